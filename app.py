@@ -4,6 +4,7 @@ from dash import dcc, html, Input, Output, State, ALL, MATCH, callback_context
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import pandas as pd
+import numpy as np
 import json
 import os
 import sys
@@ -14,27 +15,38 @@ import base64
 import hashlib
 import time
 import threading
+import multiprocessing
 import io
+import zlib
+import lzma
+import bz2
 import zipfile
 import tarfile
 import tempfile
 import uuid
-from bisect import bisect_left
-from datetime import datetime
+import mmap
+import struct
+import heapq
+import itertools
+import importlib.machinery
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import log_filter_workers
+
+if __name__ == "__main__":
+    # 打包后的进程池子进程由同一可执行文件启动，须在构建 Dash 应用之前交给 multiprocessing
+    multiprocessing.freeze_support()
+    # 进程池子进程按模块名 "__main__" 准备主模块时直接跳过，不重新执行本脚本
+    __spec__ = importlib.machinery.ModuleSpec("__main__", None)
 
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # 预编译正则模式，避免在循环中重复编译
-LOG_PREFIX_PATTERNS = [
-    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+[A-Z]\s+\w+\s*:\s*'),
-    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+[A-Z]\s*:\s*'),
-    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3}\s+[A-Z]/\w+\s*:\s*'),
-    re.compile(r'^\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?\s+'),
-    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\s+'),
-    re.compile(r'^\d{2}:\d{2}:\d{2}\s+'),
-    re.compile(r'^\[\w+\]\s*\[\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\]\s+'),
-    re.compile(r'^\[\d{10,13}\]\s+'),
-]
+LOG_PREFIX_PATTERNS = log_filter_workers.LOG_PREFIX_PATTERNS
 
 # 高亮缓存系统
 class HighlightCache:
@@ -191,8 +203,24 @@ _log_files_cache = {"mtime": None, "data": None}
 _highlight_combo_cache = {"order": [], "map": {}, "max": 30}
 _filter_tasks = {}
 _filter_tasks_lock = threading.Lock()
+_filter_cancel_tokens = {}  # session_id -> _FilterCancelToken（仅排队中/进行中的任务）
+_filter_cancel_tokens_lock = threading.Lock()
+_FILTER_PRIORITY_INTERACTIVE = 0  # 当前视图的过滤，优先调度
+_FILTER_PRIORITY_BACKGROUND = 1  # 对比等后台过滤
 _FILTER_CHUNK_LINES = 200  # 首片行数（更快首屏）
 _FILTER_PROGRESS_INTERVAL_MS = 800  # 前端轮询间隔
+_LINE_INDEX_STRIDE = 1  # 行索引步长（1 = 每行一个偏移，O(1) 定位）
+_PARALLEL_FILTER_CHUNK_BYTES = 16 * 1024 * 1024  # 并行过滤分块大小（按行对齐）
+_PARALLEL_FILTER_MIN_BYTES = 2 * _PARALLEL_FILTER_CHUNK_BYTES  # 小于该大小时在当前进程内处理
+_MASKED_FILTER_WINDOW_LINES = 65536  # 字段过滤按行掩码分窗，每窗读取一次首末选中行之间的字节
+_CONTEXT_MAX_LINES = 1000  # 上下文模式每个命中前/后最多输出的行数
+_CONTEXT_READ_LINES = 65536  # 上下文模式每次从源日志读取的行数上限
+_CONTEXT_SEPARATOR = b"--\n"  # 上下文模式中不相邻的两段之间的分隔行（同 grep -C）
+_PIPE_READ_BYTES = 1024 * 1024  # 外部过滤命令管道单次读取上限
+_CHILD_READ_PROBE_INTERVAL = 0.5  # 外部过滤命令读取位置的探测间隔（秒）
+_LINE_OFFSET_PREFIX_RE = re.compile(rb"^(\d+):(\d+):", re.MULTILINE)  # rg/grep -n -b、findstr /n /o 的行前缀
+_filter_process_pool = None
+_filter_process_pool_lock = threading.Lock()
 
 _ai_flow_tasks = {}
 _ai_flow_tasks_lock = threading.Lock()
@@ -442,20 +470,218 @@ def _resolve_filter_backend(preferred_backend="auto"):
     return "python"
 
 
+class _FilterCancelToken:
+    """过滤任务的取消令牌：登记外部子进程，取消时立即结束它们；
+    Python/并行引擎在每个分块发布进度时检查令牌"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.thread = None
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def cancelled(self):
+        return self.event.is_set()
+
+    def register(self, proc):
+        with self._lock:
+            self._processes.add(proc)
+            cancelled = self.event.is_set()
+        if cancelled:
+            _kill_process(proc)
+
+    def unregister(self, proc):
+        with self._lock:
+            self._processes.discard(proc)
+
+    def cancel(self):
+        self.event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for proc in processes:
+            _kill_process(proc)
+
+
+def _kill_process(proc):
+    try:
+        if proc.poll() is None:
+            proc.kill()
+    except OSError:
+        pass
+
+
+def _get_filter_cancel_token(session_id):
+    with _filter_cancel_tokens_lock:
+        return _filter_cancel_tokens.get(session_id)
+
+
+def _is_filter_cancelled(session_id):
+    token = _get_filter_cancel_token(session_id) if session_id else None
+    return bool(token and token.cancelled())
+
+
+def _check_filter_cancelled(session_id):
+    if _is_filter_cancelled(session_id):
+        raise RuntimeError("任务已取消")
+
+
+def _cancel_filter_task(session_id):
+    """取消过滤：排队中的直接出队；进行中的结束子进程，引擎在下一个分块处退出并删除未完成的结果文件"""
+    token = _get_filter_cancel_token(session_id)
+    if token and not token.cancelled():
+        token.cancel()
+        if _filter_job_scheduler.discard(session_id):
+            with _filter_cancel_tokens_lock:
+                if _filter_cancel_tokens.get(session_id) is token:
+                    _filter_cancel_tokens.pop(session_id, None)
+            _remove_filter_session_files(session_id)
+        print(f"[过滤] 已取消任务 session={session_id}")
+
+
+def _cancelled_run_alive(session_id):
+    token = _get_filter_cancel_token(session_id)
+    return bool(token and token.cancelled() and token.thread and token.thread.is_alive())
+
+
+def _wait_for_cancelled_run(session_id, timeout=30):
+    """同一 session 重新启动前，等待被取消的旧线程退出，避免两个线程写同一组结果文件"""
+    token = _get_filter_cancel_token(session_id)
+    if token and token.cancelled() and token.thread and token.thread.is_alive():
+        token.thread.join(timeout)
+
+
+# 会话内容寻址，相同配置的多个页面/用户共用同一 session：按客户端引用计数，
+# 最后一个引用释放时才取消任务，避免一个客户端切换配置时取消其他客户端仍在查看的过滤
+_filter_session_refs = Counter()
+_filter_session_refs_lock = threading.Lock()
+
+
+def _retain_filter_session(session_id):
+    if not session_id:
+        return
+    with _filter_session_refs_lock:
+        _filter_session_refs[session_id] += 1
+
+
+def _release_filter_session(session_id, delete_files=False):
+    """客户端不再使用该 session；没有其他引用时清理任务"""
+    if not session_id:
+        return
+    with _filter_session_refs_lock:
+        remaining = _filter_session_refs[session_id] - 1
+        if remaining > 0:
+            _filter_session_refs[session_id] = remaining
+        else:
+            _filter_session_refs.pop(session_id, None)
+    if remaining > 0:
+        print(f"[过滤] session={session_id} 仍被 {remaining} 个客户端使用，保留任务")
+        return
+    _clear_filter_task(session_id, delete_files=delete_files)
+
+
+def _get_filter_max_jobs():
+    try:
+        return max(1, int(os.environ.get("LOG_FILTER_MAX_JOBS") or 2))
+    except ValueError:
+        return 2
+
+
+class _FilterJobScheduler:
+    """过滤任务调度器：限制同时运行的扫描数，其余按 (优先级, 提交顺序) 排队。
+    相同配置的请求共用同一 session（内容寻址），排队中不会重复入队。"""
+
+    def __init__(self, max_jobs):
+        self.max_jobs = max_jobs
+        self._heap = []
+        self._pending = {}  # session_id -> 队列条目 [优先级, 序号, session_id, 目标函数, 参数, 有效]
+        self._running = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, target, args, priority):
+        with self._lock:
+            entry = [priority, next(self._seq), session_id, target, args, True]
+            self._pending[session_id] = entry
+            heapq.heappush(self._heap, entry)
+        self._dispatch()
+
+    def promote(self, session_id, priority):
+        """排队中的任务被更高优先级的请求复用时提前，保留原提交顺序"""
+        with self._lock:
+            entry = self._pending.get(session_id)
+            if entry is None or entry[0] <= priority:
+                return
+            entry[5] = False
+            promoted = [priority, entry[1], session_id, entry[3], entry[4], True]
+            self._pending[session_id] = promoted
+            heapq.heappush(self._heap, promoted)
+
+    def discard(self, session_id):
+        """从队列移除尚未开始的任务，返回是否移除"""
+        with self._lock:
+            entry = self._pending.pop(session_id, None)
+            if entry is None:
+                return False
+            entry[5] = False
+            return True
+
+    def position(self, session_id):
+        """排队位置（1 表示下一个开始），不在队列中返回 None"""
+        with self._lock:
+            entry = self._pending.get(session_id)
+            if entry is None:
+                return None
+            return 1 + sum(1 for other in self._pending.values() if other[:2] < entry[:2])
+
+    def _dispatch(self):
+        threads = []
+        with self._lock:
+            while self._heap and self._running < self.max_jobs:
+                entry = heapq.heappop(self._heap)
+                if not entry[5]:
+                    continue
+                self._pending.pop(entry[2], None)
+                self._running += 1
+                thread = threading.Thread(target=self._run, args=(entry,), daemon=True)
+                # 在锁内登记线程，取消后重启同一 session 时可以等待它退出
+                token = _get_filter_cancel_token(entry[2])
+                if token is not None:
+                    token.thread = thread
+                threads.append(thread)
+        for thread in threads:
+            thread.start()
+
+    def _run(self, entry):
+        session_id = entry[2]
+        try:
+            if not _is_filter_cancelled(session_id):
+                _update_filter_task(session_id, status="running", started_at=time.time())
+                entry[3](*entry[4])
+            else:
+                # 出队与取消同时发生：不再启动，释放令牌
+                with _filter_cancel_tokens_lock:
+                    _filter_cancel_tokens.pop(session_id, None)
+                _remove_filter_session_files(session_id)
+        except Exception as e:
+            print(f"[调度] 过滤任务异常 session={session_id}: {e}")
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._dispatch()
+
+
+_filter_job_scheduler = _FilterJobScheduler(_get_filter_max_jobs())
+
+
 def _clear_filter_task(session_id, delete_files=False):
-    """删除指定session的任务记录，可选删除临时文件"""
+    """删除指定session的任务记录并取消进行中的过滤，可选删除临时文件（结果、索引、映射等旁路文件）"""
+    _cancel_filter_task(session_id)
     with _filter_tasks_lock:
         task = _filter_tasks.pop(session_id, None)
+    _drop_session_reader(session_id)
+    _drop_source_view_session(session_id)
     if delete_files and task:
-        try:
-            temp_file = task.get("temp_file")
-            idx_file = task.get("idx_file")
-            if temp_file and os.path.exists(temp_file):
-                os.remove(temp_file)
-            if idx_file and os.path.exists(idx_file):
-                os.remove(idx_file)
-        except Exception:
-            pass
+        _remove_filter_session_files(session_id)
 
 
 def _clear_all_filter_tasks(delete_files=False):
@@ -587,7 +813,13 @@ except ImportError:
 DATA_FILE = 'string_data.json'
 ANNOTATIONS_FILE = 'keyword_annotations.json'
 FLOWS_CONFIG_FILE = 'flows.json'
-ALLOWED_LOG_EXTENSIONS = ('.txt', '.log', '.text')
+# 压缩日志作为一等日志源：不解压落盘，读取时流式解压（.zst 需安装 zstandard）
+COMPRESSED_LOG_EXTENSIONS = ('.gz', '.xz', '.bz2', '.zst')
+# 日志集：.logset 清单把轮转分段（logcat.N … logcat.1、logcat）按顺序虚拟拼接成一个日志，不落盘合并
+LOG_SET_EXTENSION = '.logset'
+ALLOWED_LOG_EXTENSIONS = ('.txt', '.log', '.text') + COMPRESSED_LOG_EXTENSIONS + (LOG_SET_EXTENSION,)
+# 没有扩展名的设备日志（logcat、kernel 等）及其轮转分段 name.N
+ROTATED_LOG_BASENAMES = ('logcat', 'kernel', 'dmesg', 'kmsg', 'main', 'system', 'events', 'radio', 'crash')
 ALLOWED_ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.7z')
 
 # 获取所有配置文件
@@ -612,6 +844,10 @@ FREE_CODE_CHAT_EXTRA_ARGS = [
 
 # 日志文件目录
 LOG_DIR = 'logs'
+# 就地导入（硬链接/写时复制克隆/符号链接引用）的源文件清单，按 大小 + mtime 校验源文件是否变化
+IMPORT_MANIFEST_FILE = os.path.join(LOG_DIR, '.import_manifest.json')
+# 本地路径导入方式：auto=硬链接→克隆→复制，reference=符号链接引用源文件，copy=始终复制
+LOG_IMPORT_MODE = os.environ.get('LOG_FILTER_IMPORT_MODE', 'auto')
 
 # 临时文件目录（用于存储过滤结果）
 TEMP_DIR = 'temp'
@@ -834,6 +1070,9 @@ def _build_free_code_chat_message(message, attachments, analysis_context=None):
             f"- 日志文件: {str(analysis_context.get('selected_log_file') or '').strip() or '未提供'}",
             f"- 选中行数: {analysis_context.get('selected_line_count') or 0}",
         ])
+        source_lines = analysis_context.get("selected_source_lines") or []
+        if display_mode == "filtered" and isinstance(source_lines, list) and source_lines:
+            sections.append(f"- 对应源文件行号: {', '.join(str(item) for item in source_lines[:50])}")
         if config_files:
             sections.append(f"- 关联配置文件: {', '.join(str(item) for item in config_files)}")
         if display_mode == "filtered":
@@ -1315,27 +1554,20 @@ def read_selected_lines_from_source_log(selected_log_file, line_numbers):
     if not os.path.exists(log_path):
         return []
 
-    target_lines = set(line_numbers)
-    max_line = max(target_lines)
-    encoding = detect_file_encoding(log_path)
     result = []
     try:
-        with open(log_path, "r", encoding=encoding, errors="replace") as f:
-            for current_line, raw_line in enumerate(f, start=1):
-                if current_line > max_line:
-                    break
-                if current_line not in target_lines:
-                    continue
-                content = raw_line.rstrip("\n")
-                parsed = _parse_log_line(content)
-                result.append({
-                    "line_number": current_line,
-                    "content": content,
-                    "timestamp": parsed.get("timestamp", ""),
-                    "tag": parsed.get("tag", ""),
-                    "level": parsed.get("level", ""),
-                    "message": parsed.get("message", ""),
-                })
+        lines_by_number = _read_lines_by_numbers(log_path, line_numbers)
+        for current_line in sorted(lines_by_number):
+            content = lines_by_number[current_line]
+            parsed = _parse_log_line(content)
+            result.append({
+                "line_number": current_line,
+                "content": content,
+                "timestamp": parsed.get("timestamp", ""),
+                "tag": parsed.get("tag", ""),
+                "level": parsed.get("level", ""),
+                "message": parsed.get("message", ""),
+            })
     except Exception as e:
         print(f"读取源文件选中日志失败: {e}")
         return []
@@ -1344,7 +1576,11 @@ def read_selected_lines_from_source_log(selected_log_file, line_numbers):
 
 def _format_line_entries_as_attachment(display_mode, line_entries):
     mode_label = "过滤结果" if display_mode == "filtered" else "源文件"
-    lines = [f"[{entry.get('line_number')}] {entry.get('content', '')}" for entry in line_entries]
+    lines = []
+    for entry in line_entries:
+        source_line = entry.get("source_line_number")
+        prefix = f"[{entry.get('line_number')}|源{source_line}]" if source_line else f"[{entry.get('line_number')}]"
+        lines.append(f"{prefix} {entry.get('content', '')}")
     return {
         "label": f"{mode_label}选中日志 ({len(line_entries)}行)",
         "text": "\n".join(lines).strip(),
@@ -1398,6 +1634,7 @@ def build_log_analysis_request_payload(group_name, display_mode, selected_log_fi
         "display_mode": display_mode,
         "selected_log_file": selected_log_file,
         "selected_lines": [entry["line_number"] for entry in line_entries],
+        "selected_source_lines": [entry["source_line_number"] for entry in line_entries if entry.get("source_line_number")],
         "selected_line_count": len(line_entries),
         "filtered_result": display_mode == "filtered",
         "auto_update_skill": bool(group_name),
@@ -1476,14 +1713,16 @@ def _normalize_log_dirname(dirname):
 
 def _ensure_allowed_log_extension(filename):
     normalized = _normalize_log_filename(filename)
-    if not normalized.lower().endswith(ALLOWED_LOG_EXTENSIONS):
+    if not _has_allowed_log_extension(normalized):
         allowed_text = "、".join(ALLOWED_LOG_EXTENSIONS)
         raise ValueError(f"仅支持 {allowed_text} 文件")
     return normalized
 
 def _resolve_log_file_path(filename, must_exist=False, allowed_extensions=None):
     normalized = _normalize_log_filename(filename)
-    if allowed_extensions and not normalized.lower().endswith(tuple(ext.lower() for ext in allowed_extensions)):
+    lower = normalized.lower()
+    if allowed_extensions and not lower.endswith(tuple(ext.lower() for ext in allowed_extensions)) and not (
+            '.log' in allowed_extensions and _is_rotated_log_name(lower)):
         allowed_text = "、".join(allowed_extensions)
         raise ValueError(f"仅支持 {allowed_text} 文件")
     log_dir = get_log_dir_path()
@@ -1522,6 +1761,30 @@ def _has_allowed_archive_extension(filename):
     value = str(filename or "").lower()
     return value.endswith(ALLOWED_ARCHIVE_EXTENSIONS)
 
+def _has_allowed_log_extension(filename):
+    """.tar.gz 等虽以压缩日志扩展名结尾，但按压缩包处理；轮转分段（logcat.1、kernel.log.2）也视为日志"""
+    value = str(filename or "").lower()
+    if value.endswith(ALLOWED_ARCHIVE_EXTENSIONS):
+        return False
+    return value.endswith(ALLOWED_LOG_EXTENSIONS) or _is_rotated_log_name(value)
+
+_ROTATED_LOG_PATTERN = re.compile(r'^(?P<base>.+?)\.(?P<index>\d{1,4})(?:\.(?:gz|xz|bz2|zst))?$', re.IGNORECASE)
+
+def _split_rotated_log_name(filename):
+    """轮转日志文件名 -> (基础名, 轮转序号)：logcat.2 -> (logcat, 2)，kernel.log -> (kernel.log, 0)；
+    基础名既不是日志扩展名也不是已知设备日志名时返回 None"""
+    name = os.path.basename(str(filename or ""))
+    match = _ROTATED_LOG_PATTERN.match(name)
+    base, index = (match.group("base"), int(match.group("index"))) if match else (name, 0)
+    lower = base.lower()
+    if lower.endswith(('.txt', '.log', '.text')) or lower in ROTATED_LOG_BASENAMES:
+        return base, index
+    return None
+
+def _is_rotated_log_name(filename):
+    parts = _split_rotated_log_name(filename)
+    return bool(parts) and (parts[1] > 0 or parts[0].lower() in ROTATED_LOG_BASENAMES)
+
 def _sanitize_import_filename(filename):
     value = re.sub(r'[\x00-\x1f<>:"|?*\\/]+', "_", str(filename or "").strip())
     value = value.strip(" .")
@@ -1533,35 +1796,136 @@ def _sanitize_import_relative_path(path_value):
     except Exception:
         return _sanitize_import_filename(os.path.basename(str(path_value or "")))
 
-def _copy_log_file_to_logs(src_path, display_name=None):
+_import_manifest_lock = threading.Lock()
+_FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+def _normalize_import_mode(mode=None):
+    value = str(mode or LOG_IMPORT_MODE or "auto").strip().lower()
+    if value in ("link", "hardlink"):
+        return "auto"
+    return value if value in ("auto", "reference", "copy") else "auto"
+
+def _try_reflink(src_path, dest_path):
+    """Linux 上尝试 FICLONE 写时复制克隆（btrfs/xfs 等），不支持时返回 False"""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(src_path, dest_path)
+        return True
+    except (OSError, ImportError):
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        return False
+
+def _place_log_file(src_path, dest_path, mode=None):
+    """按导入方式把源日志放入 logs/，返回实际使用的方式（hardlink/reflink/symlink/copy）"""
+    mode = _normalize_import_mode(mode)
+    if mode == "reference":
+        try:
+            os.symlink(os.path.abspath(src_path), dest_path)
+            return "symlink"
+        except (OSError, NotImplementedError) as e:
+            print(f"[导入] 无法创建符号链接，改为复制: {e}")
+    elif mode == "auto":
+        try:
+            os.link(src_path, dest_path)
+            return "hardlink"
+        except OSError:
+            pass  # 跨文件系统或文件系统不支持硬链接
+        if _try_reflink(src_path, dest_path):
+            return "reflink"
+    shutil.copy2(src_path, dest_path)
+    return "copy"
+
+def _load_import_manifest():
+    return _load_json_config(IMPORT_MANIFEST_FILE, {})
+
+def _update_import_manifest(update):
+    """在锁内读取-修改-保存导入清单，update(manifest) 原地修改"""
+    with _import_manifest_lock:
+        manifest = _load_import_manifest()
+        update(manifest)
+        ensure_log_dir()
+        _save_json_config(IMPORT_MANIFEST_FILE, manifest)
+
+def _record_imported_logs(records):
+    """records: [(logs/ 下的相对路径, 源文件路径, 导入方式)]"""
+    entries = {}
+    for filename, src_path, mode in records:
+        stat = os.stat(src_path)
+        entries[filename] = {
+            "source": os.path.abspath(src_path),
+            "mode": mode,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+    if entries:
+        _update_import_manifest(lambda manifest: manifest.update(entries))
+
+def _forget_imported_logs(path_prefix, new_prefix=None):
+    """删除（或重命名到 new_prefix）清单中 path_prefix 对应的文件及目录下的条目"""
+    prefix = str(path_prefix or "").replace("\\", "/").rstrip("/")
+
+    def _update(manifest):
+        for key in [k for k in manifest if k == prefix or k.startswith(prefix + "/")]:
+            entry = manifest.pop(key)
+            if new_prefix:
+                manifest[str(new_prefix).replace("\\", "/").rstrip("/") + key[len(prefix):]] = entry
+
+    _update_import_manifest(_update)
+
+def _get_imported_log_status(entry):
+    """就地导入日志的源文件状态：None（复制导入）/ ok / changed（大小或 mtime 变化）/ missing"""
+    if not entry:
+        return None
+    try:
+        stat = os.stat(entry.get("source") or "")
+    except OSError:
+        return "missing"
+    if stat.st_size != entry.get("size") or stat.st_mtime_ns != entry.get("mtime_ns"):
+        return "changed"
+    return "ok"
+
+def _copy_log_file_to_logs(src_path, display_name=None, mode="copy", records=None):
+    """把源日志放入 logs/；非复制方式导入时把 (文件名, 源路径, 方式) 追加到 records 供写入清单"""
     if not os.path.isfile(src_path):
         return None
     name = _sanitize_import_relative_path(display_name) if display_name else _sanitize_import_filename(os.path.basename(src_path))
-    if not name.lower().endswith(ALLOWED_LOG_EXTENSIONS):
+    if not _has_allowed_log_extension(name):
         return None
     filename, dest_path = _build_available_log_filename(name)
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    shutil.copy2(src_path, dest_path)
-    return filename.replace(os.sep, "/")
+    used_mode = _place_log_file(src_path, dest_path, mode)
+    filename = filename.replace(os.sep, "/")
+    if used_mode != "copy" and records is not None:
+        records.append((filename, src_path, used_mode))
+    return filename
 
 def _iter_log_files_in_dir(dir_path):
     for root, dirs, files in os.walk(dir_path):
         dirs[:] = [d for d in dirs if not d.startswith(".")]
         for filename in files:
-            if filename.startswith(".") or not filename.lower().endswith(ALLOWED_LOG_EXTENSIONS):
+            if filename.startswith(".") or not _has_allowed_log_extension(filename):
                 continue
             file_path = os.path.join(root, filename)
             if os.path.isfile(file_path):
                 rel_path = os.path.relpath(file_path, dir_path)
                 yield file_path, rel_path
 
-def _import_log_dir(dir_path, prefix=""):
+def _import_log_dir(dir_path, prefix="", mode="copy"):
     imported = []
-    for file_path, rel_path in _iter_log_files_in_dir(dir_path):
-        display_name = _sanitize_import_relative_path(os.path.join(prefix, rel_path) if prefix else rel_path)
-        copied = _copy_log_file_to_logs(file_path, display_name)
-        if copied:
-            imported.append(copied)
+    records = []
+    try:
+        for file_path, rel_path in _iter_log_files_in_dir(dir_path):
+            display_name = _sanitize_import_relative_path(os.path.join(prefix, rel_path) if prefix else rel_path)
+            copied = _copy_log_file_to_logs(file_path, display_name, mode=mode, records=records)
+            if copied:
+                imported.append(copied)
+    finally:
+        _record_imported_logs(records)
     return imported
 
 def _safe_zip_members(zip_file):
@@ -1572,19 +1936,19 @@ def _safe_zip_members(zip_file):
         parts = [part for part in name.split("/") if part]
         if not parts or any(part == ".." for part in parts):
             continue
-        if parts[-1].startswith(".") or not parts[-1].lower().endswith(ALLOWED_LOG_EXTENSIONS):
+        if parts[-1].startswith(".") or not _has_allowed_log_extension(parts[-1]):
             continue
         yield info, os.path.join(*parts)
 
 def _safe_tar_members(tar_file):
-    for member in tar_file.getmembers():
+    for member in tar_file:
         if not member.isfile():
             continue
         name = member.name.replace("\\", "/")
         parts = [part for part in name.split("/") if part]
         if not parts or any(part == ".." for part in parts):
             continue
-        if parts[-1].startswith(".") or not parts[-1].lower().endswith(ALLOWED_LOG_EXTENSIONS):
+        if parts[-1].startswith(".") or not _has_allowed_log_extension(parts[-1]):
             continue
         yield member, os.path.join(*parts)
 
@@ -1595,32 +1959,52 @@ def _find_7z_command():
             return tool
     return None
 
+def _save_log_stream_to_logs(src, display_name):
+    """把压缩包成员直接流式写入 logs/，不经过临时目录中转"""
+    name = _sanitize_import_relative_path(display_name)
+    if not _has_allowed_log_extension(name):
+        return None
+    filename, dest_path = _build_available_log_filename(name)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    try:
+        with open(dest_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    except Exception:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return filename.replace(os.sep, "/")
+
 def _import_archive_file(archive_path):
+    """导入压缩包中的日志：zip/tar 成员直接写入 logs/（.gz 等压缩成员保持压缩，读取时流式解压），
+    7z 依赖外部工具，仍先解压到临时目录"""
     archive_name = _sanitize_import_filename(os.path.basename(archive_path))
+    prefix = os.path.splitext(archive_name)[0]
     imported = []
-    with tempfile.TemporaryDirectory(prefix="log_filter_archive_") as temp_dir:
-        lower_name = archive_name.lower()
-        if lower_name.endswith(".zip"):
-            with zipfile.ZipFile(archive_path) as zip_file:
-                for info, rel_path in _safe_zip_members(zip_file):
-                    target_path = os.path.join(temp_dir, rel_path)
-                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                    with zip_file.open(info) as src, open(target_path, "wb") as dst:
-                        shutil.copyfileobj(src, dst)
-        elif lower_name.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")):
-            with tarfile.open(archive_path, "r:*") as tar_file:
-                for member, rel_path in _safe_tar_members(tar_file):
-                    target_path = os.path.join(temp_dir, rel_path)
-                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                    src = tar_file.extractfile(member)
-                    if src is None:
-                        continue
-                    with src, open(target_path, "wb") as dst:
-                        shutil.copyfileobj(src, dst)
-        elif lower_name.endswith(".7z"):
-            tool = _find_7z_command()
-            if not tool:
-                raise ValueError("未找到 7z/7za/7zr，无法解压 7z 文件")
+    lower_name = archive_name.lower()
+    if lower_name.endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as zip_file:
+            for info, rel_path in _safe_zip_members(zip_file):
+                with zip_file.open(info) as src:
+                    saved = _save_log_stream_to_logs(src, os.path.join(prefix, rel_path))
+                if saved:
+                    imported.append(saved)
+    elif lower_name.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")):
+        # 流式模式顺序读取成员，压缩 tar 无需回退重读
+        with tarfile.open(archive_path, "r|*") as tar_file:
+            for member, rel_path in _safe_tar_members(tar_file):
+                src = tar_file.extractfile(member)
+                if src is None:
+                    continue
+                with src:
+                    saved = _save_log_stream_to_logs(src, os.path.join(prefix, rel_path))
+                if saved:
+                    imported.append(saved)
+    elif lower_name.endswith(".7z"):
+        tool = _find_7z_command()
+        if not tool:
+            raise ValueError("未找到 7z/7za/7zr，无法解压 7z 文件")
+        with tempfile.TemporaryDirectory(prefix="log_filter_archive_") as temp_dir:
             result = subprocess.run(
                 [tool, "x", "-y", f"-o{temp_dir}", archive_path],
                 stdout=subprocess.PIPE,
@@ -1631,23 +2015,27 @@ def _import_archive_file(archive_path):
             if result.returncode != 0:
                 detail = (result.stderr or result.stdout or "").strip()
                 raise ValueError(f"7z 解压失败: {detail[:300]}")
-        else:
-            raise ValueError(f"不支持的压缩包类型: {archive_name}")
-        imported = _import_log_dir(temp_dir, prefix=os.path.splitext(archive_name)[0])
+            imported = _import_log_dir(temp_dir, prefix=prefix)
+    else:
+        raise ValueError(f"不支持的压缩包类型: {archive_name}")
     return imported
 
-def import_log_source_path(source_path):
+def import_log_source_path(source_path, mode=None):
+    """导入本地日志文件、目录或压缩包；mode 见 LOG_IMPORT_MODE，压缩包始终解出成员"""
     if not source_path:
         return []
     source_path = os.path.abspath(str(source_path))
+    mode = _normalize_import_mode(mode)
     if os.path.isdir(source_path):
-        return _import_log_dir(source_path, prefix=os.path.basename(source_path))
+        return _import_log_dir(source_path, prefix=os.path.basename(source_path), mode=mode)
     if os.path.isfile(source_path):
-        if str(source_path).lower().endswith(ALLOWED_LOG_EXTENSIONS):
-            copied = _copy_log_file_to_logs(source_path)
-            return [copied] if copied else []
         if _has_allowed_archive_extension(source_path):
             return _import_archive_file(source_path)
+        if _has_allowed_log_extension(str(source_path)):
+            records = []
+            copied = _copy_log_file_to_logs(source_path, mode=mode, records=records)
+            _record_imported_logs(records)
+            return [copied] if copied else []
     return []
 
 def _parse_external_program_command(value):
@@ -1784,7 +2172,7 @@ def get_log_files():
                 except OSError:
                     pass
                 for file in files:
-                    if file.lower().endswith(ALLOWED_LOG_EXTENSIONS):
+                    if _has_allowed_log_extension(file):
                         file_path = os.path.join(root, file)
                         try:
                             signature.append((os.path.relpath(file_path, LOG_DIR), os.path.getmtime(file_path)))
@@ -1797,7 +2185,7 @@ def get_log_files():
             for root, dirs, files in os.walk(LOG_DIR):
                 dirs[:] = [d for d in dirs if not d.startswith(".")]
                 for file in files:
-                    if file.lower().endswith(ALLOWED_LOG_EXTENSIONS):
+                    if _has_allowed_log_extension(file):
                         rel_path = os.path.relpath(os.path.join(root, file), LOG_DIR)
                         log_files.append(rel_path.replace(os.sep, "/"))
             log_files = sorted(log_files, key=lambda item: item.lower())
@@ -1808,6 +2196,38 @@ def get_log_files():
         print(f"获取日志列表失败: {e}")
     return []
 
+def _find_log_rotation_groups(log_files, current_dir=""):
+    """当前目录中的轮转分组 [(基础名, 从旧到新的分段文件名)]，只收录含编号分段且至少两段的分组"""
+    groups = {}
+    for file in log_files:
+        parent = os.path.dirname(file).replace("\\", "/")
+        if parent != (current_dir or "") or _is_log_set(file):
+            continue
+        parts = _split_rotated_log_name(file)
+        if parts:
+            groups.setdefault(parts[0], []).append((parts[1], file))
+    result = []
+    for base, members in sorted(groups.items()):
+        if len(members) < 2 or not any(index for index, _ in members):
+            continue
+        # 序号越大越旧，当前分段（序号 0）在最后
+        result.append((base, [file for _, file in sorted(members, key=lambda item: (-item[0], item[1]))]))
+    return result
+
+def _create_log_sets(current_dir=""):
+    """为当前目录的每组轮转日志写出 .logset 清单（已存在则按当前分段刷新），返回清单文件名列表"""
+    current_dir = _normalize_log_manager_dir(current_dir)
+    created = []
+    for base, members in _find_log_rotation_groups(get_log_files(), current_dir):
+        stem = re.sub(r'\.(?:txt|log|text)$', '', base, flags=re.IGNORECASE)
+        name = _join_log_manager_path(current_dir, stem + LOG_SET_EXTENSION)
+        name, path = _resolve_log_file_path(name, allowed_extensions=ALLOWED_LOG_EXTENSIONS)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"segments": [os.path.basename(file) for file in members]}, f, ensure_ascii=False, indent=2)
+        created.append(name.replace(os.sep, "/"))
+        print(f"[日志集] 生成 {name}: {len(members)} 个分段")
+    return created
+
 def get_config_path(config_name):
     """获取配置文件的完整路径"""
     ensure_config_dir()
@@ -1913,7 +2333,12 @@ def _init_filter_task(session_id, log_path, keep_strings, filter_strings, select
             "idx_file": None,
             "encoding": None,
             "done_lines": 0,
-            "total_lines": None,
+            "done_bytes": 0,
+            "total_bytes": None,
+            "bytes_per_sec": 0.0,
+            "lines_per_sec": 0.0,
+            "eta_seconds": None,
+            "started_at": time.time(),
             "first_ready": False,
             "finished": False,
             "error": None,
@@ -1929,7 +2354,17 @@ def _update_filter_task(session_id, **kwargs):
     with _filter_tasks_lock:
         if session_id not in _filter_tasks:
             return
-        _filter_tasks[session_id].update(kwargs)
+        task = _filter_tasks[session_id]
+        task.update(kwargs)
+        if "done_bytes" in kwargs:
+            # 按源文件已处理字节计算吞吐（MB/s、输出行/s）与剩余时间
+            elapsed = max(1e-6, time.time() - (task.get("started_at") or time.time()))
+            done_bytes = task.get("done_bytes") or 0
+            total_bytes = task.get("total_bytes") or 0
+            task["bytes_per_sec"] = done_bytes / elapsed
+            task["lines_per_sec"] = (task.get("done_lines") or 0) / elapsed
+            if total_bytes and task["bytes_per_sec"] > 0:
+                task["eta_seconds"] = max(0.0, (total_bytes - done_bytes) / task["bytes_per_sec"])
 
 
 def _get_filter_task(session_id):
@@ -1937,6 +2372,267 @@ def _get_filter_task(session_id):
         return _filter_tasks.get(session_id, {}).copy()
 
 
+# ------------------- 过滤结果缓存（内容寻址） -------------------
+_FILTER_CACHE_MAX_BYTES = int(float(os.environ.get("LOG_FILTER_CACHE_MB") or 2048) * 1024 * 1024)
+_filter_session_start_lock = threading.Lock()
+
+
+class _FilterSessionStartGuard:
+    """持有会话启动锁；同一 session 被取消的旧线程尚未退出时先在锁外等待，不阻塞其他会话的启动"""
+
+    def __init__(self, session_id, timeout=30):
+        self.session_id = session_id
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            _wait_for_cancelled_run(self.session_id, max(0.0, deadline - time.time()))
+            _filter_session_start_lock.acquire()
+            # 等待期间可能又有同 session 的任务被取消：仍未退出时释放锁重新等待，超时后照常启动
+            if time.time() >= deadline or not _cancelled_run_alive(self.session_id):
+                return self
+            _filter_session_start_lock.release()
+
+    def __exit__(self, exc_type, exc, tb):
+        _filter_session_start_lock.release()
+        return False
+
+
+def _normalize_cache_terms(values):
+    """关键字均按忽略大小写匹配：统一小写、去重、排序后参与缓存键"""
+    return sorted({term.lower() for term in _normalize_filter_terms(values)})
+
+
+def _filter_output_semantics(preferred_backend="auto"):
+    """PowerShell 会把结果重新编码为 UTF-8，其余后端都输出源文件原始字节"""
+    try:
+        backend = _resolve_filter_backend(preferred_backend)
+    except Exception:
+        backend = "python"
+    return "utf8-reencoded" if backend == "powershell" else "raw"
+
+
+def _build_filter_cache_key(log_path, keep_strings, filter_strings, preferred_backend="auto", time_range=None,
+                            field_filter=None, merge_paths=None, context=None):
+    """返回 (缓存键字典, 序列化后的缓存键)；merge_paths 为与 log_path 按时间戳归并的其他源日志，
+    context 为每个命中输出的 [前, 后] 上下文行数"""
+    payload = {
+        "source": _get_file_identity(log_path),
+        "keep": _normalize_cache_terms(keep_strings),
+        "filter": _normalize_cache_terms(filter_strings),
+        "output": _filter_output_semantics(preferred_backend)
+    }
+    if time_range:
+        payload["time_range"] = list(time_range)
+    if field_filter:
+        payload["fields"] = field_filter
+    if merge_paths:
+        payload["merge"] = [_get_file_identity(path) for path in merge_paths]
+    if context:
+        payload["context"] = list(context)
+    return payload, json.dumps(payload, ensure_ascii=False, sort_keys=True)
+
+
+def _get_filter_key_path(session_id):
+    """记录会话缓存键的旁路文件，用于查找可增量细化的父结果"""
+    return os.path.join(TEMP_DIR, f"filter_result_{session_id}.txt.key")
+
+
+def _find_refinement_parent(payload):
+    """查找可作为增量细化起点的已完成结果：同一源文件，新结果必然是其子集
+    （父保留词为空或包含新保留词，父排除词包含于新排除词），取结果最小者；
+    上下文模式的结果含非命中行，既不作为父结果也不从父结果细化"""
+    if payload.get("output") != "raw" or payload.get("context"):
+        return None
+    keep_set = set(payload["keep"])
+    filter_set = set(payload["filter"])
+    try:
+        names = os.listdir(TEMP_DIR)
+    except OSError:
+        return None
+    best = None
+    for name in names:
+        if not (name.startswith("filter_result_") and name.endswith(".txt.key")):
+            continue
+        session_id = name[len("filter_result_"):-len(".txt.key")]
+        try:
+            with open(os.path.join(TEMP_DIR, name), 'r', encoding='utf-8') as f:
+                parent = json.load(f)
+        except Exception:
+            continue
+        if parent.get("source") != payload["source"] or parent.get("output") != "raw":
+            continue
+        if parent.get("time_range") != payload.get("time_range") or parent.get("fields") != payload.get("fields"):
+            continue
+        if parent.get("merge") != payload.get("merge") or parent.get("context"):
+            continue
+        parent_keep = set(parent.get("keep") or [])
+        parent_filter = set(parent.get("filter") or [])
+        if parent_keep and (not keep_set or not keep_set <= parent_keep):
+            continue
+        if not parent_filter <= filter_set or (parent_keep == keep_set and parent_filter == filter_set):
+            continue
+        meta = _load_cached_filter_result(session_id)
+        if meta is None:
+            continue
+        temp_file = os.path.join(TEMP_DIR, f"filter_result_{session_id}.txt")
+        line_count = int(meta.get("line_count") or 0)
+        if _load_source_map_array(get_temp_source_map_path(temp_file), line_count=line_count) is None:
+            continue
+        size = int(meta.get("end_offset") or 0)
+        if best is None or size < best[1]:
+            best = (session_id, size)
+    return best[0] if best else None
+
+
+def _filter_session_files(session_id):
+    """会话相关的全部结果文件（结果、索引及其临时文件）"""
+    prefix = f"filter_result_{session_id}.txt"
+    try:
+        names = os.listdir(TEMP_DIR)
+    except OSError:
+        return []
+    return [os.path.join(TEMP_DIR, name) for name in names if name.startswith(prefix)]
+
+
+def _load_cached_filter_result(session_id):
+    """结果文件与完整索引都存在且长度一致时视为命中，返回索引元数据"""
+    temp_file = os.path.join(TEMP_DIR, f"filter_result_{session_id}.txt")
+    meta = _read_line_index_meta(get_temp_index_path(temp_file))
+    if not meta:
+        return None
+    try:
+        if os.path.getsize(temp_file) != int(meta.get("end_offset") or 0):
+            return None
+    except OSError:
+        return None
+    return meta
+
+
+def _remove_filter_session_files(session_id):
+    _drop_session_reader(session_id)
+    _drop_follow_state(session_id)
+    for path in _filter_session_files(session_id):
+        try:
+            if path.endswith(".idx"):
+                _invalidate_line_index(path)
+            os.remove(path)
+        except OSError as e:
+            print(f"[缓存] 删除过滤结果失败: {path}: {e}")
+
+
+def _enforce_filter_cache_budget(max_bytes=None):
+    """过滤结果总大小超出磁盘预算时，按最近使用时间淘汰（仍登记在任务表中的会话除外）"""
+    max_bytes = _FILTER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        names = os.listdir(TEMP_DIR)
+    except OSError:
+        return
+    with _filter_tasks_lock:
+        protected = set(_filter_tasks.keys())
+    sessions = {}
+    for name in names:
+        if not name.startswith("filter_result_"):
+            continue
+        session_id = name[len("filter_result_"):].split(".txt", 1)[0]
+        try:
+            stat = os.stat(os.path.join(TEMP_DIR, name))
+        except OSError:
+            continue
+        entry = sessions.setdefault(session_id, {"size": 0, "last_used": 0})
+        entry["size"] += stat.st_size
+        if name.endswith(".txt"):
+            entry["last_used"] = stat.st_mtime
+    total = sum(entry["size"] for entry in sessions.values())
+    if total <= max_bytes:
+        return
+    for session_id, entry in sorted(sessions.items(), key=lambda item: item[1]["last_used"]):
+        if total <= max_bytes:
+            break
+        if session_id in protected:
+            continue
+        _remove_filter_session_files(session_id)
+        total -= entry["size"]
+        print(f"[缓存] 淘汰过滤结果 session={session_id}，释放 {_format_size(entry['size'])}")
+
+
+def _start_filter_session(log_path, keep_strings, filter_strings, selected_strings, preferred_backend="auto",
+                          priority=_FILTER_PRIORITY_INTERACTIVE, time_range=None, field_filter=None, merge_paths=None,
+                          context=None):
+    """启动过滤会话：会话 ID 由文件身份、关键字集合、时间范围、字段过滤表达式、归并的其他源日志与上下文行数决定，
+    相同配置直接复用排队中/进行中的任务或已落盘的结果；新任务交给调度器按优先级排队"""
+    time_range = _normalize_time_range(time_range)
+    field_filter = _normalize_field_filter(field_filter)
+    context = _normalize_context_lines(context)
+    merge_paths = [path for path in dict.fromkeys(merge_paths or []) if path != log_path]
+    if merge_paths and (time_range or field_filter):
+        raise ValueError("按时间归并多个日志时不支持时间范围与字段过滤")
+    if context and (time_range or field_filter or merge_paths):
+        raise ValueError("上下文模式不支持时间范围、字段过滤与多日志归并")
+    try:
+        payload, cache_key = _build_filter_cache_key(log_path, keep_strings, filter_strings, preferred_backend, time_range,
+                                                     field_filter, merge_paths, context)
+    except Exception as e:
+        print(f"[缓存] 生成缓存键失败，按新会话处理: {e}")
+        payload, cache_key = None, f"{log_path}:{keep_strings}:{filter_strings}:{time.time()}"
+    session_id = hashlib.md5(cache_key.encode("utf-8")).hexdigest()
+
+    with _FilterSessionStartGuard(session_id):
+        task = _get_filter_task(session_id)
+        if task.get("status") in ("queued", "running", "finished"):
+            if task.get("status") == "queued":
+                _filter_job_scheduler.promote(session_id, priority)
+            print(f"[缓存] 复用已有过滤任务 session={session_id} status={task.get('status')}")
+            return session_id
+
+        _init_filter_task(session_id, log_path, keep_strings, filter_strings, selected_strings, preferred_backend=preferred_backend)
+        meta = _load_cached_filter_result(session_id)
+        if meta is not None:
+            temp_file = get_temp_file_path(session_id)
+            try:
+                os.utime(temp_file, None)  # 刷新最近使用时间，供 LRU 淘汰
+                total_bytes = sum(_get_log_source_size(path) for path in [log_path] + merge_paths)
+            except (OSError, RuntimeError):
+                total_bytes = 0
+            line_count = int(meta.get("line_count") or 0)
+            _update_filter_task(
+                session_id,
+                idx_file=get_temp_index_path(temp_file),
+                encoding=meta.get("encoding"),
+                total_bytes=total_bytes,
+                done_lines=line_count,
+                done_bytes=total_bytes,
+                first_ready=True,
+                finished=True,
+                status="finished",
+                backend="cache",
+                keyword_hits=meta.get("keyword_hits")
+            )
+            print(f"[缓存] 命中过滤结果 session={session_id}，行数={line_count}")
+            return session_id
+
+        parent_session_id = None
+        if payload is not None:
+            try:
+                with open(_get_filter_key_path(session_id), 'w', encoding='utf-8') as f:
+                    json.dump(payload, f, ensure_ascii=False)
+                parent_session_id = _find_refinement_parent(payload)
+            except Exception as e:
+                print(f"[缓存] 记录缓存键失败: {e}")
+        _update_filter_task(session_id, status="queued")
+        with _filter_cancel_tokens_lock:
+            _filter_cancel_tokens[session_id] = _FilterCancelToken()
+        _filter_job_scheduler.submit(
+            session_id,
+            _filter_worker,
+            (session_id, log_path, keep_strings, filter_strings, preferred_backend, _LINE_INDEX_STRIDE, parent_session_id,
+             time_range, field_filter, merge_paths, context),
+            priority
+        )
+    return session_id
+
+
 # ---- AI 流程分析任务管理 ----
 
 def _init_ai_flow_task(task_id):
@@ -2127,38 +2823,179 @@ def _format_filter_backend_text(backend=None, preferred_backend="auto", pending=
     return f"{text} · " + " · ".join(detail_parts)
 
 
-def _estimate_total_lines(log_path):
+def _format_filter_progress(task, session_id=None):
+    """按源文件已处理字节计算进度，返回 (百分比或 None, 进度文字)；排队中的任务显示排队位置。
+    进度不确定（外部命令的读取位置探测不到，已处理字节只是最后命中行的位置）时不给百分比与剩余时间"""
+    if task.get("status") == "queued":
+        position = _filter_job_scheduler.position(session_id) if session_id else None
+        return 0, f"排队中：前面还有 {position - 1} 个任务" if position else "排队中"
+    done = task.get("done_lines") or 0
+    total_bytes = task.get("total_bytes") or 0
+    done_bytes = min(task.get("done_bytes") or 0, total_bytes)
+    indeterminate = task.get("progress_indeterminate") and not task.get("finished")
+    percent = min(100, int(done_bytes * 100 / total_bytes)) if total_bytes and not indeterminate else None
+    parts = [f"{done} 行"]
+    if indeterminate:
+        parts.append(f"已扫描至少 {_format_size(done_bytes)}" + (f"/{_format_size(total_bytes)}" if total_bytes else ""))
+        return percent, " · ".join(parts)
+    if total_bytes:
+        parts.append(f"{_format_size(done_bytes)}/{_format_size(total_bytes)}")
+    if task.get("bytes_per_sec"):
+        parts.append(f"{task['bytes_per_sec'] / (1024 * 1024):.1f} MB/s")
+    if task.get("lines_per_sec"):
+        parts.append(f"{task['lines_per_sec']:.0f} 行/s")
+    eta = task.get("eta_seconds")
+    if eta is not None and not task.get("finished"):
+        parts.append(f"剩余约 {eta:.0f} 秒")
+    return percent, " · ".join(parts)
+
+
+def _refine_from_parent(session_id, parent_session_id, keep_strings, filter_strings, temp_file_path, idx_path, index_every):
+    """在父会话的过滤结果上再过滤（结果必为父结果子集），源位置经父映射换算回原始日志"""
+    parent_file = os.path.join(TEMP_DIR, f"filter_result_{parent_session_id}.txt")
+    meta = _load_cached_filter_result(parent_session_id)
+    if meta is None:
+        raise RuntimeError("父结果已失效")
+    parent_map = _load_source_map_array(get_temp_source_map_path(parent_file), line_count=int(meta.get("line_count") or 0))
+    if parent_map is None:
+        raise RuntimeError("父结果缺少源位置映射")
+    os.utime(parent_file, None)  # 刷新父结果的最近使用时间，避免细化过程中被淘汰
+    encoding = meta.get("encoding") or detect_file_encoding(parent_file)
+    _update_filter_task(session_id, encoding=encoding, total_bytes=os.path.getsize(parent_file))
+    # 父结果中已被排除的行不会再出现：沿用父结果的排除词命中数；
+    # 保留词集合缩小时父结果的排除计数包含了已不相关的行，无法精确换算，记为未知；
+    # 新增排除词看不到父结果已排除的行，其计数只是下限
+    inherited_hits = {"filter": {}, "lower_bound": []}
+    parent_hits = (meta.get("keyword_hits") or {}).get("filter") or {}
     try:
-        size = os.path.getsize(log_path)
-        # 粗略估计：假设平均 100 字节/行
-        return max(1, size // 100)
+        with open(_get_filter_key_path(parent_session_id), 'r', encoding='utf-8') as f:
+            parent_keep = set(json.load(f).get("keep") or [])
     except Exception:
-        return None
+        parent_keep = None
+    same_keep = parent_keep == set(_normalize_cache_terms(keep_strings))
+    parent_lower_bound = set((meta.get("keyword_hits") or {}).get("lower_bound") or [])
+    for term in _normalize_filter_terms(filter_strings):
+        if term in parent_hits:
+            inherited_hits["filter"][term] = parent_hits[term] if same_keep else None
+            if term in parent_lower_bound:
+                inherited_hits["lower_bound"].append(term)
+        elif parent_hits:
+            inherited_hits["lower_bound"].append(term)
+    line_count, backend = _filter_with_python_engine(
+        session_id, parent_file, temp_file_path, idx_path, keep_strings, filter_strings,
+        encoding, index_every=index_every, parent_map=parent_map, inherited_hits=inherited_hits
+    )
+    return line_count, f"{backend}-refine"
 
 
-def _filter_worker(session_id, log_path, keep_strings, filter_strings, preferred_backend="auto", index_every=500):
+def _filter_worker(session_id, log_path, keep_strings, filter_strings, preferred_backend="auto", index_every=_LINE_INDEX_STRIDE,
+                   parent_session_id=None, time_range=None, field_filter=None, merge_paths=None, context=None):
     try:
         temp_file_path = get_temp_file_path(session_id)
         idx_path = get_temp_index_path(temp_file_path)
+        if merge_paths:
+            # 多日志按时间戳归并：各源结果交错输出，没有单一源文件可供外部工具或增量细化使用
+            _update_filter_task(session_id, temp_file=temp_file_path, idx_file=idx_path,
+                                encoding=detect_file_encoding(log_path))
+            line_count, backend = _filter_with_merge_engine(
+                session_id, [log_path] + list(merge_paths), temp_file_path, idx_path, keep_strings, filter_strings,
+                index_every=index_every
+            )
+            work_bytes = _get_filter_task(session_id).get("total_bytes") or 0
+            _update_filter_task(session_id, done_lines=line_count, done_bytes=work_bytes, finished=True, first_ready=True,
+                                status="finished", backend=backend)
+            print(f"[过滤线程] session={session_id} 归并 {len(merge_paths) + 1} 个日志完成，行数={line_count}")
+            return
+        if context:
+            # 上下文模式：命中行前后的源行由源行索引定位，外部工具只能输出命中行，直接走 Python 引擎
+            encoding = detect_file_encoding(log_path)
+            try:
+                total_bytes = _get_log_source_size(log_path)
+            except (OSError, RuntimeError):
+                total_bytes = None
+            _update_filter_task(session_id, temp_file=temp_file_path, idx_file=idx_path, encoding=encoding,
+                                total_bytes=total_bytes)
+            line_count, backend = _filter_with_context_engine(
+                session_id, log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, context,
+                index_every=index_every
+            )
+            _update_filter_task(session_id, done_lines=line_count, done_bytes=total_bytes or 0, finished=True,
+                                first_ready=True, status="finished", backend=backend)
+            print(f"[过滤线程] session={session_id} 上下文 -{context[0]}/+{context[1]} 行数={line_count}")
+            return
         encoding = detect_file_encoding(log_path)
-        keep_bytes_regex, filter_bytes_regex = _compile_byte_patterns(keep_strings, filter_strings, encoding=encoding)
         keep_regex, filter_regex = _compile_patterns(keep_strings, filter_strings)
 
-        total_lines_est = _estimate_total_lines(log_path)
-        _update_filter_task(session_id, temp_file=temp_file_path, idx_file=idx_path, encoding=encoding, total_lines=total_lines_est)
-
-        line_count = 0
-        offsets = []
-        current_offset = 0
-        write_buffer = []
-        write_buffer_size = 0
-        MAX_BUFFER_SIZE = 64 * 1024  # 64KB 缓冲区
+        try:
+            total_bytes = _get_log_source_size(log_path)
+        except (OSError, RuntimeError):
+            total_bytes = None
+        _update_filter_task(session_id, temp_file=temp_file_path, idx_file=idx_path, encoding=encoding, total_bytes=total_bytes)
 
         # 预先获取任务状态，减少循环内锁竞争
         task_info = _get_filter_task(session_id)
         if not task_info:
             return
 
+        if parent_session_id:
+            try:
+                line_count, backend = _refine_from_parent(
+                    session_id, parent_session_id, keep_strings, filter_strings, temp_file_path, idx_path, index_every
+                )
+                task_now = _get_filter_task(session_id)
+                _update_filter_task(
+                    session_id,
+                    done_lines=line_count,
+                    done_bytes=task_now.get("total_bytes") or 0,
+                    first_ready=True,
+                    finished=True,
+                    status="finished",
+                    backend=backend
+                )
+                print(f"[过滤线程] session={session_id} 基于 session={parent_session_id} 增量细化完成，行数={line_count}")
+                return
+            except Exception as refine_error:
+                _check_filter_cancelled(session_id)
+                print(f"[过滤] 增量细化失败，改为过滤源文件: {refine_error}")
+                _update_filter_task(session_id, encoding=encoding, total_bytes=total_bytes, done_lines=0, done_bytes=0, first_ready=False)
+
+        # 三元组块索引：只读取可能包含保留词的块；候选块占比过高时仍交给外部工具全量扫描
+        trigram_spans = None
+        if preferred_backend in ("auto", "python") and _filter_output_semantics(preferred_backend) == "raw":
+            trigram_spans = _trigram_candidate_spans(
+                log_path, _trigram_filter_keys(keep_strings, filter_strings, encoding) or [],
+                max_ratio=_TRIGRAM_FILTER_MAX_RATIO
+            )
+
+        if time_range or field_filter or trigram_spans is not None:
+            # 时间范围 / 字段过滤 / 三元组候选块：按各自索引只读取命中的源日志区间，
+            # 外部工具无法按区间读取，直接走 Python 引擎
+            spans = _resolve_time_range_spans(log_path, time_range) if time_range else None
+            span_label = "time" if time_range else "trigram"
+            if trigram_spans is not None:
+                span_label = "time+trigram" if spans is not None else "trigram"
+                spans = trigram_spans if spans is None else _intersect_spans(spans, trigram_spans)
+            line_mask = None
+            if field_filter:
+                line_mask = _evaluate_field_filter(log_path, field_filter)
+                if spans is not None:
+                    line_mask &= _span_line_mask(log_path, spans, len(line_mask))
+                    spans = None
+            line_count, backend = _filter_with_python_engine(
+                session_id, log_path, temp_file_path, idx_path, keep_strings, filter_strings,
+                encoding, index_every=index_every, spans=spans, line_mask=line_mask, span_label=span_label
+            )
+            work_bytes = _get_filter_task(session_id).get("total_bytes") or 0
+            _update_filter_task(session_id, done_lines=line_count, done_bytes=work_bytes, finished=True, first_ready=True,
+                                status="finished", backend=backend)
+            if time_range:
+                print(f"[过滤线程] session={session_id} 时间范围 {time_range[0] or '…'} ~ {time_range[1] or '…'} 行数={line_count}")
+            if field_filter:
+                print(f"[过滤线程] session={session_id} 字段过滤 {field_filter} 选中 {int(line_mask.sum())} 行，行数={line_count}")
+            if trigram_spans is not None:
+                print(f"[过滤线程] session={session_id} 三元组索引候选 {len(trigram_spans)} 个区间，行数={line_count}")
+            return
+
         try:
             temp_file_path, idx_path, line_count, output_encoding, backend = stream_filter_to_temp(
                 log_path,
@@ -2176,6 +3013,7 @@ def _filter_worker(session_id, log_path, keep_strings, filter_strings, preferred
                 idx_file=idx_path,
                 encoding=output_encoding,
                 done_lines=line_count,
+                done_bytes=total_bytes or 0,
                 first_ready=True,
                 finished=True,
                 status="finished",
@@ -2184,87 +3022,30 @@ def _filter_worker(session_id, log_path, keep_strings, filter_strings, preferred
             print(f"[过滤线程] session={session_id} 使用外部预处理完成，行数={line_count}")
             return
         except Exception as external_error:
-            print(f"[过滤] 外部预处理不可用，回退 Python 流式过滤: {external_error}")
+            _check_filter_cancelled(session_id)
+            print(f"[过滤] 外部预处理不可用，回退 Python 分块过滤: {external_error}")
             _update_filter_task(session_id, backend="python-fallback")
 
-        with open(log_path, 'rb') as src, open(temp_file_path, 'wb') as dst:
-            for raw_line in src:
-                # 1. 优先处理字节级过滤 (最快)
-                if filter_bytes_regex and filter_bytes_regex.search(raw_line):
-                    continue
-                
-                # 2. 只有在需要时才解码一次
-                text_line = None
-                if filter_regex:
-                    try:
-                        text_line = raw_line.decode(encoding)
-                    except UnicodeDecodeError:
-                        text_line = raw_line.decode(encoding, errors='replace')
-                    if filter_regex.search(text_line):
-                        continue
-
-                # 3. 处理保留逻辑
-                if keep_bytes_regex:
-                    if not keep_bytes_regex.search(raw_line):
-                        continue
-                elif keep_regex:
-                    if text_line is None:
-                        try:
-                            text_line = raw_line.decode(encoding)
-                        except UnicodeDecodeError:
-                            text_line = raw_line.decode(encoding, errors='replace')
-                    if not keep_regex.search(text_line):
-                        continue
-
-                # 4. 写入缓冲区
-                write_buffer.append(raw_line)
-                write_buffer_size += len(raw_line)
-                
-                line_count += 1
-                if line_count % index_every == 1:
-                    offsets.append([line_count, current_offset])
-                current_offset += len(raw_line)
-
-                # 5. 批量刷新到磁盘
-                if write_buffer_size >= MAX_BUFFER_SIZE:
-                    dst.writelines(write_buffer)
-                    write_buffer = []
-                    write_buffer_size = 0
-
-                # 6. 减少状态更新频率，降低锁开销
-                if line_count % 1000 == 0:
-                    task_now = _get_filter_task(session_id)
-                    if not task_now or task_now.get("status") != "running":
-                        raise RuntimeError("任务已取消")
-                    _update_filter_task(session_id, done_lines=line_count)
-
-                if line_count == _FILTER_CHUNK_LINES:
-                    # 首片就绪逻辑保持
-                    dst.writelines(write_buffer) # 立即刷新首片
-                    write_buffer = []
-                    write_buffer_size = 0
-                    _update_filter_task(session_id, first_ready=True)
-
-            # 循环结束后的最终刷新
-            if write_buffer:
-                dst.writelines(write_buffer)
-
-        # 写索引
-        try:
-            with open(idx_path, 'w', encoding='utf-8') as idx_file:
-                json.dump({
-                    "encoding": encoding,
-                    "index_every": index_every,
-                    "offsets": offsets
-                }, idx_file, ensure_ascii=False)
-        except Exception as e:
-            print(f"[过滤] 写入索引失败: {e}")
-
-        _update_filter_task(session_id, done_lines=line_count, finished=True, first_ready=True, status="finished")
+        line_count, _ = _filter_with_python_engine(
+            session_id,
+            log_path,
+            temp_file_path,
+            idx_path,
+            keep_strings,
+            filter_strings,
+            encoding,
+            index_every=index_every
+        )
+        _update_filter_task(session_id, done_lines=line_count, done_bytes=total_bytes or 0, finished=True, first_ready=True, status="finished")
         print(f"[过滤线程] session={session_id} 完成，行数={line_count}")
     except Exception as e:
-        print(f"[过滤] 异步过滤失败: {e}")
-        _update_filter_task(session_id, error=str(e), status="error", finished=True)
+        if _is_filter_cancelled(session_id):
+            # 已取消：删除未完成的结果文件，任务记录已由取消方移除
+            print(f"[过滤线程] session={session_id} 已取消，删除未完成的结果文件")
+            _remove_filter_session_files(session_id)
+        else:
+            print(f"[过滤] 异步过滤失败: {e}")
+            _update_filter_task(session_id, error=str(e), status="error", finished=True)
     finally:
         # 确保任务最终标记为完成，防止进度条卡住
         try:
@@ -2274,6 +3055,14 @@ def _filter_worker(session_id, log_path, keep_strings, filter_strings, preferred
                 _update_filter_task(session_id, finished=True, status="finished" if task.get("status") != "error" else "error")
         except Exception as e:
             print(f"[过滤] finally块更新状态失败: {e}")
+        with _filter_cancel_tokens_lock:
+            token = _filter_cancel_tokens.get(session_id)
+            if token is not None and token.thread is threading.current_thread():
+                _filter_cancel_tokens.pop(session_id, None)
+        try:
+            _enforce_filter_cache_budget()
+        except Exception as e:
+            print(f"[缓存] 清理过滤结果缓存失败: {e}")
 
 
 def _read_partial_lines(file_path, encoding, max_lines):
@@ -2627,16 +3416,9 @@ def _read_ai_keyword_log_line(log_file, line_number):
         path = log_file if os.path.isabs(str(log_file)) else get_log_path(str(log_file))
         if not os.path.exists(path):
             return ""
-        encoding = detect_file_encoding(path)
-        with open(path, "r", encoding=encoding, errors="replace") as f:
-            for current_line, raw_line in enumerate(f, start=1):
-                if current_line == line_no:
-                    return raw_line.rstrip("\r\n")
-                if current_line > line_no:
-                    break
+        return _read_lines_by_numbers(path, [line_no]).get(line_no, "")
     except Exception:
         return ""
-    return ""
 
 def _normalize_ai_paths(payload):
     paths = payload.get("paths") if isinstance(payload, dict) else []
@@ -3087,6 +3869,20 @@ def _build_log_manager_breadcrumbs(current_dir):
         )
     return html.Div(crumbs, className="d-flex align-items-center gap-2 flex-wrap")
 
+_IMPORT_MODE_LABELS = {"hardlink": "硬链接", "reflink": "克隆", "symlink": "引用"}
+
+def _render_import_badges(import_mode, import_status):
+    """就地导入日志的方式与源文件状态标记"""
+    badges = []
+    if import_mode in _IMPORT_MODE_LABELS:
+        badges.append(dbc.Badge(_IMPORT_MODE_LABELS[import_mode], color="light", text_color="secondary", className="ms-2"))
+    if import_status == "changed":
+        badges.append(dbc.Badge("源文件已变化", color="warning", className="ms-1",
+                                title="源文件大小或修改时间与导入时不同；克隆/已断开的硬链接内容可能已过期"))
+    elif import_status == "missing":
+        badges.append(dbc.Badge("源文件缺失", color="danger", className="ms-1"))
+    return badges
+
 def _create_file_list_table(log_files, current_dir=""):
     try:
         current_dir = _normalize_log_manager_dir(current_dir)
@@ -3117,6 +3913,7 @@ def _create_file_list_table(log_files, current_dir=""):
         except Exception:
             continue
 
+    import_manifest = _load_import_manifest()
     for file in log_files:
         file = str(file or "").replace("\\", "/")
         parent = os.path.dirname(file).replace("\\", "/")
@@ -3126,16 +3923,20 @@ def _create_file_list_table(log_files, current_dir=""):
             continue
         try:
             _, file_path = _resolve_log_file_path(file, allowed_extensions=ALLOWED_LOG_EXTENSIONS)
-            if not os.path.exists(file_path):
+            import_entry = import_manifest.get(file)
+            import_status = _get_imported_log_status(import_entry)
+            if not os.path.exists(file_path) and import_status != "missing":
                 continue
-            stat = os.stat(file_path)
+            stat = os.stat(file_path) if os.path.exists(file_path) else os.lstat(file_path)
             entries.append({
                 "name": os.path.basename(file),
                 "path": file,
                 "kind": "file",
-                "size": stat.st_size,
+                "size": _get_log_source_size(file_path) if _is_log_set(file_path) else stat.st_size,
                 "mtime": stat.st_mtime,
                 "mtime_dt": datetime.fromtimestamp(stat.st_mtime),
+                "import_mode": (import_entry or {}).get("mode"),
+                "import_status": import_status,
             })
         except Exception:
             continue
@@ -3195,8 +3996,9 @@ def _create_file_list_table(log_files, current_dir=""):
                     disabled=not is_dir,
                     className="p-0 text-decoration-none log-manager-name"
                 ) if is_dir else html.Div([
-                    html.I(className="bi bi-file-earmark-text me-2 text-secondary"),
-                    html.Span(filename, className="fw-semibold")
+                    html.I(className=("bi bi-collection" if _is_log_set(filename) else "bi bi-file-earmark-text") + " me-2 text-secondary"),
+                    html.Span(filename, className="fw-semibold"),
+                    *_render_import_badges(info.get("import_mode"), info.get("import_status"))
                 ], className="d-flex align-items-center"),
                 className="align-middle"
             ),
@@ -3416,7 +4218,12 @@ app.layout = html.Div([
     dcc.Input(id="selected-lines-sync-input", type="text", value="", style={"display": "none"}),
     html.Div(id="log-analysis-context-json", style={"display": "none"}, children="{}"),
     dcc.Store(id="filter-session-store", data=""),
+    # 本页面登记了引用的过滤会话（进度轮询结束时会清空 filter-session-store，不能据此释放）；
+    # 隐藏节点供页面卸载时释放引用（assets/rolling.js）
+    dcc.Store(id="filter-retained-session-store", data=""),
+    html.Div(id="retained-filter-sessions", style={"display": "none"}, children=""),
     dcc.Store(id="filter-first-chunk-ready", data=False),
+    dcc.Store(id="filter-keyword-hits-store", data=None),
     dcc.Store(id="ai-flow-analysis-trigger", data=0),
     dcc.Store(id="ai-flow-interaction-log", data={}),
     dcc.Interval(id="filter-progress-interval", interval=_FILTER_PROGRESS_INTERVAL_MS, disabled=True),
@@ -3494,6 +4301,22 @@ app.layout = html.Div([
                         color="secondary", 
                         size="sm"
                     ),
+                    dbc.Button(
+                        "📊 概览",
+                        id="log-facets-toggle",
+                        color="secondary",
+                        size="sm",
+                        className="ms-2",
+                        title="统计当前日志的 Tag / PID / TID / 级别分布"
+                    ),
+                    dbc.Button(
+                        "🧩 模板",
+                        id="log-templates-toggle",
+                        color="secondary",
+                        size="sm",
+                        className="ms-2",
+                        title="按模板聚类当前日志，找出占用最多的高频行"
+                    ),
                     dbc.Button(
                         html.I(className="bi bi-box-arrow-up-right"), 
                         id="open-external-btn", 
@@ -3566,6 +4389,18 @@ app.layout = html.Div([
                                         ], className="d-flex align-items-center"),
                                         html.Div([
                                             dbc.Button("清除选择", id="clear-config-selection-btn", color="danger", size="sm", className="me-2"),
+                                            dbc.Input(id="filter-time-range-input", type="text", size="sm", className="me-2",
+                                                      placeholder="时间范围：01-02 10:00 ~ 01-02 11:00",
+                                                      style={"width": "260px", "fontSize": "12px"}),
+                                            dbc.Input(id="filter-field-expr-input", type="text", size="sm", className="me-2",
+                                                      placeholder="字段过滤：level >= W and tag in {DtvkitTvInput, CI}",
+                                                      style={"width": "320px", "fontSize": "12px"}),
+                                            dbc.Input(id="filter-context-input", type="text", size="sm", className="me-2",
+                                                      placeholder="上下文：3 或 2,5",
+                                                      style={"width": "110px", "fontSize": "12px"}),
+                                            dcc.Dropdown(id="merge-logs-selector", multi=True, options=[],
+                                                         placeholder="按时间归并其他日志",
+                                                         className="me-2", style={"width": "240px", "fontSize": "12px"}),
                                             html.Div([
                                                 dbc.Button([
                                                     html.Span("过滤", id="filter-btn-text"),
@@ -3645,6 +4480,8 @@ app.layout = html.Div([
                                                 dbc.Button("top", id="quick-top-btn", color="secondary", outline=True, size="sm"),
                                                 html.Span("( - / - / - )", id="log-window-line-status", className="text-muted mx-2"),
                                                 dbc.Button("bottom", id="quick-bottom-btn", color="secondary", outline=True, size="sm"),
+                                                dbc.Button("跟随", id="log-follow-btn", color="secondary", outline=True, size="sm",
+                                                           title="跟随模式：源日志新增内容自动过滤追加，停在末尾时自动滚动"),
                                                 html.Div(id="filter-progress-inline", style={"minWidth": "200px", "minHeight": "12px"}),
                                                 dbc.Button(id="log-view-ready-signal-btn", style={"display": "none"}),
                                                 dbc.Button("🖱 选择行", id="toggle-selection-mode-btn", color="secondary", outline=True, size="sm", title="点击切换行选择模式（用于AI分析）", style={"display": "none"}),
@@ -3673,7 +4510,11 @@ app.layout = html.Div([
                                                 dbc.InputGroup([
                                                     dbc.Input(id="jump-line-input", type="number", placeholder="行号", min=1, step=1),
                                                     dbc.Button("跳转", id="jump-line-btn", color="primary")
-                                                ], size="sm", style={"maxWidth": "220px"})
+                                                ], size="sm", style={"maxWidth": "220px"}),
+                                                dbc.InputGroup([
+                                                    dbc.Input(id="jump-time-input", type="text", placeholder="时间，如 01-02 10:30"),
+                                                    dbc.Button("跳到时间", id="jump-time-btn", color="primary")
+                                                ], size="sm", style={"maxWidth": "260px"})
                                             ], className="d-flex justify-content-end align-items-center gap-2")
                                         ], width=6)
                                     ], className="w-100"),
@@ -4331,11 +5172,16 @@ app.layout = html.Div([
                                             type="text",
                                             placeholder="例如: board_a/issue_20260520"
                                         )
-                                    ], width=8),
+                                    ], width=6),
                                     dbc.Col([
                                         dbc.Label("操作:", className="d-block invisible"),
                                         dbc.Button("创建目录", id="create-log-dir-btn", color="primary", className="w-100")
                                     ], width=2),
+                                    dbc.Col([
+                                        dbc.Label("日志集:", className="d-block invisible"),
+                                        dbc.Button("合并轮转日志", id="create-log-sets-btn", color="secondary", outline=True, className="w-100",
+                                                   title="把当前目录中的 logcat.N … logcat 等轮转分段生成 .logset 日志集，作为一个日志过滤、搜索")
+                                    ], width=2),
                                     dbc.Col([
                                         dbc.Label("状态:", className="d-block invisible"),
                                         html.Div(id="create-log-dir-status", className="mt-2")
@@ -4487,12 +5333,50 @@ app.layout = html.Div([
             centered=True,
         ),
         
-        # 重命名文件模态框
+        # 日志字段分布概览模态框
         dbc.Modal(
             [
-                dbc.ModalHeader(dbc.ModalTitle("重命名文件")),
+                dbc.ModalHeader(dbc.ModalTitle("日志概览"), close_button=True),
                 dbc.ModalBody(
-                    [
+                    dcc.Loading(html.Div(id="log-facets-body"), type="dot", color="#0d6efd"),
+                    style={"maxHeight": "75vh", "overflowY": "auto"}
+                ),
+                dbc.ModalFooter(
+                    dbc.Button("关闭", id="log-facets-close-btn", color="secondary", outline=True, className="ms-auto")
+                ),
+            ],
+            id="log-facets-modal",
+            is_open=False,
+            size="xl",
+        ),
+
+        # 日志高频模板模态框
+        dbc.Modal(
+            [
+                dbc.ModalHeader(dbc.ModalTitle("高频日志模板"), close_button=True),
+                dbc.ModalBody(
+                    [
+                        html.Div(id="log-templates-body"),
+                        # 后台挖掘期间轮询挖掘状态，结果就绪或模态框关闭后停止
+                        dcc.Interval(id="log-templates-interval", interval=1000, disabled=True),
+                    ],
+                    style={"maxHeight": "75vh", "overflowY": "auto"}
+                ),
+                dbc.ModalFooter(
+                    dbc.Button("关闭", id="log-templates-close-btn", color="secondary", outline=True, className="ms-auto")
+                ),
+            ],
+            id="log-templates-modal",
+            is_open=False,
+            size="xl",
+        ),
+
+        # 重命名文件模态框
+        dbc.Modal(
+            [
+                dbc.ModalHeader(dbc.ModalTitle("重命名文件")),
+                dbc.ModalBody(
+                    [
                         dbc.Label("新文件名:"),
                         dbc.Input(id="rename-file-input", type="text"),
                     ]
@@ -5172,6 +6056,17 @@ def update_compare_log_file_selectors(active_tab):
         return options, options
     return dash.no_update, dash.no_update
 
+
+@app.callback(
+    Output("merge-logs-selector", "options", allow_duplicate=True),
+    [Input("main-tabs", "active_tab")],
+    prevent_initial_call='initial_duplicate'
+)
+def update_merge_logs_selector(active_tab):
+    if active_tab:
+        return [{"label": file, "value": file} for file in get_log_files()]
+    return dash.no_update
+
 @app.callback(
     [Output("log-file-selector", "options", allow_duplicate=True),
      Output("log-file-selector", "value", allow_duplicate=True),
@@ -5412,10 +6307,11 @@ def show_config_status(select_clicks, clear_clicks, data, selected_strings, acti
     Output("selected-strings-container", "children"),
     [Input("selected-strings", "data"),
      Input("data-store", "data"),
-     Input("main-tabs", "active_tab")],  # 添加当前激活的tab状态
+     Input("main-tabs", "active_tab"),  # 添加当前激活的tab状态
+     Input("filter-keyword-hits-store", "data")],
     prevent_initial_call=True  # 防止页面加载时立即触发
 )  
-def update_selected_strings(selected_strings, data, active_tab):
+def update_selected_strings(selected_strings, data, active_tab, keyword_hits=None):
     # 只有在配置管理tab激活时才处理回调
     if active_tab != "tab-2":
         return dash.no_update
@@ -5451,6 +6347,23 @@ def update_selected_strings(selected_strings, data, active_tab):
                     keep_strings.append((category, string_text))
                     break
     
+    keyword_hits = keyword_hits if isinstance(keyword_hits, dict) else {}
+    lower_bound = set(keyword_hits.get("lower_bound") or [])
+
+    def string_button_label(string_text, string_type):
+        """按钮文字后附上一次过滤的命中行数：保留词为输出行数，过滤词为排除行数"""
+        counts = keyword_hits.get(string_type) or {}
+        if string_text not in counts:
+            return string_text
+        count = counts[string_text]
+        if count is None:
+            badge_text, title = "?", "本次为增量过滤，无法精确统计"
+        elif string_text in lower_bound:
+            badge_text, title = f"≥{count}", "增量过滤只统计到新增排除的行数下限"
+        else:
+            badge_text, title = str(count), "保留命中行数" if string_type == "keep" else "排除行数"
+        return [string_text, html.Span(badge_text, title=title, className="badge bg-light text-dark ms-1")]
+
     # 创建显示元素
     display_elements = []
     
@@ -5469,7 +6382,7 @@ def update_selected_strings(selected_strings, data, active_tab):
             for string_text in strings:
                 string_buttons.append(
                     dbc.Button(
-                        string_text, 
+                        string_button_label(string_text, "keep"),
                         id={"type": "selected-string-btn", "index": string_text},
                         color="success", 
                         size="sm",
@@ -5500,7 +6413,7 @@ def update_selected_strings(selected_strings, data, active_tab):
             for string_text in strings:
                 string_buttons.append(
                     dbc.Button(
-                        string_text, 
+                        string_button_label(string_text, "filter"),
                         id={"type": "selected-string-btn", "index": string_text},
                         color="danger", 
                         size="sm",
@@ -5718,29 +6631,40 @@ def render_keyword_annotations_list(annotations_map):
      Output("filter-progress-interval", "disabled", allow_duplicate=True),
      Output("filter-progress-interval", "n_intervals", allow_duplicate=True),
      Output("filter-first-chunk-ready", "data"),
-     Output(_UI_BUSY_STORE_ID, "data", allow_duplicate=True)],
+     Output(_UI_BUSY_STORE_ID, "data", allow_duplicate=True),
+     Output("filter-retained-session-store", "data")],
     [Input("execute-filter-btn", "n_clicks")],
     [State("filter-tab-strings-store", "data"),
      State("temp-keywords-store", "data"),
      State("log-file-selector", "value"),
-     State("filter-session-store", "data"),
+     State("filter-retained-session-store", "data"),
      State("filter-backend-selector", "value"),
+     State("filter-time-range-input", "value"),
+     State("filter-field-expr-input", "value"),
+     State("merge-logs-selector", "value"),
+     State("filter-context-input", "value"),
      State("main-tabs", "active_tab")],
     prevent_initial_call=True
 )
-def execute_filter_command(n_clicks, filter_tab_strings, temp_keywords, selected_log_file, previous_session_id, preferred_backend, active_tab):
+def execute_filter_command(n_clicks, filter_tab_strings, temp_keywords, selected_log_file, previous_session_id, preferred_backend,
+                           time_range, field_filter, merge_log_files, context_lines, active_tab):
     # 只有在日志过滤tab激活时才处理回调
     if active_tab != "tab-1" or not n_clicks:
         return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update,
                 dash.no_update, dash.no_update, dash.no_update, dash.no_update,
-                dash.no_update, dash.no_update)
-    
-    if previous_session_id:
-        _clear_filter_task(previous_session_id, delete_files=False)
+                dash.no_update, dash.no_update, dash.no_update)
     
     preferred_backend = preferred_backend or DEFAULT_FILTER_BACKEND
     # 执行过滤命令，包含临时关键字
-    session_id, filtered_result = execute_filter_logic(filter_tab_strings, temp_keywords, selected_log_file, preferred_backend=preferred_backend)
+    session_id, filtered_result = execute_filter_logic(filter_tab_strings, temp_keywords, selected_log_file, preferred_backend=preferred_backend,
+                                                       time_range=time_range, field_filter=field_filter,
+                                                       merge_log_files=merge_log_files, context_lines=context_lines)
+    # 相同配置会复用同一会话：本客户端换到新会话时登记引用，旧会话没有其他客户端使用时才清理
+    retained_session_id = previous_session_id
+    if session_id and session_id != previous_session_id:
+        _retain_filter_session(session_id)
+        _release_filter_session(previous_session_id, delete_files=False)
+        retained_session_id = session_id
     try:
         print(f"[过滤UI] 启动过滤 session={session_id}, n_clicks={n_clicks}")
     except Exception:
@@ -5759,10 +6683,23 @@ def execute_filter_command(n_clicks, filter_tab_strings, temp_keywords, selected
         False,                          # interval 启用 (disabled=False)
         0,                              # 重置轮询计数
         False,                          # 首片未就绪
-        ui_state
+        ui_state,
+        retained_session_id or ""       # 本页面持有引用的会话
     )
 
 
+@app.callback(
+    Output("retained-filter-sessions", "children"),
+    [Input("filter-retained-session-store", "data"),
+     Input("compare-session-store", "data")]
+)
+def mirror_retained_filter_sessions(filter_session_id, compare_sessions):
+    """把本页面持有引用的会话写到隐藏节点，页面卸载时由前端一并释放"""
+    compare_sessions = compare_sessions if isinstance(compare_sessions, dict) else {}
+    sids = [sid for sid in (filter_session_id, compare_sessions.get("a"), compare_sessions.get("b")) if sid]
+    return ",".join(sids)
+
+
 @app.callback(
     Output("filter-backend-display", "children", allow_duplicate=True),
     [Input("filter-backend-selector", "value"),
@@ -6095,18 +7032,90 @@ def toggle_interaction_log(open_clicks, close_clicks, is_open, log_data):
     return is_open, dash.no_update
 
 
+def _build_literal_trie_pattern(terms):
+    """把多个字面量合并为前缀树形式的正则：每层按下一个字符分派分支，
+    匹配成本只与关键字长度有关，不随关键字数量线性增长；同一起点优先最长匹配"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[None] = True  # 关键字结束标记
+    return _trie_node_pattern(trie)
+
+
+def _trie_node_pattern(node):
+    ends = None in node
+    singles, branches = [], []
+    for ch in sorted(key for key in node if key is not None):
+        child = node[ch]
+        chain = [ch]
+        # 压缩无分叉的单链，直接输出字面量
+        while len(child) == 1 and None not in child:
+            (next_ch, child), = child.items()
+            chain.append(next_ch)
+        literal = re.escape("".join(chain))
+        if len(child) == 1:
+            (singles if len(chain) == 1 else branches).append(literal)
+        else:
+            branches.append(literal + _trie_node_pattern(child))
+    if len(singles) > 1:
+        branches.append("[" + "".join(singles) + "]")
+    else:
+        branches.extend(singles)
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 and not ends else "(?:" + "|".join(branches) + ")"
+    return body + ("?" if ends else "")
+
+
+def _literal_match_key(term, encoding=None):
+    """关键字的规范匹配键（与命中文本 .lower() 一致）；给定 encoding 时为字节键"""
+    if encoding is not None:
+        return term.encode(encoding, errors='ignore').lower()
+    lowered = term.lower()
+    # 小写化后长度变化的字符（如 "İ"）保留原样，交给 IGNORECASE 处理
+    return lowered if len(lowered) == len(term) else term
+
+
+def _compile_literal_regex(terms, encoding=None):
+    """编译大小写不敏感的多字面量正则；给定 encoding 时编译字节正则（仅折叠 ASCII 大小写）"""
+    if encoding is None:
+        unique = {_literal_match_key(term) for term in terms if term}
+        return re.compile(_build_literal_trie_pattern(unique), re.IGNORECASE) if unique else None
+    encoded = {_literal_match_key(term, encoding) for term in terms if term}
+    encoded.discard(b"")
+    if not encoded:
+        return None
+    # 字节串按 latin-1 一一映射成字符构建前缀树，再还原为字节正则
+    pattern = _build_literal_trie_pattern(term.decode('latin-1') for term in encoded)
+    return re.compile(pattern.encode('latin-1'), re.IGNORECASE)
+
+
+class _LiteralMatcher:
+    """大小写不敏感的多关键字匹配器，命中时可反查是哪个关键字"""
+
+    def __init__(self, keywords):
+        self.keywords = {}
+        for keyword in keywords:
+            if keyword:
+                self.keywords.setdefault(keyword.lower(), keyword)
+        self.regex = _compile_literal_regex(self.keywords.keys())
+
+    def finditer(self, text):
+        return self.regex.finditer(text) if self.regex is not None else iter(())
+
+    def search(self, text):
+        return self.regex.search(text) if self.regex is not None else None
+
+    def keyword_for(self, matched_text):
+        return self.keywords.get(matched_text.lower(), matched_text)
+
+
 def _compile_patterns(keep_strings, filter_strings):
     """预编译保留/过滤正则，避免重复编译"""
-    keep_regex = None
-    filter_regex = None
-    if keep_strings:
-        escaped = [re.escape(s) for s in keep_strings if s]
-        if escaped:
-            keep_regex = re.compile("|".join(escaped), re.IGNORECASE)
-    if filter_strings:
-        escaped = [re.escape(s) for s in filter_strings if s]
-        if escaped:
-            filter_regex = re.compile("|".join(escaped), re.IGNORECASE)
+    keep_regex = _compile_literal_regex(keep_strings or [])
+    filter_regex = _compile_literal_regex(filter_strings or [])
     return keep_regex, filter_regex
 
 def _compile_byte_patterns(keep_strings, filter_strings, encoding):
@@ -6114,41 +7123,547 @@ def _compile_byte_patterns(keep_strings, filter_strings, encoding):
     keep_regex = None
     filter_regex = None
     try:
-        if keep_strings:
-            escaped = [re.escape(s).encode(encoding, errors='ignore') for s in keep_strings if s]
-            if escaped:
-                keep_regex = re.compile(b"|".join(escaped), re.IGNORECASE)
-        if filter_strings:
-            escaped = [re.escape(s).encode(encoding, errors='ignore') for s in filter_strings if s]
-            if escaped:
-                filter_regex = re.compile(b"|".join(escaped), re.IGNORECASE)
+        keep_regex = _compile_literal_regex(keep_strings or [], encoding=encoding)
+        filter_regex = _compile_literal_regex(filter_strings or [], encoding=encoding)
     except Exception as e:
         print(f"[过滤] 编译字节正则失败，回退文本正则: {e}")
     return keep_regex, filter_regex
 
 
-def _build_temp_index(temp_file_path, idx_path, encoding, index_every=500):
-    """为临时文件生成行偏移索引"""
-    offsets = []
-    current_offset = 0
-    line_count = 0
+def _build_temp_index(temp_file_path, idx_path, encoding, index_every=_LINE_INDEX_STRIDE):
+    """为临时文件生成二进制行偏移索引"""
     try:
-        with open(temp_file_path, 'rb') as f:
-            for raw_line in f:
-                line_count += 1
-                if line_count % index_every == 1:
-                    offsets.append([line_count, current_offset])
-                current_offset += len(raw_line)
-        with open(idx_path, 'w', encoding='utf-8') as idx_file:
-            json.dump({
-                "encoding": encoding,
-                "index_every": index_every,
-                "line_count": line_count,
-                "offsets": offsets
-            }, idx_file, ensure_ascii=False)
+        meta = _write_line_index_for_file(temp_file_path, idx_path, encoding, stride=index_every)
+        return meta["line_count"]
     except Exception as e:
         print(f"[过滤] 构建索引失败: {e}")
-    return line_count
+    return get_file_line_count(temp_file_path)
+
+# ------------------- 多核分块 Python 过滤引擎 -------------------
+def _get_filter_worker_count():
+    """并行过滤进程数，可通过 LOG_FILTER_WORKERS 覆盖"""
+    try:
+        configured = int(os.environ.get("LOG_FILTER_WORKERS") or 0)
+    except ValueError:
+        configured = 0
+    return max(1, configured or (os.cpu_count() or 1))
+
+
+def _get_filter_process_context():
+    """进程池的启动方式：不 fork 多线程的 Flask 进程；有 forkserver 时用它（预加载工作模块），否则 spawn。
+    子进程只需要 log_filter_workers，主模块的 __spec__ 已在入口处声明，不会被重新导入"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["log_filter_workers"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _get_filter_process_pool():
+    global _filter_process_pool
+    with _filter_process_pool_lock:
+        if _filter_process_pool is None:
+            _filter_process_pool = ProcessPoolExecutor(
+                max_workers=_get_filter_worker_count(), mp_context=_get_filter_process_context()
+            )
+        return _filter_process_pool
+
+
+def _reset_filter_process_pool():
+    """进程池损坏（子进程异常退出）后丢弃，下次按需重建"""
+    global _filter_process_pool
+    with _filter_process_pool_lock:
+        pool = _filter_process_pool
+        _filter_process_pool = None
+    if pool is not None:
+        try:
+            pool.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            print(f"[过滤] 关闭进程池失败: {e}")
+
+
+def _split_newline_aligned_ranges(file_path, chunk_bytes=_PARALLEL_FILTER_CHUNK_BYTES, start=0, end=None):
+    """把文件（或其中按行对齐的 [start, end) 部分）切成按换行对齐的 [start, end) 字节区间"""
+    size = _get_log_source_size(file_path) if end is None else end
+    ranges = []
+    with _open_log_binary(file_path) as f:
+        while start < size:
+            end = min(size, start + chunk_bytes)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _compile_engine_patterns(keep_strings, filter_strings, encoding):
+    """为分块引擎编译正则，返回 (keep, filter, 文本匹配编码)。
+    关键字都能按文件编码精确编码且不含非 ASCII 大小写字母时走字节正则，否则按文本匹配。"""
+    keep_terms = _normalize_filter_terms(keep_strings)
+    filter_terms = _normalize_filter_terms(filter_strings)
+    needs_text = False
+    for term in keep_terms + filter_terms:
+        if not term.isascii() and term.lower() != term.upper():
+            needs_text = True  # 字节正则的 IGNORECASE 只折叠 ASCII
+            break
+        try:
+            term.encode(encoding)
+        except (UnicodeEncodeError, LookupError):
+            needs_text = True
+            break
+    if not needs_text:
+        keep_regex, filter_regex = _compile_byte_patterns(keep_terms, filter_terms, encoding=encoding)
+        if (keep_regex is not None or not keep_terms) and (filter_regex is not None or not filter_terms):
+            return keep_regex, filter_regex, None
+    keep_regex, filter_regex = _compile_patterns(keep_terms, filter_terms)
+    return keep_regex, filter_regex, encoding
+
+
+def _keyword_hit_closure(terms, encoding=None):
+    """命中统计用：匹配键 -> 该行同时必然命中的关键字键（自身及作为其子串的其他关键字）。
+    正则在同一位置只报告最长关键字，被包含的短关键字靠此补计。"""
+    keys = {_literal_match_key(term, encoding) for term in terms if term}
+    keys.discard(b"" if encoding is not None else "")
+    return {key: tuple(other for other in keys if other in key) for key in keys}
+
+
+_count_line_hits = log_filter_workers.count_line_hits
+
+def _merge_hit_counts(total, hits):
+    for side, counts in zip(total, hits):
+        for key, value in counts.items():
+            side[key] = side.get(key, 0) + value
+
+
+def _resolve_keyword_hits(keep_terms, filter_terms, keep_counts, filter_counts, encoding=None):
+    """把按匹配键累计的命中数换算回原始关键字：
+    keep 为输出中含该关键字的行数，filter 为该关键字排除掉的行数"""
+    return {
+        "keep": {term: keep_counts.get(_literal_match_key(term, encoding), 0) for term in _normalize_filter_terms(keep_terms)},
+        "filter": {term: filter_counts.get(_literal_match_key(term, encoding), 0) for term in _normalize_filter_terms(filter_terms)}
+    }
+
+
+_filter_lines_in_buffer = log_filter_workers.filter_lines_in_buffer
+_buffer_line_starts = log_filter_workers.buffer_line_starts
+_span_line_ordinals = log_filter_workers.span_line_ordinals
+_filter_bytes = log_filter_workers.filter_bytes
+
+
+def _read_log_range(file_path, start, end):
+    """读取源日志 [start, end) 字节（支持压缩日志与日志集）"""
+    with _open_log_binary(file_path) as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _pool_log_source(log_path):
+    """进程池子进程读取源日志的描述：普通文件为路径，日志集为 [[分段路径, 虚拟起点, 长度, 补换行], ...]。
+    子进程不加载 app.py，压缩日志与含压缩分段的日志集不能交给进程池"""
+    if not _is_log_set(log_path):
+        return os.path.abspath(log_path)
+    layout = _get_log_set_layout(log_path)
+    return [
+        [segment[0], start, segment[3], segment[4]]
+        for segment, start in zip(layout["segments"], layout["starts"])
+    ]
+
+
+def _filter_byte_range(file_path, start, end, keep_regex, filter_regex, text_encoding=None, closures=None):
+    """在当前进程过滤源文件 [start, end) 区间，返回值同 log_filter_workers.filter_byte_range"""
+    data = _read_log_range(file_path, start, end)
+    return _filter_bytes(data, keep_regex, filter_regex, text_encoding, with_lines=True, closures=closures)
+
+
+def _filter_masked_range(file_path, start, end, ordinals, line_starts, line_ends, keep_regex, filter_regex,
+                         text_encoding=None, closures=None):
+    """在当前进程只过滤 [start, end) 区间内被选中的行，见 log_filter_workers.filter_masked_bytes"""
+    data = _read_log_range(file_path, start, end)
+    return log_filter_workers.filter_masked_bytes(data, ordinals, line_starts, line_ends, keep_regex, filter_regex,
+                                                  text_encoding, closures)
+
+def _masked_line_ranges(line_index, line_mask, window_lines=_MASKED_FILTER_WINDOW_LINES):
+    """把源行掩码按固定行数分窗，返回 (区间列表, 每区间选中行描述, {区间起始偏移: 起始行序号})；
+    区间只覆盖窗内首个到最后一个选中行，没有选中行的窗口完全跳过"""
+    if line_index is None or line_index.stride != 1 or line_index.line_count != len(line_mask):
+        raise RuntimeError("源日志行索引与字段列不一致，请重新打开日志后重试")
+    count = line_index.line_count
+    offsets = np.append(np.frombuffer(line_index._view, dtype='<u8'), np.uint64(line_index.end_offset)).astype(np.int64)
+    ranges, selections, base_lines = [], [], {}
+    for window_start in range(0, count, window_lines):
+        selected = np.flatnonzero(line_mask[window_start:window_start + window_lines]) + window_start
+        if not len(selected):
+            continue
+        first = int(selected[0])
+        start, end = int(offsets[first]), int(offsets[selected[-1] + 1])
+        ranges.append((start, end))
+        selections.append((selected - first, offsets[selected] - start, offsets[selected + 1] - start))
+        base_lines[start] = first
+    return ranges, selections, base_lines
+
+
+def _span_line_mask(log_path, spans, line_count):
+    """时间范围区间 [(起始偏移, 结束偏移, 起始行号)] -> 按源行排列的布尔掩码"""
+    mask = np.zeros(line_count, dtype=bool)
+    with _LineIndexLease(_get_source_line_index, log_path) as line_index:
+        offsets = np.frombuffer(line_index._view, dtype='<u8')
+        for _, span_end, span_line in spans:
+            end_line = int(np.searchsorted(offsets, span_end, side='left'))
+            mask[span_line - 1:end_line] = True
+    return mask
+
+
+def _iter_filtered_ranges(log_path, ranges, keep_regex, filter_regex, text_encoding, pool=None, closures=None,
+                          selections=None):
+    """按源文件顺序产出每个区间的过滤结果；提供进程池时并行计算、顺序合并。
+    selections 与 ranges 一一对应时只过滤各区间内被选中的行（见 _filter_masked_range）"""
+    if pool is None:
+        for i, (start, end) in enumerate(ranges):
+            if selections is None:
+                yield _filter_byte_range(log_path, start, end, keep_regex, filter_regex, text_encoding, closures)
+            else:
+                yield _filter_masked_range(log_path, start, end, *selections[i], keep_regex, filter_regex,
+                                           text_encoding, closures)
+        return
+    source = _pool_log_source(log_path)
+    jobs = [
+        (log_filter_workers.filter_byte_range, (source, start, end)) if selections is None
+        else (log_filter_workers.filter_masked_range, (source, start, end) + tuple(selections[i]))
+        for i, (start, end) in enumerate(ranges)
+    ]
+    max_pending = _get_filter_worker_count() + 2  # 限制在途分块，控制内存占用
+    pending = deque()
+    try:
+        for func, args in jobs:
+            pending.append(pool.submit(func, *args, keep_regex, filter_regex, text_encoding, closures))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _iter_filtered_compressed_blocks(log_path, keep_regex, filter_regex, text_encoding, pool=None, closures=None,
+                                     chunk_bytes=_PARALLEL_FILTER_CHUNK_BYTES):
+    """顺序解压压缩日志并按换行对齐分块过滤，产出 ((块起始解压偏移, 已读压缩字节), 过滤结果)；
+    提供进程池时解压与过滤流水并行，结果仍按源文件顺序产出"""
+    max_pending = _get_filter_worker_count() + 2
+    pending = deque()
+    try:
+        with _open_log_binary(log_path) as f:
+            start = 0
+            carry = b""
+            while True:
+                block = f.read(chunk_bytes)
+                data = carry + block
+                if block:
+                    cut = data.rfind(b"\n") + 1
+                    if not cut:
+                        carry = data
+                        continue
+                    data, carry = data[:cut], data[cut:]
+                elif not data:
+                    break
+                else:
+                    carry = b""
+                position = (start, _compressed_read_offset(f, start + len(data)))
+                start += len(data)
+                if pool is None:
+                    yield position, _filter_bytes(data, keep_regex, filter_regex, text_encoding, True, closures)
+                    continue
+                pending.append((position, pool.submit(_filter_bytes, data, keep_regex, filter_regex, text_encoding, True, closures)))
+                if len(pending) >= max_pending:
+                    position, future = pending.popleft()
+                    yield position, future.result()
+        while pending:
+            position, future = pending.popleft()
+            yield position, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _publish_filter_progress(session_id, index_writer, dst, done_bytes, first_ready):
+    """把已写出的结果落盘并对滚动窗口可见，同时更新任务进度；返回最新的 first_ready"""
+    dst.flush()
+    index_writer.publish()
+    if not session_id:
+        return first_ready
+    _check_filter_cancelled(session_id)
+    task_now = _get_filter_task(session_id)
+    if not task_now or task_now.get("status") != "running":
+        raise RuntimeError("任务已取消")
+    updates = {"done_lines": index_writer.line_count, "done_bytes": done_bytes}
+    if not first_ready and index_writer.line_count >= _FILTER_CHUNK_LINES:
+        first_ready = True
+        updates["first_ready"] = True
+    _update_filter_task(session_id, **updates)
+    return first_ready
+
+
+def _filter_with_python_engine(session_id, log_path, temp_file_path, idx_path, keep_strings, filter_strings,
+                               encoding, index_every=_LINE_INDEX_STRIDE, allow_parallel=True, parent_map=None,
+                               inherited_hits=None, spans=None, line_mask=None, span_label="time"):
+    """分块过滤 log_path，结果按顺序写入临时文件、行索引与源位置映射，返回 (行数, 后端名)。
+    parent_map 非空时 log_path 是上一轮过滤结果，源位置经其映射换算回原始日志；
+    inherited_hits 为上一轮已统计的排除词命中数，与本轮统计合并；
+    spans 非空时只过滤这些按行对齐的 (起始偏移, 结束偏移, 起始行号) 区间（时间范围 / 三元组候选块，
+    span_label 标注在后端名中）；
+    line_mask 为按源行排列的布尔掩码时只读取、过滤被选中的行（字段过滤）。"""
+    keep_regex, filter_regex, text_encoding = _compile_engine_patterns(keep_strings, filter_strings, encoding)
+    key_encoding = None if text_encoding else encoding
+    closures = (_keyword_hit_closure(keep_strings, key_encoding), _keyword_hit_closure(filter_strings, key_encoding))
+    hit_totals = ({}, {})
+    compressed_kind = _compressed_log_kind(log_path)
+    # 压缩日志全量过滤时无法按字节区间随机切分：主进程顺序解压，按块交给进程池过滤
+    streaming = bool(compressed_kind) and spans is None and line_mask is None
+    range_base_lines = {}
+    selections = None
+    if line_mask is not None:
+        with _LineIndexLease(_get_source_line_index, log_path) as line_index:
+            ranges, selections, range_base_lines = _masked_line_ranges(line_index, line_mask)
+        work_bytes = sum(range_end - range_start for range_start, range_end in ranges)
+    elif spans is not None:
+        ranges = []
+        for span_start, span_end, span_line in spans:
+            range_base_lines[span_start] = span_line - 1
+            ranges.extend(_split_newline_aligned_ranges(log_path, start=span_start, end=span_end))
+        work_bytes = sum(span_end - span_start for span_start, span_end, _ in spans)
+    else:
+        ranges = None if streaming else _split_newline_aligned_ranges(log_path)
+        work_bytes = _get_log_source_size(log_path)
+    worker_count = _get_filter_worker_count()
+    use_pool = (
+        allow_parallel
+        and worker_count > 1
+        and not (compressed_kind and not streaming)  # 子进程没有解压快照，随机区间会从头解压
+        and not _log_set_has_compressed_segments(log_path)
+        and (streaming or len(ranges) > 1)
+        and work_bytes >= _PARALLEL_FILTER_MIN_BYTES
+    )
+    backend = f"python-parallel({worker_count})" if use_pool else "python"
+    if compressed_kind:
+        backend = f"{backend}+{compressed_kind}"
+    if spans is not None:
+        backend = f"{backend}+{span_label}"
+    if line_mask is not None:
+        backend = f"{backend}+fields"
+    if spans is not None or line_mask is not None:
+        _update_filter_task(session_id, backend=backend, total_bytes=work_bytes)
+    else:
+        _update_filter_task(session_id, backend=backend)
+
+    index_writer = _LineIndexWriter(idx_path, stride=index_every, encoding=encoding, live=True)
+    map_writer = _SourceMapWriter(get_temp_source_map_path(temp_file_path))
+    results = None
+    first_ready = False
+    base_line = 0
+    done_bytes = 0
+    try:
+        pool = _get_filter_process_pool() if use_pool else None
+        if streaming:
+            results = _iter_filtered_compressed_blocks(
+                log_path, keep_regex, filter_regex, text_encoding, pool=pool, closures=closures
+            )
+            blocks = results
+        else:
+            results = _iter_filtered_ranges(
+                log_path, ranges, keep_regex, filter_regex, text_encoding, pool=pool, closures=closures,
+                selections=selections
+            )
+            blocks = zip(ranges, results)
+        with open(temp_file_path, 'wb') as dst:
+            for (range_start, range_end), (output, ordinals, offsets, range_lines, hits) in blocks:
+                base_line = range_base_lines.get(range_start, base_line)
+                _merge_hit_counts(hit_totals, hits)
+                if output:
+                    dst.write(output)
+                    index_writer.add_chunk(output)
+                    if parent_map is not None:
+                        entries = parent_map[base_line + ordinals]
+                        map_writer.add(entries[:, 0], entries[:, 1])
+                    else:
+                        map_writer.add(base_line + ordinals + 1, range_start + offsets)
+                base_line += range_lines
+                # 压缩日志流式过滤时 range_end 即已读压缩字节数，其余按已处理字节累计
+                done_bytes = range_end if streaming else done_bytes + (range_end - range_start)
+                first_ready = _publish_filter_progress(session_id, index_writer, dst, done_bytes, first_ready)
+        map_writer.close()
+    except BrokenProcessPool as e:
+        index_writer.abort()
+        map_writer.abort()
+        _reset_filter_process_pool()
+        print(f"[过滤] 进程池异常，改为单进程过滤: {e}")
+        return _filter_with_python_engine(
+            session_id, log_path, temp_file_path, idx_path, keep_strings, filter_strings,
+            encoding, index_every=index_every, allow_parallel=False, parent_map=parent_map,
+            inherited_hits=inherited_hits, spans=spans, line_mask=line_mask, span_label=span_label
+        )
+    except Exception:
+        index_writer.abort()
+        map_writer.abort()
+        raise
+    finally:
+        if results is not None:
+            results.close()
+
+    keyword_hits = _resolve_keyword_hits(keep_strings, filter_strings, hit_totals[0], hit_totals[1], key_encoding)
+    for term, count in ((inherited_hits or {}).get("filter") or {}).items():
+        if term in keyword_hits["filter"]:
+            keyword_hits["filter"][term] = None if count is None else keyword_hits["filter"][term] + count
+    if (inherited_hits or {}).get("lower_bound"):
+        keyword_hits["lower_bound"] = list(inherited_hits["lower_bound"])
+    _update_filter_task(session_id, keyword_hits=keyword_hits)
+    line_count = index_writer.line_count
+    try:
+        index_writer.close(encoding=encoding, keyword_hits=keyword_hits)
+    except Exception as e:
+        index_writer.abort()
+        print(f"[过滤] 写入索引失败: {e}")
+    return line_count, backend
+
+
+def _normalize_context_lines(value):
+    """上下文行数输入："N"（前后各 N 行）或 "前,后"；返回 [前, 后] 或 None"""
+    if value in (None, "", [], ()):
+        return None
+    if isinstance(value, (list, tuple)):
+        parts = [str(item).strip() for item in value]
+    else:
+        parts = [part for part in re.split(r'\s*[,，/\s]\s*', str(value).strip()) if part]
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2 or not all(part.isdigit() for part in parts):
+        raise ValueError("上下文行数格式应为 N 或 前,后")
+    before, after = (min(int(part), _CONTEXT_MAX_LINES) for part in parts)
+    return [before, after] if before or after else None
+
+
+def _filter_with_context_engine(session_id, log_path, temp_file_path, idx_path, keep_strings, filter_strings,
+                                encoding, context, index_every=_LINE_INDEX_STRIDE, allow_parallel=True):
+    """过滤 log_path 并输出每个命中行及其前后若干行，返回 (行数, 后端名)。
+    命中行按块流式产出，上下文区间由源行索引的行偏移换算：重叠或相邻的区间合并为一段，
+    段之间插入分隔行；只读取各段的源字节，内存只与块大小有关。"""
+    before, after = context
+    # 整个过滤期间租用源行索引：偏移数组直接引用其映射
+    line_index = _lease_line_index(_get_source_line_index, log_path)
+    if line_index is None or line_index.stride != 1:
+        if line_index is not None:
+            line_index.release()
+        raise RuntimeError("源日志行索引不可用，无法输出上下文")
+    line_count = line_index.line_count
+    offsets = np.frombuffer(line_index._view, dtype='<u8')
+    end_offset = line_index.end_offset
+
+    def line_offset(line):
+        return int(offsets[line]) if line < line_count else end_offset
+
+    keep_regex, filter_regex, text_encoding = _compile_engine_patterns(keep_strings, filter_strings, encoding)
+    key_encoding = None if text_encoding else encoding
+    closures = (_keyword_hit_closure(keep_strings, key_encoding), _keyword_hit_closure(filter_strings, key_encoding))
+    hit_totals = ({}, {})
+    work_bytes = _get_log_source_size(log_path)
+    sequential = bool(_compressed_log_kind(log_path)) or _log_set_has_compressed_segments(log_path)
+    worker_count = _get_filter_worker_count()
+    use_pool = allow_parallel and not sequential and worker_count > 1 and work_bytes >= _PARALLEL_FILTER_MIN_BYTES
+    backend = f"python-parallel({worker_count})+context" if use_pool else "python+context"
+    _update_filter_task(session_id, backend=backend)
+
+    index_writer = _LineIndexWriter(idx_path, stride=index_every, encoding=encoding, live=True)
+    map_writer = _SourceMapWriter(get_temp_source_map_path(temp_file_path))
+    results = None
+    first_ready = False
+    try:
+        if use_pool:
+            ranges = _split_newline_aligned_ranges(log_path)
+            results = _iter_filtered_ranges(log_path, ranges, keep_regex, filter_regex, text_encoding,
+                                            pool=_get_filter_process_pool(), closures=closures)
+            blocks = ((end - start, result) for (start, end), result in zip(ranges, results))
+        else:
+            blocks = (
+                (len(data), _filter_bytes(data, keep_regex, filter_regex, text_encoding, with_lines=True, closures=closures))
+                for data in _iter_line_aligned_blocks(log_path, _PARALLEL_FILTER_CHUNK_BYTES)
+            )
+        with open(temp_file_path, 'wb') as dst, _open_log_binary(log_path) as src:
+            hunk_count = 0
+
+            def emit(first, last):
+                """写出源行 [first, last]（0-based）一段，段前加分隔行；分隔行映射到段首行"""
+                nonlocal hunk_count
+                if hunk_count:
+                    dst.write(_CONTEXT_SEPARATOR)
+                    index_writer.add_chunk(_CONTEXT_SEPARATOR)
+                    map_writer.add([first + 1], [line_offset(first)])
+                hunk_count += 1
+                for part in range(first, last + 1, _CONTEXT_READ_LINES):
+                    part_end = min(last + 1, part + _CONTEXT_READ_LINES)
+                    start = line_offset(part)
+                    src.seek(start)
+                    data = src.read(line_offset(part_end) - start)
+                    dst.write(data)
+                    index_writer.add_chunk(data)
+                    map_writer.add(np.arange(part + 1, part_end + 1), offsets[part:part_end])
+
+            base_line = 0
+            done_bytes = 0
+            pending = None  # 尚未结束的一段 [首行, 末行]，后续块的命中可能与之合并
+            for block_bytes, (output, ordinals, _, block_lines, hits) in blocks:
+                _merge_hit_counts(hit_totals, hits)
+                if len(ordinals):
+                    matched = base_line + ordinals.astype(np.int64)
+                    starts = np.maximum(matched - before, 0)
+                    ends = np.minimum(matched + after, line_count - 1)
+                    # 命中行有序，区间末行单调不减：起始行超过上一区间末行 +1 处即为新段
+                    breaks = np.flatnonzero(starts[1:] > ends[:-1] + 1) + 1
+                    hunk_starts = starts[np.concatenate(([0], breaks))].tolist()
+                    hunk_ends = ends[np.concatenate((breaks - 1, [len(ends) - 1]))].tolist()
+                    if pending is not None and hunk_starts[0] <= pending[1] + 1:
+                        hunk_starts[0] = pending[0]
+                    elif pending is not None:
+                        emit(*pending)
+                    for first, last in zip(hunk_starts[:-1], hunk_ends[:-1]):
+                        emit(first, last)
+                    pending = [hunk_starts[-1], hunk_ends[-1]]
+                base_line += block_lines
+                done_bytes += block_bytes
+                first_ready = _publish_filter_progress(session_id, index_writer, dst, done_bytes, first_ready)
+            if base_line != line_count:
+                raise RuntimeError("源日志已变化，与行索引不一致，请重新过滤")
+            if pending is not None:
+                emit(*pending)
+            first_ready = _publish_filter_progress(session_id, index_writer, dst, done_bytes, first_ready)
+        map_writer.close()
+    except BrokenProcessPool as e:
+        index_writer.abort()
+        map_writer.abort()
+        _reset_filter_process_pool()
+        print(f"[过滤] 进程池异常，改为单进程过滤: {e}")
+        return _filter_with_context_engine(
+            session_id, log_path, temp_file_path, idx_path, keep_strings, filter_strings,
+            encoding, context, index_every=index_every, allow_parallel=False
+        )
+    except Exception:
+        index_writer.abort()
+        map_writer.abort()
+        raise
+    finally:
+        if results is not None:
+            results.close()
+        line_index.release()
+
+    keyword_hits = _resolve_keyword_hits(keep_strings, filter_strings, hit_totals[0], hit_totals[1], key_encoding)
+    _update_filter_task(session_id, keyword_hits=keyword_hits)
+    output_lines = index_writer.line_count
+    try:
+        index_writer.close(encoding=encoding, keyword_hits=keyword_hits)
+    except Exception as e:
+        index_writer.abort()
+        print(f"[过滤] 写入索引失败: {e}")
+    return output_lines, backend
 
 
 def _normalize_filter_terms(values):
@@ -6188,10 +7703,12 @@ def _normalize_command_args(command):
     return shlex.split(str(command), posix=(os.name != "nt"))
 
 
-def _build_findstr_command(patterns, log_path=None, invert=False):
+def _build_findstr_command(patterns, log_path=None, invert=False, line_offsets=False):
     cmd = ["findstr", "/i", "/l"]
     if invert:
         cmd.append("/v")
+    if line_offsets:
+        cmd.extend(["/n", "/o"])
     for pattern in patterns:
         cmd.append(f"/c:{pattern}")
     if log_path:
@@ -6199,25 +7716,246 @@ def _build_findstr_command(patterns, log_path=None, invert=False):
     return cmd
 
 
-def _run_pipeline_to_file(commands, temp_file_path):
-    with open(temp_file_path, "wb") as output_file:
-        if len(commands) == 1:
-            result = subprocess.run(commands[0], stdout=output_file, stderr=subprocess.PIPE)
-            stderr_text = result.stderr.decode("utf-8", errors="replace") if result.stderr else ""
-            return [result.returncode], stderr_text
+def _strip_line_offset_prefixes(block):
+    """去掉 rg/grep -n -b、findstr /n /o 输出的 "行号:偏移:" 行前缀，
+    返回 (原始行字节, 每行 (源行号, 源字节偏移) 数组, 已处理到的源文件字节数)"""
+    prefixes = _LINE_OFFSET_PREFIX_RE.findall(block)
+    if not prefixes:
+        return block, np.zeros((0, 2), dtype=np.uint64), None
+    positions = np.array(prefixes).astype(np.uint64)
+    last_start = block.rfind(b"\n", 0, len(block) - 1) + 1
+    match = _LINE_OFFSET_PREFIX_RE.match(block, last_start)
+    done_bytes = int(match.group(2)) + len(block) - match.end() if match else None
+    return _LINE_OFFSET_PREFIX_RE.sub(b"", block), positions, done_bytes
+
+
+def _read_child_file_offset(pid, real_path):
+    """经 /proc 读取子进程打开 real_path 的文件描述符的当前读取位置；
+    非 Linux、文件尚未打开或以 mmap 方式读取时返回 None"""
+    fd_dir = f"/proc/{pid}/fd"
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return None
+    for fd in fds:
+        try:
+            if os.readlink(os.path.join(fd_dir, fd)) != real_path:
+                continue
+            with open(f"/proc/{pid}/fdinfo/{fd}", 'r') as f:
+                for line in f:
+                    if line.startswith("pos:"):
+                        return int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return None
+
+
+def _watch_child_read_offset(proc, source_path, on_offset, stop):
+    """后台线程：定期把子进程读取 source_path 的位置回调给 on_offset，直到 stop 被置位"""
+    real_path = os.path.realpath(source_path)
+    while not stop.wait(_CHILD_READ_PROBE_INTERVAL):
+        offset = _read_child_file_offset(proc.pid, real_path)
+        if offset is not None:
+            on_offset(offset)
+
+
+def _read_command_blocks(command, backend, handle_block, session_id=None, source_path=None, on_read_offset=None):
+    """执行外部命令，按整行切块回调 handle_block(块)；stderr 写入临时文件避免管道写满阻塞。
+    子进程登记到任务的取消令牌，取消时立即被结束。
+    提供 source_path 与 on_read_offset 时，命中之间也定期回调子进程读取源文件的位置。"""
+    token = _get_filter_cancel_token(session_id) if session_id else None
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        if token:
+            token.register(proc)
+        watcher = None
+        stop_watch = threading.Event()
+        if source_path and on_read_offset:
+            watcher = threading.Thread(
+                target=_watch_child_read_offset, args=(proc, source_path, on_read_offset, stop_watch), daemon=True
+            )
+            watcher.start()
+        try:
+            pending = b""
+            while True:
+                data = proc.stdout.read1(_PIPE_READ_BYTES)
+                if not data:
+                    break
+                cut = data.rfind(b"\n")
+                if cut < 0:
+                    pending += data
+                    continue
+                handle_block(pending + data[:cut + 1])
+                pending = data[cut + 1:]
+            if pending:
+                handle_block(pending)
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            proc.stdout.close()
+            return_code = proc.wait()
+            stop_watch.set()
+            if watcher is not None:
+                watcher.join()  # 结束后不再回写进度，避免覆盖完成时的最终进度
+            if token:
+                token.unregister(proc)
+        _check_filter_cancelled(session_id)
+        if return_code not in (0, 1):
+            stderr_file.seek(0)
+            stderr_text = stderr_file.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"{backend} 过滤失败: {stderr_text or return_code}")
+
+
+def _strip_checked_line_offset_prefixes(block, backend):
+    block, positions, done_bytes = _strip_line_offset_prefixes(block)
+    if len(positions) != block.count(b"\n") + (0 if block.endswith(b"\n") else 1):
+        raise RuntimeError(f"{backend} 输出缺少行号/偏移前缀")
+    return block, positions, done_bytes
+
+
+def _count_block_hits(block, regex, closure, text_encoding, counts):
+    if regex is not None and block:
+        buffer = block.decode(text_encoding, errors='surrogateescape') if text_encoding else block
+        _count_line_hits(buffer, regex, closure, counts)
+
+
+def _stream_command_to_temp(command, temp_file_path, idx_path, encoding, index_every, backend,
+                            keep_regex=None, filter_regex=None, text_encoding=None, closures=None,
+                            keyword_terms=None, session_id=None, source_path=None):
+    """单进程执行外部保留过滤命令，从管道流式读取结果：
+    在 Python 侧补做排除过滤并统计关键字命中，同时写出临时文件、行索引与源位置映射，无需二次扫描。
+    命令输出需带 "行号:偏移:" 前缀，用于源位置映射；进度取最后命中行的结束位置与子进程读取位置
+    （source_path，仅 Linux 可探测）中较大者，探测不到读取位置时进度显示为不确定。"""
+    index_writer = _LineIndexWriter(idx_path, stride=index_every, encoding=encoding, live=True)
+    map_writer = _SourceMapWriter(get_temp_source_map_path(temp_file_path))
+    progress = {"done_bytes": 0, "first_ready": False}
+    hit_totals = ({}, {})
+    closures = closures or ({}, {})
+    if session_id:
+        _update_filter_task(session_id, progress_indeterminate=True)
+
+    def on_read_offset(offset):
+        progress["done_bytes"] = max(progress["done_bytes"], offset)
+        _update_filter_task(session_id, done_bytes=progress["done_bytes"], progress_indeterminate=False)
+
+    def write_block(dst, block):
+        block, positions, done_bytes = _strip_checked_line_offset_prefixes(block, backend)
+        if done_bytes is not None:
+            progress["done_bytes"] = max(progress["done_bytes"], done_bytes)
+        if filter_regex is not None and block:
+            block, ordinals, _, _, hits = _filter_bytes(
+                block, None, filter_regex, text_encoding, with_lines=True, closures=({}, closures[1])
+            )
+            positions = positions[ordinals]
+            _merge_hit_counts(hit_totals, hits)
+        _count_block_hits(block, keep_regex, closures[0], text_encoding, hit_totals[0])
+        if block:
+            dst.write(block)
+            index_writer.add_chunk(block)
+            map_writer.add(positions[:, 0], positions[:, 1])
+        progress["first_ready"] = _publish_filter_progress(
+            session_id, index_writer, dst, progress["done_bytes"], progress["first_ready"]
+        )
+
+    try:
+        with open(temp_file_path, "wb") as dst:
+            _read_command_blocks(command, backend, lambda block: write_block(dst, block), session_id=session_id,
+                                 source_path=source_path, on_read_offset=on_read_offset if session_id else None)
+        map_writer.close()
+        keyword_hits = None
+        if keyword_terms is not None:
+            keyword_hits = _resolve_keyword_hits(
+                keyword_terms[0], keyword_terms[1], hit_totals[0], hit_totals[1], None if text_encoding else encoding
+            )
+            _update_filter_task(session_id, keyword_hits=keyword_hits)
+        line_count = index_writer.line_count
+        index_writer.close(encoding=encoding, keyword_hits=keyword_hits)
+    except Exception:
+        index_writer.abort()
+        map_writer.abort()
+        raise
+    print(f"[过滤] 使用 {backend} 完成，输出: {temp_file_path}, 行数: {line_count}")
+    return temp_file_path, idx_path, line_count, encoding, backend
+
+
+def _stream_exclusions_to_temp(command, log_path, temp_file_path, idx_path, encoding, index_every, backend,
+                               filter_strings, filter_regex, text_encoding, closure, session_id=None):
+    """只有排除词时：外部工具找出被排除的行（带 "行号:偏移:" 前缀），
+    Python 顺序复制其间的源文件片段作为结果，同一遍统计每个排除词去掉的行数"""
+    index_writer = _LineIndexWriter(idx_path, stride=index_every, encoding=encoding, live=True)
+    map_writer = _SourceMapWriter(get_temp_source_map_path(temp_file_path))
+    state = {"cursor": 0, "next_line": 1, "first_ready": False}
+    filter_counts = {}
+
+    def copy_until(src, dst, end_offset):
+        """复制 [cursor, end_offset) 的源文件内容，cursor 总在行首"""
+        at_line_start = True
+        remaining = None if end_offset is None else end_offset - state["cursor"]
+        while remaining is None or remaining > 0:
+            block = src.read(_LINE_INDEX_READ_BLOCK if remaining is None else min(remaining, _LINE_INDEX_READ_BLOCK))
+            if not block:
+                break
+            starts = _buffer_line_starts(block)
+            if not at_line_start:
+                starts = starts[1:]
+            at_line_start = block.endswith(b"\n")
+            map_writer.add(state["next_line"] + np.arange(len(starts)), state["cursor"] + starts)
+            state["next_line"] += len(starts)
+            state["cursor"] += len(block)
+            dst.write(block)
+            index_writer.add_chunk(block)
+            if remaining is not None:
+                remaining -= len(block)
+
+    def handle_block(src, dst, block):
+        block, positions, _ = _strip_checked_line_offset_prefixes(block, backend)
+        _count_block_hits(block, filter_regex, closure, text_encoding, filter_counts)
+        line_starts = _buffer_line_starts(block)
+        line_ends = np.append(line_starts[1:], len(block))
+        for (line_no, offset), length in zip(positions.tolist(), (line_ends - line_starts).tolist()):
+            copy_until(src, dst, offset)
+            state["cursor"] = offset + length
+            state["next_line"] = line_no + 1
+            src.seek(state["cursor"])
+        state["first_ready"] = _publish_filter_progress(
+            session_id, index_writer, dst, state["cursor"], state["first_ready"]
+        )
+
+    try:
+        with open(log_path, "rb") as src, open(temp_file_path, "wb") as dst:
+            _read_command_blocks(command, backend, lambda block: handle_block(src, dst, block), session_id=session_id)
+            copy_until(src, dst, None)
+        map_writer.close()
+        keyword_hits = _resolve_keyword_hits([], filter_strings, {}, filter_counts, None if text_encoding else encoding)
+        _update_filter_task(session_id, keyword_hits=keyword_hits)
+        line_count = index_writer.line_count
+        index_writer.close(encoding=encoding, keyword_hits=keyword_hits)
+    except Exception:
+        index_writer.abort()
+        map_writer.abort()
+        raise
+    print(f"[过滤] 使用 {backend} 完成，输出: {temp_file_path}, 行数: {line_count}")
+    return temp_file_path, idx_path, line_count, encoding, backend
+
 
-        first = subprocess.Popen(commands[0], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        second = subprocess.Popen(commands[1], stdin=first.stdout, stdout=output_file, stderr=subprocess.PIPE)
-        if first.stdout:
-            first.stdout.close()
-        second_stderr = second.communicate()[1]
-        first_stderr = first.communicate()[1]
-        stderr_parts = []
-        if first_stderr:
-            stderr_parts.append(first_stderr.decode("utf-8", errors="replace"))
-        if second_stderr:
-            stderr_parts.append(second_stderr.decode("utf-8", errors="replace"))
-        return [first.returncode, second.returncode], "\n".join(part for part in stderr_parts if part)
+def _stream_filter_single_pass(keep_command, exclude_command, log_path, temp_file_path, idx_path,
+                               keep_strings, filter_strings, encoding, index_every, backend, session_id=None):
+    """有保留词时由外部工具做保留、Python 补做排除；只有排除词时由外部工具找出被排除的行、
+    Python 复制其余部分。两种方式都在同一遍中统计每个关键字的命中行数。"""
+    keep_regex, filter_regex, text_encoding = _compile_engine_patterns(keep_strings, filter_strings, encoding)
+    key_encoding = None if text_encoding else encoding
+    closures = (_keyword_hit_closure(keep_strings, key_encoding), _keyword_hit_closure(filter_strings, key_encoding))
+    if keep_command is None:
+        return _stream_exclusions_to_temp(
+            exclude_command, log_path, temp_file_path, idx_path, encoding, index_every, backend,
+            filter_strings, filter_regex, text_encoding, closures[1], session_id=session_id
+        )
+    return _stream_command_to_temp(
+        keep_command, temp_file_path, idx_path, encoding, index_every, backend,
+        keep_regex=keep_regex, filter_regex=filter_regex, text_encoding=text_encoding, closures=closures,
+        keyword_terms=(keep_strings, filter_strings), session_id=session_id, source_path=log_path
+    )
 
 
 def _finalize_filtered_output(temp_file_path, idx_path, encoding, index_every, backend):
@@ -6226,52 +7964,41 @@ def _finalize_filtered_output(temp_file_path, idx_path, encoding, index_every, b
     return temp_file_path, idx_path, line_count, encoding, backend
 
 
-def _stream_filter_with_rg(log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, index_every):
+def _stream_filter_with_rg(log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, index_every, session_id=None):
     rg_cmd = _get_rg_command()
     if not rg_cmd:
         raise RuntimeError("未找到可用的 rg")
-    commands = []
-    if keep_strings:
-        commands.append(_build_arg_command([rg_cmd, "--text", "--no-heading", "--color", "never", "-i", "-F"], keep_strings, log_path=log_path))
-    else:
-        commands.append([rg_cmd, "--text", "--no-heading", "--color", "never", "^", log_path])
-    if filter_strings:
-        commands.append(_build_arg_command([rg_cmd, "--text", "--no-heading", "--color", "never", "-i", "-F"], filter_strings, invert=True))
-    return_codes, stderr_text = _run_pipeline_to_file(commands, temp_file_path)
-    if any(code not in (0, 1) for code in return_codes):
-        raise RuntimeError(f"rg 过滤失败: {stderr_text or return_codes}")
-    return _finalize_filtered_output(temp_file_path, idx_path, encoding, index_every, "rg")
+    # --no-mmap：按 read() 顺序读取，读取位置可从 /proc 探测，用于命中稀疏时的进度
+    base_args = [rg_cmd, "--text", "--no-heading", "--no-mmap", "--line-number", "--byte-offset", "--color", "never",
+                 "-i", "-F"]
+    keep_command = _build_arg_command(base_args, keep_strings, log_path=log_path) if keep_strings else None
+    exclude_command = None if keep_strings else _build_arg_command(base_args, filter_strings, log_path=log_path)
+    return _stream_filter_single_pass(
+        keep_command, exclude_command, log_path, temp_file_path, idx_path,
+        keep_strings, filter_strings, encoding, index_every, "rg", session_id=session_id
+    )
 
 
-def _stream_filter_with_grep(log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, index_every):
-    commands = []
-    if keep_strings:
-        commands.append(_build_arg_command(["grep", "-a", "-i", "-F"], keep_strings, log_path=log_path))
-    else:
-        commands.append(["grep", "-a", "-E", "^", log_path])
-    if filter_strings:
-        commands.append(_build_arg_command(["grep", "-a", "-i", "-F"], filter_strings, invert=True))
-    return_codes, stderr_text = _run_pipeline_to_file(commands, temp_file_path)
-    if any(code not in (0, 1) for code in return_codes):
-        raise RuntimeError(f"grep 过滤失败: {stderr_text or return_codes}")
-    return _finalize_filtered_output(temp_file_path, idx_path, encoding, index_every, "grep")
+def _stream_filter_with_grep(log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, index_every, session_id=None):
+    base_args = ["grep", "-a", "-n", "-b", "-i", "-F"]
+    keep_command = _build_arg_command(base_args, keep_strings, log_path=log_path) if keep_strings else None
+    exclude_command = None if keep_strings else _build_arg_command(base_args, filter_strings, log_path=log_path)
+    return _stream_filter_single_pass(
+        keep_command, exclude_command, log_path, temp_file_path, idx_path,
+        keep_strings, filter_strings, encoding, index_every, "grep", session_id=session_id
+    )
 
 
-def _stream_filter_with_findstr(log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, index_every):
-    commands = []
-    if keep_strings:
-        commands.append(_build_findstr_command(keep_strings, log_path=log_path))
-    else:
-        commands.append(["cmd", "/d", "/s", "/c", f'type "{log_path}"'])
-    if filter_strings:
-        commands.append(_build_findstr_command(filter_strings, invert=True))
-    return_codes, stderr_text = _run_pipeline_to_file(commands, temp_file_path)
-    if any(code not in (0, 1) for code in return_codes):
-        raise RuntimeError(f"findstr 过滤失败: {stderr_text or return_codes}")
-    return _finalize_filtered_output(temp_file_path, idx_path, encoding, index_every, "findstr")
+def _stream_filter_with_findstr(log_path, temp_file_path, idx_path, keep_strings, filter_strings, encoding, index_every, session_id=None):
+    keep_command = _build_findstr_command(keep_strings, log_path=log_path, line_offsets=True) if keep_strings else None
+    exclude_command = None if keep_strings else _build_findstr_command(filter_strings, log_path=log_path, line_offsets=True)
+    return _stream_filter_single_pass(
+        keep_command, exclude_command, log_path, temp_file_path, idx_path,
+        keep_strings, filter_strings, encoding, index_every, "findstr", session_id=session_id
+    )
 
 
-def _stream_filter_with_powershell(log_path, temp_file_path, idx_path, keep_strings, filter_strings, index_every, shell_cmd):
+def _stream_filter_with_powershell(log_path, temp_file_path, idx_path, keep_strings, filter_strings, index_every, shell_cmd, session_id=None):
     keep_array = "@(" + ", ".join(_powershell_quote(pattern) for pattern in keep_strings) + ")" if keep_strings else "@()"
     filter_array = "@(" + ", ".join(_powershell_quote(pattern) for pattern in filter_strings) + ")" if filter_strings else "@()"
     script = "\n".join([
@@ -6284,19 +8011,59 @@ def _stream_filter_with_powershell(log_path, temp_file_path, idx_path, keep_stri
         "if ($filterPatterns.Count -gt 0) { $content = $content | Select-String -SimpleMatch -CaseSensitive:$false -NotMatch -Pattern $filterPatterns }",
         "$content | Set-Content -Path $outputPath -Encoding utf8"
     ])
-    result = subprocess.run(_build_powershell_encoded_command(script), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.returncode not in (0, 1):
-        stderr_text = result.stderr.decode("utf-8", errors="replace") if result.stderr else ""
-        raise RuntimeError(f"{shell_cmd} 过滤失败: {stderr_text or result.returncode}")
+    proc = subprocess.Popen(_build_powershell_encoded_command(script), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    token = _get_filter_cancel_token(session_id) if session_id else None
+    if token:
+        token.register(proc)
+    try:
+        _, stderr = proc.communicate()
+    finally:
+        if token:
+            token.unregister(proc)
+    _check_filter_cancelled(session_id)
+    if proc.returncode not in (0, 1):
+        stderr_text = stderr.decode("utf-8", errors="replace") if stderr else ""
+        raise RuntimeError(f"{shell_cmd} 过滤失败: {stderr_text or proc.returncode}")
     return _finalize_filtered_output(temp_file_path, idx_path, "utf-8", index_every, shell_cmd)
 
 
-def _copy_source_to_temp(log_path, temp_file_path, idx_path, encoding, index_every):
-    shutil.copyfile(log_path, temp_file_path)
-    return _finalize_filtered_output(temp_file_path, idx_path, encoding, index_every, "python-copy")
+def _copy_source_to_temp(log_path, temp_file_path, idx_path, encoding, index_every, session_id=None):
+    """无过滤条件时复制源文件，复制过程中同步生成行索引"""
+    index_writer = _LineIndexWriter(idx_path, stride=index_every, encoding=encoding, live=True)
+    map_writer = _SourceMapWriter(get_temp_source_map_path(temp_file_path))
+    first_ready = False
+    at_line_start = True
+    try:
+        with _open_log_binary(log_path) as src, open(temp_file_path, "wb") as dst:
+            while True:
+                block = src.read(_LINE_INDEX_READ_BLOCK)
+                if not block:
+                    break
+                # 整份复制时源位置即输出位置；块可能截断在行中间，跳过不是行首的位置
+                starts = _buffer_line_starts(block)
+                if not at_line_start:
+                    starts = starts[1:]
+                at_line_start = block.endswith(b"\n")
+                map_writer.add(index_writer.line_count + 1 + np.arange(len(starts)), index_writer.offset + starts)
+                dst.write(block)
+                index_writer.add_chunk(block)
+                first_ready = _publish_filter_progress(
+                    session_id, index_writer, dst, _compressed_read_offset(src, index_writer.offset), first_ready
+                )
+        map_writer.close()
+        line_count = index_writer.line_count
+        keyword_hits = {"keep": {}, "filter": {}}
+        _update_filter_task(session_id, keyword_hits=keyword_hits)
+        index_writer.close(encoding=encoding, keyword_hits=keyword_hits)
+    except Exception:
+        index_writer.abort()
+        map_writer.abort()
+        raise
+    print(f"[过滤] 使用 python-copy 完成，输出: {temp_file_path}, 行数: {line_count}")
+    return temp_file_path, idx_path, line_count, encoding, "python-copy"
 
 
-def stream_filter_to_temp(log_path, keep_regex, filter_regex, keep_strings, filter_strings, session_id=None, index_every=500, preferred_backend="auto"):
+def stream_filter_to_temp(log_path, keep_regex, filter_regex, keep_strings, filter_strings, session_id=None, index_every=_LINE_INDEX_STRIDE, preferred_backend="auto"):
     ensure_temp_dir()
     temp_file_path = get_temp_file_path(session_id)
     idx_path = get_temp_index_path(temp_file_path)
@@ -6305,23 +8072,28 @@ def stream_filter_to_temp(log_path, keep_regex, filter_regex, keep_strings, filt
     normalized_filter = _normalize_filter_terms(filter_strings)
 
     if not normalized_keep and not normalized_filter:
-        return _copy_source_to_temp(log_path, temp_file_path, idx_path, encoding, index_every)
+        return _copy_source_to_temp(log_path, temp_file_path, idx_path, encoding, index_every, session_id=session_id)
+
+    if _compressed_log_kind(log_path):
+        raise RuntimeError("压缩日志由 Python 引擎流式解压过滤")
+    if _is_log_set(log_path):
+        raise RuntimeError("日志集由 Python 引擎按分段拼接过滤")
 
     resolved_backend = _resolve_filter_backend(preferred_backend)
 
     if resolved_backend == "rg":
-        return _stream_filter_with_rg(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, encoding, index_every)
+        return _stream_filter_with_rg(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, encoding, index_every, session_id=session_id)
 
     if resolved_backend == "grep":
-        return _stream_filter_with_grep(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, encoding, index_every)
+        return _stream_filter_with_grep(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, encoding, index_every, session_id=session_id)
 
     if resolved_backend == "findstr":
-        return _stream_filter_with_findstr(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, encoding, index_every)
+        return _stream_filter_with_findstr(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, encoding, index_every, session_id=session_id)
 
     if resolved_backend == "powershell":
         runtime = _detect_windows_powershell_runtime()
         if runtime.get("cmd") and runtime.get("meets_minimum"):
-            return _stream_filter_with_powershell(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, index_every, runtime["cmd"])
+            return _stream_filter_with_powershell(log_path, temp_file_path, idx_path, normalized_keep, normalized_filter, index_every, runtime["cmd"], session_id=session_id)
         raise RuntimeError(f"Windows PowerShell 版本过低，切换 Python 过滤: {_powershell_fallback_reason()}")
 
     if resolved_backend == "python":
@@ -6413,8 +8185,11 @@ def build_rolling_display(temp_file_path, line_count, session_id, selected_strin
     return result_display
 
 
-def execute_filter_logic(selected_strings, temp_keywords, selected_log_file, preferred_backend="auto"):
-    """执行过滤逻辑，包含临时关键字（异步流式过滤）"""
+def execute_filter_logic(selected_strings, temp_keywords, selected_log_file, preferred_backend="auto", time_range=None,
+                         field_filter=None, merge_log_files=None, context_lines=None):
+    """执行过滤逻辑，包含临时关键字（异步流式过滤）；time_range 限定只过滤该时间段内的日志，
+    field_filter 为级别/Tag/PID/TID 字段过滤表达式，merge_log_files 为与当前日志按时间戳归并显示的其他日志，
+    context_lines 为每个命中行额外输出的前/后行数"""
     # 合并选中的字符串和临时关键字
     normalized_temp_keywords = normalize_temp_keywords(temp_keywords)
     all_strings = []
@@ -6436,21 +8211,21 @@ def execute_filter_logic(selected_strings, temp_keywords, selected_log_file, pre
     
     if not selected_log_file:
         return "", html.P("请选择日志文件", className="text-danger text-center")
+    try:
+        field_filter = _normalize_field_filter(field_filter)
+    except ValueError as e:
+        return "", html.P(f"字段过滤表达式错误: {e}", className="text-danger text-center")
     log_path = get_log_path(selected_log_file)
+    merge_paths = [get_log_path(name) for name in (merge_log_files or []) if name]
     data = load_data()
     
-    # session_id 基于文件和关键字，保证同配置复用滚动会话
+    # session_id 基于文件身份、关键字集合、时间范围、字段过滤表达式、归并日志和上下文行数，相同配置复用已有结果
     try:
-        session_key = f"{log_path}:{keep_strings}:{filter_strings}:{time.time()}"
-        session_id = hashlib.md5(session_key.encode()).hexdigest()
-    except Exception:
-        session_id = hashlib.md5(str(time.time()).encode()).hexdigest()
-    
-    # 初始化任务并启动后台线程
-    _init_filter_task(session_id, log_path, keep_strings, filter_strings, all_strings, preferred_backend=preferred_backend)
-    thread = threading.Thread(target=_filter_worker, args=(session_id, log_path, keep_strings, filter_strings, preferred_backend))
-    thread.daemon = True
-    thread.start()
+        session_id = _start_filter_session(log_path, keep_strings, filter_strings, all_strings, preferred_backend=preferred_backend,
+                                           time_range=time_range, field_filter=field_filter, merge_paths=merge_paths,
+                                           context=context_lines)
+    except ValueError as e:
+        return "", html.P(str(e), className="text-danger text-center")
     
     progress_component = html.Div([
         html.Div(id="filter-partial-display")
@@ -6460,7 +8235,8 @@ def execute_filter_logic(selected_strings, temp_keywords, selected_log_file, pre
     return session_id, progress_component
 
 
-def _start_filter_task_for_log(selected_strings, temp_keywords, selected_log_file, session_prefix="", preferred_backend="auto"):
+def _start_filter_task_for_log(selected_strings, temp_keywords, selected_log_file, preferred_backend="auto",
+                               priority=_FILTER_PRIORITY_BACKGROUND):
     normalized_temp_keywords = normalize_temp_keywords(temp_keywords)
     all_strings = []
     if selected_strings:
@@ -6482,17 +8258,8 @@ def _start_filter_task_for_log(selected_strings, temp_keywords, selected_log_fil
         return ""
 
     log_path = get_log_path(selected_log_file)
-    try:
-        session_key = f"{session_prefix}:{log_path}:{keep_strings}:{filter_strings}:{time.time()}"
-        session_id = hashlib.md5(session_key.encode()).hexdigest()
-    except Exception:
-        session_id = hashlib.md5(str(time.time()).encode()).hexdigest()
-
-    _init_filter_task(session_id, log_path, keep_strings, filter_strings, all_strings, preferred_backend=preferred_backend)
-    thread = threading.Thread(target=_filter_worker, args=(session_id, log_path, keep_strings, filter_strings, preferred_backend))
-    thread.daemon = True
-    thread.start()
-    return session_id
+    return _start_filter_session(log_path, keep_strings, filter_strings, all_strings, preferred_backend=preferred_backend,
+                                 priority=priority)
 
 
 def _read_lines_for_diff(file_path, encoding, max_lines=20000):
@@ -6666,27 +8433,29 @@ def build_side_by_side_diff(a_lines, b_lines, max_display_lines=10000, ignore_pr
      Output("filter-first-chunk-ready", "data", allow_duplicate=True),
      Output("log-filter-results", "children", allow_duplicate=True),
      Output("filtered-result-store", "data", allow_duplicate=True),
-     Output(_UI_BUSY_STORE_ID, "data", allow_duplicate=True)],
+     Output(_UI_BUSY_STORE_ID, "data", allow_duplicate=True),
+     Output("filter-keyword-hits-store", "data", allow_duplicate=True)],
     [Input("filter-progress-interval", "n_intervals")],
     [State("filter-session-store", "data"),
+     State("filter-first-chunk-ready", "data"),
      State("main-tabs", "active_tab")],
     prevent_initial_call=True
 )
-def poll_filter_progress(n_intervals, session_id, active_tab):
+def poll_filter_progress(n_intervals, session_id, first_chunk_shown, active_tab):
     progress_footer_show = {"display": "block"}
     progress_footer_hide = {"display": "none"}
     if active_tab != "tab-1" or not session_id:
         print(f"[进度] 跳过轮询 active_tab={active_tab} session_id={session_id}")
         return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, True,
                 dash.no_update, dash.no_update, dash.no_update, dash.no_update,
-                dash.no_update)
+                dash.no_update, dash.no_update)
     
     task = _get_filter_task(session_id)
     if not task:
         print(f"[进度] session={session_id} 未找到任务(可能是旧轮询)，暂不停止轮询")
         return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update,
                 dash.no_update, dash.no_update, dash.no_update, dash.no_update,
-                dash.no_update)
+                dash.no_update, dash.no_update)
     backend_text = _format_filter_backend_text(task.get("backend"), task.get("preferred_backend"))
     
     # 错误处理
@@ -6697,30 +8466,33 @@ def poll_filter_progress(n_intervals, session_id, active_tab):
         ])
         print(f"[进度] session={session_id} 状态=error, err={task.get('error')}")
         return (0, "过滤失败", backend_text, err_div, "", progress_footer_show, True, "", True, err_div, err_div,
-                _make_log_view_ui_state("error"))
+                _make_log_view_ui_state("error"), dash.no_update)
     
     done = task.get("done_lines") or 0
-    total = task.get("total_lines")
-    percent = min(100, int(done / total * 100)) if total else None
-    progress_text = f"{done} 行" + (f"/约{total}行" if total else "")
-    print(f"[进度] tick session={session_id} status={task.get('status')} done={done} total={total} first_ready={task.get('first_ready')} finished={task.get('finished')} first_chunk={task.get('first_ready')} progress_bar={(percent if percent is not None else 'NA')}")
+    percent, progress_text = _format_filter_progress(task, session_id)
+    if percent is None and task.get("progress_indeterminate"):
+        percent = 100  # 进度不确定：满格条纹动画表示仍在扫描
+    print(f"[进度] tick session={session_id} status={task.get('status')} done={done} bytes={task.get('done_bytes')}/{task.get('total_bytes')} first_ready={task.get('first_ready')} finished={task.get('finished')} first_chunk={task.get('first_ready')} progress_bar={(percent if percent is not None else 'NA')}")
     
-    # 首片就绪但未完成
+    # 首片就绪但未完成：用已写出的部分打开滚动窗口，后续行数随窗口请求增长
     if task.get("first_ready") and not task.get("finished"):
-        encoding = task.get("encoding") or "utf-8"
-        chunk_text = _read_partial_lines(task.get("temp_file"), encoding, _FILTER_CHUNK_LINES)
-        data = load_data()
-        partial_display = highlight_keywords_dash(chunk_text, task.get("selected_strings"), data)
-        print(f"[进度] session={session_id} 首片已就绪，返回部分内容，percent={percent}")
+        partial_display = dash.no_update
+        if first_chunk_shown is not True:
+            encoding = task.get("encoding") or "utf-8"
+            temp_file = task.get("temp_file")
+            line_count = get_file_line_count(temp_file) or done
+            data = load_data()
+            partial_display = build_rolling_display(temp_file, line_count, session_id, task.get("selected_strings"), data, encoding)
+            print(f"[进度] session={session_id} 首片已就绪，打开滚动窗口，已写出 {line_count} 行，percent={percent}")
         return (percent if percent is not None else 1, progress_text, backend_text, partial_display, "", progress_footer_show, False, session_id, True,
-                dash.no_update, dash.no_update, _make_log_view_ui_state("filter_partial_ready"))
+                dash.no_update, dash.no_update, _make_log_view_ui_state("filter_partial_ready"), dash.no_update)
     
     # 完成
     if task.get("finished"):
         temp_file = task.get("temp_file")
         idx_file = task.get("idx_file")
         encoding = task.get("encoding") or "utf-8"
-        line_count = done or task.get("total_lines") or 0
+        line_count = done
         data = load_data()
         selected_strings = task.get("selected_strings")
         # Always use rolling display to ensure search/jump functionality works
@@ -6728,12 +8500,12 @@ def poll_filter_progress(n_intervals, session_id, active_tab):
         print(f"[进度] session={session_id} 完成，行数={line_count}，停止轮询")
         inline_progress = ""  # 完成后隐藏内联进度条
         return (100, "完成", backend_text, dash.no_update, inline_progress, progress_footer_hide, True, "", "",
-                final_display, final_display, _make_log_view_ui_state("filter_done"))
+                final_display, final_display, _make_log_view_ui_state("filter_done"), task.get("keyword_hits"))
     
     # 仍在进行，但未到首片
     inline_progress = ""  # 不再显示顶部内联进度条
     return (percent, progress_text, backend_text, dash.no_update, inline_progress, progress_footer_show, False, session_id, dash.no_update,
-            dash.no_update, dash.no_update, _make_log_view_ui_state("filter_running"))
+            dash.no_update, dash.no_update, _make_log_view_ui_state("filter_running"), dash.no_update)
 
 
 @app.callback(
@@ -6774,16 +8546,15 @@ def start_compare(n_clicks, compare_strings, temp_keywords, log_a, log_b, existi
                 dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update,
                 dash.no_update, html.Script("if(window.showToast) window.showToast('请选择两份日志文件', 'warning');"))
 
-    if existing_sessions and isinstance(existing_sessions, dict):
-        sid_a = existing_sessions.get("a")
-        sid_b = existing_sessions.get("b")
-        if sid_a:
-            _clear_filter_task(sid_a, delete_files=False)
-        if sid_b:
-            _clear_filter_task(sid_b, delete_files=False)
-
-    session_a = _start_filter_task_for_log(compare_strings, temp_keywords, log_a, session_prefix="compare:A", preferred_backend=preferred_backend)
-    session_b = _start_filter_task_for_log(compare_strings, temp_keywords, log_b, session_prefix="compare:B", preferred_backend=preferred_backend)
+    session_a = _start_filter_task_for_log(compare_strings, temp_keywords, log_a, preferred_backend=preferred_backend)
+    session_b = _start_filter_task_for_log(compare_strings, temp_keywords, log_b, preferred_backend=preferred_backend)
+    # 新会话可能与旧会话相同（内容寻址复用），也可能被其他客户端共用：按引用计数释放不再使用的旧任务
+    old_sessions = existing_sessions if isinstance(existing_sessions, dict) else {}
+    old_sids = {sid for sid in (old_sessions.get("a"), old_sessions.get("b")) if sid}
+    for new_sid in {session_a, session_b} - old_sids:
+        _retain_filter_session(new_sid)
+    for old_sid in old_sids - {session_a, session_b}:
+        _release_filter_session(old_sid, delete_files=False)
     if not session_a or not session_b:
         return (dash.no_update, True, 0,
                 {"display": "none", "marginLeft": "5px"}, "过滤并对比", False,
@@ -6861,15 +8632,14 @@ def poll_compare_progress(n_intervals, sessions, log_a, log_b, ignore_prefix_len
                 msg, html.Pre(msg, className="small text-danger"),
                 True, spinner_hide, "过滤并对比", False, progress_hide)
 
-    def _pct(task):
-        done = task.get("done_lines") or 0
-        total = task.get("total_lines")
-        if total:
-            return min(100, int(done / total * 100)), f"{done} 行/约{total}行"
-        return (1 if done else 0), f"{done} 行"
+    def _pct(task, session_id):
+        percent, text = _format_filter_progress(task, session_id)
+        if percent is None:
+            percent = 1 if task.get("done_lines") else 0
+        return percent, text
 
-    pct_a, txt_a = _pct(task_a)
-    pct_b, txt_b = _pct(task_b)
+    pct_a, txt_a = _pct(task_a, sid_a)
+    pct_b, txt_b = _pct(task_b, sid_b)
 
     if task_a.get("finished") and task_b.get("finished"):
         temp_a = task_a.get("temp_file")
@@ -6990,19 +8760,14 @@ def execute_source_logic(selected_log_file, selected_strings=None, temp_keywords
     except Exception:
         session_id = None
 
-    encoding = detect_file_encoding(log_path)
-    temp_file_path = get_temp_file_path(session_id)
-    idx_path = get_temp_index_path(temp_file_path)
-    temp_file_path, idx_path, line_count, output_encoding, backend = _copy_source_to_temp(
-        log_path,
-        temp_file_path,
-        idx_path,
-        encoding,
-        500
-    )
+    # 直接基于源日志的持久化行索引滚动显示，不再复制到 temp/
+    line_index = _get_source_line_index(log_path)
+    line_count = line_index.line_count if line_index else get_file_line_count(log_path)
+    output_encoding = (line_index.encoding if line_index else None) or detect_file_encoding(log_path)
+    _register_source_view_session(session_id, log_path)
     data = load_data() if all_strings else None
-    result_display = build_rolling_display(temp_file_path, line_count, session_id, all_strings, data, output_encoding)
-    return f"{backend}:{log_path}", result_display
+    result_display = build_rolling_display(log_path, line_count, session_id, all_strings, data, output_encoding)
+    return f"source-index:{log_path}", result_display
 
 
 def execute_source_preview(selected_log_file, selected_strings=None, temp_keywords=None, max_lines=_SOURCE_PREVIEW_LINES):
@@ -7068,20 +8833,18 @@ def _extract_notes_from_text(text, annotations_map):
         keyword_to_note[str(k)] = str(note_text)
     if not keyword_to_note:
         return []
-    # 关键字按长度降序，优先匹配长关键字
-    sorted_keywords = sorted(keyword_to_note.keys(), key=len, reverse=True)
+    # 区分大小写；前瞻分组在每个起点取最长关键字，起点落在其他命中内部的更长关键字也能找到
+    rank = {keyword: i for i, keyword in enumerate(keyword_to_note)}
+    regex = re.compile("(?=(" + _build_literal_trie_pattern(rank) + "))")
     notes = []
     for line in text.split('\n'):
         line_str = line.strip()
         if not line_str:
             continue
-        matched_note = None
-        for kw in sorted_keywords:
-            if kw in line_str:
-                matched_note = keyword_to_note.get(kw, kw)
-                break
-        if matched_note is not None:
-            notes.append(matched_note)
+        # 一行命中多个关键字时，优先取最长的关键字；等长时取注释映射中靠前的
+        matched = min((m.group(1) for m in regex.finditer(line_str)), key=lambda kw: (-len(kw), rank[kw]), default=None)
+        if matched is not None:
+            notes.append(keyword_to_note[matched])
     return notes
 
 
@@ -7089,14 +8852,13 @@ def _extract_annotation_text_python(log_path, annotations_map):
     keywords = [str(k) for k in (annotations_map or {}).keys() if str(k)]
     if not keywords:
         return ""
-    lowered_keywords = [kw.lower() for kw in keywords]
+    matcher = _LiteralMatcher(keywords)
     encoding = detect_file_encoding(log_path)
     matched_lines = []
-    with open(log_path, 'r', encoding=encoding, errors='replace') as src:
+    with _open_log_text(log_path, encoding) as src:
         for line in src:
             line_text = line.rstrip('\n')
-            lowered_line = line_text.lower()
-            if any(keyword in lowered_line for keyword in lowered_keywords):
+            if matcher.search(line_text):
                 matched_lines.append(line_text)
     return "\n".join(matched_lines)
 
@@ -7108,6 +8870,8 @@ def build_annotation_match_command(selected_log_file, annotations_map):
     keywords = [str(k) for k in (annotations_map or {}).keys() if str(k)]
     if not keywords:
         return None
+    if _compressed_log_kind(log_path) or _is_log_set(log_path):
+        return None  # 外部工具无法直接读取压缩日志与日志集，走 Python 流式匹配
     if os.name == 'nt':
         if not _can_use_windows_powershell():
             return None
@@ -8024,21 +9788,13 @@ def highlight_keywords_dash(text, selected_strings, data, flat=False):
     
     # 性能优化：使用单一正则表达式进行匹配
     try:
-        # 构建单一正则表达式模式
-        pattern_parts = []
-        for keyword in keywords_to_highlight:
-            escaped_keyword = re.escape(keyword)
-            pattern_parts.append(escaped_keyword)
-        
-        if not pattern_parts:
+        # 所有关键字合并为一个前缀树正则（不区分大小写）
+        regex = _compile_literal_regex(keywords_to_highlight)
+        if regex is None:
             result = html.Pre(text, className="small")
             highlight_cache.put(cache_key, result)
             return result
         
-        # 创建单一正则表达式（不区分大小写）
-        combined_pattern = f"({'|'.join(pattern_parts)})"
-        regex = re.compile(combined_pattern, re.IGNORECASE)
-        
         # 按行处理文本
         lines = text.split('\n')
         highlighted_lines = []
@@ -8151,43 +9907,3143 @@ def get_temp_index_path(temp_file_path):
     """获取临时结果的索引文件路径"""
     return f"{temp_file_path}.idx"
 
-def detect_file_encoding(file_path, default_encoding="utf-8"):
-    """读取部分内容推测编码，失败则返回默认编码"""
-    encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1', 'iso-8859-1']
-    try:
-        with open(file_path, 'rb') as f:
-            sample = f.read(65536)  # 64KB 样本
-        for enc in encodings:
+# ------------------- 压缩日志流式解压 -------------------
+# 压缩日志不解压落盘：读取时流式解压，对外暴露的偏移都是解压后的字节偏移，
+# 行索引、源位置映射与滚动窗口读取与普通日志完全一致。
+# 随机 seek 时从不超过目标的最近恢复点继续解压：
+# - gzip 顺序解压时每输出固定字节数保存一次解压器快照（zlib 解压器可复制）；
+# - xz 按文件尾部自带的块索引定位到目标所在块（多线程 xz 压缩的文件按块切分），
+#   先送入流头再从块起点解压；
+# - 流关闭时保留解压状态，之后打开同一文件向后读取时直接接手，按区间/分页顺序读取不必每次从头解压；
+# 都没有时（bz2/zst、单块 xz 向回 seek）从文件头重新解压。
+# 快照与保留的解压状态只在进程内存中：zlib 解压器状态无法序列化（Python 没有 inflatePrime），
+# 无法像 zran 那样落盘；xz 块索引本就在文件中，无需旁路文件。
+_COMPRESSED_READ_BLOCK = 256 * 1024
+_COMPRESSED_OUTPUT_LIMIT = 4 * 1024 * 1024  # 单次解压输出上限，防止高压缩比数据撑爆内存
+_COMPRESSED_CHECKPOINT_EVERY = 16 * 1024 * 1024
+_COMPRESSED_CHECKPOINT_FILES_MAX = 16
+_COMPRESSED_PARKED_MAX = 4  # 保留的解压状态数（xz 解压器可能占用数十 MB 字典）
+_XZ_HEADER_SIZE = 12
+# (路径, 大小, mtime) -> {"offsets": [解压偏移], "points": [(压缩偏移, 解压器快照)], "size": 解压后总大小,
+#                        "blocks": xz 块索引（见 _read_xz_block_index），未读取为 None}
+_compressed_checkpoints = OrderedDict()
+# [(文件键, 解压状态)]，按关闭先后排列
+_compressed_parked = deque()
+_compressed_checkpoints_lock = threading.Lock()
+
+
+def _compressed_log_kind(file_path):
+    """按扩展名识别压缩日志，返回 gz/xz/bz2/zst；普通日志返回 None"""
+    value = str(file_path or "").lower()
+    for ext in COMPRESSED_LOG_EXTENSIONS:
+        if value.endswith(ext):
+            return ext[1:]
+    return None
+
+
+def _new_log_decompressor(kind):
+    if kind == "gz":
+        return zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)  # 自动识别 gzip/zlib 头
+    if kind == "xz":
+        return lzma.LZMADecompressor()
+    if kind == "bz2":
+        return bz2.BZ2Decompressor()
+    if kind == "zst":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError("未安装 zstandard，无法读取 .zst 日志") from exc
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise RuntimeError(f"不支持的压缩格式: {kind}")
+
+
+def _get_compressed_checkpoints(key):
+    with _compressed_checkpoints_lock:
+        entry = _compressed_checkpoints.get(key)
+        if entry is None:
+            entry = {"offsets": [], "points": [], "size": None, "blocks": None}
+            _compressed_checkpoints[key] = entry
+            while len(_compressed_checkpoints) > _COMPRESSED_CHECKPOINT_FILES_MAX:
+                _compressed_checkpoints.popitem(last=False)
+        else:
+            _compressed_checkpoints.move_to_end(key)
+        return entry
+
+
+def _read_xz_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("xz 索引整数溢出")
+
+
+def _read_xz_block_index(f, file_size):
+    """从文件尾部向前逐个解析 xz 流的索引，返回按解压偏移排列的块列表
+    [(块解压起点, 块压缩起点, 流头偏移, 流内块数据结束偏移, 流解压结束偏移, 下一流起点或 None)]"""
+    streams = []
+    pos = file_size
+    while pos > 0:
+        while pos >= 4:  # 流之间的填充为 4 字节对齐的零
+            f.seek(pos - 4)
+            if f.read(4) != b"\0\0\0\0":
+                break
+            pos -= 4
+        if pos < 2 * _XZ_HEADER_SIZE:
+            raise ValueError("xz 流过短")
+        f.seek(pos - _XZ_HEADER_SIZE)
+        footer = f.read(_XZ_HEADER_SIZE)
+        if footer[10:] != b"YZ":
+            raise ValueError("xz 流尾无效")
+        index_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+        index_start = pos - _XZ_HEADER_SIZE - index_size
+        if index_start < _XZ_HEADER_SIZE:
+            raise ValueError("xz 索引越界")
+        f.seek(index_start)
+        index = f.read(index_size)
+        if index[:1] != b"\0":
+            raise ValueError("xz 索引无效")
+        count, cursor = _read_xz_varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, cursor = _read_xz_varint(index, cursor)
+            size, cursor = _read_xz_varint(index, cursor)
+            records.append((unpadded, size))
+        stream_start = index_start - sum((unpadded + 3) & ~3 for unpadded, _ in records) - _XZ_HEADER_SIZE
+        if stream_start < 0:
+            raise ValueError("xz 块大小越界")
+        streams.append((stream_start, index_start, records))
+        pos = stream_start
+    streams.reverse()
+    blocks = []
+    out_pos = 0
+    for i, (stream_start, index_start, records) in enumerate(streams):
+        next_stream = streams[i + 1][0] if i + 1 < len(streams) else None
+        stream_out_end = out_pos + sum(size for _, size in records)
+        in_pos = stream_start + _XZ_HEADER_SIZE
+        for unpadded, size in records:
+            blocks.append((out_pos, in_pos, stream_start, index_start, stream_out_end, next_stream))
+            out_pos += size
+            in_pos += (unpadded + 3) & ~3
+    return blocks
+
+
+class _CompressedLogStream(io.RawIOBase):
+    """可 seek 的流式解压原始流，由 _open_log_binary 包装成带缓冲的文件对象使用"""
+
+    # 可在流之间交接的解压状态
+    _STATE_FIELDS = ("_file", "_decompressor", "_pending", "_in_pos", "_out_pos", "_buffer", "_buffer_start",
+                     "_eof", "_stream_end")
+
+    def __init__(self, file_path):
+        super().__init__()
+        self.kind = _compressed_log_kind(file_path)
+        self._file = open(file_path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        self._checkpoints = _get_compressed_checkpoints(self._key)
+        if self.kind == "xz" and self._checkpoints["blocks"] is None:
             try:
-                sample.decode(enc)
-                return enc
-            except UnicodeDecodeError:
-                continue
-    except Exception as e:
-        print(f"[滚动窗口] 探测编码失败，使用默认编码 {default_encoding}: {e}")
-    return default_encoding
+                blocks = _read_xz_block_index(self._file, stat.st_size)
+            except (ValueError, IndexError, struct.error) as e:
+                print(f"[压缩日志] 读取 xz 块索引失败，向回 seek 时从头解压: {e}")
+                blocks = []
+            with _compressed_checkpoints_lock:
+                self._checkpoints["blocks"] = blocks
+                if blocks:
+                    self._checkpoints["size"] = blocks[-1][4]
+        self._pos = 0
+        self._restart(0, 0, _new_log_decompressor(self.kind))
+
+    def _restart(self, out_pos, in_pos, decompressor, prefix=b"", stream_end=None):
+        self._file.seek(in_pos)
+        self._decompressor = decompressor
+        self._pending = prefix
+        self._in_pos = in_pos
+        self._out_pos = out_pos
+        self._buffer = b""
+        self._buffer_start = out_pos
+        self._eof = False
+        # 从 xz 块中途开始解压时，读到流内块数据末尾（索引之前）即停：(结束偏移, 流解压结束偏移, 下一流起点)
+        self._stream_end = stream_end
+
+    def _restart_xz_block(self, block):
+        out_pos, in_pos, stream_start, index_start, stream_out_end, next_stream = block
+        self._file.seek(stream_start)
+        header = self._file.read(_XZ_HEADER_SIZE)
+        self._restart(out_pos, in_pos, _new_log_decompressor(self.kind), prefix=header,
+                      stream_end=(index_start, stream_out_end, next_stream))
+
+    def _export_state(self):
+        return tuple(getattr(self, name) for name in self._STATE_FIELDS)
+
+    def _adopt_state(self, state):
+        for name, value in zip(self._STATE_FIELDS, state):
+            setattr(self, name, value)
+
+    def _park_state(self):
+        """保留当前解压状态（连同文件句柄）供之后打开同一文件的流接手；已到末尾或未开始时直接关闭文件"""
+        if self._eof or self._out_pos <= 0:
+            self._file.close()
+            return
+        evicted = []
+        with _compressed_checkpoints_lock:
+            _compressed_parked.append((self._key, self._export_state()))
+            while len(_compressed_parked) > _COMPRESSED_PARKED_MAX:
+                evicted.append(_compressed_parked.popleft()[1][0])
+        for f in evicted:
+            f.close()
+
+    def _take_parked_state(self, target, floor):
+        """取出同一文件中解压位置不超过 target 且在 floor 之后的最近保留状态"""
+        with _compressed_checkpoints_lock:
+            best = None
+            for i, (key, state) in enumerate(_compressed_parked):
+                buffer_start = state[self._STATE_FIELDS.index("_buffer_start")]
+                if key == self._key and floor < buffer_start <= target:
+                    if best is None or buffer_start > best[1]:
+                        best = (i, buffer_start)
+            if best is None:
+                return None
+            state = _compressed_parked[best[0]][1]
+            del _compressed_parked[best[0]]
+            return state
 
-def _load_temp_index_metadata(file_path):
-    idx_path = get_temp_index_path(file_path)
-    if not os.path.exists(idx_path):
-        return None
-    try:
-        with open(idx_path, 'r', encoding='utf-8') as idx_file:
-            data = json.load(idx_file)
-        if isinstance(data, dict):
-            return data
-    except Exception as e:
-        print(f"[滚动窗口] 读取索引元数据失败: {e}")
-    return None
+    @property
+    def compressed_offset(self):
+        """已读入的压缩字节数，用于按源文件大小计算进度"""
+        return self._in_pos
 
+    def readable(self):
+        return True
 
-def _get_search_cache_key(file_path, keyword, case_sensitive):
-    try:
-        stat = os.stat(file_path)
-        return (
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._total_size()
+        if offset < 0:
+            raise ValueError("seek 偏移不能为负")
+        self._pos = offset
+        return self._pos
+
+    def _total_size(self):
+        if self._checkpoints["size"] is None:
+            while self._produce():
+                pass
+        return self._checkpoints["size"]
+
+    def _decompress(self, data):
+        decompressor = self._decompressor
+        if self.kind == "zst":
+            return decompressor.decompress(data)
+        out = decompressor.decompress(data, _COMPRESSED_OUTPUT_LIMIT)
+        if self.kind == "gz":
+            self._pending = decompressor.unconsumed_tail
+        return out
+
+    def _read_input(self):
+        size = _COMPRESSED_READ_BLOCK
+        if self._stream_end is not None:
+            size = min(size, self._stream_end[0] - self._in_pos)
+        data = self._file.read(size) if size > 0 else b""
+        self._in_pos += len(data)
+        return data
+
+    def _produce(self):
+        """解压出下一段数据追加到缓冲；到达文件末尾返回 False"""
+        while not self._eof:
+            decompressor = self._decompressor
+            if getattr(decompressor, "eof", False):
+                # 多成员/多帧压缩文件（如 cat a.gz b.gz）：剩余数据交给新的解压器
+                self._pending = (getattr(decompressor, "unused_data", b"") or b"") + self._pending
+                if self.kind == "xz":
+                    self._pending = self._pending.lstrip(b"\0")  # xz 流之间的零填充
+                while not self._pending:
+                    self._pending = self._read_input()
+                    if self.kind != "xz" or not self._pending:
+                        break
+                    self._pending = self._pending.lstrip(b"\0")
+                if not self._pending:
+                    self._eof = True
+                    break
+                self._decompressor = _new_log_decompressor(self.kind)
+                continue
+            if self.kind in ("xz", "bz2") and not decompressor.needs_input:
+                out = decompressor.decompress(b"", _COMPRESSED_OUTPUT_LIMIT)
+            else:
+                if not self._pending:
+                    self._pending = self._read_input()
+                    if not self._pending:
+                        if self._stream_end is not None:
+                            # 流内块数据已解压完（跳过了流索引校验）：转到下一流头顺序解压
+                            _, stream_out_end, next_stream = self._stream_end
+                            if next_stream is None:
+                                self._out_pos = stream_out_end
+                                self._eof = True
+                                break
+                            self._restart(stream_out_end, next_stream, _new_log_decompressor(self.kind))
+                            continue
+                        # 截断的压缩文件：保留已解压出的内容
+                        self._eof = True
+                        break
+                data, self._pending = self._pending, b""
+                out = self._decompress(data)
+            if out:
+                self._buffer_start = self._out_pos
+                self._buffer = out
+                self._out_pos += len(out)
+                self._save_checkpoint()
+                return True
+        self._checkpoints["size"] = self._out_pos
+        return False
+
+    def _save_checkpoint(self):
+        if self.kind != "gz":
+            return
+        checkpoints = self._checkpoints
+        with _compressed_checkpoints_lock:
+            last = checkpoints["offsets"][-1] if checkpoints["offsets"] else 0
+            if self._out_pos - last < _COMPRESSED_CHECKPOINT_EVERY:
+                return
+            # 未交给解压器的输入可按文件偏移重读，快照只需记录解压器状态
+            checkpoints["offsets"].append(self._out_pos)
+            checkpoints["points"].append((self._in_pos - len(self._pending), self._decompressor.copy()))
+
+    def _jump_towards(self, target):
+        """目标在当前位置之前或远在其后时，从不超过目标的最近恢复点（gzip 快照 / xz 块起点 /
+        保留的解压状态）继续解压，都没有时从文件头开始"""
+        behind = target < self._buffer_start
+        floor = -1 if behind else self._out_pos  # 向前跳时恢复点必须越过当前解压位置才值得
+        restore = None
+        checkpoints = self._checkpoints
+        with _compressed_checkpoints_lock:
+            slot = bisect_left(checkpoints["offsets"], target + 1) - 1
+            if slot >= 0 and checkpoints["offsets"][slot] > floor:
+                in_pos, decompressor = checkpoints["points"][slot]
+                restore = (checkpoints["offsets"][slot], "gz", (in_pos, decompressor))
+            blocks = checkpoints["blocks"] or ()
+            slot = bisect_right(blocks, (target, float("inf"))) - 1
+            if slot >= 0 and blocks[slot][0] > floor and (restore is None or blocks[slot][0] > restore[0]):
+                restore = (blocks[slot][0], "xz", blocks[slot])
+        state = self._take_parked_state(target, floor if restore is None else max(floor, restore[0]))
+        if state is not None:
+            self._park_state()
+            self._adopt_state(state)
+        elif restore is not None and restore[1] == "gz":
+            self._restart(restore[0], restore[2][0], restore[2][1].copy())
+        elif restore is not None:
+            self._restart_xz_block(restore[2])
+        elif behind:
+            self._restart(0, 0, _new_log_decompressor(self.kind))
+
+    def readinto(self, buffer):
+        target = self._pos
+        if target < self._buffer_start or target >= self._out_pos:
+            self._jump_towards(target)
+        while target >= self._out_pos:
+            if not self._produce():
+                return 0
+        start = target - self._buffer_start
+        size = min(len(buffer), len(self._buffer) - start)
+        buffer[:size] = self._buffer[start:start + size]
+        self._pos += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._park_state()
+        super().close()
+
+
+# ------------------- 日志集（轮转分段虚拟拼接） -------------------
+# .logset 清单为 JSON {"segments": [...]}，分段路径相对清单所在目录、按从旧到新排列，分段可以是压缩日志。
+# 读取时按虚拟偏移首尾拼接各分段；分段末尾缺少换行时补一个换行，行不会跨分段粘连。
+# 各分段的解压后长度记录在源索引目录的旁路文件中，分段大小/mtime 不变时直接复用。
+_LOG_SET_READ_BLOCK = 1024 * 1024
+_log_set_layouts = OrderedDict()
+_log_set_layouts_lock = threading.Lock()
+_LOG_SET_LAYOUTS_MAX = 16
+
+
+def _is_log_set(file_path):
+    return str(file_path or "").lower().endswith(LOG_SET_EXTENSION)
+
+
+def _read_log_set_manifest(log_path):
+    """读取日志集清单，返回分段绝对路径列表；分段必须位于 logs/ 内且存在"""
+    try:
+        with open(log_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        raise RuntimeError(f"日志集清单无效: {os.path.basename(log_path)}: {e}")
+    names = manifest.get("segments") if isinstance(manifest, dict) else None
+    if not isinstance(names, list) or not names:
+        raise RuntimeError(f"日志集清单缺少分段: {os.path.basename(log_path)}")
+    base_dir = os.path.dirname(os.path.abspath(log_path))
+    segments = []
+    for name in names:
+        path = os.path.abspath(os.path.join(base_dir, str(name)))
+        if not _is_source_log_path(path) or _is_log_set(path):
+            raise RuntimeError(f"日志集分段路径无效: {name}")
+        if not os.path.isfile(path):
+            raise RuntimeError(f"日志集分段不存在: {name}")
+        segments.append(path)
+    return segments
+
+
+def _get_log_set_layout_path(idx_path):
+    return idx_path[:-len(".idx")] + ".set.json" if idx_path.endswith(".idx") else idx_path + ".set.json"
+
+
+def _measure_log_segment(path):
+    """分段解压后的字节数，以及末尾是否需要补换行"""
+    if not _compressed_log_kind(path):
+        size = os.path.getsize(path)
+        if not size:
+            return 0, False
+        with open(path, 'rb') as f:
+            f.seek(size - 1)
+            return size, f.read(1) != b"\n"
+    length, last = 0, b"\n"
+    with _open_log_binary(path) as f:
+        for block in iter(lambda: f.read(_LOG_SET_READ_BLOCK), b""):
+            length += len(block)
+            last = block[-1:]
+    return length, last != b"\n"
+
+
+def _get_log_set_layout(log_path):
+    """日志集布局 {"segments": [[路径, 磁盘大小, mtime_ns, 虚拟长度, 补换行]], "starts": [...], "size": 总长}"""
+    key = os.path.abspath(log_path)
+    stats = []
+    for path in _read_log_set_manifest(log_path):
+        stat = os.stat(path)
+        stats.append([path, stat.st_size, stat.st_mtime_ns])
+    with _log_set_layouts_lock:
+        cached = _log_set_layouts.get(key)
+        if cached and [item[:3] for item in cached["segments"]] == stats:
+            _log_set_layouts.move_to_end(key)
+            return cached
+    layout_path = _get_log_set_layout_path(get_source_index_path(log_path))
+    known = {}
+    try:
+        with open(layout_path, 'r', encoding='utf-8') as f:
+            known = {tuple(item[:3]): item[3:] for item in json.load(f).get("segments") or []}
+    except Exception:
+        pass
+    segments = []
+    changed = False
+    for stat in stats:
+        measured = known.get(tuple(stat))
+        if measured is None:
+            measured = list(_measure_log_segment(stat[0]))
+            changed = True
+        segments.append(stat + [int(measured[0]), bool(measured[1])])
+    starts = []
+    position = 0
+    for segment in segments:
+        starts.append(position)
+        position += segment[3] + int(segment[4])
+    layout = {"segments": segments, "starts": starts, "size": position}
+    if changed or len(known) != len(segments):
+        try:
+            os.makedirs(os.path.dirname(layout_path), exist_ok=True)
+            tmp_path = f"{layout_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"source": key, "segments": segments}, f, ensure_ascii=False)
+            os.replace(tmp_path, layout_path)
+        except Exception as e:
+            print(f"[日志集] 写入分段布局失败: {e}")
+    with _log_set_layouts_lock:
+        _log_set_layouts[key] = layout
+        while len(_log_set_layouts) > _LOG_SET_LAYOUTS_MAX:
+            _log_set_layouts.popitem(last=False)
+    return layout
+
+
+def _log_set_has_compressed_segments(log_path):
+    return _is_log_set(log_path) and any(
+        _compressed_log_kind(segment[0]) for segment in _get_log_set_layout(log_path)["segments"]
+    )
+
+
+def _get_log_source_size(log_path):
+    """源日志大小：日志集为拼接后的虚拟大小，其余为磁盘文件大小（压缩日志按压缩字节计进度）"""
+    if _is_log_set(log_path):
+        return _get_log_set_layout(log_path)["size"]
+    return os.path.getsize(log_path)
+
+
+class _LogSetStream(io.RawIOBase):
+    """日志集的可 seek 只读虚拟拼接流，由 _open_log_binary 包装成带缓冲的文件对象使用"""
+
+    def __init__(self, file_path):
+        super().__init__()
+        layout = _get_log_set_layout(file_path)
+        self._segments = layout["segments"]
+        self._starts = layout["starts"]
+        self._size = layout["size"]
+        self._pos = 0
+        self._slot = None
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("seek 偏移不能为负")
+        self._pos = offset
+        return self._pos
+
+    def _segment_file(self, slot):
+        if self._slot != slot:
+            if self._file is not None:
+                self._file.close()
+            self._file = _open_log_binary(self._segments[slot][0])
+            self._slot = slot
+        return self._file
+
+    def readinto(self, buffer):
+        if self._pos >= self._size or not len(buffer):
+            return 0
+        # 空分段与下一分段起点相同，取最后一个起点不超过当前位置的分段
+        slot = bisect_right(self._starts, self._pos) - 1
+        local = self._pos - self._starts[slot]
+        length = self._segments[slot][3]
+        if local >= length:
+            buffer[0:1] = b"\n"
+            self._pos += 1
+            return 1
+        f = self._segment_file(slot)
+        if f.tell() != local:
+            f.seek(local)
+        size = f.readinto(memoryview(buffer)[:min(len(buffer), length - local)])
+        if not size:
+            raise RuntimeError(f"日志集分段已变化: {os.path.basename(self._segments[slot][0])}")
+        self._pos += size
+        return size
+
+    def close(self):
+        if not self.closed and self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def _open_log_binary(file_path):
+    """以二进制方式打开日志；压缩日志返回可 seek 的流式解压文件对象，偏移为解压后的字节偏移；
+    日志集返回各分段虚拟拼接后的文件对象"""
+    if _is_log_set(file_path):
+        return io.BufferedReader(_LogSetStream(file_path), buffer_size=_LOG_SET_READ_BLOCK)
+    if _compressed_log_kind(file_path):
+        return io.BufferedReader(_CompressedLogStream(file_path), buffer_size=_COMPRESSED_READ_BLOCK)
+    return open(file_path, 'rb')
+
+
+def _open_log_text(file_path, encoding):
+    return io.TextIOWrapper(_open_log_binary(file_path), encoding=encoding, errors='replace')
+
+
+def _compressed_read_offset(f, default):
+    """压缩日志返回已读入的压缩字节数（与按文件大小计的 total_bytes 同口径），普通文件返回 default"""
+    raw = getattr(f, "raw", None)
+    return raw.compressed_offset if isinstance(raw, _CompressedLogStream) else default
+
+
+def detect_file_encoding(file_path, default_encoding="utf-8"):
+    """读取部分内容推测编码，失败则返回默认编码"""
+    encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1', 'iso-8859-1']
+    try:
+        with _open_log_binary(file_path) as f:
+            sample = f.read(65536)  # 64KB 样本
+        for enc in encodings:
+            try:
+                sample.decode(enc)
+                return enc
+            except UnicodeDecodeError:
+                continue
+    except Exception as e:
+        print(f"[滚动窗口] 探测编码失败，使用默认编码 {default_encoding}: {e}")
+    return default_encoding
+
+# ------------------- 二进制行偏移索引 -------------------
+# 格式：小端 uint64 偏移数组（第 1、1+stride、1+2*stride... 行的起始字节）
+#      + JSON 元数据 + uint64 元数据长度 + 8 字节魔数。
+# 元数据放在尾部，便于边过滤边流式写入；读取时 mmap 后按行号 O(1) 定位。
+_LINE_INDEX_MAGIC = b"LFLIDX01"
+_LINE_INDEX_READ_BLOCK = 16 * 1024 * 1024
+_LINE_INDEX_CACHE_MAX = 32
+
+
+class _LineIndexWriter:
+    """流式写出二进制行偏移索引，写完后原子替换目标文件。
+    live=True 时登记为进行中的索引，publish() 后已写出的行可被滚动窗口读取。"""
+
+    def __init__(self, idx_path, stride=_LINE_INDEX_STRIDE, encoding=None, live=False):
+        self.idx_path = idx_path
+        self.stride = max(1, int(stride or 1))
+        self.encoding = encoding
+        self.tmp_path = f"{idx_path}.{uuid.uuid4().hex[:8]}.tmp"
+        self.file = open(self.tmp_path, 'wb')
+        self.buffer = array('Q')
+        self.line_count = 0
+        self.offset = 0
+        self._at_line_start = True
+        self._lock = threading.Lock()
+        self._published = (0, 0)
+        self._reader_file = None
+        self._closed = False
+        self._live = live
+        if live:
+            with _live_line_index_lock:
+                _live_line_index_writers[os.path.abspath(idx_path)] = self
+
+    def add_line(self, length):
+        """登记一行（按写入顺序），length 为该行字节数（含换行符）"""
+        if self.line_count % self.stride == 0:
+            self.buffer.append(self.offset)
+            if len(self.buffer) >= 65536:
+                self._flush()
+        self.line_count += 1
+        self.offset += length
+        self._at_line_start = True
+
+    def add_chunk(self, data):
+        """登记一段连续字节（可跨行、可截断在行中间），用 numpy 向量化查找行首"""
+        if not data:
+            return
+        newline_pos = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+        inner = newline_pos[newline_pos < len(data) - 1]
+        starts = inner.astype(np.uint64) + np.uint64(self.offset + 1)
+        if self._at_line_start:
+            starts = np.concatenate((np.array([self.offset], dtype=np.uint64), starts))
+        count = len(starts)
+        if count:
+            if self.stride > 1:
+                ordinals = np.arange(self.line_count, self.line_count + count, dtype=np.uint64)
+                starts = starts[ordinals % np.uint64(self.stride) == 0]
+            self._flush()
+            self.file.write(starts.astype('<u8').tobytes())
+        self.line_count += count
+        self.offset += len(data)
+        self._at_line_start = data.endswith(b"\n")
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        if sys.byteorder != "little":
+            self.buffer.byteswap()
+        self.buffer.tofile(self.file)
+        self.buffer = array('Q')
+
+    def publish(self):
+        """把已登记的行落盘并对读取方可见（调用前需先 flush 对应的数据文件）"""
+        with self._lock:
+            self._flush()
+            self.file.flush()
+            self._published = (self.line_count, self.offset)
+
+    def published(self):
+        with self._lock:
+            return self._published
+
+    def read_entry(self, slot):
+        """读取第 slot 个已发布的偏移；写入完成后改读最终索引"""
+        with self._lock:
+            if not self._closed:
+                if self._reader_file is None:
+                    self._reader_file = open(self.tmp_path, 'rb')
+                self._reader_file.seek(slot * 8)
+                return struct.unpack("<Q", self._reader_file.read(8))[0]
+        with _LineIndexLease(_open_line_index, self.idx_path) as line_index:
+            if line_index is None:
+                raise RuntimeError("行索引不可用")
+            return line_index._view[slot]
+
+    def _release(self):
+        """关闭读取句柄并注销进行中的索引（调用方持有 _lock）"""
+        if self._reader_file is not None:
+            self._reader_file.close()
+            self._reader_file = None
+        self._closed = True
+        if self._live:
+            with _live_line_index_lock:
+                key = os.path.abspath(self.idx_path)
+                if _live_line_index_writers.get(key) is self:
+                    _live_line_index_writers.pop(key, None)
+
+    def close(self, encoding=None, **extra_meta):
+        self._flush()
+        encoding = encoding or self.encoding or "utf-8"
+        meta = dict(extra_meta)
+        meta.update({
+            "encoding": encoding,
+            "stride": self.stride,
+            "line_count": self.line_count,
+            "entries": (self.line_count + self.stride - 1) // self.stride,
+            "end_offset": self.offset
+        })
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        self.file.write(meta_bytes)
+        self.file.write(struct.pack("<Q", len(meta_bytes)))
+        self.file.write(_LINE_INDEX_MAGIC)
+        self.file.close()
+        with self._lock:
+            # 替换前关闭读取句柄（Windows 下打开中的文件无法被替换）
+            if self._reader_file is not None:
+                self._reader_file.close()
+                self._reader_file = None
+            _invalidate_line_index(self.idx_path)
+            os.replace(self.tmp_path, self.idx_path)
+            self._release()
+        return meta
+
+    def abort(self):
+        try:
+            self.file.close()
+        finally:
+            with self._lock:
+                self._release()
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+class _LiveLineIndex:
+    """过滤进行中的行索引视图，只暴露创建时已发布的行"""
+
+    is_live = True
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.idx_path = writer.idx_path
+        self.signature = None
+        self.line_count, self.end_offset = writer.published()
+        self.stride = writer.stride
+        self.encoding = writer.encoding
+        self.meta = {
+            "encoding": self.encoding,
+            "stride": self.stride,
+            "line_count": self.line_count,
+            "entries": (self.line_count + self.stride - 1) // self.stride,
+            "end_offset": self.end_offset,
+            "live": True
+        }
+
+    def seek_point(self, line_no):
+        if self.line_count <= 0 or line_no <= 1:
+            return 1, 0
+        line_no = min(line_no, self.line_count)
+        slot = (line_no - 1) // self.stride
+        return slot * self.stride + 1, self.writer.read_entry(slot)
+
+    def line_span(self, line_no):
+        if self.stride != 1 or line_no < 1 or line_no > self.line_count:
+            return None
+        end = self.writer.read_entry(line_no) if line_no < self.line_count else self.end_offset
+        return self.writer.read_entry(line_no - 1), end
+
+    def acquire(self):
+        return True
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+
+_live_line_index_writers = {}
+_live_line_index_lock = threading.Lock()
+
+
+def _get_live_line_index(idx_path):
+    with _live_line_index_lock:
+        writer = _live_line_index_writers.get(os.path.abspath(idx_path))
+    return _LiveLineIndex(writer) if writer is not None else None
+
+
+# ------------------- 过滤结果 → 源文件位置映射 -------------------
+# 每个输出行对应 16 字节：源文件行号（1-based）与源文件字节偏移，均为小端 uint64
+_SOURCE_MAP_ENTRY_BYTES = 16
+
+
+def get_temp_source_map_path(temp_file_path):
+    """过滤结果的源位置映射文件路径"""
+    return f"{temp_file_path}.map"
+
+
+class _SourceMapWriter:
+    """流式写出源位置映射，写完后原子替换目标文件"""
+
+    def __init__(self, map_path):
+        self.map_path = map_path
+        self.tmp_path = f"{map_path}.{uuid.uuid4().hex[:8]}.tmp"
+        self.file = open(self.tmp_path, 'wb')
+        self.count = 0
+
+    def add(self, source_lines, source_offsets):
+        entries = np.empty((len(source_lines), 2), dtype='<u8')
+        entries[:, 0] = source_lines
+        entries[:, 1] = source_offsets
+        self.file.write(entries.tobytes())
+        self.count += len(entries)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.map_path)
+
+    def abort(self):
+        try:
+            self.file.close()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+def _load_source_map_array(map_path, line_count=None):
+    """以 np.memmap 只读映射整个源位置映射，形状 (行数, 2)；行数不符时返回 None"""
+    try:
+        size = os.path.getsize(map_path)
+    except OSError:
+        return None
+    if size % _SOURCE_MAP_ENTRY_BYTES:
+        return None
+    entries = size // _SOURCE_MAP_ENTRY_BYTES
+    if line_count is not None and entries != line_count:
+        return None
+    if not entries:
+        return np.zeros((0, 2), dtype='<u8')
+    return np.memmap(map_path, dtype='<u8', mode='r', shape=(entries, 2))
+
+
+def _get_filter_session_source(session_id):
+    """过滤会话对应的源日志路径；源文件在过滤后被修改、或缺少缓存键无法核对时返回 None（映射已失效）。
+    内存中的任务与落盘的缓存键都按缓存键记录的源文件身份核对"""
+    try:
+        with open(_get_filter_key_path(session_id), 'r', encoding='utf-8') as f:
+            source = (json.load(f) or {}).get("source") or {}
+        task = _get_filter_task(session_id)
+        path = (task or {}).get("log_path") or source.get("path")
+        if path and _get_file_identity(path) == source:
+            return path
+    except Exception:
+        pass
+    return None
+
+
+def _lookup_filter_source_positions(session_id, line_numbers):
+    """过滤结果行号(1-based) -> (源行号, 源字节偏移)，直接按 行号*16 定位映射记录"""
+    temp_file = os.path.join(TEMP_DIR, f"filter_result_{session_id}.txt")
+    meta = _load_cached_filter_result(session_id)
+    if meta is None:
+        return {}
+    source_map = _load_source_map_array(get_temp_source_map_path(temp_file), line_count=int(meta.get("line_count") or 0))
+    if source_map is None:
+        return {}
+    positions = {}
+    for line_no in line_numbers:
+        line_no = int(line_no)
+        if 1 <= line_no <= len(source_map):
+            source_line, source_offset = source_map[line_no - 1]
+            positions[line_no] = (int(source_line), int(source_offset))
+    return positions
+
+
+def _find_filtered_line_for_source(session_id, source_line):
+    """源行号 -> 过滤结果中位于该行或其后的首行行号(1-based)；结果未完成或为空时返回 None"""
+    temp_file = os.path.join(TEMP_DIR, f"filter_result_{session_id}.txt")
+    meta = _load_cached_filter_result(session_id)
+    if meta is None:
+        return None
+    source_map = _load_source_map_array(get_temp_source_map_path(temp_file), line_count=int(meta.get("line_count") or 0))
+    if source_map is None or not len(source_map):
+        return None
+    # 映射按源行号递增写入，二分即可
+    position = int(np.searchsorted(source_map[:, 0], source_line, side='left'))
+    return min(position, len(source_map) - 1) + 1
+
+
+def _locate_time_in_source(log_path, text):
+    """时间 -> 源日志中时间 >= 该时间的首行，返回 (行号, 命中段数)"""
+    ts_index = _get_timestamp_index(log_path)
+    if ts_index is None:
+        raise RuntimeError("日志中没有可识别的时间戳")
+    target = ts_index.normalize_query(text)
+    with _open_log_binary(log_path) as f:
+        return ts_index.find_line(f, target)
+
+
+def _read_source_line_at(log_path, source_offset, encoding=None):
+    """按映射记录的字节偏移直接 seek 读取源日志中的一行"""
+    encoding = encoding or detect_file_encoding(log_path)
+    with _open_log_binary(log_path) as f:
+        f.seek(source_offset)
+        return _decode_log_bytes(f.readline(), encoding).rstrip("\r\n")
+
+
+class _LineIndex:
+    """mmap 方式加载的只读行偏移索引。
+    读取偏移区（_view / seek_point / line_span）前需先租用（见 _LineIndexLease）：
+    缓存淘汰或索引追加只标记失效（closed），最后一个租用者释放后才解除映射。"""
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        stat = os.stat(idx_path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        with open(idx_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            size = len(self._mm)
+            if size < 16 or self._mm[size - 8:size] != _LINE_INDEX_MAGIC:
+                raise ValueError("不是二进制行索引")
+            meta_len = struct.unpack("<Q", self._mm[size - 16:size - 8])[0]
+            meta_start = size - 16 - meta_len
+            self.meta = json.loads(self._mm[meta_start:size - 16].decode("utf-8"))
+            entries = int(self.meta.get("entries") or 0)
+            if entries * 8 > meta_start:
+                raise ValueError("行索引已损坏")
+            self._view = memoryview(self._mm)[:entries * 8].cast('Q')
+        except Exception:
+            self._mm.close()
+            raise
+        self.line_count = int(self.meta.get("line_count") or 0)
+        self.stride = max(1, int(self.meta.get("stride") or 1))
+        self.encoding = self.meta.get("encoding")
+        self.end_offset = int(self.meta.get("end_offset") or 0)
+        self.closed = False
+        self._leases = 1  # 缓存自身持有一份，close() 时释放
+        self._lease_lock = threading.Lock()
+
+    def seek_point(self, line_no):
+        """返回不晚于 line_no 的最近索引点 (行号, 字节偏移)；stride=1 时即该行本身"""
+        if self.line_count <= 0 or line_no <= 1:
+            return 1, 0
+        line_no = min(line_no, self.line_count)
+        slot = (line_no - 1) // self.stride
+        return slot * self.stride + 1, self._view[slot]
+
+    def line_span(self, line_no):
+        """stride=1 时返回该行的 [起始, 结束) 字节区间"""
+        if self.stride != 1 or line_no < 1 or line_no > self.line_count:
+            return None
+        end = self._view[line_no] if line_no < self.line_count else self.end_offset
+        return self._view[line_no - 1], end
+
+    def acquire(self):
+        """租用映射，成功后直到 release 都可安全读取；已解除映射时返回 False"""
+        with self._lease_lock:
+            if self._leases <= 0:
+                return False
+            self._leases += 1
+            return True
+
+    def release(self):
+        with self._lease_lock:
+            self._leases -= 1
+            if self._leases > 0:
+                return
+        try:
+            self._view.release()
+        except Exception:
+            pass
+        try:
+            self._mm.close()
+        except Exception:
+            pass  # 仍有 numpy 视图引用时由垃圾回收解除映射
+
+    def close(self):
+        # 缓存淘汰或索引追加时调用：标记失效（读取器据此重建）并释放缓存持有的租用
+        with self._lease_lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.release()
+
+
+def _lease_line_index(getter, *args):
+    """获取并租用行索引，用完需 release()；取到的索引恰好已解除映射时重新获取"""
+    for _ in range(3):
+        line_index = getter(*args)
+        if line_index is None or line_index.acquire():
+            return line_index
+    raise RuntimeError("行索引反复失效，请重试")
+
+
+class _LineIndexLease:
+    """with 语句内租用 getter(*args) 返回的行索引，取不到时为 None"""
+
+    def __init__(self, getter, *args):
+        self._getter = getter
+        self._args = args
+        self.line_index = None
+
+    def __enter__(self):
+        self.line_index = _lease_line_index(self._getter, *self._args)
+        return self.line_index
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.line_index is not None:
+            self.line_index.release()
+            self.line_index = None
+        return False
+
+
+_line_index_cache = OrderedDict()
+_line_index_cache_lock = threading.Lock()
+
+
+def _invalidate_line_index(idx_path):
+    with _line_index_cache_lock:
+        cached = _line_index_cache.pop(os.path.abspath(idx_path), None)
+    if cached:
+        cached.close()
+
+
+def _open_line_index(idx_path):
+    """按索引文件 mtime/大小缓存 mmap 句柄（LRU），重复滚动请求不再重复解析索引"""
+    key = os.path.abspath(idx_path)
+    try:
+        stat = os.stat(idx_path)
+    except OSError:
+        _invalidate_line_index(idx_path)
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _line_index_cache_lock:
+        cached = _line_index_cache.get(key)
+        if cached and cached.signature == signature:
+            _line_index_cache.move_to_end(key)
+            return cached
+    try:
+        line_index = _LineIndex(idx_path)
+    except Exception as e:
+        print(f"[滚动窗口] 读取行索引失败: {idx_path}: {e}")
+        return None
+    evicted = []
+    with _line_index_cache_lock:
+        previous = _line_index_cache.pop(key, None)
+        if previous:
+            evicted.append(previous)
+        _line_index_cache[key] = line_index
+        while len(_line_index_cache) > _LINE_INDEX_CACHE_MAX:
+            evicted.append(_line_index_cache.popitem(last=False)[1])
+    for item in evicted:
+        item.close()
+    return line_index
+
+
+def _read_line_index_meta(idx_path):
+    """只读取索引尾部元数据（不映射偏移数组）"""
+    try:
+        with open(idx_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size < 16:
+                return None
+            f.seek(size - 16)
+            tail = f.read(16)
+            if tail[8:] != _LINE_INDEX_MAGIC:
+                return None
+            meta_len = struct.unpack("<Q", tail[:8])[0]
+            f.seek(size - 16 - meta_len)
+            return json.loads(f.read(meta_len).decode("utf-8"))
+    except Exception:
+        return None
+
+
+def _write_line_index_for_file(file_path, idx_path, encoding, stride=_LINE_INDEX_STRIDE, **extra_meta):
+    """按块读取文件并写出行索引，返回元数据"""
+    writer = _LineIndexWriter(idx_path, stride=stride)
+    try:
+        with _open_log_binary(file_path) as f:
+            for block in iter(lambda: f.read(_LINE_INDEX_READ_BLOCK), b""):
+                writer.add_chunk(block)
+        return writer.close(encoding=encoding, **extra_meta)
+    except Exception:
+        writer.abort()
+        raise
+
+
+def _append_line_index(idx_path, data, **extra_meta):
+    """把追加到数据文件末尾的整行 data 登记进已完成的行索引，返回新元数据。
+    不原地改写（Windows 上已映射的文件无法截断，且结果按内容寻址被多个页面共用）：
+    旧偏移区、新偏移与新元数据写入临时文件后原子替换；调用方需先释放该结果的读取器并使缓存的映射失效。"""
+    meta = _read_line_index_meta(idx_path)
+    if not meta:
+        raise RuntimeError("行索引不可用")
+    stride = max(1, int(meta.get("stride") or 1))
+    line_count = int(meta.get("line_count") or 0)
+    entries = int(meta.get("entries") or 0)
+    offset = int(meta.get("end_offset") or 0)
+    newline_pos = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+    starts = np.concatenate((
+        np.array([offset], dtype=np.uint64),
+        newline_pos[newline_pos < len(data) - 1].astype(np.uint64) + np.uint64(offset + 1)
+    )) if data else np.zeros(0, dtype=np.uint64)
+    count = len(starts)
+    if stride > 1 and count:
+        ordinals = np.arange(line_count, line_count + count, dtype=np.uint64)
+        starts = starts[ordinals % np.uint64(stride) == 0]
+    meta.update(extra_meta)
+    meta.update({
+        "line_count": line_count + count,
+        "entries": entries + len(starts),
+        "end_offset": offset + len(data)
+    })
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    _invalidate_line_index(idx_path)
+    tmp_path = f"{idx_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(idx_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            remaining = entries * 8
+            while remaining > 0:
+                block = src.read(min(_LINE_INDEX_READ_BLOCK, remaining))
+                if not block:
+                    raise RuntimeError("行索引已损坏")
+                dst.write(block)
+                remaining -= len(block)
+            dst.write(starts.astype('<u8').tobytes())
+            dst.write(meta_bytes)
+            dst.write(struct.pack("<Q", len(meta_bytes)))
+            dst.write(_LINE_INDEX_MAGIC)
+        _replace_file_with_retry(tmp_path, idx_path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return meta
+
+
+def _replace_file_with_retry(src, dst, attempts=5, delay=0.05):
+    """os.replace；Windows 上目标仍被其他请求短暂映射/打开时稍等重试"""
+    for attempt in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay)
+
+
+def _get_temp_line_index(file_path):
+    idx_path = get_temp_index_path(file_path)
+    # 过滤仍在进行时返回已发布部分的视图，滚动窗口可提前打开
+    live_index = _get_live_line_index(idx_path)
+    if live_index is not None:
+        return live_index
+    return _open_line_index(idx_path)
+
+
+def _load_temp_index_metadata(file_path):
+    line_index = _get_temp_line_index(file_path)
+    return line_index.meta if line_index else None
+
+
+# ------------------- 源日志持久化行索引 -------------------
+# logs/ 下的源日志按 路径 + 大小 + mtime 建立一次行偏移索引并落盘，
+# 源文件视图、行范围读取、搜索和 AI 行定位都直接复用，不再复制/重扫源文件。
+SOURCE_INDEX_DIR = os.path.join(TEMP_DIR, 'source_index')
+_source_index_locks = {}
+_source_index_locks_guard = threading.Lock()
+# 源文件视图会话 -> 源日志路径（源文件视图直接读取源日志），按最近使用淘汰
+_SOURCE_VIEW_SESSIONS_MAX = 64
+_source_view_sessions = OrderedDict()
+_source_view_sessions_lock = threading.Lock()
+
+
+def _register_source_view_session(session_id, log_path):
+    with _source_view_sessions_lock:
+        _source_view_sessions[session_id] = os.path.abspath(log_path)
+        _source_view_sessions.move_to_end(session_id)
+        while len(_source_view_sessions) > _SOURCE_VIEW_SESSIONS_MAX:
+            _source_view_sessions.popitem(last=False)
+
+
+def _get_source_view_path(session_id):
+    """源文件视图会话对应的源日志路径；不是源文件视图会话返回 None"""
+    with _source_view_sessions_lock:
+        path = _source_view_sessions.get(session_id)
+        if path is not None:
+            _source_view_sessions.move_to_end(session_id)
+        return path
+
+
+def _drop_source_view_session(session_id):
+    with _source_view_sessions_lock:
+        _source_view_sessions.pop(session_id, None)
+
+
+def _get_file_identity(file_path):
+    stat = os.stat(file_path)
+    identity = {
+        "path": os.path.abspath(file_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns
+    }
+    if _is_log_set(file_path):
+        # 日志集的身份由清单与各分段共同决定，任一分段变化都会使索引与缓存失效
+        layout = _get_log_set_layout(file_path)
+        identity["size"] = layout["size"]
+        identity["segments"] = [segment[:3] for segment in layout["segments"]]
+    return identity
+
+
+def _is_source_log_path(file_path):
+    try:
+        log_dir = os.path.abspath(LOG_DIR)
+        abs_path = os.path.abspath(file_path)
+        return abs_path != log_dir and os.path.commonpath([log_dir, abs_path]) == log_dir
+    except ValueError:
+        return False
+
+
+def get_source_index_path(log_path):
+    """获取源日志持久化索引路径（按绝对路径哈希，与日志目录结构解耦）"""
+    key = hashlib.sha1(os.path.abspath(log_path).encode("utf-8")).hexdigest()
+    return os.path.join(SOURCE_INDEX_DIR, f"{key}.idx")
+
+
+def _get_source_index_lock(log_path):
+    key = os.path.abspath(log_path)
+    with _source_index_locks_guard:
+        lock = _source_index_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _source_index_locks[key] = lock
+        return lock
+
+
+def _read_source_line_index(log_path, identity):
+    line_index = _open_line_index(get_source_index_path(log_path))
+    if line_index is None or line_index.meta.get("source") != identity:
+        return None
+    return line_index
+
+
+def _build_source_line_index(log_path, identity, stride=_LINE_INDEX_STRIDE):
+    """全量扫描一次源日志，写出带文件身份的行偏移索引"""
+    os.makedirs(SOURCE_INDEX_DIR, exist_ok=True)
+    idx_path = get_source_index_path(log_path)
+    encoding = detect_file_encoding(log_path)
+    started = time.time()
+    meta = _write_line_index_for_file(log_path, idx_path, encoding, stride=stride, source=identity)
+    print(f"[源索引] 已建立索引: {log_path}, 行数: {meta['line_count']}, 耗时: {time.time() - started:.2f}s")
+    line_index = _open_line_index(idx_path)
+    if line_index is not None and line_index.acquire():
+        try:
+            _build_timestamp_index(log_path, identity, line_index)
+        except Exception as e:
+            print(f"[时间索引] 建立索引失败: {log_path}: {e}")
+        finally:
+            line_index.release()
+    return line_index
+
+
+def _get_source_line_index(log_path, build=True):
+    """获取源日志行索引；文件身份（路径/大小/mtime）变化时自动重建"""
+    try:
+        identity = _get_file_identity(log_path)
+    except OSError:
+        return None
+    data = _read_source_line_index(log_path, identity)
+    if data is not None or not build:
+        return data
+    with _get_source_index_lock(log_path):
+        # 等锁期间可能已由其他线程建好
+        data = _read_source_line_index(log_path, identity)
+        if data is not None:
+            return data
+        try:
+            return _build_source_line_index(log_path, identity)
+        except Exception as e:
+            print(f"[源索引] 建立索引失败: {log_path}: {e}")
+            return None
+
+
+def _get_source_index_sidecars(idx_path):
+    """与源行索引同生命周期的旁路文件：时间戳索引、字段列存、字段分布概览、三元组块索引、日志集分段布局、模板"""
+    return (_get_timestamp_index_path(idx_path), _get_log_fields_path(idx_path), _get_log_facets_path(idx_path),
+            _get_trigram_index_path(idx_path), _get_log_set_layout_path(idx_path), _get_log_templates_path(idx_path))
+
+
+def _remove_source_line_index(log_path):
+    try:
+        idx_path = get_source_index_path(log_path)
+        _invalidate_line_index(idx_path)
+        for path in (idx_path,) + _get_source_index_sidecars(idx_path):
+            if os.path.exists(path):
+                os.remove(path)
+    except Exception as e:
+        print(f"[源索引] 删除索引失败: {e}")
+
+
+def _prune_source_line_indexes():
+    """清理源日志已不存在的索引文件"""
+    if not os.path.isdir(SOURCE_INDEX_DIR):
+        return
+    for name in os.listdir(SOURCE_INDEX_DIR):
+        if not name.endswith(".idx"):
+            continue
+        idx_path = os.path.join(SOURCE_INDEX_DIR, name)
+        meta = _read_line_index_meta(idx_path) or {}
+        source_path = (meta.get("source") or {}).get("path")
+        if not source_path or not os.path.exists(source_path):
+            _invalidate_line_index(idx_path)
+            for path in (idx_path,) + _get_source_index_sidecars(idx_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# ------------------- 源日志稀疏时间戳索引 -------------------
+# 与源行索引一同建立：每隔固定行数采样一行行首时间戳，记录 (时间值, 行号, 字节偏移)。
+# MM-DD 与仅时分秒的时间戳没有年份/日期，按年/天取模；顺序采样时倒退超过半个周期视为回绕并累加周期。
+# 设备重启、时钟回拨等造成的倒退把采样切成若干单调段，按段二分，再在相邻采样之间逐行精确定位。
+_TIMESTAMP_INDEX_EVERY = 1024
+_TIMESTAMP_SAMPLE_LOOKAHEAD = 64  # 采样行没有时间戳（如堆栈续行）时向后查找的行数
+_TIMESTAMP_INDEX_VERSION = 2  # 2：时间倒退处补采样，单调段从倒退发生的行开始
+_TIMESTAMP_PERIODS = {"md": 366 * 86400, "tod": 86400}
+_TIMESTAMP_DATE_PATTERN = re.compile(
+    rb'^(?:\[\w+\]\s*)?\[?(?:(?P<year>\d{4})-)?(?P<month>\d{2})-(?P<day>\d{2})[T\s]+'
+    rb'(?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2})(?:[.,](?P<frac>\d{1,9}))?)?'
+)
+_TIMESTAMP_TIME_PATTERN = re.compile(rb'^(?:\[\w+\]\s*)?(?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2})(?:[.,](?P<frac>\d{1,9}))?)?')
+_TIMESTAMP_EPOCH_PATTERN = re.compile(rb'^(?:\[\w+\]\s*)?\[(?P<epoch>\d{10}(?:\d{3})?)\]')
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+_MD_BASE_ORDINAL = datetime(2000, 1, 1).toordinal()  # 2000 为闰年，可容纳 02-29
+_timestamp_index_cache = {}
+_timestamp_index_cache_lock = threading.Lock()
+
+
+def _parse_line_timestamp(raw_line):
+    """解析行首时间戳（LOG_PREFIX_PATTERNS 覆盖的格式），返回 (格式, 秒) 或 None。
+    格式：abs=带年份或 epoch，md=月-日（无年份），tod=仅时分秒"""
+    m = _TIMESTAMP_EPOCH_PATTERN.match(raw_line)
+    if m:
+        digits = m.group("epoch")
+        return "abs", int(digits) / (1000 if len(digits) == 13 else 1)
+    m = _TIMESTAMP_DATE_PATTERN.match(raw_line)
+    if m:
+        kind = "abs" if m.group("year") else "md"
+        try:
+            ordinal = datetime(int(m.group("year") or 2000), int(m.group("month")), int(m.group("day"))).toordinal()
+        except ValueError:
+            return None
+        base = (ordinal - (_EPOCH_ORDINAL if kind == "abs" else _MD_BASE_ORDINAL)) * 86400
+    else:
+        m = _TIMESTAMP_TIME_PATTERN.match(raw_line)
+        if m is None:
+            return None
+        kind, base = "tod", 0
+    hour, minute, second = int(m.group("hour")), int(m.group("minute")), int(m.group("second") or 0)
+    if hour > 23 or minute > 59 or second > 60:
+        return None
+    value = base + hour * 3600 + minute * 60 + second
+    frac = m.group("frac")
+    if frac:
+        value += int(frac) / (10 ** len(frac))
+    return kind, value
+
+
+def _unwrap_timestamp(value, reference, period):
+    """把取模的时间值平移到离 reference 最近的周期"""
+    if not period:
+        return value
+    return value + round((reference - value) / period) * period
+
+
+def _get_timestamp_index_path(idx_path):
+    return idx_path[:-len(".idx")] + ".ts.json" if idx_path.endswith(".idx") else idx_path + ".ts.json"
+
+
+class _TimestampIndex:
+    """源日志的稀疏时间戳索引：按单调段二分定位时间，再在相邻采样之间逐行精确查找"""
+
+    def __init__(self, data):
+        self.kind = data.get("kind")
+        self.period = _TIMESTAMP_PERIODS.get(self.kind)
+        self.values = data.get("values") or []
+        self.lines = data.get("lines") or []
+        self.offsets = data.get("offsets") or []
+        self.line_count = int(data.get("line_count") or 0)
+        self.end_offset = int(data.get("end_offset") or 0)
+        # 时间值倒退处切分单调段 [(首采样, 末采样)]
+        self.segments = []
+        start = 0
+        for i in range(1, len(self.values)):
+            if self.values[i] < self.values[i - 1]:
+                self.segments.append((start, i - 1))
+                start = i
+        if self.values:
+            self.segments.append((start, len(self.values) - 1))
+
+    def _sample(self, i):
+        return self.lines[i], self.offsets[i]
+
+    def _segment_start(self, seg):
+        return (1, 0) if seg == 0 else self._sample(self.segments[seg][0])
+
+    def _segment_end(self, seg):
+        """段的结束位置（不含）：下一段首采样，最后一段到文件末尾"""
+        if seg + 1 < len(self.segments):
+            return self._sample(self.segments[seg + 1][0])
+        return self.line_count + 1, self.end_offset
+
+    def _scan(self, f, low, high, target, strict, reference):
+        """在 [low, high) 行区间内逐行查找首个时间 >=target（strict 时 >target）的行；无时间戳的行沿用上一行时间"""
+        line_no, offset = low
+        f.seek(offset)
+        while line_no < high[0]:
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            parsed = _parse_line_timestamp(raw_line)
+            if parsed is not None and parsed[0] == self.kind:
+                value = _unwrap_timestamp(parsed[1], reference, self.period)
+                if value > target or (value == target and not strict):
+                    return line_no, offset
+            offset += len(raw_line)
+            line_no += 1
+        return high
+
+    def locate(self, f, seg, target, strict=False):
+        """返回段内首个时间 >=target（strict 时 >target）的 (行号, 字节偏移)；不存在时返回段结束位置"""
+        first, last = self.segments[seg]
+        values = self.values[first:last + 1]
+        k = first + (bisect_right(values, target) if strict else bisect_left(values, target))
+        if k == first:
+            if seg > 0:
+                return self._sample(first)
+            return self._scan(f, (1, 0), self._sample(first), target, strict, self.values[first])
+        high = self._sample(k) if k <= last else self._segment_end(seg)
+        return self._scan(f, self._sample(k - 1), high, target, strict, self.values[k - 1])
+
+    def query_values(self, value):
+        """取模格式的查询值展开到索引覆盖的每个周期"""
+        if not self.period or not self.values:
+            return [value]
+        return [value + n * self.period for n in range(int(self.values[-1] // self.period) + 1)]
+
+    def normalize_query(self, text):
+        """把用户输入的时间换算到索引的时间格式；缺少的年份/日期取自日志首个时间戳"""
+        parsed = _parse_line_timestamp(str(text or "").strip().encode("utf-8"))
+        if parsed is None:
+            raise ValueError(f"无法识别的时间: {text}")
+        kind, value = parsed
+        if kind == self.kind:
+            return value
+        if self.kind == "tod":
+            return value % 86400
+        first = self.values[0] % self.period if self.period else self.values[0]
+        if kind == "tod":
+            return first - first % 86400 + value
+        if self.kind == "md":
+            day = datetime(1970, 1, 1) + timedelta(seconds=value)
+            return (datetime(2000, day.month, day.day).toordinal() - _MD_BASE_ORDINAL) * 86400 + value % 86400
+        year = (datetime(1970, 1, 1) + timedelta(seconds=first)).year
+        day = datetime(2000, 1, 1) + timedelta(seconds=value)
+        return (datetime(year, day.month, day.day).toordinal() - _EPOCH_ORDINAL) * 86400 + value % 86400
+
+    def find_spans(self, f, start=None, end=None):
+        """时间范围 [start, end] 对应的源日志区间 [(起始偏移, 结束偏移, 起始行号)]，按文件顺序合并"""
+        if start is not None and end is not None and end < start and self.period:
+            end += self.period  # 跨越回绕点的范围，如 23:00 ~ 01:00
+        base = start if start is not None else end
+        spans = []
+        for value in self.query_values(base):
+            shift = value - base
+            spans.extend(self._spans_for(
+                f, None if start is None else start + shift, None if end is None else end + shift
+            ))
+        merged = []
+        for span in sorted(spans):
+            if merged and span[0] <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], span[1]), merged[-1][2])
+            else:
+                merged.append(span)
+        return merged
+
+    def _spans_for(self, f, low, high):
+        result = []
+        for seg in range(len(self.segments)):
+            begin = self.locate(f, seg, low) if low is not None else self._segment_start(seg)
+            finish = self.locate(f, seg, high, strict=True) if high is not None else self._segment_end(seg)
+            if begin[0] < finish[0]:
+                result.append((begin[1], finish[1], begin[0]))
+        return result
+
+    def find_line(self, f, target):
+        """时间 >=target 的首行：优先取时间范围覆盖 target 的单调段，返回 (行号, 命中段数) 或 (None, 0)"""
+        covering = []
+        fallback = None
+        for value in self.query_values(target):
+            for seg, (first, last) in enumerate(self.segments):
+                position = self.locate(f, seg, value)
+                if position[0] >= self._segment_end(seg)[0]:
+                    continue
+                if self.values[first] <= value:
+                    covering.append(position[0])
+                elif fallback is None or position[0] < fallback:
+                    fallback = position[0]
+        if covering:
+            return min(covering), len(covering)
+        return fallback, (1 if fallback is not None else 0)
+
+
+def _sample_timestamp_drops(f, kind, shift, end_line, values, lines, offsets):
+    """从最后一个采样逐行扫描到 end_line（不含），时间比上一条时间戳小的行追加为采样"""
+    line_no, offset = lines[-1], offsets[-1]
+    previous = values[-1]
+    f.seek(offset)
+    while line_no < end_line:
+        raw_line = f.readline()
+        if not raw_line:
+            break
+        parsed = _parse_line_timestamp(raw_line)
+        if parsed is not None and parsed[0] == kind:
+            value = parsed[1] + shift
+            if value < previous:
+                values.append(value)
+                lines.append(line_no)
+                offsets.append(offset)
+            previous = value
+        offset += len(raw_line)
+        line_no += 1
+
+
+def _build_timestamp_index(log_path, identity, line_index):
+    """按行索引每隔 _TIMESTAMP_INDEX_EVERY 行采样时间戳，写出带文件身份的稀疏时间索引"""
+    started = time.time()
+    values, lines, offsets = [], [], []
+    kind = None
+    period = None
+    wraps = 0
+    with _open_log_binary(log_path) as f:
+        for sample_line in range(1, line_index.line_count + 1, _TIMESTAMP_INDEX_EVERY):
+            line_no, offset = line_index.seek_point(sample_line)
+            f.seek(offset)
+            for _ in range(_TIMESTAMP_SAMPLE_LOOKAHEAD):
+                raw_line = f.readline()
+                if not raw_line:
+                    break
+                parsed = _parse_line_timestamp(raw_line)
+                if parsed is not None and kind in (None, parsed[0]):
+                    kind = parsed[0]
+                    period = _TIMESTAMP_PERIODS.get(kind)
+                    value = parsed[1] + wraps * (period or 0)
+                    if period and values and value < values[-1] - period / 2:
+                        # 回绕（12-31 → 01-01、23:59 → 00:00）：进入下一周期
+                        wraps += 1
+                        value += period
+                    if values and value < values[-1]:
+                        # 时间倒退（重启、时钟回拨）：在两个采样之间逐行找出倒退发生的行，作为新单调段的首采样
+                        position = f.tell()
+                        _sample_timestamp_drops(f, kind, wraps * (period or 0), line_no, values, lines, offsets)
+                        f.seek(position)
+                    if not lines or line_no > lines[-1]:
+                        values.append(value)
+                        lines.append(line_no)
+                        offsets.append(offset)
+                    break
+                offset += len(raw_line)
+                line_no += 1
+    data = {
+        "source": identity,
+        "kind": kind,
+        "line_count": line_index.line_count,
+        "end_offset": line_index.end_offset,
+        "every": _TIMESTAMP_INDEX_EVERY,
+        "version": _TIMESTAMP_INDEX_VERSION,
+        "values": values,
+        "lines": lines,
+        "offsets": offsets,
+    }
+    ts_path = _get_timestamp_index_path(get_source_index_path(log_path))
+    tmp_path = f"{ts_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        json.dump(data, out)
+    os.replace(tmp_path, ts_path)
+    with _timestamp_index_cache_lock:
+        _timestamp_index_cache.pop(os.path.abspath(log_path), None)
+    print(f"[时间索引] 已建立索引: {log_path}, 格式: {kind or '无时间戳'}, 采样: {len(values)}, 耗时: {time.time() - started:.2f}s")
+    return data
+
+
+def _get_timestamp_index(log_path, build=True):
+    """获取源日志时间戳索引；日志没有可识别的时间戳时返回 None"""
+    line_index = _get_source_line_index(log_path, build=build)
+    if line_index is None:
+        return None
+    identity = line_index.meta.get("source")
+    key = os.path.abspath(log_path)
+    with _timestamp_index_cache_lock:
+        cached = _timestamp_index_cache.get(key)
+    if cached is not None and cached[0] == identity:
+        return cached[1]
+    ts_path = _get_timestamp_index_path(get_source_index_path(log_path))
+
+    def is_current(data):
+        return data is not None and data.get("source") == identity and data.get("version") == _TIMESTAMP_INDEX_VERSION
+
+    data = _load_json_config(ts_path, None) if os.path.exists(ts_path) else None
+    if not is_current(data) and build:
+        with _get_source_index_lock(log_path):
+            data = _load_json_config(ts_path, None) if os.path.exists(ts_path) else None
+            if not is_current(data):
+                with _LineIndexLease(_get_source_line_index, log_path) as leased:
+                    data = _build_timestamp_index(log_path, identity, leased) if leased is not None else None
+    if not is_current(data):
+        return None
+    ts_index = _TimestampIndex(data) if data.get("kind") else None
+    with _timestamp_index_cache_lock:
+        _timestamp_index_cache[key] = (identity, ts_index)
+    return ts_index
+
+
+def _normalize_time_range(value):
+    """时间范围输入：'起 ~ 止' 字符串或 [起, 止]，任一端可为空；返回 [起, 止] 或 None"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        parts = re.split(r'\s*(?:~|～|,|，|\bto\b)\s*', value.strip(), maxsplit=1)
+        value = parts + [""] * (2 - len(parts))
+    start, end = (str(item or "").strip() for item in list(value)[:2])
+    return [start, end] if start or end else None
+
+
+def _time_query_resolution(text):
+    """时间输入的精度（秒）：带毫秒 0.001，带秒 1，只到分钟 60"""
+    if re.search(r'\d:\d{2}:\d{2}[.,]\d', text):
+        return 0.001
+    if re.search(r'\d:\d{2}:\d{2}', text):
+        return 1
+    return 60
+
+
+def _resolve_time_range_spans(log_path, time_range):
+    """时间范围换算为源日志区间 [(起始偏移, 结束偏移, 起始行号)]"""
+    ts_index = _get_timestamp_index(log_path)
+    if ts_index is None:
+        raise RuntimeError("日志中没有可识别的时间戳，无法按时间范围过滤")
+    start = ts_index.normalize_query(time_range[0]) if time_range[0] else None
+    end = ts_index.normalize_query(time_range[1]) if time_range[1] else None
+    if end is not None:
+        # 结束时间按输入精度整段包含：'10:05' 包含 10:05:59.999，'10:05:00' 包含 10:05:00.999
+        end += _time_query_resolution(time_range[1]) - 0.001
+    with _open_log_binary(log_path) as f:
+        return ts_index.find_spans(f, start, end)
+
+
+# ------------------- 多日志按时间戳归并 -------------------
+# 多个源日志按行首时间戳 k 路归并为一个交错视图：每个源顺序分块读取并过滤，内存中只保留各源当前块，
+# heapq.merge 对每个源只持有一行候选。输出行前加 "[来源] " 标签，按普通过滤会话写结果与行索引供滚动视图读取。
+# 各源时间格式不同时统一换算到最粗的格式（仅时分秒 > 月-日 > 带年份）；无时间戳的续行沿用上一条时间戳，
+# 源内时间倒退（重启、时钟回拨）时保持该源原有顺序。
+_MERGE_READ_BLOCK = 4 * 1024 * 1024
+_MERGE_FLUSH_BYTES = 1024 * 1024
+_MERGE_DETECT_LINES = 1024  # 探测源时间格式时最多读取的行数
+_MERGE_KIND_ORDER = ("abs", "md", "tod")
+
+
+def _merge_source_tag(log_path):
+    """来源标签：文件名中的非单词字符替换为下划线，"[标签] " 前缀仍能被时间戳解析跳过"""
+    return re.sub(r'[^0-9A-Za-z_]', '_', os.path.basename(log_path)) or "log"
+
+
+def _detect_log_timestamp(log_path):
+    """源日志首个可识别的行首时间戳 (格式, 秒)；前若干行都没有时返回 None"""
+    with _open_log_binary(log_path) as f:
+        for _ in range(_MERGE_DETECT_LINES):
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            parsed = _parse_line_timestamp(raw_line)
+            if parsed is not None:
+                return parsed
+    return None
+
+
+def _convert_timestamp_kind(kind, value, target):
+    """时间值换算到更粗的格式：带年份 -> 月-日取 2000 年的同月同日，任意格式 -> 仅时分秒取一天内的秒数"""
+    if kind == target:
+        return value
+    if target == "tod":
+        return value % 86400
+    day = datetime.fromordinal(_EPOCH_ORDINAL + int(value // 86400))
+    return (datetime(2000, day.month, day.day).toordinal() - _MD_BASE_ORDINAL) * 86400 + value % 86400
+
+
+def _iter_merge_source_lines(log_path, prefix, kind, target, start, patterns, closures, hit_totals, progress,
+                             transcode=None):
+    """产出源日志过滤后的 (时间值, 带来源标签的行)；每块末尾额外产出 (时间值, None) 供归并方发布进度。
+    start 为该源首个时间戳换算后的值，progress[0] 累计各源已读取的字节数；
+    transcode=(源编码, 输出编码) 时把保留行转码为输出编码"""
+    keep_regex, filter_regex, text_encoding = patterns
+    period = _TIMESTAMP_PERIODS.get(target)
+    last = start
+
+    def latest(data, pos, floor):
+        """块内 [floor, pos) 中最后一条可识别时间戳，换算并展开到 last 附近；没有时返回 None"""
+        while pos > floor:
+            line_start = max(data.rfind(b"\n", floor, pos - 1) + 1, floor)
+            parsed = _parse_line_timestamp(data[line_start:pos])
+            if parsed is not None and parsed[0] == kind:
+                return _unwrap_timestamp(_convert_timestamp_kind(kind, parsed[1], target), last, period)
+            pos = line_start
+        return None
+
+    for data in _iter_line_aligned_blocks(log_path, _MERGE_READ_BLOCK):
+        _, _, offsets, _, hits = _filter_bytes(data, keep_regex, filter_regex, text_encoding, with_lines=True,
+                                               closures=closures)
+        _merge_hit_counts(hit_totals, hits)
+        cursor = 0
+        for offset in offsets.tolist():
+            end = data.find(b"\n", offset) + 1 or len(data)
+            # 只回溯到上一条保留行，整块的回溯总量是线性的
+            value = latest(data, end, cursor)
+            if value is not None:
+                last = value
+            cursor = offset
+            line = data[offset:end]
+            if transcode:
+                line = line.decode(transcode[0], errors='replace').encode(transcode[1])
+            yield last, prefix + (line if line.endswith(b"\n") else line + b"\n")
+        value = latest(data, len(data), cursor)
+        if value is not None:
+            last = value
+        progress[0] += len(data)
+        yield last, None
+
+
+def _filter_with_merge_engine(session_id, log_paths, temp_file_path, idx_path, keep_strings, filter_strings,
+                              index_every=_LINE_INDEX_STRIDE):
+    """按时间戳归并多个源日志的过滤结果，写入临时文件与行索引，返回 (行数, 后端名)。
+    结果行来自多个源，不写源位置映射"""
+    sources = []
+    for log_path in log_paths:
+        encoding = detect_file_encoding(log_path)
+        try:
+            ascii_compatible = "\n".encode(encoding) == b"\n"
+        except (LookupError, UnicodeEncodeError):
+            ascii_compatible = False
+        if not ascii_compatible:
+            raise RuntimeError(f"归并视图只支持 ASCII 兼容编码的日志: {os.path.basename(log_path)}")
+        first = _detect_log_timestamp(log_path)
+        if first is None:
+            raise RuntimeError(f"日志中没有可识别的时间戳，无法按时间归并: {os.path.basename(log_path)}")
+        sources.append((log_path, encoding, first))
+    target = max((first[0] for _, _, first in sources), key=_MERGE_KIND_ORDER.index)
+    period = _TIMESTAMP_PERIODS.get(target)
+    # 取模格式下各源首个时间都展开到第一个源附近，跨零点/跨年开始的源仍能正确对齐
+    reference = _convert_timestamp_kind(sources[0][2][0], sources[0][2][1], target)
+    # 各源编码不同时统一转码为 UTF-8 输出，避免不同编码的原始字节混在同一个结果文件里
+    output_encoding = sources[0][1] if len({encoding for _, encoding, _ in sources}) == 1 else "utf-8"
+
+    progress = [0]
+    hit_sets = []
+    streams = []
+    used_tags = set()
+    for log_path, encoding, (kind, value) in sources:
+        tag = base_tag = _merge_source_tag(log_path)
+        suffix = 2
+        while tag in used_tags:
+            tag = f"{base_tag}_{suffix}"
+            suffix += 1
+        used_tags.add(tag)
+        patterns = _compile_engine_patterns(keep_strings, filter_strings, encoding)
+        key_encoding = None if patterns[2] else encoding
+        closures = (_keyword_hit_closure(keep_strings, key_encoding), _keyword_hit_closure(filter_strings, key_encoding))
+        hit_totals = ({}, {})
+        hit_sets.append((hit_totals, key_encoding))
+        start = _unwrap_timestamp(_convert_timestamp_kind(kind, value, target), reference, period)
+        streams.append(_iter_merge_source_lines(
+            log_path, f"[{tag}] ".encode("ascii"), kind, target, start, patterns, closures, hit_totals, progress,
+            transcode=None if encoding == output_encoding else (encoding, output_encoding)
+        ))
+
+    backend = f"python-merge({len(log_paths)})"
+    total_bytes = sum(_get_log_source_size(log_path) for log_path in log_paths)
+    _update_filter_task(session_id, backend=backend, total_bytes=total_bytes, encoding=output_encoding)
+    index_writer = _LineIndexWriter(idx_path, stride=index_every, encoding=output_encoding, live=True)
+    first_ready = False
+    try:
+        with open(temp_file_path, 'wb') as dst:
+            pending = []
+            pending_bytes = 0
+            published_bytes = 0
+            for _, line in heapq.merge(*streams, key=lambda item: item[0]):
+                if line is not None:
+                    pending.append(line)
+                    pending_bytes += len(line)
+                    if pending_bytes < _MERGE_FLUSH_BYTES and (first_ready or len(pending) < _FILTER_CHUNK_LINES):
+                        continue
+                elif progress[0] - published_bytes < _MERGE_READ_BLOCK:
+                    continue
+                if pending:
+                    output = b"".join(pending)
+                    dst.write(output)
+                    index_writer.add_chunk(output)
+                    pending = []
+                    pending_bytes = 0
+                published_bytes = progress[0]
+                first_ready = _publish_filter_progress(session_id, index_writer, dst, published_bytes, first_ready)
+            if pending:
+                output = b"".join(pending)
+                dst.write(output)
+                index_writer.add_chunk(output)
+            _publish_filter_progress(session_id, index_writer, dst, progress[0], first_ready)
+    except Exception:
+        index_writer.abort()
+        raise
+    finally:
+        for stream in streams:
+            stream.close()
+
+    keyword_hits = None
+    for hit_totals, key_encoding in hit_sets:
+        hits = _resolve_keyword_hits(keep_strings, filter_strings, hit_totals[0], hit_totals[1], key_encoding)
+        keyword_hits = _merge_keyword_hits(keyword_hits, hits)
+    _update_filter_task(session_id, keyword_hits=keyword_hits)
+    line_count = index_writer.line_count
+    try:
+        index_writer.close(encoding=output_encoding, keyword_hits=keyword_hits)
+    except Exception as e:
+        index_writer.abort()
+        print(f"[过滤] 写入索引失败: {e}")
+    return line_count, backend
+
+
+# ------------------- 源日志字段列存（级别 / Tag / PID / TID） -------------------
+# 一遍解析 logcat 行头，把级别、Tag、PID、TID 存成按行排列的定长列（Tag 字符串驻留为编号），
+# 与源行索引同目录持久化；字段过滤表达式在列上做向量化掩码，不再逐行重新匹配文本。
+_LOG_LEVELS = "VDIWEFA"
+_LOG_LEVEL_ALIASES = {
+    "verbose": "V", "debug": "D", "info": "I", "warn": "W", "warning": "W",
+    "error": "E", "fatal": "F", "assert": "A",
+}
+# threadtime: 01-02 10:00:00.000  123  456 W Tag: msg；brief/time: 01-02 10:00:00.000 W/Tag( 123): msg
+# 多行模式且不跨越换行，既可逐行 match，也可在整块上 findall
+_LOG_FIELDS_PATTERN = log_filter_workers.LOG_FIELDS_PATTERN
+_LOG_FIELD_NAMES = ("level", "tag", "pid", "tid")
+_LOG_FIELDS_CACHE_MAX = 4
+_log_fields_cache = OrderedDict()
+_log_fields_cache_lock = threading.Lock()
+
+
+def _get_log_fields_path(idx_path):
+    return idx_path[:-len(".idx")] + ".fields.npz" if idx_path.endswith(".idx") else idx_path + ".fields.npz"
+
+
+class _LogFieldColumns:
+    """按源行号（0-based）排列的字段列：level uint8（0=无法解析，1..7=V..A）、
+    tag uint32（0=无 Tag，对应 tags[0]=''）、pid/tid int32（-1=缺失）"""
+
+    def __init__(self, level, tag, pid, tid, tags):
+        self.level = level
+        self.tag = tag
+        self.pid = pid
+        self.tid = tid
+        self.tags = [str(name) for name in tags]
+        self.tag_ids = {name: i for i, name in enumerate(self.tags)}
+
+    @property
+    def line_count(self):
+        return len(self.level)
+
+
+def _build_log_field_columns(log_path, identity, line_index):
+    """一遍扫描源日志提取级别/Tag/PID/TID，写出与源文件身份绑定的 .fields.npz"""
+    started = time.time()
+    count = line_index.line_count
+    level = np.zeros(count, dtype=np.uint8)
+    tag = np.zeros(count, dtype=np.uint32)
+    pid = np.full(count, -1, dtype=np.int32)
+    tid = np.full(count, -1, dtype=np.int32)
+    tags = [""]
+    tag_ids = {b"": 0}
+    level_codes = {c.encode(): i + 1 for i, c in enumerate(_LOG_LEVELS)}
+    match = _LOG_FIELDS_PATTERN.match
+    line_no = 0
+    with _open_log_binary(log_path) as f:
+        for raw_line in f:
+            if line_no >= count:
+                break
+            m = match(raw_line)
+            if m:
+                if m.group("level"):
+                    level[line_no] = level_codes[m.group("level")]
+                    name = m.group("tag")
+                    pid[line_no] = int(m.group("pid"))
+                    tid[line_no] = int(m.group("tid"))
+                else:
+                    level[line_no] = level_codes[m.group("blevel")]
+                    name = m.group("btag")
+                    if m.group("bpid"):
+                        pid[line_no] = int(m.group("bpid"))
+                tag_id = tag_ids.get(name)
+                if tag_id is None:
+                    tag_id = tag_ids[name] = len(tags)
+                    tags.append(name.decode("utf-8", errors="replace"))
+                tag[line_no] = tag_id
+            line_no += 1
+    fields_path = _get_log_fields_path(get_source_index_path(log_path))
+    tmp_path = f"{fields_path}.tmp.npz"
+    np.savez(
+        tmp_path, level=level, tag=tag, pid=pid, tid=tid, tags=np.array(tags, dtype=str),
+        source=np.array(json.dumps(identity, sort_keys=True))
+    )
+    os.replace(tmp_path, fields_path)
+    print(f"[字段列存] 已建立: {log_path}, 行数: {count}, Tag 数: {len(tags) - 1}, 耗时: {time.time() - started:.2f}s")
+    return _LogFieldColumns(level, tag, pid, tid, tags)
+
+
+def _load_log_field_columns(fields_path, identity):
+    try:
+        with np.load(fields_path, allow_pickle=False) as data:
+            if json.loads(str(data["source"])) != identity:
+                return None
+            return _LogFieldColumns(data["level"], data["tag"], data["pid"], data["tid"], data["tags"].tolist())
+    except Exception:
+        return None
+
+
+def _get_log_field_columns(log_path, build=True):
+    """获取源日志字段列（内存 LRU + 磁盘缓存）；源文件变化后自动重建"""
+    line_index = _get_source_line_index(log_path, build=build)
+    if line_index is None:
+        return None
+    identity = line_index.meta.get("source")
+    key = os.path.abspath(log_path)
+    with _log_fields_cache_lock:
+        cached = _log_fields_cache.get(key)
+        if cached is not None and cached[0] == identity:
+            _log_fields_cache.move_to_end(key)
+            return cached[1]
+    fields_path = _get_log_fields_path(get_source_index_path(log_path))
+    columns = _load_log_field_columns(fields_path, identity) if os.path.exists(fields_path) else None
+    if columns is None or columns.line_count != line_index.line_count:
+        if not build:
+            return None
+        with _get_source_index_lock(log_path):
+            columns = _load_log_field_columns(fields_path, identity) if os.path.exists(fields_path) else None
+            if columns is None or columns.line_count != line_index.line_count:
+                columns = _build_log_field_columns(log_path, identity, line_index)
+    with _log_fields_cache_lock:
+        _log_fields_cache[key] = (identity, columns)
+        _log_fields_cache.move_to_end(key)
+        while len(_log_fields_cache) > _LOG_FIELDS_CACHE_MAX:
+            _log_fields_cache.popitem(last=False)
+    return columns
+
+
+_FIELD_FILTER_TOKEN_PATTERN = re.compile(
+    r'\s*(?:(?P<op>>=|<=|!=|==|=|>|<|\(|\)|\{|\}|,)|"(?P<dq>[^"]*)"|\'(?P<sq>[^\']*)\'|(?P<word>[^\s(){},<>=!"\']+))'
+)
+
+
+def _tokenize_field_filter(expr):
+    tokens = []
+    pos = 0
+    text = str(expr or "")
+    while pos < len(text):
+        m = _FIELD_FILTER_TOKEN_PATTERN.match(text, pos)
+        if not m or m.end() == pos:
+            if text[pos:].strip():
+                raise ValueError(f"字段过滤表达式无法解析: {text[pos:]}")
+            break
+        pos = m.end()
+        if m.group("op"):
+            tokens.append(("op", m.group("op")))
+        elif m.group("word") is not None:
+            tokens.append(("word", m.group("word")))
+        else:
+            tokens.append(("str", m.group("dq") if m.group("dq") is not None else m.group("sq")))
+    return tokens
+
+
+class _FieldFilterParser:
+    """字段过滤表达式：比较式用 and / or / not 与括号组合，解析为 (列 -> 布尔掩码) 的函数。
+    比较式：level >= W、tag == CI、tag in {A, B}、tag not in {...}、pid = 123、tid != 5"""
+
+    def __init__(self, expr):
+        self.tokens = _tokenize_field_filter(expr)
+        self.pos = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("字段过滤表达式为空")
+        node = self._or()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"字段过滤表达式多余内容: {self.tokens[self.pos][1]}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self):
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError("字段过滤表达式不完整")
+        self.pos += 1
+        return token
+
+    def _keyword(self, *words):
+        kind, value = self._peek()
+        if kind == "word" and value.lower() in words:
+            self.pos += 1
+            return True
+        return False
+
+    def _or(self):
+        nodes = [self._and()]
+        while self._keyword("or", "||"):
+            nodes.append(self._and())
+        if len(nodes) == 1:
+            return nodes[0]
+        return lambda cols: np.logical_or.reduce([node(cols) for node in nodes])
+
+    def _and(self):
+        nodes = [self._not()]
+        while self._keyword("and", "&&"):
+            nodes.append(self._not())
+        if len(nodes) == 1:
+            return nodes[0]
+        return lambda cols: np.logical_and.reduce([node(cols) for node in nodes])
+
+    def _not(self):
+        if self._keyword("not"):
+            node = self._not()
+            return lambda cols: ~node(cols)
+        if self._peek() == ("op", "("):
+            self.pos += 1
+            node = self._or()
+            if self._take() != ("op", ")"):
+                raise ValueError("字段过滤表达式缺少右括号")
+            return node
+        return self._comparison()
+
+    def _values(self):
+        if self._peek() != ("op", "{"):
+            return [self._value()]
+        self.pos += 1
+        values = []
+        while self._peek() != ("op", "}"):
+            values.append(self._value())
+            if self._peek() == ("op", ","):
+                self.pos += 1
+        self.pos += 1
+        return values
+
+    def _value(self):
+        kind, value = self._take()
+        if kind == "op":
+            raise ValueError(f"字段过滤表达式缺少取值: {value}")
+        return value
+
+    def _comparison(self):
+        kind, field = self._take()
+        field = field.lower() if kind == "word" else field
+        if field not in _LOG_FIELD_NAMES:
+            raise ValueError(f"未知字段: {field}（可用字段: {', '.join(_LOG_FIELD_NAMES)}）")
+        negate = self._keyword("not")
+        if self._keyword("in"):
+            op = "in"
+        elif negate:
+            raise ValueError("not 之后应为 in")
+        else:
+            kind, op = self._take()
+            if kind != "op" or op not in ("=", "==", "!=", ">=", "<=", ">", "<"):
+                raise ValueError(f"字段 {field} 后应为比较运算符")
+        values = self._values()
+        if op != "in" and len(values) != 1:
+            raise ValueError(f"运算符 {op} 只接受一个取值")
+        node = _field_comparison(field, "==" if op in ("=", "in") else op, values)
+        return (lambda cols: ~node(cols)) if negate else node
+
+
+def _normalize_log_level(value):
+    level = _LOG_LEVEL_ALIASES.get(str(value).lower(), str(value).upper())
+    if len(level) != 1 or level not in _LOG_LEVELS:
+        raise ValueError(f"未知日志级别: {value}")
+    return _LOG_LEVELS.index(level) + 1
+
+
+def _field_comparison(field, op, values):
+    """单个比较式 -> 掩码函数；无法解析的行（级别为 0）不满足任何级别比较"""
+    compare = {
+        "==": np.equal, "!=": np.not_equal, ">=": np.greater_equal,
+        "<=": np.less_equal, ">": np.greater, "<": np.less,
+    }
+    if field == "tag":
+        if op not in ("==", "!="):
+            raise ValueError("tag 只支持 =、!=、in、not in")
+
+        def tag_mask(cols):
+            ids = [cols.tag_ids[name] for name in values if name in cols.tag_ids]
+            mask = np.isin(cols.tag, ids) if ids else np.zeros(cols.line_count, dtype=bool)
+            return mask if op == "==" else ~mask
+        return tag_mask
+    if field == "level":
+        codes = [_normalize_log_level(value) for value in values]
+    else:
+        try:
+            codes = [int(value) for value in values]
+        except ValueError:
+            raise ValueError(f"{field} 取值应为整数: {', '.join(values)}")
+
+    def column_mask(cols):
+        column = getattr(cols, field)
+        valid = column > 0 if field == "level" else column >= 0
+        if len(codes) > 1:
+            return valid & np.isin(column, codes)
+        return valid & compare[op](column, codes[0])
+    return column_mask
+
+
+def _normalize_field_filter(expr):
+    """校验并规范化字段过滤表达式（折叠空白），空表达式返回 None；语法错误抛 ValueError"""
+    text = " ".join(str(expr or "").split())
+    if not text:
+        return None
+    _FieldFilterParser(text).parse()
+    return text
+
+
+def _evaluate_field_filter(log_path, expr):
+    """在源日志字段列上求值字段过滤表达式，返回按源行排列的布尔掩码"""
+    node = _FieldFilterParser(expr).parse()
+    columns = _get_log_field_columns(log_path)
+    if columns is None:
+        raise RuntimeError("无法建立源日志字段列存")
+    return np.asarray(node(columns), dtype=bool)
+
+
+# ------------------- 源日志字段分布概览 -------------------
+# 一遍流式统计 Tag / PID / TID / 级别 / 每分钟行数，与源行索引同目录缓存为 .facets.json。
+# 各块先精确计数，再合并进容量固定的 heavy-hitters 摘要：键数不超过容量时结果精确，
+# 超出后按 Misra-Gries 合并（减去第 capacity+1 大的计数），内存与耗时不随文件增长。
+_FACET_SKETCH_CAPACITY = 2000  # 每个维度精确计数的键数上限
+_FACET_STORE_TOP = 100  # 每个维度写入缓存的条目数
+_FACET_MAX_MINUTES = 7 * 1440  # 每分钟行数序列超过该长度时改为按小时汇总
+
+
+def _get_log_facets_path(idx_path):
+    return idx_path[:-len(".idx")] + ".facets.json" if idx_path.endswith(".idx") else idx_path + ".facets.json"
+
+
+class _HeavyHitters:
+    """可合并的 heavy-hitters 摘要：counts 为各键计数的下界，真实计数不超过 count + error；
+    error 不超过 总数 / (capacity + 1)，计数最大的键总能保留"""
+
+    def __init__(self, capacity=_FACET_SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.error = 0
+
+    def update(self, counts):
+        self.counts.update(counts)
+        if len(self.counts) <= self.capacity:
+            return
+        ranked = self.counts.most_common()
+        threshold = ranked[self.capacity][1]
+        self.error += threshold
+        self.counts = Counter({key: count - threshold for key, count in ranked[:self.capacity] if count > threshold})
+
+    def top(self, n):
+        return self.counts.most_common(n)
+
+
+_count_log_facets_bytes = log_filter_workers.count_log_facets_bytes
+
+
+def _count_log_facets_range(file_path, start, end):
+    """在当前进程统计源文件 [start, end) 区间"""
+    return _count_log_facets_bytes(_read_log_range(file_path, start, end))
+
+def _iter_log_facet_counts(log_path):
+    """按源文件顺序产出各块的统计结果；普通大文件交给进程池并行，压缩日志顺序解压"""
+    if _compressed_log_kind(log_path) or _log_set_has_compressed_segments(log_path):
+        for data in _iter_line_aligned_blocks(log_path, _PARALLEL_FILTER_CHUNK_BYTES):
+            yield _count_log_facets_bytes(data)
+        return
+    ranges = _split_newline_aligned_ranges(log_path)
+    use_pool = (
+        _get_filter_worker_count() > 1
+        and len(ranges) > 1
+        and _get_log_source_size(log_path) >= _PARALLEL_FILTER_MIN_BYTES
+    )
+    if not use_pool:
+        for start, end in ranges:
+            yield _count_log_facets_range(log_path, start, end)
+        return
+    pool = _get_filter_process_pool()
+    source = _pool_log_source(log_path)
+    pending = deque()
+    try:
+        for start, end in ranges:
+            pending.append(pool.submit(log_filter_workers.count_log_facets_range, source, start, end))
+            if len(pending) >= _get_filter_worker_count() + 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _build_log_facets(log_path, identity):
+    """一遍流式统计源日志字段分布，写出与源文件身份绑定的 .facets.json"""
+    started = time.time()
+    sketches = {name: _HeavyHitters() for name in ("tag", "pid", "tid")}
+    levels = Counter()
+    minutes = Counter()  # 按首次出现顺序，即文件中的时间顺序
+    lines = parsed = 0
+    for counts in _iter_log_facet_counts(log_path):
+        lines += counts["lines"]
+        parsed += counts["parsed"]
+        if not counts["parsed"]:
+            continue
+        for name, sketch in sketches.items():
+            sketch.update(counts[name])
+        levels.update(counts["level"])
+        minutes.update(counts["minute"])
+
+    def decode(key):
+        return key.decode("utf-8", errors="replace")
+
+    per_minute = [[decode(key), count] for key, count in minutes.items()]
+    bucket = "minute"
+    if len(per_minute) > _FACET_MAX_MINUTES:
+        hours = Counter()
+        for key, count in per_minute:
+            hours[key[:-3]] += count
+        per_minute = [[key, count] for key, count in hours.items()]
+        bucket = "hour"
+    data = {
+        "source": identity,
+        "lines": lines,
+        "parsed": parsed,
+        "levels": [[level, levels[level.encode()]] for level in _LOG_LEVELS if levels[level.encode()]],
+        "timeline": per_minute,
+        "timeline_bucket": bucket,
+    }
+    for name, sketch in sketches.items():
+        data[name] = [[decode(key), count] for key, count in sketch.top(_FACET_STORE_TOP)]
+        data[f"{name}_error"] = sketch.error
+    facets_path = _get_log_facets_path(get_source_index_path(log_path))
+    tmp_path = f"{facets_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        json.dump(data, out, ensure_ascii=False)
+    os.replace(tmp_path, facets_path)
+    print(f"[字段概览] 已统计: {log_path}, 行数: {lines}, 可解析: {parsed}, 耗时: {time.time() - started:.2f}s")
+    return data
+
+
+def _get_log_facets(log_path, build=True):
+    """获取源日志字段分布概览（磁盘缓存），源文件变化后重新统计"""
+    line_index = _get_source_line_index(log_path, build=build)
+    if line_index is None:
+        return None
+    identity = line_index.meta.get("source")
+    facets_path = _get_log_facets_path(get_source_index_path(log_path))
+    data = _load_json_config(facets_path, None) if os.path.exists(facets_path) else None
+    if (data is None or data.get("source") != identity) and build:
+        with _get_source_index_lock(log_path):
+            data = _load_json_config(facets_path, None) if os.path.exists(facets_path) else None
+            if data is None or data.get("source") != identity:
+                data = _build_log_facets(log_path, identity)
+    if data is None or data.get("source") != identity:
+        return None
+    return data
+
+
+# ------------------- 源日志模板挖掘（Drain） -------------------
+# 一遍流式把日志行聚成模板：先按 LOG_PREFIX_PATTERNS 去掉时间戳/进程信息（行头中的 Tag 保留为首词），
+# 消息中含数字的词记为 <*>，按 (词数, 首词) 分桶，桶内与已有模板逐词比较，相同词比例达到阈值即归入并把不同位置改为 <*>（Drain）。
+# 统计每个模板的行数与字节数，结果与源文件身份绑定缓存为 .templates.json。
+# 大文件按块交给进程池各自聚类，再按同样的相似度规则把各块模板依次并入总的模板集合；挖掘在后台线程进行。
+_TEMPLATE_STORE_TOP = 50
+_TEMPLATE_PARAM = log_filter_workers.TEMPLATE_PARAM
+
+
+def _get_log_templates_path(idx_path):
+    return idx_path[:-len(".idx")] + ".templates.json" if idx_path.endswith(".idx") else idx_path + ".templates.json"
+
+def _template_filter_keyword(template, samples):
+    """模板中最长的连续固定词段，作为可一键屏蔽该模板的关键字；样例行中找不到时退回最长的单个固定词"""
+    runs, run = [], []
+    for token in template + [_TEMPLATE_PARAM]:
+        if token == _TEMPLATE_PARAM:
+            if run:
+                runs.append(" ".join(run))
+            run = []
+        else:
+            run.append(token)
+    candidates = sorted(runs, key=len, reverse=True)
+    candidates += sorted({token for token in template if token != _TEMPLATE_PARAM}, key=len, reverse=True)
+    for keyword in candidates:
+        if len(keyword) >= 3 and all(keyword in sample for sample in samples):
+            return keyword
+    return None
+
+
+def _iter_log_template_chunks(log_path, encoding):
+    """按源文件顺序产出各块的模板挖掘结果；普通大文件交给进程池并行，压缩日志顺序解压"""
+    if _compressed_log_kind(log_path) or _log_set_has_compressed_segments(log_path):
+        for data in _iter_line_aligned_blocks(log_path, _PARALLEL_FILTER_CHUNK_BYTES):
+            yield log_filter_workers.mine_log_templates_bytes(data, encoding)
+        return
+    ranges = _split_newline_aligned_ranges(log_path)
+    use_pool = (
+        _get_filter_worker_count() > 1
+        and len(ranges) > 1
+        and _get_log_source_size(log_path) >= _PARALLEL_FILTER_MIN_BYTES
+    )
+    if not use_pool:
+        for start, end in ranges:
+            yield log_filter_workers.mine_log_templates_bytes(_read_log_range(log_path, start, end), encoding)
+        return
+    pool = _get_filter_process_pool()
+    source = _pool_log_source(log_path)
+    pending = deque()
+    try:
+        for start, end in ranges:
+            pending.append(pool.submit(log_filter_workers.mine_log_templates_range, source, start, end, encoding))
+            if len(pending) >= _get_filter_worker_count() + 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _build_log_templates(log_path, identity, on_progress=None):
+    """分块挖掘源日志模板并逐块合并，写出与源文件身份绑定的 .templates.json；
+    on_progress(已处理字节) 在每块合并后回调"""
+    started = time.time()
+    encoding = detect_file_encoding(log_path)
+    miner = log_filter_workers.LogTemplateMiner()
+    lines = total_bytes = 0
+    for chunk in _iter_log_template_chunks(log_path, encoding):
+        miner.merge(chunk)
+        lines += chunk["lines"]
+        total_bytes += chunk["bytes"]
+        if on_progress:
+            on_progress(total_bytes)
+    ranked = sorted(miner.clusters, key=lambda cluster: cluster[2], reverse=True)[:_TEMPLATE_STORE_TOP]
+    data = {
+        "source": identity,
+        "lines": lines,
+        "bytes": total_bytes,
+        "clusters": len(miner.clusters),
+        "other_lines": miner.other_lines,
+        "other_bytes": miner.other_bytes,
+        "templates": [
+            {
+                "template": " ".join(template),
+                "lines": count,
+                "bytes": size,
+                "samples": samples,
+                "keyword": _template_filter_keyword(template, samples),
+            }
+            for template, count, size, samples in ranked
+        ],
+    }
+    templates_path = _get_log_templates_path(get_source_index_path(log_path))
+    tmp_path = f"{templates_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        json.dump(data, out, ensure_ascii=False)
+    os.replace(tmp_path, templates_path)
+    print(f"[模板挖掘] 已完成: {log_path}, 行数: {lines}, 模板数: {len(miner.clusters)}, 耗时: {time.time() - started:.2f}s")
+    return data
+
+
+def _get_log_templates(log_path, build=True, on_progress=None):
+    """获取源日志高频模板（磁盘缓存），源文件变化后重新挖掘；build=False 时只读缓存"""
+    line_index = _get_source_line_index(log_path, build=build)
+    if line_index is None:
+        return None
+    identity = line_index.meta.get("source")
+    templates_path = _get_log_templates_path(get_source_index_path(log_path))
+    data = _load_json_config(templates_path, None) if os.path.exists(templates_path) else None
+    if (data is None or data.get("source") != identity) and build:
+        with _get_source_index_lock(log_path):
+            data = _load_json_config(templates_path, None) if os.path.exists(templates_path) else None
+            if data is None or data.get("source") != identity:
+                data = _build_log_templates(log_path, identity, on_progress=on_progress)
+    if data is None or data.get("source") != identity:
+        return None
+    return data
+
+
+_log_template_builds = {}  # 源日志绝对路径 -> {"status": "building"/"error", "done_bytes", "total_bytes", "error"}
+_log_template_builds_lock = threading.Lock()
+
+
+def _get_log_templates_build(log_path):
+    with _log_template_builds_lock:
+        return dict(_log_template_builds.get(os.path.abspath(log_path)) or {})
+
+
+def _start_log_templates_build(log_path):
+    """在后台线程建立源行索引并挖掘模板，同一日志同时只挖掘一次；返回当前挖掘状态。
+    挖掘成功后状态被移除，结果从磁盘缓存读取"""
+    key = os.path.abspath(log_path)
+    with _log_template_builds_lock:
+        state = _log_template_builds.get(key)
+        if state and state["status"] == "building":
+            return dict(state)
+        state = {"status": "building", "done_bytes": 0, "total_bytes": None, "error": None}
+        _log_template_builds[key] = state
+
+    def on_progress(done_bytes):
+        with _log_template_builds_lock:
+            state["done_bytes"] = done_bytes
+
+    def _worker():
+        try:
+            line_index = _get_source_line_index(log_path)
+            if line_index is not None:
+                with _log_template_builds_lock:
+                    state["total_bytes"] = line_index.end_offset
+            data = _get_log_templates(log_path, on_progress=on_progress)
+            error = None if data is not None else "无法挖掘该日志的模板"
+        except Exception as e:
+            print(f"[模板挖掘] 挖掘失败: {log_path}: {e}")
+            error = f"挖掘失败: {e}"
+        with _log_template_builds_lock:
+            if error:
+                state.update(status="error", error=error)
+            elif _log_template_builds.get(key) is state:
+                del _log_template_builds[key]
+
+    thread = threading.Thread(target=_worker, name="log-template-miner")
+    thread.daemon = True
+    thread.start()
+    return dict(state)
+
+# ------------------- 源日志三元组块索引 -------------------
+# 把源日志切成约 1MB 的按行对齐块，每块记录出现过的（ASCII 小写化）字节三元组的哈希位图。
+# 关键字的全部三元组都出现在块位图中时该块才可能命中，过滤与搜索只读取候选块；
+# 位图只会多报不会漏报，候选块内仍由正则精确匹配。
+TRIGRAM_INDEX_ENABLED = os.environ.get('LOG_FILTER_TRIGRAM_INDEX', '1').strip().lower() not in ('0', 'false', 'off', 'no')
+_TRIGRAM_INDEX_MIN_BYTES = 64 * 1024 * 1024  # 小于该大小的日志全量扫描已足够快，不建索引
+_TRIGRAM_BLOCK_BYTES = 1024 * 1024
+_TRIGRAM_HASH_BITS = 17  # 每块位图 2^17 位（16KB），约为源文件大小的 1.6%
+_TRIGRAM_FILTER_MAX_RATIO = 0.5  # 过滤时候选块超过该比例则不如外部工具全量扫描
+_TRIGRAM_CACHE_MAX = 2
+_trigram_index_cache = OrderedDict()
+_trigram_index_cache_lock = threading.Lock()
+
+
+def _get_trigram_index_path(idx_path):
+    return idx_path[:-len(".idx")] + ".tri.npz" if idx_path.endswith(".idx") else idx_path + ".tri.npz"
+
+
+def _iter_line_aligned_blocks(log_path, chunk_bytes):
+    """顺序读取（含解压）源日志，产出约 chunk_bytes 大小、按换行对齐的字节块"""
+    with _open_log_binary(log_path) as f:
+        carry = b""
+        while True:
+            block = f.read(chunk_bytes)
+            data = carry + block
+            if block:
+                cut = data.rfind(b"\n") + 1
+                data, carry = data[:cut], data[cut:]
+                if not data:
+                    continue
+            elif not data:
+                break
+            else:
+                carry = b""
+            yield data
+
+
+def _trigram_hashes(data):
+    """字节串中全部三元组的哈希（乘法哈希取高位），调用方负责先小写化"""
+    if len(data) < 3:
+        return np.zeros(0, dtype=np.uint32)
+    a = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    grams = (a[:-2] << np.uint32(16)) | (a[1:-1] << np.uint32(8)) | a[2:]
+    return (grams * np.uint32(0x9E3779B1)) >> np.uint32(32 - _TRIGRAM_HASH_BITS)
+
+
+def _trigram_block_bits(data):
+    bits = np.zeros(1 << _TRIGRAM_HASH_BITS, dtype=bool)
+    bits[_trigram_hashes(data.lower())] = True
+    return np.packbits(bits, bitorder='little')
+
+
+class _TrigramIndex:
+    """块位图矩阵 bits[块, 位图字节]，offsets[块] 为块起始偏移（末尾附文件结束偏移），lines[块] 为块起始行号"""
+
+    def __init__(self, bits, offsets, lines):
+        self.bits = bits
+        self.offsets = offsets
+        self.lines = lines
+
+    @property
+    def block_count(self):
+        return len(self.lines)
+
+    def candidate_blocks(self, keys):
+        """任一关键字（已小写化的字节串）的全部三元组都出现的块"""
+        result = np.zeros(self.block_count, dtype=bool)
+        for key in keys:
+            mask = np.ones(self.block_count, dtype=bool)
+            for h in np.unique(_trigram_hashes(key)).tolist():
+                mask &= (self.bits[:, h >> 3] & (1 << (h & 7))) != 0
+                if not mask.any():
+                    break
+            result |= mask
+        return result
+
+    def spans(self, blocks):
+        """候选块合并为 [(起始偏移, 结束偏移, 起始行号)]"""
+        spans = []
+        for block in np.flatnonzero(blocks).tolist():
+            start, end = int(self.offsets[block]), int(self.offsets[block + 1])
+            if spans and spans[-1][1] == start:
+                spans[-1] = (spans[-1][0], end, spans[-1][2])
+            else:
+                spans.append((start, end, int(self.lines[block])))
+        return spans
+
+
+def _build_trigram_index(log_path, identity):
+    """一遍读取源日志写出块三元组位图，与源文件身份绑定"""
+    started = time.time()
+    rows, offsets, lines = [], [0], []
+    line_no = 1
+    for data in _iter_line_aligned_blocks(log_path, _TRIGRAM_BLOCK_BYTES):
+        rows.append(_trigram_block_bits(data))
+        lines.append(line_no)
+        line_no += data.count(b"\n")
+        offsets.append(offsets[-1] + len(data))
+    bits = np.vstack(rows) if rows else np.zeros((0, (1 << _TRIGRAM_HASH_BITS) // 8), dtype=np.uint8)
+    tri_path = _get_trigram_index_path(get_source_index_path(log_path))
+    tmp_path = f"{tri_path}.tmp.npz"
+    np.savez(
+        tmp_path, bits=bits, offsets=np.array(offsets, dtype=np.int64), lines=np.array(lines, dtype=np.int64),
+        hash_bits=np.array(_TRIGRAM_HASH_BITS), source=np.array(json.dumps(identity, sort_keys=True))
+    )
+    os.replace(tmp_path, tri_path)
+    with _trigram_index_cache_lock:
+        _trigram_index_cache.pop(os.path.abspath(log_path), None)
+    print(f"[三元组索引] 已建立: {log_path}, 块数: {len(lines)}, 耗时: {time.time() - started:.2f}s")
+
+
+def _get_trigram_index(log_path, build=False):
+    """获取源日志三元组块索引；默认不在查询路径上同步建立（由导入后的后台任务建立）"""
+    if not TRIGRAM_INDEX_ENABLED or not _is_source_log_path(log_path):
+        return None
+    line_index = _get_source_line_index(log_path, build=build)
+    if line_index is None or line_index.end_offset < _TRIGRAM_INDEX_MIN_BYTES:
+        return None
+    identity = line_index.meta.get("source")
+    key = os.path.abspath(log_path)
+    with _trigram_index_cache_lock:
+        cached = _trigram_index_cache.get(key)
+        if cached is not None and cached[0] == identity:
+            _trigram_index_cache.move_to_end(key)
+            return cached[1]
+    tri_path = _get_trigram_index_path(get_source_index_path(log_path))
+    for attempt in range(2):
+        try:
+            with np.load(tri_path, allow_pickle=False) as data:
+                if json.loads(str(data["source"])) == identity and int(data["hash_bits"]) == _TRIGRAM_HASH_BITS:
+                    index = _TrigramIndex(data["bits"], data["offsets"], data["lines"])
+                    break
+        except Exception:
+            pass
+        if attempt or not build:
+            return None
+        with _get_source_index_lock(log_path):
+            _build_trigram_index(log_path, identity)
+    with _trigram_index_cache_lock:
+        _trigram_index_cache[key] = (identity, index)
+        while len(_trigram_index_cache) > _TRIGRAM_CACHE_MAX:
+            _trigram_index_cache.popitem(last=False)
+    return index
+
+
+def _trigram_candidate_spans(log_path, keys, max_ratio=1.0):
+    """按三元组索引找出可能包含任一关键字（ASCII 小写化字节）的源日志区间；
+    没有索引、关键字短于 3 字节或候选比例超过 max_ratio 时返回 None（调用方全量扫描）"""
+    keys = [key for key in keys if key is not None]
+    if not keys or any(len(key) < 3 for key in keys):
+        return None
+    index = _get_trigram_index(log_path)
+    if index is None or not index.block_count:
+        return None
+    blocks = index.candidate_blocks(keys)
+    spans = index.spans(blocks)
+    total = int(index.offsets[-1]) or 1
+    if sum(end - start for start, end, _ in spans) > total * max_ratio:
+        return None
+    return spans
+
+
+def _trigram_filter_keys(keep_strings, filter_strings, encoding):
+    """过滤关键字 -> 三元组查询键；需要按文本（Unicode 大小写折叠）匹配或编码不兼容 ASCII 时返回 None"""
+    keep_terms = _normalize_filter_terms(keep_strings)
+    if not keep_terms:
+        return None
+    try:
+        if "abc".encode(encoding) != b"abc":
+            return None
+    except (LookupError, TypeError):
+        return None
+    if _compile_engine_patterns(keep_strings, filter_strings, encoding)[2] is not None:
+        return None
+    return [_literal_match_key(term, encoding) for term in keep_terms]
+
+
+def _intersect_spans(first, second):
+    """两组按文件顺序排列、按行对齐的区间求交集"""
+    result = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        a_start, a_end, a_line = first[i]
+        b_start, b_end, b_line = second[j]
+        start, end = max(a_start, b_start), min(a_end, b_end)
+        if start < end:
+            result.append((start, end, a_line if a_start >= b_start else b_line))
+        if a_end <= b_end:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _schedule_source_index_build(log_filenames):
+    """导入后在后台为日志建立索引，首次打开时无需再等待全量扫描"""
+    log_paths = []
+    for filename in log_filenames or []:
+        try:
+            log_paths.append(get_log_path(filename))
+        except Exception:
+            continue
+    if not log_paths:
+        return
+
+    def _worker():
+        for log_path in log_paths:
+            if os.path.isfile(log_path):
+                _get_source_line_index(log_path)
+                try:
+                    _get_log_facets(log_path)
+                except Exception as e:
+                    print(f"[字段概览] 统计失败: {log_path}: {e}")
+                try:
+                    _get_trigram_index(log_path, build=True)
+                except Exception as e:
+                    print(f"[三元组索引] 建立失败: {log_path}: {e}")
+
+    thread = threading.Thread(target=_worker, name="source-index-builder")
+    thread.daemon = True
+    thread.start()
+
+
+def _get_line_index(file_path):
+    """统一获取行索引：源日志走持久化索引，过滤结果走 .idx 旁路索引"""
+    if _is_source_log_path(file_path):
+        return _get_source_line_index(file_path)
+    return _get_temp_line_index(file_path)
+
+
+def _load_line_index_metadata(file_path):
+    line_index = _get_line_index(file_path)
+    return line_index.meta if line_index else None
+
+
+def _resolve_session_file_path(session_id):
+    """滚动窗口会话对应的实际文件：源文件视图直接指向源日志，过滤会话指向临时结果"""
+    source_path = _get_source_view_path(session_id)
+    if source_path and os.path.exists(source_path):
+        return source_path
+    return get_temp_file_path(session_id)
+
+
+# ------------------- 滚动窗口会话读取器缓存 -------------------
+_SESSION_READER_MAX = 16
+_SESSION_READER_TTL = 600  # 秒，超时未访问的读取器自动关闭
+_session_readers = OrderedDict()
+_session_readers_lock = threading.Lock()
+
+
+def _decode_log_bytes(data, encoding):
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError:
+        return data.decode(encoding, errors='replace')
+
+
+class _SessionLogReader:
+    """滚动窗口会话读取器：常驻文件句柄、行索引、编码与行数，跨请求复用。
+    按租用计数关闭：缓存持有一份，每个请求经 _get_session_reader 取得一份，用完 release()；
+    被淘汰后仍在读取的请求不受影响，最后一份释放时才在锁内关闭文件并归还行索引租用。"""
+
+    def __init__(self, session_id, file_path):
+        self.session_id = session_id
+        self.file_path = file_path
+        stat = os.stat(file_path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.line_index = _lease_line_index(_get_line_index, file_path)
+        self.encoding = (self.line_index.encoding if self.line_index else None) or detect_file_encoding(file_path)
+        self.line_count = self.line_index.line_count if self.line_index else get_file_line_count(file_path)
+        self.file = _open_log_binary(file_path)
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self._leases = 1
+        self._retired = False
+
+    def is_stale(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return True
+        if (stat.st_mtime_ns, stat.st_size) != self.signature:
+            return True
+        if getattr(self.line_index, "is_live", False):
+            # 进行中的索引视图是快照，每次请求重新获取已发布的行
+            return True
+        if getattr(self.line_index, "closed", False):
+            # 共享的行索引已被 LRU 淘汰或因追加失效关闭，需重新打开
+            return True
+        # 过滤结束后才写出 .idx：无索引的读取器在索引出现后需要重建
+        return self.line_index is None and _get_line_index(self.file_path) is not None
+
+    def read_range(self, start_line, end_line):
+        """读取 [start_line, end_line]（1-based），返回去掉末尾换行的文本"""
+        start_line = max(1, int(start_line))
+        if self.line_count:
+            end_line = min(int(end_line), self.line_count)
+        if start_line > end_line:
+            return ""
+        with self.lock:
+            self.last_used = time.time()
+            # 行索引已租用：即使之后被标记失效，映射在本读取器关闭前仍然有效
+            line_index = self.line_index
+            if line_index and line_index.stride == 1:
+                # 稠密索引：一次 seek + 一次 read 取出整段
+                start_offset = line_index.line_span(start_line)[0]
+                end_offset = line_index.line_span(end_line)[1]
+                self.file.seek(start_offset)
+                data = self.file.read(end_offset - start_offset)
+            else:
+                current_line, offset = line_index.seek_point(start_line) if line_index else (1, 0)
+                self.file.seek(offset)
+                chunks = []
+                while current_line <= end_line:
+                    raw_line = self.file.readline()
+                    if not raw_line:
+                        break
+                    if current_line >= start_line:
+                        chunks.append(raw_line)
+                    current_line += 1
+                data = b"".join(chunks)
+        text = _decode_log_bytes(data, self.encoding)
+        return text[:-1] if text.endswith("\n") else text
+
+    def acquire(self):
+        with self.lock:
+            if self._leases <= 0:
+                return False
+            self._leases += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self._leases -= 1
+            if self._leases > 0:
+                return
+            try:
+                self.file.close()
+            except Exception:
+                pass
+            if self.line_index is not None:
+                self.line_index.release()
+
+    def close(self):
+        """从缓存移除时调用：释放缓存持有的一份，仍在读取的请求释放后才真正关闭"""
+        with self.lock:
+            if self._retired:
+                return
+            self._retired = True
+        self.release()
+
+
+def _get_session_reader(session_id):
+    """获取（或创建）会话读取器并为调用方租用一份，用完需 release()；
+    文件变化、超时或超出容量时淘汰旧读取器"""
+    now = time.time()
+    evicted = []
+    with _session_readers_lock:
+        for sid in [sid for sid, item in _session_readers.items() if now - item.last_used > _SESSION_READER_TTL]:
+            evicted.append(_session_readers.pop(sid))
+        reader = _session_readers.get(session_id)
+        if reader is not None:
+            _session_readers.move_to_end(session_id)
+            if not reader.acquire():
+                reader = None
+    for item in evicted:
+        item.close()
+    if reader is not None:
+        if not reader.is_stale():
+            return reader
+        reader.release()
+
+    file_path = _resolve_session_file_path(session_id)
+    if not os.path.exists(file_path):
+        _drop_session_reader(session_id)
+        return None
+    new_reader = _SessionLogReader(session_id, file_path)
+    new_reader.acquire()
+    evicted = []
+    with _session_readers_lock:
+        previous = _session_readers.pop(session_id, None)
+        if previous is not None:
+            evicted.append(previous)
+        _session_readers[session_id] = new_reader
+        while len(_session_readers) > _SESSION_READER_MAX:
+            evicted.append(_session_readers.popitem(last=False)[1])
+    for item in evicted:
+        item.close()
+    return new_reader
+
+
+def _drop_session_reader(session_id):
+    with _session_readers_lock:
+        reader = _session_readers.pop(session_id, None)
+    if reader is not None:
+        reader.close()
+
+
+# ------------------- 跟随模式（增量过滤源日志新增内容） -------------------
+# 源日志持续增长时只读取、过滤上次处理位置之后新增的完整行，追加到已完成结果的临时文件、
+# 源位置映射与行索引末尾；每次轮询的开销只与新增字节数成正比。
+_FOLLOW_READ_BLOCK = 4 * 1024 * 1024
+_follow_states = {}
+_follow_states_lock = threading.Lock()
+
+
+def _get_follow_state(session_id):
+    with _follow_states_lock:
+        state = _follow_states.get(session_id)
+        if state is None:
+            state = {"lock": threading.Lock(), "offset": None}
+            _follow_states[session_id] = state
+        return state
+
+
+def _drop_follow_state(session_id):
+    with _follow_states_lock:
+        _follow_states.pop(session_id, None)
+
+
+def _line_start_before(file_path, offset):
+    """offset 所在行的行首偏移（offset 恰在行首时原样返回）"""
+    with open(file_path, 'rb') as f:
+        position = offset
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            block = f.read(position - start)
+            cut = block.rfind(b"\n")
+            if cut >= 0:
+                return start + cut + 1
+            position = start
+    return 0
+
+
+def _count_newlines(file_path, start, end):
+    count = 0
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(_FOLLOW_READ_BLOCK, remaining))
+            if not block:
+                break
+            count += block.count(b"\n")
+            remaining -= len(block)
+    return count
+
+
+def _truncate_filter_result(session_id, line_count, meta):
+    """把已完成的过滤结果截断为前 line_count 行（结果、映射、行索引），返回新元数据"""
+    temp_file = get_temp_file_path(session_id)
+    idx_path = get_temp_index_path(temp_file)
+    with _LineIndexLease(_open_line_index, idx_path) as line_index:
+        if line_index is None:
+            raise RuntimeError("行索引不可用")
+        anchor_line, offset = line_index.seek_point(line_count + 1)
+    with open(temp_file, 'rb') as f:
+        f.seek(offset)
+        for _ in range(line_count + 1 - anchor_line):
+            offset += len(f.readline())
+    _drop_session_reader(session_id)
+    _invalidate_line_index(idx_path)
+    os.truncate(temp_file, offset)
+    os.truncate(get_temp_source_map_path(temp_file), line_count * _SOURCE_MAP_ENTRY_BYTES)
+    extra = {k: v for k, v in meta.items() if k not in ("encoding", "stride", "line_count", "entries", "end_offset")}
+    return _write_line_index_for_file(temp_file, idx_path, meta.get("encoding"), int(meta.get("stride") or 1), **extra)
+
+
+def _init_follow_state(session_id, state):
+    """由已完成结果确定跟随起点：源日志在过滤时的大小回退到行首（末行可能尚未写完），
+    结果中源偏移不早于该位置的行先撤回，再从该行重新过滤"""
+    try:
+        with open(_get_filter_key_path(session_id), 'r', encoding='utf-8') as f:
+            key = json.load(f) or {}
+    except Exception:
+        raise RuntimeError("过滤结果缺少缓存键，无法跟随")
+    if key.get("output") != "raw" or key.get("time_range") or key.get("fields") or key.get("merge") or key.get("context"):
+        raise RuntimeError("跟随模式只支持按关键字过滤的结果")
+    source = key.get("source") or {}
+    log_path = source.get("path")
+    if not log_path or not os.path.exists(log_path):
+        raise RuntimeError("源日志不存在")
+    if _compressed_log_kind(log_path) or _is_log_set(log_path):
+        raise RuntimeError("压缩日志与日志集不支持跟随模式")
+    meta = _load_cached_filter_result(session_id)
+    if meta is None:
+        raise RuntimeError("过滤结果尚未完成")
+    temp_file = get_temp_file_path(session_id)
+    line_count = int(meta.get("line_count") or 0)
+    source_map = _load_source_map_array(get_temp_source_map_path(temp_file), line_count=line_count)
+    if source_map is None:
+        raise RuntimeError("过滤结果缺少源位置映射")
+
+    offset = min(int(source.get("size") or 0), os.path.getsize(log_path))
+    offset = _line_start_before(log_path, offset)
+    kept = int(np.searchsorted(source_map[:, 1], offset, side='left')) if line_count else 0
+    if kept:
+        last_line, last_offset = (int(v) for v in source_map[kept - 1])
+        lines_before = last_line - 1 + _count_newlines(log_path, last_offset, offset)
+    else:
+        source_index = _get_source_line_index(log_path, build=False)
+        if source_index is not None and source_index.end_offset == offset:
+            lines_before = source_index.line_count
+        else:
+            lines_before = _count_newlines(log_path, 0, offset)
+    del source_map
+    if kept < line_count:
+        print(f"[跟随] 撤回末尾 {line_count - kept} 行，从源偏移 {offset} 重新过滤 session={session_id}")
+        meta = _truncate_filter_result(session_id, kept, meta)
+
+    task = _get_filter_task(session_id)
+    keep_strings = task.get("keep_strings") or key.get("keep") or []
+    filter_strings = task.get("filter_strings") or key.get("filter") or []
+    encoding = meta.get("encoding") or detect_file_encoding(log_path)
+    keep_regex, filter_regex, text_encoding = _compile_engine_patterns(keep_strings, filter_strings, encoding)
+    key_encoding = None if text_encoding else encoding
+    state.update({
+        "log_path": log_path,
+        "key": key,
+        "offset": offset,
+        "lines": lines_before,
+        "keep_strings": keep_strings,
+        "filter_strings": filter_strings,
+        "patterns": (keep_regex, filter_regex, text_encoding),
+        "key_encoding": key_encoding,
+        "closures": (_keyword_hit_closure(keep_strings, key_encoding), _keyword_hit_closure(filter_strings, key_encoding)),
+        "base_hits": meta.get("keyword_hits"),
+        "hits": ({}, {})
+    })
+
+
+def _merge_keyword_hits(base, extra):
+    if not base:
+        return extra
+    merged = json.loads(json.dumps(base))
+    for section in ("keep", "filter"):
+        counts = merged.setdefault(section, {})
+        for term, count in (extra.get(section) or {}).items():
+            if term in counts:
+                counts[term] = None if counts[term] is None or count is None else counts[term] + count
+    return merged
+
+
+def _follow_filter_session(session_id):
+    """过滤新增内容并追加到结果末尾，返回 (结果总行数, 本次追加行数)；过滤仍在进行时返回 None"""
+    task = _get_filter_task(session_id)
+    if task.get("status") in ("queued", "running"):
+        return None
+    state = _get_follow_state(session_id)
+    with state["lock"]:
+        if state["offset"] is None:
+            _init_follow_state(session_id, state)
+        log_path = state["log_path"]
+        size = os.path.getsize(log_path)
+        if size < state["offset"]:
+            _drop_follow_state(session_id)
+            raise RuntimeError("源日志已被截断或轮转，请重新过滤")
+        temp_file = get_temp_file_path(session_id)
+        idx_path = get_temp_index_path(temp_file)
+        map_path = get_temp_source_map_path(temp_file)
+        keep_regex, filter_regex, text_encoding = state["patterns"]
+        appended = 0
+        meta = None
+        if size > state["offset"]:
+            with open(log_path, 'rb') as src, open(temp_file, 'ab') as dst, open(map_path, 'ab') as map_file:
+                src.seek(state["offset"])
+                remaining = size - state["offset"]
+                carry = b""
+                while remaining > 0:
+                    block = src.read(min(_FOLLOW_READ_BLOCK, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    data = carry + block
+                    cut = data.rfind(b"\n") + 1
+                    data, carry = data[:cut], data[cut:]
+                    if not data:
+                        continue  # 末行尚未写完，留到下次轮询
+                    output, ordinals, offsets, range_lines, hits = _filter_bytes(
+                        data, keep_regex, filter_regex, text_encoding, with_lines=True, closures=state["closures"]
+                    )
+                    _merge_hit_counts(state["hits"], hits)
+                    if output:
+                        # 先落盘结果与映射再登记索引：读取方以索引行数为准，不会读到未写完的行
+                        dst_size, map_size = dst.tell(), map_file.tell()
+                        try:
+                            entries = np.empty((len(ordinals), 2), dtype='<u8')
+                            entries[:, 0] = state["lines"] + ordinals + 1
+                            entries[:, 1] = state["offset"] + offsets
+                            dst.write(output)
+                            map_file.write(entries.tobytes())
+                            dst.flush()
+                            map_file.flush()
+                            keyword_hits = _merge_keyword_hits(state["base_hits"], _resolve_keyword_hits(
+                                state["keep_strings"], state["filter_strings"], state["hits"][0], state["hits"][1],
+                                state["key_encoding"]
+                            ))
+                            # 替换索引前先释放读取器与缓存的映射（同 _truncate_filter_result）
+                            _drop_session_reader(session_id)
+                            meta = _append_line_index(idx_path, output, keyword_hits=keyword_hits)
+                        except Exception:
+                            dst.truncate(dst_size)
+                            map_file.truncate(map_size)
+                            _drop_follow_state(session_id)
+                            raise
+                        appended += len(ordinals)
+                    state["lines"] += range_lines
+                    state["offset"] += len(data)
+        if meta is None:
+            meta = _load_cached_filter_result(session_id) or {}
+        line_count = int(meta.get("line_count") or 0)
+        if appended:
+            _drop_session_reader(session_id)
+            _update_filter_task(session_id, done_lines=line_count, keyword_hits=meta.get("keyword_hits"))
+        identity = _get_file_identity(log_path)
+        if identity["size"] == state["offset"] and identity != state["key"].get("source"):
+            # 缓存键记录已跟随到的源文件身份，源位置映射与细化查找继续有效
+            state["key"]["source"] = identity
+            key_path = _get_filter_key_path(session_id)
+            tmp_path = f"{key_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state["key"], f, ensure_ascii=False)
+            os.replace(tmp_path, key_path)
+        return line_count, appended
+
+
+def _capture_stream_to_log(stream, log_file):
+    """把管道 / 标准输入持续追加写入新建的日志文件，供跟随模式实时过滤"""
+    read = getattr(stream, "read1", stream.read)
+    log_path = log_file.name
+    with log_file as f:
+        while True:
+            block = read(65536)
+            if not block:
+                break
+            f.write(block)
+            f.flush()
+    print(f"[跟随] 输入流已结束: {log_path}")
+
+
+def _start_stdin_capture(name):
+    name = os.path.basename(str(name or "").strip())
+    if not name:
+        raise ValueError("日志文件名不能为空")
+    ensure_log_dir()
+    log_path = os.path.join(LOG_DIR, name)
+    try:
+        # 只新建：logs/ 下已有的文件可能是导入时硬链接/符号链接到用户原始文件的源日志，不能往里追加
+        log_file = open(log_path, 'xb')
+    except FileExistsError:
+        raise ValueError(f"日志文件已存在，请换一个名称: {name}")
+    threading.Thread(target=_capture_stream_to_log, args=(sys.stdin.buffer, log_file), daemon=True).start()
+    print(f"[跟随] 标准输入持续写入 {log_path}")
+    return log_path
+
+
+def _read_lines_by_numbers(file_path, line_numbers, encoding=None):
+    """按行号批量读取（1-based），借助行索引就近 seek，返回 {行号: 文本}"""
+    targets = sorted({int(n) for n in line_numbers if int(n) > 0})
+    if not targets:
+        return {}
+    result = {}
+    with _LineIndexLease(_get_line_index, file_path) as line_index, _open_log_binary(file_path) as f:
+        encoding = encoding or (line_index.encoding if line_index else None) or detect_file_encoding(file_path)
+        current_line = None
+        for target in targets:
+            anchor_line, anchor_offset = line_index.seek_point(target) if line_index else (1, 0)
+            # 当前位置已在目标之前且比最近锚点更近时顺序读，避免回退 seek
+            if current_line is None or current_line > target or current_line < anchor_line:
+                f.seek(anchor_offset)
+                current_line = anchor_line
+            raw_line = b""
+            while current_line <= target:
+                raw_line = f.readline()
+                if not raw_line:
+                    break
+                current_line += 1
+            if not raw_line or current_line - 1 != target:
+                break
+            result[target] = raw_line.decode(encoding, errors='replace').rstrip("\r\n")
+    return result
+
+
+def _get_search_cache_key(file_path, keyword, case_sensitive):
+    try:
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if _is_log_set(file_path):
+            identity = _get_file_identity(file_path)
+            signature = (json.dumps(identity["segments"]), identity["size"])
+        return (
             os.path.abspath(file_path),
-            stat.st_mtime_ns,
-            stat.st_size,
+            *signature,
             str(keyword or ""),
             bool(case_sensitive)
         )
@@ -8234,13 +13090,28 @@ def _scan_search_matches_binary(file_path, keyword, encodings, case_sensitive, i
             if not keyword_bytes:
                 continue
             regex = re.compile(re.escape(keyword_bytes), 0 if case_sensitive else re.IGNORECASE)
-            with open(file_path, 'rb') as f:
-                current_total = 0
-                for current_total, raw_line in enumerate(f, start=1):
-                    if regex.search(raw_line):
-                        matches.append(current_total)
-                if current_total > 0:
-                    total_lines = current_total
+            # 源日志有三元组块索引时只扫描候选块（区分大小写的命中必然也是小写化后的命中）
+            spans = None
+            if total_lines and "abc".encode(enc) == b"abc":
+                spans = _trigram_candidate_spans(file_path, [keyword_bytes.lower()])
+            with _open_log_binary(file_path) as f:
+                if spans is not None:
+                    for span_start, span_end, span_line in spans:
+                        f.seek(span_start)
+                        position = span_start
+                        for line_no, raw_line in enumerate(f, start=span_line):
+                            if regex.search(raw_line):
+                                matches.append(line_no)
+                            position += len(raw_line)
+                            if position >= span_end:
+                                break
+                else:
+                    current_total = 0
+                    for current_total, raw_line in enumerate(f, start=1):
+                        if regex.search(raw_line):
+                            matches.append(current_total)
+                    if current_total > 0:
+                        total_lines = current_total
             return {
                 "matches": matches,
                 "total_matches": len(matches),
@@ -8265,7 +13136,7 @@ def _scan_search_matches_text(file_path, keyword, encodings, case_sensitive, idx
     for enc in encodings:
         try:
             used_encoding = enc
-            with open(file_path, 'r', encoding=enc, errors='replace') as f:
+            with _open_log_text(file_path, enc) as f:
                 current_total = 0
                 for current_total, line in enumerate(f, start=1):
                     haystack = line if case_sensitive else line.lower()
@@ -8293,7 +13164,7 @@ def _get_search_match_index(file_path, keyword, case_sensitive=False):
     if cached is not None:
         return cached
 
-    idx_data = _load_temp_index_metadata(file_path) or {}
+    idx_data = _load_line_index_metadata(file_path) or {}
     encoding_candidates = _get_search_encoding_candidates(file_path, idx_data)
     if _can_use_binary_search(str(keyword or ""), case_sensitive):
         result = _scan_search_matches_binary(file_path, keyword, encoding_candidates, case_sensitive, idx_data=idx_data)
@@ -8305,11 +13176,10 @@ def _get_search_match_index(file_path, keyword, case_sensitive=False):
 
 def get_file_line_count(file_path):
     try:
-        idx_data = _load_temp_index_metadata(file_path)
-        if idx_data and isinstance(idx_data.get("line_count"), int):
-            count = max(0, int(idx_data.get("line_count") or 0))
-            return count
-        with open(file_path, 'rb') as f:
+        line_index = _get_line_index(file_path)
+        if line_index:
+            return max(0, line_index.line_count)
+        with _open_log_binary(file_path) as f:
             count = sum(1 for _ in f)
         return count
     except Exception as e:
@@ -8326,52 +13196,29 @@ def get_file_lines_range(file_path, start_line, end_line, encoding=None):
         if start_line > end_line:
             return "", encoding or "utf-8"
         
-        idx_data = _load_temp_index_metadata(file_path)
-        has_index = bool(idx_data)
+        with _LineIndexLease(_get_line_index, file_path) as line_index:
+            # 如果未指定编码，尝试使用索引中的编码或探测
+            detected_encoding = encoding or (line_index.encoding if line_index else None) or detect_file_encoding(file_path)
 
-        idx_encoding = None
-        offsets = []
-        if has_index:
-            try:
-                offsets = idx_data.get("offsets", [])
-                idx_encoding = idx_data.get("encoding")
-            except Exception as e:
-                print(f"[滚动窗口] 读取索引失败，回退全文件读取: {e}")
-                offsets = []
-                has_index = False
-        
-        # 如果未指定编码，尝试使用索引中的编码或探测
-        detected_encoding = encoding or idx_encoding or detect_file_encoding(file_path)
-        
-        # 使用索引快速定位，减少大文件读取
-        start_offset = 0
-        start_line_offset = 1
-        if has_index and offsets:
-            for entry_line, entry_offset in offsets:
-                if entry_line <= start_line:
-                    start_offset = entry_offset
-                    start_line_offset = entry_line
-                else:
-                    break
+            # 使用索引 O(1) 定位起始行（stride>1 时从最近索引点顺序读）
+            start_line_offset, start_offset = line_index.seek_point(start_line) if line_index else (1, 0)
         
         lines = []
         current_line_no = start_line_offset
-        with open(file_path, 'rb') as f:
+        with _open_log_binary(file_path) as f:
             if start_offset:
                 f.seek(start_offset)
             while current_line_no <= end_line:
                 raw_line = f.readline()
                 if not raw_line:
                     break
-                try:
-                    line_text = raw_line.decode(detected_encoding)
-                except UnicodeDecodeError:
-                    line_text = raw_line.decode(detected_encoding, errors='replace')
                 if current_line_no >= start_line:
+                    try:
+                        line_text = raw_line.decode(detected_encoding)
+                    except UnicodeDecodeError:
+                        line_text = raw_line.decode(detected_encoding, errors='replace')
                     lines.append(line_text.rstrip('\n'))
                 current_line_no += 1
-                if current_line_no > end_line:
-                    break
         
         result_text = '\n'.join(lines)
         return result_text, detected_encoding
@@ -8835,7 +13682,8 @@ def handle_file_upload(contents, filename, last_modified, current_dir):
                     imported_files.append(item_filename)
             except Exception as item_error:
                 failed_files.append(f"{item_filename}: {item_error}")
-        
+
+        _schedule_source_index_build(imported_files)
         log_files = get_log_files()
         file_list_table = _create_file_list_table(log_files, current_dir)
 
@@ -8876,6 +13724,27 @@ def create_log_directory(n_clicks, dirname, current_dir):
     except Exception as e:
         return dbc.Alert(f"创建目录失败: {str(e)}", color="danger", dismissable=True), dash.no_update, dash.no_update
 
+@app.callback(
+    [Output("create-log-dir-status", "children", allow_duplicate=True),
+     Output("uploaded-files-list", "children", allow_duplicate=True)],
+    [Input("create-log-sets-btn", "n_clicks")],
+    [State("log-manager-current-dir-store", "data")],
+    prevent_initial_call=True
+)
+def create_log_sets(n_clicks, current_dir):
+    if not n_clicks:
+        return dash.no_update, dash.no_update
+    try:
+        created = _create_log_sets(current_dir)
+        if not created:
+            return dbc.Alert("当前目录没有轮转日志分段", color="warning", dismissable=True), dash.no_update
+        _schedule_source_index_build(created)
+        log_files = get_log_files()
+        return (dbc.Alert(f"已生成日志集: {'、'.join(os.path.basename(name) for name in created)}", color="success", dismissable=True),
+                _create_file_list_table(log_files, current_dir))
+    except Exception as e:
+        return dbc.Alert(f"生成日志集失败: {str(e)}", color="danger", dismissable=True), dash.no_update
+
 # 删除文件操作
 @app.callback(
     Output('uploaded-files-list', 'children', allow_duplicate=True),
@@ -8907,10 +13776,15 @@ def delete_log_file(file_clicks, dir_clicks, current_dir):
             _dirname, dir_path = _resolve_log_dir_path(target_path, must_exist=False)
             if os.path.isdir(dir_path):
                 shutil.rmtree(dir_path)
+            _prune_source_line_indexes()
+            _forget_imported_logs(_dirname)
         else:
             _filename, file_path = _resolve_log_file_path(target_path, must_exist=False, allowed_extensions=ALLOWED_LOG_EXTENSIONS)
-            if os.path.exists(file_path):
+            if os.path.lexists(file_path):
+                # 硬链接/符号链接导入的日志只删除 logs/ 中的链接，不影响源文件
                 os.remove(file_path)
+            _remove_source_line_index(file_path)
+            _forget_imported_logs(_filename)
             
         # 更新文件列表
         log_files = get_log_files()
@@ -9011,17 +13885,19 @@ def execute_rename(n_clicks, target_filename, target_kind, new_filename, current
             target_filename, old_path = _resolve_log_file_path(target_filename, must_exist=False, allowed_extensions=ALLOWED_LOG_EXTENSIONS)
             new_filename, new_path = _resolve_log_file_path(new_filename, must_exist=False, allowed_extensions=ALLOWED_LOG_EXTENSIONS)
         
-        # 检查原文件是否存在
-        if not os.path.exists(old_path):
+        # 检查原文件是否存在（源文件缺失的引用导入仍可重命名）
+        if not os.path.lexists(old_path):
              return dash.no_update, _toast_script("原文件不存在", "error"), False
             
         # 检查新文件名是否已存在
-        if os.path.exists(new_path):
+        if os.path.lexists(new_path):
             return dash.no_update, _toast_script(f"文件名 {new_filename} 已存在", "error"), True
             
         # 重命名文件
         os.makedirs(os.path.dirname(new_path), exist_ok=True)
         os.rename(old_path, new_path)
+        _prune_source_line_indexes()
+        _forget_imported_logs(target_filename, new_prefix=new_filename)
         
         # 更新文件列表
         log_files = get_log_files()
@@ -9761,6 +14637,234 @@ def load_selected_config_files(selected_config_files, selected_log_file, active_
 
 
 
+# 日志字段分布概览：Tag / 时间条目可一键加为临时保留/屏蔽关键字；
+# 级别/PID/TID 作为子串会命中大量无关行（"W"、"1234"），改为追加字段过滤条件（level = W、pid != 1234）
+_FACET_DISPLAY_TOP = 15
+_FACET_FIELD_KINDS = ("level", "pid", "tid")
+
+
+def _facet_field_clause(kind, value, exclude=False):
+    return f"{kind} {'!=' if exclude else '='} {value}"
+
+
+def _render_facet_card(title, kind, items, error=0):
+    if not items:
+        return dbc.Card([dbc.CardHeader(title), dbc.CardBody(html.Small("无数据", className="text-muted"))], className="h-100")
+    peak = max(count for _, count in items) or 1
+    rows = []
+    for name, count in items[:_FACET_DISPLAY_TOP]:
+        if kind in _FACET_FIELD_KINDS:
+            buttons = [
+                dbc.Button("+", id={"type": "facet-field-btn", "index": f"keep:{kind}:{name}"}, color="link", size="sm",
+                           className="p-0 px-1", style={"position": "relative"},
+                           title=f"添加字段过滤「{_facet_field_clause(kind, name)}」"),
+                dbc.Button("−", id={"type": "facet-field-btn", "index": f"filter:{kind}:{name}"}, color="link", size="sm",
+                           className="p-0 px-1 text-danger", style={"position": "relative"},
+                           title=f"添加字段过滤「{_facet_field_clause(kind, name, exclude=True)}」"),
+            ]
+        else:
+            buttons = [
+                dbc.Button("+", id={"type": "facet-keyword-btn", "index": f"keep:{kind}:{name}"}, color="link", size="sm",
+                           className="p-0 px-1", style={"position": "relative"}, title=f"添加临时保留关键字「{name}」"),
+                dbc.Button("−", id={"type": "facet-keyword-btn", "index": f"filter:{kind}:{name}"}, color="link", size="sm",
+                           className="p-0 px-1 text-danger", style={"position": "relative"}, title=f"添加临时屏蔽关键字「{name}」"),
+            ]
+        rows.append(html.Div([
+            html.Div(style={
+                "position": "absolute", "left": 0, "top": 0, "bottom": 0,
+                "width": f"{count * 100 / peak:.1f}%", "backgroundColor": "#e7f1ff", "zIndex": 0
+            }),
+            html.Span(name, className="text-truncate", title=name, style={"position": "relative", "flex": "1 1 auto", "minWidth": 0}),
+            html.Span(f"{count:,}", className="text-muted", style={"position": "relative"}),
+            *buttons,
+        ], className="d-flex align-items-center gap-2 mb-1", style={"position": "relative", "fontSize": "12px"}))
+    header = f"{title}（近似，误差 ≤ {error:,}）" if error else title
+    return dbc.Card([dbc.CardHeader(header), dbc.CardBody(rows)], className="h-100")
+
+
+def _render_log_facets(facets, filename):
+    lines = int(facets.get("lines") or 0)
+    parsed = int(facets.get("parsed") or 0)
+    timeline = facets.get("timeline") or []
+    bucket_label = "小时" if facets.get("timeline_bucket") == "hour" else "分钟"
+    children = [
+        html.Div(
+            f"{filename}：共 {lines:,} 行，可解析 logcat 行头 {parsed:,} 行"
+            + (f"（{parsed * 100 / lines:.1f}%）" if lines else ""),
+            className="mb-2 small text-muted"
+        )
+    ]
+    if timeline:
+        figure = px.bar(x=[key for key, _ in timeline], y=[count for _, count in timeline],
+                        labels={"x": bucket_label, "y": "行数"})
+        figure.update_layout(height=220, margin=dict(l=40, r=10, t=10, b=30))
+        children.append(dcc.Graph(figure=figure, config={"displayModeBar": False}, className="mb-2"))
+    busiest = sorted(timeline, key=lambda item: item[1], reverse=True)
+    children.append(dbc.Row([
+        dbc.Col(_render_facet_card("Tag", "tag", facets.get("tag"), facets.get("tag_error", 0)), md=4, className="mb-2"),
+        dbc.Col(_render_facet_card("PID", "pid", facets.get("pid"), facets.get("pid_error", 0)), md=4, className="mb-2"),
+        dbc.Col(_render_facet_card("TID", "tid", facets.get("tid"), facets.get("tid_error", 0)), md=4, className="mb-2"),
+        dbc.Col(_render_facet_card("级别", "level", facets.get("levels")), md=4, className="mb-2"),
+        dbc.Col(_render_facet_card(f"最繁忙的{bucket_label}", "minute", busiest), md=4, className="mb-2"),
+    ], className="g-2"))
+    return children
+
+
+@app.callback(
+    [Output("log-facets-modal", "is_open"),
+     Output("log-facets-body", "children")],
+    [Input("log-facets-toggle", "n_clicks"),
+     Input("log-facets-close-btn", "n_clicks")],
+    [State("log-file-selector", "value")],
+    prevent_initial_call=True
+)
+def toggle_log_facets(open_clicks, close_clicks, selected_log_file):
+    ctx = dash.callback_context
+    if not ctx.triggered or ctx.triggered[0]["prop_id"].startswith("log-facets-close-btn"):
+        return False, dash.no_update
+    if not selected_log_file:
+        return True, html.P("请选择日志文件", className="text-danger text-center")
+    try:
+        log_path = get_log_path(selected_log_file)
+        facets = _get_log_facets(log_path)
+    except Exception as e:
+        print(f"[字段概览] 统计失败: {e}")
+        facets = None
+    if facets is None:
+        return True, html.P("无法统计该日志", className="text-danger text-center")
+    return True, _render_log_facets(facets, selected_log_file)
+
+
+@app.callback(
+    [Output("filter-field-expr-input", "value"),
+     Output("toast-container", "children", allow_duplicate=True)],
+    [Input({"type": "facet-field-btn", "index": dash.ALL}, "n_clicks")],
+    [State("filter-field-expr-input", "value")],
+    prevent_initial_call=True
+)
+def add_facet_field_clause(n_clicks, current_expr):
+    """概览中的级别/PID/TID 条目：以 and 追加到字段过滤表达式"""
+    ctx = dash.callback_context
+    if not ctx.triggered or not ctx.triggered[0].get("value"):
+        return dash.no_update, dash.no_update
+    kw_type, kind, value = json.loads(ctx.triggered[0]["prop_id"].rsplit(".", 1)[0])["index"].split(":", 2)
+    clause = _facet_field_clause(kind, value, exclude=kw_type == "filter")
+    current_expr = (current_expr or "").strip()
+    if clause in [part.strip() for part in re.split(r'\band\b', current_expr)]:
+        return dash.no_update, dash.no_update
+    expr = f"{current_expr} and {clause}" if current_expr else clause
+    return expr, _toast_script(f"已添加字段过滤: {clause}", "success")
+
+
+# 高频模板：按字节占比排列，条目可一键把模板的固定词段加为临时屏蔽关键字
+_TEMPLATE_DISPLAY_TOP = 20
+
+
+def _render_log_templates(templates, filename):
+    total_bytes = int(templates.get("bytes") or 0) or 1
+    items = (templates.get("templates") or [])[:_TEMPLATE_DISPLAY_TOP]
+    cumulative = 0
+    rows = []
+    for item in items:
+        share = int(item.get("bytes") or 0) * 100 / total_bytes
+        cumulative += share
+        keyword = item.get("keyword")
+        button = dbc.Button("−", id={"type": "facet-keyword-btn", "index": f"filter:template:{keyword}"}, color="link",
+                            size="sm", className="p-0 px-1 text-danger", title=f"添加临时屏蔽关键字「{keyword}」") if keyword else None
+        rows.append(html.Tr([
+            html.Td([
+                html.Code(item.get("template") or "(空行)", className="d-block text-break"),
+                html.Div([html.Div(sample, className="text-truncate", title=sample) for sample in item.get("samples") or []],
+                         className="text-muted", style={"fontSize": "11px", "maxWidth": "760px"}),
+            ]),
+            html.Td(f"{int(item.get('lines') or 0):,}", className="text-end text-nowrap"),
+            html.Td(f"{share:.1f}%", className="text-end text-nowrap"),
+            html.Td(f"{cumulative:.1f}%", className="text-end text-nowrap text-muted"),
+            html.Td(button, className="text-center"),
+        ], style={"fontSize": "12px"}))
+    summary = (
+        f"{filename}：共 {int(templates.get('lines') or 0):,} 行，聚成 {int(templates.get('clusters') or 0):,} 个模板；"
+        f"前 {len(items)} 个模板占文件字节 {cumulative:.1f}%"
+    )
+    if templates.get("other_lines"):
+        summary += f"，另有 {int(templates['other_lines']):,} 行超出模板数上限未归类"
+    return [
+        html.Div(summary, className="mb-2 small text-muted"),
+        dbc.Table([
+            html.Thead(html.Tr([html.Th("模板 / 样例"), html.Th("行数", className="text-end"), html.Th("字节占比", className="text-end"),
+                                html.Th("累计", className="text-end"), html.Th("屏蔽")])),
+            html.Tbody(rows)
+        ], bordered=True, hover=True, size="sm", responsive=True)
+    ]
+
+
+def _render_log_templates_building(state):
+    total_bytes = state.get("total_bytes")
+    if total_bytes:
+        done_bytes = min(int(state.get("done_bytes") or 0), total_bytes)
+        percent = int(done_bytes * 100 / total_bytes)
+        text = f"正在后台挖掘模板：{_format_size(done_bytes)}/{_format_size(total_bytes)}"
+    else:
+        percent = 100
+        text = "正在建立行索引，随后挖掘模板"
+    return html.Div([
+        html.Div(text, className="small text-muted mb-2"),
+        dbc.Progress(value=percent, striped=True, animated=True, style={"height": "8px"}),
+    ], className="py-3")
+
+
+def _log_templates_view(selected_log_file, start=False):
+    """返回 (模态框内容, 是否停止轮询)：已有缓存直接展示，否则在后台挖掘并显示进度；
+    start=False（轮询）时不重启已失败的挖掘"""
+    if not selected_log_file:
+        return html.P("请选择日志文件", className="text-danger text-center"), True
+    try:
+        log_path = get_log_path(selected_log_file)
+        templates = _get_log_templates(log_path, build=False)
+        state = _get_log_templates_build(log_path) if templates is None else {}
+        if templates is None and (start or not state):
+            state = _start_log_templates_build(log_path)
+    except Exception as e:
+        print(f"[模板挖掘] 挖掘失败: {e}")
+        templates, state = None, {"status": "error", "error": "无法挖掘该日志的模板"}
+    if templates is not None:
+        return _render_log_templates(templates, selected_log_file), True
+    if state.get("status") == "building":
+        return _render_log_templates_building(state), False
+    return html.P(state.get("error") or "无法挖掘该日志的模板", className="text-danger text-center"), True
+
+
+@app.callback(
+    [Output("log-templates-modal", "is_open"),
+     Output("log-templates-body", "children"),
+     Output("log-templates-interval", "disabled")],
+    [Input("log-templates-toggle", "n_clicks"),
+     Input("log-templates-close-btn", "n_clicks")],
+    [State("log-file-selector", "value")],
+    prevent_initial_call=True
+)
+def toggle_log_templates(open_clicks, close_clicks, selected_log_file):
+    ctx = dash.callback_context
+    if not ctx.triggered or ctx.triggered[0]["prop_id"].startswith("log-templates-close-btn"):
+        return False, dash.no_update, True
+    body, done = _log_templates_view(selected_log_file, start=True)
+    return True, body, done
+
+
+@app.callback(
+    [Output("log-templates-body", "children", allow_duplicate=True),
+     Output("log-templates-interval", "disabled", allow_duplicate=True)],
+    [Input("log-templates-interval", "n_intervals")],
+    [State("log-templates-modal", "is_open"),
+     State("log-file-selector", "value")],
+    prevent_initial_call=True
+)
+def poll_log_templates(n_intervals, is_open, selected_log_file):
+    if not is_open:
+        return dash.no_update, True
+    return _log_templates_view(selected_log_file)
+
+
 # 监听临时关键字存储变化，更新显示
 @app.callback(
     Output('temp-keywords-popover-display', 'children'),
@@ -9788,13 +14892,15 @@ def reload_temp_keywords_on_load(_href):
     [Input('temp-keyword-add-btn', 'n_clicks'),
      Input('temp-keyword-text', 'n_submit'),
      Input('temp-exclude-keyword-add-btn', 'n_clicks'),
-     Input('temp-exclude-keyword-text', 'n_submit')],
+     Input('temp-exclude-keyword-text', 'n_submit'),
+     Input({"type": "facet-keyword-btn", "index": dash.ALL}, 'n_clicks')],
     [State('temp-keyword-text', 'value'),
      State('temp-exclude-keyword-text', 'value'),
      State('temp-keywords-store', 'data')],
     prevent_initial_call=True
 )
-def add_temp_keyword(n_clicks, n_submit, exclude_clicks, exclude_submit, keyword_text, exclude_keyword_text, existing_keywords):
+def add_temp_keyword(n_clicks, n_submit, exclude_clicks, exclude_submit, facet_clicks, keyword_text, exclude_keyword_text,
+                     existing_keywords):
     # 获取回调上下文
     ctx = dash.callback_context
     
@@ -9807,9 +14913,17 @@ def add_temp_keyword(n_clicks, n_submit, exclude_clicks, exclude_submit, keyword
     # 检查是否是按钮点击事件
     prop_id = ctx.triggered[0]['prop_id']
     # 判断添加类型
-    is_exclude = 'temp-exclude-keyword' in prop_id
-    target_text = exclude_keyword_text if is_exclude else keyword_text
-    target_text = target_text.strip() if target_text else ""
+    if 'facet-keyword-btn' in prop_id:
+        # 概览中的 Tag / 时间条目、高频模板：index 为 "keep:维度:文本" / "filter:维度:文本"
+        if not ctx.triggered[0].get('value'):
+            return dash.no_update, dash.no_update
+        kw_type, _facet_kind, facet_text = json.loads(prop_id.rsplit('.', 1)[0])["index"].split(':', 2)
+        is_exclude = kw_type == "filter"
+        target_text = facet_text.strip()
+    else:
+        is_exclude = 'temp-exclude-keyword' in prop_id
+        target_text = exclude_keyword_text if is_exclude else keyword_text
+        target_text = target_text.strip() if target_text else ""
     
     if not target_text:
         return normalized_keywords, dash.no_update
@@ -9955,21 +15069,24 @@ def create_temp_keyword_buttons(keywords):
 
 @app.server.route('/api/import-log-paths', methods=['POST'])
 def import_log_paths_api():
-    """从 Electron 传入的本地路径导入日志文件、目录或压缩包。"""
+    """从 Electron 传入的本地路径导入日志文件、目录或压缩包。
+    可选 mode：auto（默认，硬链接/克隆，失败再复制）、reference（符号链接引用源文件）、copy。"""
     try:
         from flask import request, jsonify
         data = request.get_json(silent=True) or {}
         paths = data.get("paths") or []
         if not isinstance(paths, list):
             return jsonify({"ok": False, "error": "paths 必须是数组"}), 400
+        mode = data.get("mode")
         ensure_log_dir()
         imported = []
         failed = []
         for source_path in paths:
             try:
-                imported.extend(import_log_source_path(source_path))
+                imported.extend(import_log_source_path(source_path, mode=mode))
             except Exception as exc:
                 failed.append({"path": str(source_path), "error": str(exc)})
+        _schedule_source_index_build(imported)
         return jsonify({
             "ok": bool(imported) and not failed,
             "imported": imported,
@@ -9999,7 +15116,7 @@ def upload_log_files_api():
             display_name = raw_rel_path or storage_file.filename or "log.log"
             try:
                 display_name = _sanitize_import_relative_path(display_name)
-                if not display_name.lower().endswith(ALLOWED_LOG_EXTENSIONS):
+                if not _has_allowed_log_extension(display_name):
                     continue
                 filename, dest_path = _build_available_log_filename(display_name)
                 os.makedirs(os.path.dirname(dest_path), exist_ok=True)
@@ -10008,6 +15125,7 @@ def upload_log_files_api():
             except Exception as exc:
                 failed.append({"path": display_name, "error": str(exc)})
 
+        _schedule_source_index_build(imported)
         return jsonify({
             "ok": bool(imported) and not failed,
             "imported": imported,
@@ -10031,11 +15149,15 @@ def get_log_window():
         end_line = int(data.get('end_line', 500))
         if not session_id:
             return jsonify({'success': False, 'error': '缺少session_id'})
-        temp_file_path = get_temp_file_path(session_id)
-        if not os.path.exists(temp_file_path):
-            return jsonify({'success': False, 'error': f'临时文件不存在: {temp_file_path}'})
-        total_lines = get_file_line_count(temp_file_path)
-        content, encoding = get_file_lines_range(temp_file_path, start_line, end_line)
+        reader = _get_session_reader(session_id)
+        if reader is None:
+            return jsonify({'success': False, 'error': f'临时文件不存在: {_resolve_session_file_path(session_id)}'})
+        try:
+            total_lines = reader.line_count
+            content = reader.read_range(start_line, end_line)
+            encoding = reader.encoding
+        finally:
+            reader.release()
 
         # 分片高亮（基于会话记录的关键字和颜色映射）
         is_html = False
@@ -10070,14 +15192,10 @@ def get_log_window():
                     colors_map[highlight_keyword.lower()] = {'bg': '#ffff00', 'fg': '#000000'}
 
             if keywords_to_highlight:
-                # 构建单个正则（按长度降序，避免子串先匹配）
-                # 去重并排序
-                unique_keywords = sorted(list(set(keywords_to_highlight)), key=len, reverse=True)
-                parts = [re.escape(k) for k in unique_keywords]
+                # 合并为前缀树正则（同一起点优先最长关键字）
+                regex = _compile_literal_regex(keywords_to_highlight)
                 
-                if parts:
-                    combined = '(' + '|'.join(parts) + ')'
-                    regex = re.compile(combined, re.IGNORECASE)
+                if regex is not None:
 
                     def html_escape(s):
                         return s.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
@@ -10125,6 +15243,125 @@ def get_log_window():
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)})
 
+# API端点：跟随模式轮询，过滤源日志新增内容并追加到结果末尾
+@app.server.route('/api/follow-poll', methods=['POST'])
+def follow_poll():
+    try:
+        from flask import request, jsonify
+        data = request.get_json() or {}
+        session_id = data.get('session_id')
+        if not session_id:
+            return jsonify({'success': False, 'error': '缺少session_id'})
+        if _get_source_view_path(session_id):
+            return jsonify({'success': False, 'unsupported': True, 'error': '源文件视图不支持跟随，请先过滤'})
+        result = _follow_filter_session(session_id)
+        if result is None:
+            task = _get_filter_task(session_id)
+            return jsonify({'success': True, 'pending': True, 'total_lines': int(task.get('done_lines') or 0), 'appended': 0})
+        total_lines, appended = result
+        return jsonify({'success': True, 'total_lines': total_lines, 'appended': appended})
+    except Exception as e:
+        print(f"[API端点] 跟随轮询失败: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+# API端点：页面卸载时释放该页面持有的过滤会话引用（navigator.sendBeacon）
+@app.server.route('/api/release-filter-sessions', methods=['POST'])
+def release_filter_sessions():
+    try:
+        from flask import request, jsonify
+        data = request.get_json(force=True, silent=True) or {}
+        session_ids = data.get('session_ids') or []
+        if not isinstance(session_ids, list):
+            return jsonify({'success': False, 'error': 'session_ids 应为列表'})
+        # 同一页面的过滤与对比可能引用同一会话，各自登记过一次，逐个释放
+        for session_id in session_ids:
+            if isinstance(session_id, str) and session_id:
+                _release_filter_session(session_id, delete_files=False)
+        return jsonify({'success': True})
+    except Exception as e:
+        print(f"[API端点] 释放过滤会话失败: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+# API端点：过滤结果行 -> 源日志位置（可附带源日志上下文）
+@app.server.route('/api/source-position', methods=['POST'])
+def source_position():
+    try:
+        from flask import request, jsonify
+        data = request.get_json() or {}
+        session_id = data.get('session_id')
+        if not session_id:
+            return jsonify({'success': False, 'error': '缺少session_id'})
+        raw_lines = data.get('lines')
+        if raw_lines is None:
+            raw_lines = [data.get('line')]
+        line_numbers = _normalize_selected_line_numbers(list(raw_lines or []))
+        if not line_numbers:
+            return jsonify({'success': False, 'error': '缺少行号'})
+        context = max(0, min(int(data.get('context', 0) or 0), 500))
+
+        positions = _lookup_filter_source_positions(session_id, line_numbers)
+        if not positions:
+            return jsonify({'success': False, 'error': '过滤结果尚未完成或缺少源位置映射'})
+        log_path = _get_filter_session_source(session_id)
+        encoding = None
+        if log_path:
+            line_index = _get_source_line_index(log_path, build=False)
+            encoding = (line_index.encoding if line_index else None) or detect_file_encoding(log_path)
+
+        items = []
+        for line_no in line_numbers:
+            if line_no not in positions:
+                continue
+            source_line, source_offset = positions[line_no]
+            item = {'line_number': line_no, 'source_line_number': source_line, 'source_byte_offset': source_offset}
+            if log_path and context:
+                first = max(1, source_line - context)
+                lines_by_number = _read_lines_by_numbers(log_path, range(first, source_line + context + 1), encoding=encoding)
+                item['context_start_line'] = first
+                item['context'] = [lines_by_number[n] for n in sorted(lines_by_number)]
+            elif log_path:
+                item['content'] = _read_source_line_at(log_path, source_offset, encoding)
+            items.append(item)
+        return jsonify({
+            'success': True,
+            'source_file': os.path.basename(log_path) if log_path else None,
+            'positions': items
+        })
+    except Exception as e:
+        print(f"[API端点] 源位置查询失败: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+# API端点：跳转到指定时间（源文件视图直接定位，过滤结果经源位置映射换算）
+@app.server.route('/api/jump-to-time', methods=['POST'])
+def jump_to_time():
+    try:
+        from flask import request, jsonify
+        data = request.get_json() or {}
+        session_id = data.get('session_id')
+        time_text = str(data.get('time') or '').strip()
+        if not session_id:
+            return jsonify({'success': False, 'error': '缺少session_id'})
+        if not time_text:
+            return jsonify({'success': False, 'error': '缺少时间'})
+
+        source_view_path = _get_source_view_path(session_id)
+        log_path = source_view_path or _get_filter_session_source(session_id)
+        if not log_path or not os.path.exists(log_path):
+            return jsonify({'success': False, 'error': '找不到会话对应的源日志'})
+        source_line, matches = _locate_time_in_source(log_path, time_text)
+        if source_line is None:
+            return jsonify({'success': False, 'error': '日志中没有该时间之后的记录'})
+        if source_view_path:
+            line = source_line
+        else:
+            line = _find_filtered_line_for_source(session_id, source_line)
+            if line is None:
+                return jsonify({'success': False, 'error': '过滤结果尚未完成或缺少源位置映射'})
+        return jsonify({'success': True, 'line': line, 'source_line_number': source_line, 'matches': matches})
+    except Exception as e:
+        print(f"[API端点] 按时间跳转失败: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
 # API端点：从指定行开始向下查找关键字（基于会话临时文件）
 @app.server.route('/api/search-next', methods=['POST'])
 def search_next():
@@ -10142,7 +15379,7 @@ def search_next():
         if not keyword:
             return jsonify({'success': False, 'error': '缺少关键字'})
 
-        temp_file_path = get_temp_file_path(session_id)
+        temp_file_path = _resolve_session_file_path(session_id)
         if not os.path.exists(temp_file_path):
             return jsonify({'success': False, 'error': f'临时文件不存在: {temp_file_path}'})
 
@@ -10195,7 +15432,7 @@ def search_prev():
         if not keyword:
             return jsonify({'success': False, 'error': '缺少关键字'})
 
-        temp_file_path = get_temp_file_path(session_id)
+        temp_file_path = _resolve_session_file_path(session_id)
         if not os.path.exists(temp_file_path):
             return jsonify({'success': False, 'error': f'临时文件不存在: {temp_file_path}'})
 
@@ -11441,55 +16678,57 @@ def read_selected_lines_from_temp(session_id, line_numbers):
     if not line_numbers:
         return []
 
-    temp_file = os.path.join(TEMP_DIR, f"filtered_{session_id}.txt")
+    temp_file = os.path.join(TEMP_DIR, f"filter_result_{session_id}.txt")
     if not os.path.exists(temp_file):
         return []
 
     try:
-        with open(temp_file, 'r', encoding='utf-8', errors='replace') as f:
-            all_lines = f.readlines()
+        lines_by_number = _read_lines_by_numbers(temp_file, line_numbers)
+        source_positions = _lookup_filter_source_positions(session_id, lines_by_number.keys())
     except Exception as e:
         print(f"读取过滤结果失败: {e}")
         return []
 
     result = []
-    for ln in sorted(line_numbers):
-        idx = ln - 1  # 0-indexed
-        if 0 <= idx < len(all_lines):
-            content = all_lines[idx].rstrip('\n')
-            # 尝试提取日志结构化信息
-            parsed = _parse_log_line(content)
-            result.append({
-                "line_number": ln,
-                "content": content,
-                "timestamp": parsed.get("timestamp", ""),
-                "tag": parsed.get("tag", ""),
-                "level": parsed.get("level", ""),
-                "message": parsed.get("message", "")
-            })
+    for ln in sorted(lines_by_number):
+        content = lines_by_number[ln]
+        # 尝试提取日志结构化信息
+        parsed = _parse_log_line(content)
+        source_line, source_offset = source_positions.get(ln, (None, None))
+        result.append({
+            "line_number": ln,
+            "content": content,
+            "source_line_number": source_line,
+            "source_byte_offset": source_offset,
+            "timestamp": parsed.get("timestamp", ""),
+            "tag": parsed.get("tag", ""),
+            "level": parsed.get("level", ""),
+            "message": parsed.get("message", "")
+        })
     return result
 
 
+# 行头一次匹配：时间戳后依次尝试 brief（E/Tag）与 threadtime（pid tid E Tag）格式，均不符时余下部分作为正文
+_LOG_LINE_PATTERN = re.compile(
+    r'^(?P<timestamp>\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}(?:\.\d{3})?|\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}[^ ]*)\s+'
+    r'(?:(?:\d+\s+\d+\s+)?(?P<level>[A-Z])/(?P<tag>\w+)\s*:\s*'
+    r'|\d+\s+\d+\s+(?P<tlevel>[VDIWEFA])\s+(?P<ttag>[^:]*?)\s*:\s*)?'
+    r'(?P<message>.*)'
+)
+
+
 def _parse_log_line(line):
     """解析单行日志，提取时间戳、Tag、级别、正文"""
-    # Android logcat 格式: 01-01 12:00:00.000 123 456 E/Tag: message
-    m = re.match(r'^(?P<timestamp>\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})\s+\d+\s+\d+\s+(?P<level>[A-Z])/(?P<tag>\w+)\s*:\s*(?P<message>.*)', line)
-    if m:
-        return m.groupdict()
-    # Android logcat 无进程ID: 01-01 12:00:00.000 E/Tag: message
-    m = re.match(r'^(?P<timestamp>\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})\s+(?P<level>[A-Z])/(?P<tag>\w+)\s*:\s*(?P<message>.*)', line)
-    if m:
-        return m.groupdict()
-    # 简单时间戳: 01-01 12:00:00 message
-    m = re.match(r'^(?P<timestamp>\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})\s+(?P<message>.*)', line)
-    if m:
-        return {**m.groupdict(), "tag": "", "level": ""}
-    # ISO 时间戳: 2024-01-01T12:00:00.000Z message
-    m = re.match(r'^(?P<timestamp>\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}[^ ]*)\s+(?P<message>.*)', line)
-    if m:
-        return {**m.groupdict(), "tag": "", "level": ""}
-    # 无法解析时，整行作为 message
-    return {"timestamp": "", "tag": "", "level": "", "message": line}
+    m = _LOG_LINE_PATTERN.match(line)
+    if not m:
+        # 无法解析时，整行作为 message
+        return {"timestamp": "", "tag": "", "level": "", "message": line}
+    return {
+        "timestamp": m.group("timestamp"),
+        "tag": m.group("tag") or m.group("ttag") or "",
+        "level": m.group("level") or m.group("tlevel") or "",
+        "message": m.group("message"),
+    }
 
 # -----------------------------------------------------------------------------
 # 文本选中 Chat/Copy 上下文菜单回调
@@ -11520,6 +16759,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Log Filter Application')
     parser.add_argument('--port', type=int, default=8052, help='Port to run the application on')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host to bind the application to')
+    parser.add_argument('--stdin', type=str, metavar='NAME',
+                        help='Write stdin to a new file logs/NAME for follow mode (e.g. adb logcat | python app.py --stdin live.log)')
     args = parser.parse_args()
+    if args.stdin:
+        _start_stdin_capture(args.stdin)
     
     app.run(debug=False, port=args.port, host=args.host)
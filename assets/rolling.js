@@ -66,6 +66,7 @@
       endLine: Math.min(windowSize, parseInt(div.getAttribute('data-total-lines') || '0', 10) || windowSize),
       centerLine: null,
       highlightKeyword: null,
+      isHtml: false,
       lastRequestKey: null,
       pendingRequest: null
     };
@@ -147,6 +148,7 @@
             } else {
               pre.textContent = data.content || '';
             }
+            state.isHtml = !!data.is_html;
         }
 
         var lh = getLineHeight(pre);
@@ -460,6 +462,126 @@
       };
     } catch(e) { console.warn('[前端滚动窗口][assets] 注册外部控制失败:', e); }
 
+    // -------------------------------------------------------------------------
+    // Follow mode: poll for newly filtered lines and append only the new tail
+    // -------------------------------------------------------------------------
+    var followBusy = false;
+
+    function isScrolledToBottom() {
+      if (scrollTarget === window) {
+        return docScrollTop() + window.innerHeight >= getDocScrollHeight() - 4;
+      }
+      return scrollTarget.scrollTop + scrollTarget.clientHeight >= scrollTarget.scrollHeight - 4;
+    }
+
+    function scrollToBottom() {
+      if (scrollTarget === window) {
+        window.scrollTo(0, getDocScrollHeight());
+      } else {
+        scrollTarget.scrollTop = scrollTarget.scrollHeight;
+      }
+    }
+
+    function dropLeadingLines(text, count) {
+      var pos = -1;
+      for (var i = 0; i < count; i++) {
+        pos = text.indexOf('\n', pos + 1);
+        if (pos < 0) return '';
+      }
+      return text.slice(pos + 1);
+    }
+
+    function appendTail(oldTotal, newTotal) {
+      var pre = div.querySelector('pre');
+      var stickToBottom = isScrolledToBottom();
+      // Too many new lines, wrapped selection view or server-rendered highlight: just load the last window
+      if (!pre || newTotal - oldTotal > windowSize || pre.querySelector('.log-line-wrap') || (!state.isHtml && pre.children.length)) {
+        followBusy = false;
+        requestRange(Math.max(1, newTotal - windowSize + 1), newTotal, { centerLine: newTotal }, true);
+        return;
+      }
+      var payload = { session_id: sessionId, start_line: oldTotal + 1, end_line: newTotal };
+      if (state.highlightKeyword) {
+        payload.highlight_keyword = state.highlightKeyword;
+      }
+      state.isLoading = true;
+      fetch('/api/get-log-window', {
+        method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload)
+      })
+      .then(function(r){ return r.json(); })
+      .then(function(data){
+        if (!data || !data.success) return;
+        var isHtml = state.isHtml;
+        if (isHtml !== !!data.is_html) {
+          state.pendingRequest = { startLine: state.startLine, endLine: newTotal, anchorArg: { centerLine: newTotal }, forceReload: true };
+          return;
+        }
+        var current = isHtml ? pre.innerHTML : pre.textContent;
+        // plain windows have no trailing newline, highlighted windows end every line with one
+        var joined = (!isHtml && current) ? current + '\n' + data.content : current + data.content;
+        var endLine = data.end_line;
+        var startLine = state.startLine;
+        var drop = 0;
+        // keep the window bounded even when the user has scrolled up; scrolling back there reloads it
+        if (endLine - startLine + 1 > windowSize) {
+          drop = endLine - startLine + 1 - windowSize;
+          joined = dropLeadingLines(joined, drop);
+          startLine += drop;
+        }
+        if (isHtml) { pre.innerHTML = joined; } else { pre.textContent = joined; }
+        if (drop && !stickToBottom) {
+          // lines still on screen moved up by the dropped ones: shift the scroll position to keep them in place
+          var shift = drop * getLineHeight(pre);
+          if (scrollTarget === window) {
+            window.scrollTo(0, Math.max(0, docScrollTop() - shift));
+          } else {
+            scrollTarget.scrollTop = Math.max(0, scrollTarget.scrollTop - shift);
+          }
+        }
+        state.startLine = startLine;
+        state.endLine = endLine;
+        state.lastRequestKey = buildRequestKey(startLine, endLine);
+        if (stickToBottom) {
+          scrollToBottom();
+          state.centerLine = endLine;
+        }
+        updateStatusDisplay();
+      })
+      .catch(function(err){ console.error('[前端滚动窗口][assets] 跟随追加异常:', err); })
+      .finally(function(){
+        state.isLoading = false;
+        followBusy = false;
+        flushPendingRequest();
+      });
+    }
+
+    function followTick() {
+      if (!document.body.contains(div)) { clearInterval(followTimer); return; }
+      if (!window.__logFollowEnabled || followBusy || state.isLoading || !isVisible(div)) return;
+      followBusy = true;
+      fetch('/api/follow-poll', {
+        method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ session_id: sessionId })
+      })
+      .then(function(r){ return r.json(); })
+      .then(function(data){
+        if (!data || !data.success) {
+          if (data && data.error) console.warn('[前端滚动窗口][assets] 跟随轮询失败:', data.error);
+          followBusy = false;
+          return;
+        }
+        var oldTotal = state.totalLines || 0;
+        var newTotal = parseInt(data.total_lines || 0, 10) || 0;
+        if (data.pending || newTotal <= oldTotal) { followBusy = false; return; }
+        state.totalLines = newTotal;
+        // Window does not reach the old tail: only the total changes
+        if (state.endLine < oldTotal) { followBusy = false; updateStatusDisplay(); return; }
+        appendTail(oldTotal, newTotal);
+      })
+      .catch(function(err){ followBusy = false; console.error('[前端滚动窗口][assets] 跟随轮询异常:', err); });
+    }
+
+    var followTimer = setInterval(followTick, 1000);
+
     // -------------------------------------------------------------------------
     // Line selection for AI analysis (click / shift+click)
     // -------------------------------------------------------------------------
@@ -580,6 +702,14 @@
     } catch(e) {}
   }
 
+  // Follow toggle button (shared by all rolling instances)
+  document.addEventListener('click', function(e) {
+    var btn = e.target && e.target.closest ? e.target.closest('#log-follow-btn') : null;
+    if (!btn) return;
+    window.__logFollowEnabled = !window.__logFollowEnabled;
+    btn.classList.toggle('active', window.__logFollowEnabled);
+  });
+
   function bootstrap() {
     var nodes = document.querySelectorAll("div[id^='log-window-']");
     nodes.forEach(function(div){
@@ -607,4 +737,14 @@
   } else {
     bootstrap();
   }
+
+  // release the filter sessions this page holds references to, so shared scans can be cancelled
+  window.addEventListener('pagehide', function(event){
+    if (event.persisted) return;  // kept in the back/forward cache: the page may come back with its sessions
+    var holder = document.getElementById('retained-filter-sessions');
+    var ids = holder ? (holder.textContent || '').split(',').filter(Boolean) : [];
+    if (!ids.length || !navigator.sendBeacon) return;
+    var body = new Blob([JSON.stringify({ session_ids: ids })], { type: 'application/json' });
+    navigator.sendBeacon('/api/release-filter-sessions', body);
+  });
 })();
@@ -217,12 +217,40 @@
     reg.jumpToLine(val, { behavior: 'smooth' });
   }
 
+  function handleJumpTime() {
+    var active = getActiveRegistry();
+    if (!active) { window.showToast && window.showToast('滚动窗口未初始化', 'error'); return; }
+    var reg = active.reg;
+
+    var input = document.getElementById('jump-time-input');
+    var val = input ? String(input.value || '').trim() : '';
+    if (!val) { window.showToast && window.showToast('请输入时间', 'warning'); return; }
+    fetch('/api/jump-to-time', {
+      method: 'POST', headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ session_id: active.sessionId, time: val })
+    })
+    .then(function(r){ return r.json(); })
+    .then(function(res){
+      if (!res || res.success !== true) {
+        window.showToast && window.showToast('按时间跳转失败: ' + (res && res.error ? res.error : '未知错误'), 'error');
+        return;
+      }
+      reg.jumpToLine(res.line, { behavior: 'smooth' });
+      window.showToast && window.showToast('定位到第 ' + res.line + ' 行', 'success', 2500);
+    })
+    .catch(function(err){
+      window.showToast && window.showToast('按时间跳转异常: ' + err, 'error');
+    });
+  }
+
   function onKeyDown(e){
     if (e && e.key === 'Enter') {
       if (e.target && e.target.id === 'global-search-input') {
         handleSearchNext();
       } else if (e.target && e.target.id === 'jump-line-input') {
         handleJumpLine();
+      } else if (e.target && e.target.id === 'jump-time-input') {
+        handleJumpTime();
       }
     }
   }
@@ -237,6 +265,8 @@
         handleSearchPrev();
       } else if (t.id === 'jump-line-btn') {
         handleJumpLine();
+      } else if (t.id === 'jump-time-btn') {
+        handleJumpTime();
       } else if (t.id === 'quick-top-btn') {
         try {
           var div = getActiveLogWindow();
@@ -266,8 +296,10 @@
     });
     var si = document.getElementById('global-search-input');
     var ji = document.getElementById('jump-line-input');
+    var ti = document.getElementById('jump-time-input');
     si && si.addEventListener('keydown', onKeyDown);
     ji && ji.addEventListener('keydown', onKeyDown);
+    ti && ti.addEventListener('keydown', onKeyDown);
     si && si.addEventListener('input', scheduleHighlightRefresh);
     resetSearchStatus();
 
@@ -275,8 +307,10 @@
     var obs = new MutationObserver(function(){
       var si2 = document.getElementById('global-search-input');
       var ji2 = document.getElementById('jump-line-input');
+      var ti2 = document.getElementById('jump-time-input');
       si2 && si2.removeEventListener && si2.addEventListener('keydown', onKeyDown);
       ji2 && ji2.removeEventListener && ji2.addEventListener('keydown', onKeyDown);
+      ti2 && ti2.removeEventListener && ti2.addEventListener('keydown', onKeyDown);
       si2 && si2.addEventListener('input', scheduleHighlightRefresh);
     });
     obs.observe(document.body, { childList: true, subtree: true });
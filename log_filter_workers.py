@@ -0,0 +1,352 @@
+"""过滤进程池的工作函数：按行对齐的块过滤、命中统计、字段分布统计与模板挖掘。
+
+进程池以 spawn/forkserver 启动子进程，子进程只导入本模块，不会重新执行 app.py
+（Dash 布局、回调注册、目录初始化等）。本模块只依赖标准库与 numpy，导入时没有副作用。
+压缩日志与含压缩分段的日志集不进进程池，子进程只读取普通文件或由普通分段拼接的日志集。
+"""
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+
+# ------------------- 分块过滤 -------------------
+def count_line_hits(data, regex, closure, counts):
+    """按行统计各关键字命中行数（同一行多次命中只计一次），累加到 counts。
+    正则不报告重叠的命中（"abcd" 与 "cdef" 在 "abcdef" 中只报告前者），
+    命中行内未被闭包覆盖的其余关键字再逐个做子串检查"""
+    if regex is None or not data:
+        return
+    newline = b"\n" if isinstance(data, bytes) else "\n"
+    all_keys = tuple(closure)
+    line_start = 0
+    line_end = -1
+    seen = set()
+
+    def flush():
+        if len(seen) < len(all_keys):
+            line = data[line_start:line_end].lower()
+            seen.update(key for key in all_keys if key not in seen and key in line)
+        for key in seen:
+            counts[key] = counts.get(key, 0) + 1
+
+    for m in regex.finditer(data):
+        if m.start() > line_end:
+            if seen:
+                flush()
+            seen = set()
+            line_start = data.rfind(newline, 0, m.start()) + 1
+            line_end = data.find(newline, m.start())
+            if line_end < 0:
+                line_end = len(data)
+        key = m.group().lower()
+        seen.update(closure.get(key, (key,)))
+    if seen:
+        flush()
+
+
+def filter_lines_in_buffer(data, keep_regex, filter_regex, closures=None):
+    """在按行对齐的缓冲区（bytes 或 str）上过滤，返回 (保留内容, 保留区间列表, 命中统计)。
+    直接在整块上搜索命中位置再回溯所在行，避免逐行调用正则。
+    closures=(保留, 排除) 命中闭包非空时同一遍统计 ({保留键: 输出行数}, {排除键: 排除行数})。"""
+    newline = b"\n" if isinstance(data, bytes) else "\n"
+    length = len(data)
+    spans = []
+    removed = []
+    if keep_regex is not None:
+        pos = 0
+        while pos < length:
+            m = keep_regex.search(data, pos)
+            if m is None:
+                break
+            line_start = data.rfind(newline, 0, m.start()) + 1
+            line_end = data.find(newline, m.start())
+            line_end = length if line_end < 0 else line_end + 1
+            pos = line_end
+            if filter_regex is not None and filter_regex.search(data, line_start, line_end):
+                removed.append((line_start, line_end))
+                continue
+            if spans and spans[-1][1] == line_start:
+                spans[-1][1] = line_end
+            else:
+                spans.append([line_start, line_end])
+    elif filter_regex is not None:
+        pos = segment_start = 0
+        while pos < length:
+            m = filter_regex.search(data, pos)
+            if m is None:
+                break
+            line_start = data.rfind(newline, 0, m.start()) + 1
+            line_end = data.find(newline, m.start())
+            line_end = length if line_end < 0 else line_end + 1
+            if line_start > segment_start:
+                spans.append([segment_start, line_start])
+            removed.append((line_start, line_end))
+            segment_start = pos = line_end
+        if segment_start < length:
+            spans.append([segment_start, length])
+    elif length:
+        spans.append([0, length])
+    output = data[:0].join(data[start:end] for start, end in spans)
+    if closures is None:
+        return output, spans, None
+    hits = ({}, {})
+    count_line_hits(output, keep_regex, closures[0], hits[0])
+    if removed:
+        count_line_hits(data[:0].join(data[start:end] for start, end in removed), filter_regex, closures[1], hits[1])
+    return output, spans, hits
+
+
+def buffer_line_starts(data):
+    """缓冲区内各行起始位置（bytes 按字节、str 按字符），numpy 向量化"""
+    if isinstance(data, bytes):
+        codes = np.frombuffer(data, dtype=np.uint8)
+    else:
+        codes = np.frombuffer(data.encode("utf-32-le", errors="surrogatepass"), dtype="<u4")
+    newline_pos = np.flatnonzero(codes == 10)
+    starts = np.concatenate((np.zeros(1, dtype=np.int64), newline_pos.astype(np.int64) + 1))
+    return starts[starts < len(data)]
+
+
+def span_line_ordinals(line_starts, spans):
+    """把保留区间换算成缓冲区内的行序号（0-based）"""
+    if not spans:
+        return np.zeros(0, dtype=np.int64)
+    bounds = np.asarray(spans, dtype=np.int64)
+    first = np.searchsorted(line_starts, bounds[:, 0])
+    counts = np.searchsorted(line_starts, bounds[:, 1]) - first
+    output_base = np.cumsum(counts) - counts
+    return np.repeat(first - output_base, counts) + np.arange(int(counts.sum()), dtype=np.int64)
+
+
+def filter_bytes(data, keep_regex, filter_regex, text_encoding=None, with_lines=False, closures=None):
+    """过滤按行对齐的原始字节；text_encoding 非空时按文本匹配。
+    with_lines=True 时额外返回保留行的行序号、块内字节偏移、块总行数与命中统计。"""
+    if text_encoding:
+        # surrogateescape 保证无法解码的字节原样写回
+        buffer = data.decode(text_encoding, errors='surrogateescape')
+    else:
+        buffer = data
+    output, spans, hits = filter_lines_in_buffer(buffer, keep_regex, filter_regex, closures)
+    if text_encoding:
+        output = output.encode(text_encoding, errors='surrogateescape')
+    if not with_lines:
+        return output
+    line_starts = buffer_line_starts(buffer)
+    ordinals = span_line_ordinals(line_starts, spans)
+    # 换行符在文本/字节中一一对应，字节偏移按同一行序号取
+    byte_starts = buffer_line_starts(data) if text_encoding else line_starts
+    return output, ordinals, byte_starts[ordinals], len(line_starts), hits
+
+
+def read_source_range(source, start, end):
+    """读取 [start, end) 字节。source 为普通文件路径，或日志集分段列表
+    [[路径, 虚拟起点, 长度, 补换行], ...]（由主进程按日志集布局解析好传入）"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+    parts = []
+    for path, segment_start, length, pad in source:
+        segment_end = segment_start + length + int(pad)
+        if segment_end <= start or segment_start >= end:
+            continue
+        local_start = max(start, segment_start) - segment_start
+        local_end = min(end, segment_end) - segment_start
+        if local_start < length:
+            with open(path, 'rb') as f:
+                f.seek(local_start)
+                data = f.read(min(local_end, length) - local_start)
+            if len(data) != min(local_end, length) - local_start:
+                raise RuntimeError(f"日志集分段已变化: {os.path.basename(path)}")
+            parts.append(data)
+        if local_end > length:
+            parts.append(b"\n")
+    return b"".join(parts)
+
+
+def filter_byte_range(source, start, end, keep_regex, filter_regex, text_encoding=None, closures=None):
+    """进程池工作函数：过滤源文件 [start, end) 区间，
+    返回 (命中行原始字节, 命中行在区间内的行序号, 区间内字节偏移, 区间总行数, 命中统计)"""
+    data = read_source_range(source, start, end)
+    return filter_bytes(data, keep_regex, filter_regex, text_encoding, with_lines=True, closures=closures)
+
+
+def filter_masked_bytes(data, ordinals, line_starts, line_ends, keep_regex, filter_regex, text_encoding=None,
+                        closures=None):
+    """只拼接区间字节 data 中被选中的行（区间内行序号 ordinals、块内起止偏移 line_starts/line_ends）
+    再按关键字过滤；返回值与 filter_byte_range 相同"""
+    buffer = b"".join([data[a:b] for a, b in zip(line_starts.tolist(), line_ends.tolist())])
+    output, picked, _, _, hits = filter_bytes(buffer, keep_regex, filter_regex, text_encoding, with_lines=True, closures=closures)
+    return output, ordinals[picked], line_starts[picked], int(ordinals[-1]) + 1 if len(ordinals) else 0, hits
+
+
+def filter_masked_range(source, start, end, ordinals, line_starts, line_ends, keep_regex, filter_regex,
+                        text_encoding=None, closures=None):
+    """进程池工作函数：读取源文件 [start, end) 区间后按 filter_masked_bytes 过滤"""
+    data = read_source_range(source, start, end)
+    return filter_masked_bytes(data, ordinals, line_starts, line_ends, keep_regex, filter_regex, text_encoding, closures)
+
+
+# ------------------- 字段分布统计 -------------------
+LOG_FIELDS_PATTERN = re.compile(
+    rb'^(?P<minute>\d{2}-\d{2}[ \t]+\d{2}:\d{2}):\d{2}\.\d{3}[ \t]+'
+    rb'(?:(?P<pid>\d+)[ \t]+(?P<tid>\d+)[ \t]+(?P<level>[VDIWEFA])[ \t]+(?P<tag>[^:\n]*?)[ \t]*:'
+    rb'|(?P<blevel>[VDIWEFA])/(?P<btag>[^(:\n]*?)[ \t]*(?:\([ \t]*(?P<bpid>\d+)\))?[ \t]*:)',
+    re.MULTILINE
+)
+
+
+def count_log_facets_bytes(data):
+    """统计一块按行对齐的日志字节：整块 findall 行头字段，返回各维度的精确计数"""
+    rows = LOG_FIELDS_PATTERN.findall(data)
+    counts = {"lines": data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0), "parsed": len(rows)}
+    if rows:
+        minute, pid, tid, level, tag, blevel, btag, bpid = zip(*rows)
+        counts["minute"] = Counter()
+        for key, count in Counter(minute).items():
+            counts["minute"][b" ".join(key.split())] += count
+        counts["level"] = Counter(level) + Counter(blevel)
+        counts["tag"] = Counter(tag) + Counter(btag)
+        counts["pid"] = Counter(pid) + Counter(bpid)
+        counts["tid"] = Counter(tid)
+        for name in ("level", "tag", "pid", "tid"):
+            counts[name].pop(b"", None)
+    return counts
+
+
+def count_log_facets_range(source, start, end):
+    """进程池工作函数：统计源文件 [start, end) 区间"""
+    return count_log_facets_bytes(read_source_range(source, start, end))
+
+
+# ------------------- 模板挖掘（Drain） -------------------
+# 行头前缀（时间戳 / 进程信息），app.py 的高亮与模板挖掘共用
+LOG_PREFIX_PATTERNS = [
+    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+[A-Z]\s+\w+\s*:\s*'),
+    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+[A-Z]\s*:\s*'),
+    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3}\s+[A-Z]/\w+\s*:\s*'),
+    re.compile(r'^\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?\s+'),
+    re.compile(r'^\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\s+'),
+    re.compile(r'^\d{2}:\d{2}:\d{2}\s+'),
+    re.compile(r'^\[\w+\]\s*\[\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\]\s+'),
+    re.compile(r'^\[\d{10,13}\]\s+'),
+]
+TEMPLATE_SIM_THRESHOLD = 0.5
+TEMPLATE_MAX_CLUSTERS = 20000  # 模板总数上限，超出后无法归入已有模板的行计入"其他"
+TEMPLATE_MAX_PER_BUCKET = 200
+TEMPLATE_MEMO_MAX = 200000  # 掩码后消息 -> 模板的缓存条数，重复消息免去桶内比较
+TEMPLATE_SAMPLES = 3
+TEMPLATE_PARAM = "<*>"
+TEMPLATE_PARAM_PATTERN = re.compile(r'\S*\d\S*')
+TEMPLATE_TAG_PATTERN = re.compile(r'(?:^|[\s/])([^\s/:]+)\s*:\s*$')  # 被去掉的行头末尾的 "Tag:"
+
+
+def strip_log_prefix(line):
+    """去掉行首的时间戳和进程信息，没有可识别前缀时原样返回"""
+    for pattern in LOG_PREFIX_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            return line[match.end():].strip()
+    return line
+
+
+class LogTemplateMiner:
+    """Drain 风格的流式模板聚类：clusters 中每项为 [模板词列表, 行数, 字节数, 样例行]"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.clusters = []
+        self.memo = {}
+        self.other_lines = 0
+        self.other_bytes = 0
+
+    def _match(self, bucket, tokens):
+        best, best_sim = None, -1.0
+        for cluster in bucket:
+            template = cluster[0]
+            same = sum(1 for t, s in zip(template, tokens) if t == s and t != TEMPLATE_PARAM)
+            params = sum(1 for t in template if t == TEMPLATE_PARAM)
+            sim = (same + params) / len(tokens) if tokens else 1.0
+            if sim > best_sim:
+                best, best_sim = cluster, sim
+        if best is None or best_sim < TEMPLATE_SIM_THRESHOLD:
+            return None
+        # 参数位之外相同词太少（如整行都是 <*>）时不归并
+        if tokens and sum(1 for t, s in zip(best[0], tokens) if t == s and t != TEMPLATE_PARAM) == 0:
+            return None
+        return best
+
+    def _cluster_for(self, masked):
+        """掩码后的消息 -> 所属模板（归入时把不同位置改为 <*>，否则新建）；模板数达到上限时返回 None"""
+        cluster = self.memo.get(masked)
+        if cluster is not None:
+            return cluster
+        tokens = masked.split()
+        bucket = self.buckets.setdefault((len(tokens), tokens[0] if tokens else ""), [])
+        cluster = self._match(bucket, tokens)
+        if cluster is not None:
+            cluster[0] = [t if t == s else TEMPLATE_PARAM for t, s in zip(cluster[0], tokens)]
+        elif len(self.clusters) < TEMPLATE_MAX_CLUSTERS and len(bucket) < TEMPLATE_MAX_PER_BUCKET:
+            cluster = [tokens, 0, 0, []]
+            bucket.append(cluster)
+            self.clusters.append(cluster)
+        else:
+            return None
+        if len(self.memo) >= TEMPLATE_MEMO_MAX:
+            self.memo.clear()
+        self.memo[masked] = cluster
+        return cluster
+
+    def _count(self, cluster, lines, size, samples):
+        if cluster is None:
+            self.other_lines += lines
+            self.other_bytes += size
+            return
+        cluster[1] += lines
+        cluster[2] += size
+        for sample in samples:
+            if len(cluster[3]) < TEMPLATE_SAMPLES and sample not in cluster[3]:
+                cluster[3].append(sample)
+
+    def add(self, tag, message, size, raw_line):
+        masked = TEMPLATE_PARAM_PATTERN.sub(TEMPLATE_PARAM, message)
+        if tag:
+            masked = f"{tag}: {masked}"  # Tag 含数字也不视为参数
+        self._count(self._cluster_for(masked), 1, size, (raw_line,))
+
+    def merge(self, chunk):
+        """并入分块挖掘的结果（mine_log_templates_bytes 的返回值）：各块模板按同样的相似度规则归入本矿工的模板"""
+        self.other_lines += chunk["other_lines"]
+        self.other_bytes += chunk["other_bytes"]
+        for tokens, lines, size, samples in chunk["clusters"]:
+            self._count(self._cluster_for(" ".join(tokens)), lines, size, samples)
+
+
+def mine_log_templates_bytes(data, encoding):
+    """挖掘一块按行对齐的日志字节，返回 {"lines", "bytes", "clusters", "other_lines", "other_bytes"}"""
+    miner = LogTemplateMiner()
+    raw_lines = data.split(b"\n")
+    if raw_lines and not raw_lines[-1]:
+        raw_lines.pop()
+    for raw in raw_lines:
+        line = raw.decode(encoding, errors="replace").rstrip("\r")
+        message = strip_log_prefix(line)
+        tag = None
+        if message is not line:
+            m = TEMPLATE_TAG_PATTERN.search(line, 0, line.find(message) if message else len(line))
+            tag = m.group(1) if m else None
+        miner.add(tag, message, len(raw) + 1, line[:300])
+    return {
+        "lines": len(raw_lines),
+        "bytes": len(data),
+        "clusters": miner.clusters,
+        "other_lines": miner.other_lines,
+        "other_bytes": miner.other_bytes,
+    }
+
+
+def mine_log_templates_range(source, start, end, encoding):
+    """进程池工作函数：挖掘源文件 [start, end) 区间的模板"""
+    return mine_log_templates_bytes(read_source_range(source, start, end), encoding)
@@ -0,0 +1,80 @@
+import importlib
+import os
+import sys
+import time
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    """在临时目录中导入 app，日志与索引都写到该目录下的 logs/、temp/"""
+    work_dir = tmp_path_factory.mktemp("work")
+    previous = os.getcwd()
+    os.chdir(work_dir)
+    os.makedirs("logs", exist_ok=True)
+    sys.path.insert(0, PROJECT_DIR)
+    try:
+        yield importlib.import_module("app")
+    finally:
+        sys.path.remove(PROJECT_DIR)
+        os.chdir(previous)
+
+
+@pytest.fixture
+def run_filter(app):
+    """启动过滤会话并等待结束，返回 (session_id, 任务, 结果字节)"""
+
+    def run(log_path, keep, exclude=(), backend="auto", timeout=60, **kwargs):
+        session_id = app._start_filter_session(log_path, list(keep), list(exclude), [], backend, **kwargs)
+        task = wait_filter(app, session_id, timeout)
+        assert task.get("status") == "finished", task.get("error")
+        with open(app.get_temp_file_path(session_id), "rb") as f:
+            return session_id, task, f.read()
+
+    yield run
+    app._clear_all_filter_tasks(delete_files=True)
+
+
+@pytest.fixture
+def python_engine(app, monkeypatch):
+    """强制使用 Python 过滤引擎，不调用外部 rg/grep"""
+    monkeypatch.setattr(app, "_resolve_filter_backend", lambda preferred_backend="auto": "python")
+
+
+def wait_filter(app, session_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        task = app._get_filter_task(session_id)
+        if task.get("finished") or task.get("status") in ("error", "cancelled"):
+            return task
+        time.sleep(0.02)
+    raise AssertionError(f"过滤超时: {session_id}")
+
+
+def write_log(name, lines, mode="w", encoding="utf-8"):
+    """在 logs/ 下写入日志，返回写入的文本行"""
+    with open(os.path.join("logs", name), mode, encoding=encoding, newline="") as f:
+        f.write("".join(lines))
+    return lines
+
+
+def reference_filter(lines, keep, exclude=()):
+    """参考实现：保留含任一保留词（不区分大小写）且不含任何排除词的行"""
+    keep = [k.lower() for k in keep]
+    exclude = [k.lower() for k in exclude]
+    return [
+        line for line in lines
+        if (not keep or any(k in line.lower() for k in keep)) and not any(k in line.lower() for k in exclude)
+    ]
+
+
+def logcat_lines(count, start=0):
+    """threadtime 格式的合成日志，级别 / Tag / PID / 消息内容按行号循环"""
+    return [
+        f"01-02 10:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 1000:03d}  {100 + i % 7}  {200 + i % 5} "
+        f"{'VDIWE'[i % 5]} Tag{i % 9}: message {i} {'foo' if i % 4 == 0 else 'bar'}\n"
+        for i in range(start, start + count)
+    ]
@@ -0,0 +1,69 @@
+import bz2
+import gzip
+import lzma
+import os
+import random
+
+import pytest
+
+from conftest import logcat_lines, reference_filter
+
+COMPRESSORS = {
+    "gz": gzip.compress,
+    "xz": lzma.compress,
+    "bz2": bz2.compress,
+}
+
+
+def write_compressed(name, lines, kind, parts=3):
+    """分成多个成员/流压缩后拼接，覆盖多成员 gzip、多流 xz 与多流 bz2"""
+    data = "".join(lines).encode("utf-8")
+    step = len(data) // parts + 1
+    with open(os.path.join("logs", name), "wb") as f:
+        for start in range(0, len(data), step):
+            f.write(COMPRESSORS[kind](data[start:start + step]))
+    return data
+
+
+@pytest.mark.parametrize("kind", sorted(COMPRESSORS))
+def test_random_seeks_return_source_bytes(app, monkeypatch, kind):
+    monkeypatch.setattr(app, "_COMPRESSED_CHECKPOINT_EVERY", 128 * 1024)
+    data = write_compressed(f"seek.log.{kind}", logcat_lines(40000), kind)
+    log_path = app.get_log_path(f"seek.log.{kind}")
+    rng = random.Random(kind)
+    with app._open_log_binary(log_path) as f:
+        assert f.seek(0, os.SEEK_END) == len(data)
+        for _ in range(60):
+            offset = rng.randrange(len(data))
+            size = rng.choice([1, 100, 5000, 300000])
+            f.seek(offset)
+            assert f.read(size) == data[offset:offset + size], offset
+        f.seek(len(data) - 10)
+        assert f.read(100) == data[-10:]
+        assert f.read(1) == b""
+
+
+@pytest.mark.parametrize("kind", sorted(COMPRESSORS))
+def test_filter_and_line_range_on_compressed_log(app, run_filter, kind):
+    lines = logcat_lines(20000)
+    write_compressed(f"filter.log.{kind}", lines, kind)
+    log_path = app.get_log_path(f"filter.log.{kind}")
+    session_id, task, output = run_filter(log_path, ["Tag6"], ["foo"])
+    expected = reference_filter(lines, ["Tag6"], ["foo"])
+    assert kind in task["backend"]
+    assert output.decode("utf-8") == "".join(expected)
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    assert [lines[n - 1] for n in source_map[:, 0]] == expected
+
+    content, _ = app.get_file_lines_range(log_path, 15001, 15003)
+    assert content.splitlines() == [line.rstrip("\n") for line in lines[15000:15003]]
+
+
+def test_truncated_gzip_keeps_decoded_prefix(app):
+    data = "".join(logcat_lines(5000)).encode("utf-8")
+    compressed = gzip.compress(data)
+    with open(os.path.join("logs", "truncated.log.gz"), "wb") as f:
+        f.write(compressed[:len(compressed) // 2])
+    with app._open_log_binary(app.get_log_path("truncated.log.gz")) as f:
+        prefix = f.read()
+    assert prefix and data.startswith(prefix)
@@ -0,0 +1,97 @@
+import functools
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def reference_context(lines, keep, exclude, before, after):
+    """参考实现：命中行前后各取若干行，重叠或相邻的段合并，段之间插入 "--" 分隔行；
+    返回 (输出行, 每行对应的源行号)，分隔行对应下一段的首行"""
+    hits = set(map(id, reference_filter(lines, keep, exclude)))
+    hunks = []
+    for i, line in enumerate(lines):
+        if id(line) not in hits:
+            continue
+        first, last = max(0, i - before), min(len(lines) - 1, i + after)
+        if hunks and first <= hunks[-1][1] + 1:
+            hunks[-1][1] = max(hunks[-1][1], last)
+        else:
+            hunks.append([first, last])
+    output, numbers = [], []
+    for n, (first, last) in enumerate(hunks):
+        if n:
+            output.append("--\n")
+            numbers.append(first + 1)
+        output.extend(lines[first:last + 1])
+        numbers.extend(range(first + 1, last + 2))
+    return output, numbers
+
+
+@pytest.fixture(scope="module")
+def source(app):
+    lines = logcat_lines(20000)
+    for i in (0, 3, 9, 10, 500, 19998):
+        lines[i] = lines[i].replace("message", "Needle message")
+    write_log("context.log", lines)
+    return app.get_log_path("context.log"), lines
+
+
+@pytest.mark.parametrize("context", [[2, 2], [0, 3], [4, 0], [1000, 1]])
+def test_hunks_and_separators(app, run_filter, monkeypatch, source, context):
+    log_path, lines = source
+    monkeypatch.setattr(app, "_PARALLEL_FILTER_CHUNK_BYTES", 32 * 1024)  # 段跨越多个读取块
+    session_id, task, output = run_filter(log_path, ["needle"], ["message 500 "], context=context)
+    expected, numbers = reference_context(lines, ["needle"], ["message 500 "], *context)
+    assert task["backend"].endswith("+context")
+    assert output.decode("utf-8") == "".join(expected)
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    assert source_map[:, 0].tolist() == numbers
+    assert task["keyword_hits"]["keep"]["needle"] == 5
+
+
+def test_dense_hits_across_pool_chunks(app, run_filter, monkeypatch, source):
+    log_path, lines = source
+    monkeypatch.setenv("LOG_FILTER_WORKERS", "2")
+    monkeypatch.setattr(app, "_PARALLEL_FILTER_MIN_BYTES", 0)
+    monkeypatch.setattr(app, "_split_newline_aligned_ranges",
+                        functools.partial(app._split_newline_aligned_ranges, chunk_bytes=64 * 1024))
+    app._reset_filter_process_pool()
+    try:
+        _, task, output = run_filter(log_path, ["Tag3: message 1"], [], context=[1, 2])
+    finally:
+        app._reset_filter_process_pool()
+    assert task["backend"].startswith("python-parallel(2)")
+    assert output.decode("utf-8") == "".join(reference_context(lines, ["Tag3: message 1"], [], 1, 2)[0])
+
+
+@pytest.mark.skipif(shutil.which("grep") is None, reason="grep 不可用")
+def test_matches_grep_context_output(app, run_filter, source):
+    log_path, _ = source
+    _, _, output = run_filter(log_path, ["tag7: message 19"], [], context=[3, 1])
+    grep = subprocess.run(["grep", "-i", "-F", "-B", "3", "-A", "1", "-e", "tag7: message 19", log_path],
+                          stdout=subprocess.PIPE, check=True)
+    assert output == grep.stdout
+
+
+def test_context_option_parsing(app):
+    assert app._normalize_context_lines("3") == [3, 3]
+    assert app._normalize_context_lines("2，5") == [2, 5]
+    assert app._normalize_context_lines([0, "4"]) == [0, 4]
+    assert app._normalize_context_lines("0") is None
+    assert app._normalize_context_lines("") is None
+    assert app._normalize_context_lines("99999") == [app._CONTEXT_MAX_LINES] * 2
+    with pytest.raises(ValueError):
+        app._normalize_context_lines("1,2,3")
+    with pytest.raises(ValueError):
+        app._normalize_context_lines("-1")
+
+
+def test_context_rejects_other_modes(app, source):
+    log_path, _ = source
+    with pytest.raises(ValueError):
+        app._start_filter_session(log_path, ["Tag1"], [], [], context="2", field_filter="level >= W")
+    with pytest.raises(ValueError):
+        app._start_filter_session(log_path, ["Tag1"], [], [], context="2", merge_paths=[log_path + ".other"])
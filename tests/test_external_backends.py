@@ -0,0 +1,40 @@
+import shutil
+
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+BACKENDS = [
+    pytest.param(name, marks=pytest.mark.skipif(shutil.which(name) is None, reason=f"{name} 不可用"))
+    for name in ("rg", "grep")
+]
+
+
+@pytest.fixture(scope="module")
+def source(app):
+    lines = write_log("external.log", logcat_lines(20000))
+    return app.get_log_path("external.log"), lines
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_single_pass_keep_and_exclude(app, run_filter, source, backend):
+    log_path, lines = source
+    session_id, task, output = run_filter(log_path, ["Tag3", "tag5"], ["foo", "message 1"], backend=backend)
+    expected = reference_filter(lines, ["Tag3", "tag5"], ["foo", "message 1"])
+    assert task["backend"] == backend
+    assert output.decode("utf-8") == "".join(expected)
+    hits = task["keyword_hits"]
+    assert hits["keep"]["Tag3"] == sum("tag3" in line.lower() for line in expected)
+    assert hits["filter"]["foo"] == sum(
+        "foo" in line for line in reference_filter(lines, ["Tag3", "tag5"])
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_single_pass_exclude_only(app, run_filter, source, backend):
+    log_path, lines = source
+    session_id, task, output = run_filter(log_path, [], ["Tag2", "foo"], backend=backend)
+    expected = reference_filter(lines, [], ["Tag2", "foo"])
+    assert output.decode("utf-8") == "".join(expected)
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    assert [lines[int(n) - 1] for n in source_map[:, 0]] == expected
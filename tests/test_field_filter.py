@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+LEVELS = "VDIWEFA"
+
+
+def mixed_lines(count):
+    """threadtime 行中穿插 brief 格式与无法解析的行"""
+    lines = []
+    for i, line in enumerate(logcat_lines(count)):
+        lines.append(line)
+        if i % 50 == 0:
+            lines.append(f"01-02 11:00:00.000 E/Brief Tag( {300 + i % 3}): brief {i}\n")
+        if i % 70 == 0:
+            lines.append(f"    at com.example.Frame{i}\n")
+    return lines
+
+
+def parse_reference(line):
+    """逐行解析出 (级别, Tag, pid, tid)，无法解析时返回 None"""
+    head = line.split()
+    if len(head) >= 6 and head[4] in LEVELS and head[5].endswith(":"):
+        return head[4], head[5][:-1], int(head[2]), int(head[3])
+    if len(head) >= 3 and "/" in head[2] and head[2][0] in LEVELS:
+        tag = line.split("/", 1)[1].split("(", 1)[0].strip()
+        return head[2][0], tag, int(line.split("(", 1)[1].split(")", 1)[0]), None
+    return None
+
+
+def reference_mask(lines, predicate):
+    return np.array([bool(fields) and predicate(*fields) for fields in map(parse_reference, lines)])
+
+
+@pytest.fixture(scope="module")
+def source(app):
+    lines = write_log("fields.log", mixed_lines(6000))
+    return app.get_log_path("fields.log"), lines
+
+
+@pytest.mark.parametrize("expr, predicate", [
+    ("level >= W", lambda level, tag, pid, tid: LEVELS.index(level) >= LEVELS.index("W")),
+    ("level = error and tag in {Tag1, 'Brief Tag'}",
+     lambda level, tag, pid, tid: level == "E" and tag in ("Tag1", "Brief Tag")),
+    ("tag not in {Tag0, Tag2} and (pid = 101 or tid != 203)",
+     lambda level, tag, pid, tid: tag not in ("Tag0", "Tag2") and (pid == 101 or (tid is not None and tid != 203))),
+    ("pid in {300, 302} || tag == Missing", lambda level, tag, pid, tid: pid in (300, 302)),
+])
+def test_mask_matches_reference_parser(app, source, expr, predicate):
+    log_path, lines = source
+    mask = app._evaluate_field_filter(log_path, expr)
+    assert mask.tolist() == reference_mask(lines, predicate).tolist()
+
+
+def test_not_is_exact_complement(app, source):
+    log_path, lines = source
+    below_info = app._evaluate_field_filter(log_path, "level < I")
+    assert below_info.tolist() == reference_mask(lines, lambda level, tag, pid, tid: level in "VD").tolist()
+    # 无法解析的行不满足任何级别比较，取反后被选中
+    assert app._evaluate_field_filter(log_path, "not level < I").tolist() == (~below_info).tolist()
+
+
+@pytest.mark.parametrize("expr", ["", "level >=", "colour = red", "tag > Tag1", "pid = abc", "level = Q", "(level = W"])
+def test_invalid_expressions_rejected(app, expr):
+    with pytest.raises(ValueError):
+        app._FieldFilterParser(expr).parse()
+
+
+def test_filter_run_with_field_clause(app, run_filter, source):
+    log_path, lines = source
+    _, task, output = run_filter(log_path, ["message 1"], ["foo"], field_filter="level >= W and tag != Tag3")
+    fields_ok = reference_mask(lines, lambda level, tag, pid, tid: level in "WEFA" and tag != "Tag3")
+    expected = reference_filter([line for line, ok in zip(lines, fields_ok) if ok], ["message 1"], ["foo"])
+    assert "fields" in task["backend"]
+    assert output.decode("utf-8") == "".join(expected)
+
+
+def test_columns_rebuilt_after_source_change(app):
+    lines = write_log("fields_grow.log", logcat_lines(300))
+    log_path = app.get_log_path("fields_grow.log")
+    assert app._evaluate_field_filter(log_path, "tag = Tag8").sum() == sum("Tag8:" in line for line in lines)
+    lines += write_log("fields_grow.log", logcat_lines(200, start=300), mode="a")
+    assert app._evaluate_field_filter(log_path, "tag = Tag8").sum() == sum("Tag8:" in line for line in lines)
@@ -0,0 +1,41 @@
+import os
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def test_identical_rerun_hits_cache(app, run_filter):
+    lines = write_log("cache.log", logcat_lines(3000))
+    log_path = app.get_log_path("cache.log")
+    session_id, task, output = run_filter(log_path, ["Tag1", "Tag2"], ["foo"])
+    assert task["backend"] != "cache"
+    assert output.decode("utf-8") == "".join(reference_filter(lines, ["Tag1", "Tag2"], ["foo"]))
+
+    app._clear_all_filter_tasks(delete_files=False)
+    again, task, cached = run_filter(log_path, ["tag2", "TAG1", "tag1"], ["FOO"])
+    assert again == session_id
+    assert task["backend"] == "cache"
+    assert task["done_lines"] == len(cached.splitlines())
+    assert cached == output
+
+
+def test_changed_source_gets_new_session(app, run_filter):
+    lines = write_log("cache_grow.log", logcat_lines(1000))
+    log_path = app.get_log_path("cache_grow.log")
+    session_id, _, _ = run_filter(log_path, ["Tag3"])
+    lines += write_log("cache_grow.log", logcat_lines(500, start=1000), mode="a")
+    grown, task, output = run_filter(log_path, ["Tag3"])
+    assert grown != session_id
+    assert task["backend"] != "cache"
+    assert output.decode("utf-8") == "".join(reference_filter(lines, ["Tag3"]))
+
+
+def test_budget_evicts_only_unregistered_results(app, run_filter):
+    write_log("cache_budget.log", logcat_lines(1000))
+    log_path = app.get_log_path("cache_budget.log")
+    old, _, _ = run_filter(log_path, ["Tag4"])
+    app._clear_all_filter_tasks(delete_files=False)
+    kept, _, _ = run_filter(log_path, ["Tag5"])
+    app._enforce_filter_cache_budget(max_bytes=0)
+    assert app._filter_session_files(old) == []
+    assert os.path.exists(app.get_temp_file_path(kept))
+    assert app._load_cached_filter_result(kept) is not None
@@ -0,0 +1,84 @@
+import functools
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import logcat_lines, wait_filter, write_log
+
+SLEEPER = [sys.executable, "-c", "import sys, time\nprint('hit', flush=True)\ntime.sleep(60)\n"]
+
+
+@pytest.fixture
+def token(app):
+    session_id = "cancel-token-test"
+    token = app._FilterCancelToken()
+    with app._filter_cancel_tokens_lock:
+        app._filter_cancel_tokens[session_id] = token
+    yield session_id, token
+    with app._filter_cancel_tokens_lock:
+        app._filter_cancel_tokens.pop(session_id, None)
+
+
+def test_token_kills_registered_and_late_processes(app):
+    token = app._FilterCancelToken()
+    running = subprocess.Popen(SLEEPER, stdout=subprocess.DEVNULL)
+    token.register(running)
+    token.cancel()
+    assert running.wait(timeout=5) != 0
+    late = subprocess.Popen(SLEEPER, stdout=subprocess.DEVNULL)
+    token.register(late)
+    assert late.wait(timeout=5) != 0
+    assert token.cancelled()
+
+
+def test_cancel_interrupts_external_command(app, token):
+    session_id, cancel_token = token
+    blocks = []
+
+    def on_block(block):
+        blocks.append(block)
+        threading.Timer(0.1, cancel_token.cancel).start()
+
+    started = time.time()
+    with pytest.raises(RuntimeError, match="任务已取消"):
+        app._read_command_blocks(SLEEPER, "python", on_block, session_id=session_id)
+    assert blocks == [b"hit\n"]
+    assert time.time() - started < 10
+    assert not cancel_token._processes
+
+
+def test_clear_stops_running_filter_and_removes_partial_files(app, python_engine, monkeypatch):
+    write_log("cancel.log", logcat_lines(40000))
+    log_path = app.get_log_path("cancel.log")
+    monkeypatch.setattr(app, "_split_newline_aligned_ranges",
+                        functools.partial(app._split_newline_aligned_ranges, chunk_bytes=64 * 1024))
+    published, release = threading.Event(), threading.Event()
+    original = app._update_filter_task
+
+    def pause_on_progress(session_id, **kwargs):
+        original(session_id, **kwargs)
+        if kwargs.get("done_lines") and not kwargs.get("finished"):
+            published.set()
+            release.wait(10)
+
+    monkeypatch.setattr(app, "_update_filter_task", pause_on_progress)
+    session_id = app._start_filter_session(log_path, ["Tag1"], [], [], "auto")
+    try:
+        assert published.wait(10)
+        worker = app._get_filter_cancel_token(session_id).thread
+        app._clear_filter_task(session_id)
+    finally:
+        release.set()
+    worker.join(10)
+    assert not worker.is_alive()
+    assert app._get_filter_task(session_id) == {}
+    assert app._filter_session_files(session_id) == []
+
+    monkeypatch.setattr(app, "_update_filter_task", original)
+    again = app._start_filter_session(log_path, ["Tag1"], [], [], "auto")
+    assert again == session_id
+    assert wait_filter(app, again)["status"] == "finished"
+    app._clear_all_filter_tasks(delete_files=True)
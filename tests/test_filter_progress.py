@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import logcat_lines, write_log
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fdinfo"), reason="需要 /proc")
+def test_child_read_offset_from_proc(app, tmp_path):
+    source = tmp_path / "probe.bin"
+    source.write_bytes(b"x" * 100000)
+    script = "import sys, time\nf = open(sys.argv[1], 'rb', buffering=0)\nf.read(12345)\nprint('ok', flush=True)\ntime.sleep(30)\n"
+    proc = subprocess.Popen([sys.executable, "-c", script, str(source)], stdout=subprocess.PIPE)
+    try:
+        assert proc.stdout.readline() == b"ok\n"
+        assert app._read_child_file_offset(proc.pid, os.path.realpath(source)) == 12345
+        assert app._read_child_file_offset(proc.pid, os.path.realpath(tmp_path / "other.bin")) is None
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+
+def test_byte_based_progress_text(app):
+    mb = 1024 * 1024
+    task = {"status": "running", "done_lines": 10, "done_bytes": 25 * mb, "total_bytes": 100 * mb,
+            "bytes_per_sec": 5 * mb, "lines_per_sec": 2.0, "eta_seconds": 15}
+    percent, text = app._format_filter_progress(task)
+    assert percent == 25
+    assert "5.0 MB/s" in text and "剩余约 15 秒" in text
+
+    percent, text = app._format_filter_progress(dict(task, progress_indeterminate=True))
+    assert percent is None
+    assert "已扫描至少" in text and "剩余" not in text and "MB/s" not in text
+
+    percent, _ = app._format_filter_progress(dict(task, progress_indeterminate=True, finished=True, done_bytes=100 * mb))
+    assert percent == 100
+
+
+def test_finished_task_reports_all_bytes(app, run_filter):
+    write_log("progress.log", logcat_lines(5000))
+    log_path = app.get_log_path("progress.log")
+    _, task, _ = run_filter(log_path, ["Tag1"])
+    assert task["total_bytes"] == os.path.getsize(log_path)
+    assert task["done_bytes"] == task["total_bytes"]
+    assert task["bytes_per_sec"] > 0
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def scheduler(app):
+    """单并发调度器，首个任务阻塞到测试放行，其余任务按出队顺序记录"""
+    scheduler = app._FilterJobScheduler(1)
+    order = []
+    release = threading.Event()
+    done = threading.Event()
+
+    def job(name, last=False):
+        if name == "blocker":
+            release.wait(10)
+        order.append(name)
+        if last:
+            done.set()
+
+    scheduler.submit("blocker", job, ("blocker",), 0)
+    yield scheduler, job, order, release, done
+    release.set()
+
+
+def test_priority_order_and_positions(app, scheduler):
+    scheduler, job, order, release, done = scheduler
+    scheduler.submit("compare", job, ("compare",), app._FILTER_PRIORITY_BACKGROUND)
+    scheduler.submit("view", job, ("view",), app._FILTER_PRIORITY_INTERACTIVE)
+    scheduler.submit("ai", job, ("ai", True), app._FILTER_PRIORITY_BACKGROUND + 1)
+    assert scheduler.position("blocker") is None
+    assert [scheduler.position(name) for name in ("view", "compare", "ai")] == [1, 2, 3]
+    release.set()
+    assert done.wait(10)
+    assert order == ["blocker", "view", "compare", "ai"]
+
+
+def test_promote_and_discard(app, scheduler, monkeypatch):
+    scheduler, job, order, release, done = scheduler
+    background = app._FILTER_PRIORITY_BACKGROUND
+    scheduler.submit("first", job, ("first",), background)
+    scheduler.submit("second", job, ("second",), background)
+    scheduler.submit("dropped", job, ("dropped",), background)
+    scheduler.submit("last", job, ("last", True), background)
+    scheduler.promote("second", app._FILTER_PRIORITY_INTERACTIVE)
+    scheduler.promote("first", background + 5)  # 降低优先级的请求不生效
+    assert scheduler.position("second") == 1
+    assert scheduler.discard("dropped") and not scheduler.discard("dropped")
+
+    monkeypatch.setattr(app, "_filter_job_scheduler", scheduler)
+    app._init_filter_task("last", "x.log", [], [], [])
+    app._update_filter_task("last", status="queued")
+    _, text = app._format_filter_progress(app._get_filter_task("last"), "last")
+    assert text == "排队中：前面还有 2 个任务"
+
+    release.set()
+    assert done.wait(10)
+    assert order == ["blocker", "second", "first", "last"]
+    with app._filter_tasks_lock:
+        app._filter_tasks.pop("last", None)
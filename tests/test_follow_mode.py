@@ -0,0 +1,89 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def _index_offsets(idx_path, meta):
+    with open(idx_path, "rb") as f:
+        return np.frombuffer(f.read(meta["entries"] * 8), dtype="<u8").tolist()
+
+
+@pytest.mark.parametrize("stride", [1, 3, 16])
+def test_append_line_index_matches_rebuild(app, stride):
+    first = "".join(logcat_lines(101)).encode("utf-8")
+    second = "".join(logcat_lines(58, start=101)).encode("utf-8")
+    path = os.path.join("logs", f"append_{stride}.log")
+    idx_path = f"{path}.idx"
+    with open(path, "wb") as f:
+        f.write(first)
+    app._write_line_index_for_file(path, idx_path, "utf-8", stride=stride)
+    with open(path, "ab") as f:
+        f.write(second)
+    appended = app._append_line_index(idx_path, second, keyword_hits={"keep": {"x": 1}})
+
+    rebuilt_path = f"{path}.rebuilt.idx"
+    rebuilt = app._write_line_index_for_file(path, rebuilt_path, "utf-8", stride=stride)
+    for field in ("line_count", "entries", "end_offset", "stride"):
+        assert appended[field] == rebuilt[field]
+    assert app._read_line_index_meta(idx_path)["keyword_hits"] == {"keep": {"x": 1}}
+    assert _index_offsets(idx_path, appended) == _index_offsets(rebuilt_path, rebuilt)
+    assert app._open_line_index(idx_path).line_span(159) == app._open_line_index(rebuilt_path).line_span(159)
+
+
+def test_follow_appends_only_new_matches(app, run_filter):
+    lines = write_log("follow.log", logcat_lines(3000))
+    log_path = app.get_log_path("follow.log")
+    session_id, _, _ = run_filter(log_path, ["Tag2", "Tag4"], ["foo"])
+    assert app._follow_filter_session(session_id)[1] == 0
+
+    lines += write_log("follow.log", logcat_lines(700, start=3000), mode="a")
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write("01-02 11:00:00.000  1  2 I Tag2: unfinished")  # 末行未写完，不参与本轮过滤
+    total, appended = app._follow_filter_session(session_id)
+    expected = reference_filter(lines, ["Tag2", "Tag4"], ["foo"])
+    assert total == len(expected)
+    assert appended == len(reference_filter(lines[3000:], ["Tag2", "Tag4"], ["foo"]))
+
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(" now\n")
+    lines.append("01-02 11:00:00.000  1  2 I Tag2: unfinished now\n")
+    expected = reference_filter(lines, ["Tag2", "Tag4"], ["foo"])
+    assert app._follow_filter_session(session_id) == (len(expected), 1)
+
+    temp_file = app.get_temp_file_path(session_id)
+    with open(temp_file, encoding="utf-8") as f:
+        assert f.read() == "".join(expected)
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(temp_file))
+    assert [lines[n - 1] for n in source_map[:, 0]] == expected
+    assert app._get_filter_task(session_id)["keyword_hits"]["keep"]["Tag2"] == sum("Tag2" in line for line in expected)
+    content, _ = app.get_file_lines_range(temp_file, len(expected) - 1, len(expected))
+    assert content.splitlines() == [line.rstrip("\n") for line in expected[-2:]]
+    assert app._get_filter_session_source(session_id) == log_path
+
+
+def test_follow_detects_truncation(app, run_filter):
+    write_log("follow_rotated.log", logcat_lines(500))
+    log_path = app.get_log_path("follow_rotated.log")
+    session_id, _, _ = run_filter(log_path, ["Tag1"])
+    app._follow_filter_session(session_id)
+    write_log("follow_rotated.log", logcat_lines(10))
+    with pytest.raises(RuntimeError, match="截断或轮转"):
+        app._follow_filter_session(session_id)
+
+
+def test_stream_capture_refuses_existing_names(app):
+    write_log("captured.log", ["existing\n"])
+    with pytest.raises(ValueError):
+        app._start_stdin_capture("captured.log")
+    with pytest.raises(ValueError):
+        app._start_stdin_capture("  ")
+    log_file = open(os.path.join("logs", "piped.log"), "xb")
+    app._capture_stream_to_log(io.BytesIO(b"a\nb\n" * 50000), log_file)
+    with open(os.path.join("logs", "piped.log"), "rb") as f:
+        assert f.read() == b"a\nb\n" * 50000
+    with open(os.path.join("logs", "captured.log"), encoding="utf-8") as f:
+        assert f.read() == "existing\n"
@@ -0,0 +1,36 @@
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def test_overlapping_keywords_each_counted_once_per_line(app):
+    terms = ["abcd", "cdef", "bc", "ABCD"]
+    regex = app._compile_literal_regex(terms)
+    closure = app._keyword_hit_closure(terms)
+    counts = {}
+    app._count_line_hits("xxabcdefxx abcd\nnothing\ncdef bc\nBC", regex, closure, counts)
+    assert counts == {"abcd": 1, "cdef": 2, "bc": 3}
+    hits = app._resolve_keyword_hits(terms, ["zz"], counts, {})
+    assert hits == {"keep": {"abcd": 1, "cdef": 2, "bc": 3, "ABCD": 1}, "filter": {"zz": 0}}
+
+
+@pytest.mark.parametrize("engine", ["python", "auto"])
+def test_filter_run_reports_hits(app, run_filter, request, engine):
+    if engine == "python":
+        request.getfixturevalue("python_engine")
+    lines = write_log(f"hits_{engine}.log", logcat_lines(5000))
+    log_path = app.get_log_path(f"hits_{engine}.log")
+    keep = ["message 1", "message 12", "age 1", "Tag6", "nowhere"]
+    exclude = ["foo", "message 12", "Tag6: message 1"]
+    session_id, task, output = run_filter(log_path, keep, exclude)
+    expected = reference_filter(lines, keep, exclude)
+    assert output.decode("utf-8") == "".join(expected)
+
+    kept_before_exclude = reference_filter(lines, keep)
+    hits = task["keyword_hits"]
+    assert hits["keep"] == {term: sum(term.lower() in line.lower() for line in expected) for term in keep}
+    assert hits["filter"] == {
+        term: sum(term.lower() in line.lower() for line in kept_before_exclude) for term in exclude
+    }
+    meta = app._read_line_index_meta(app.get_temp_index_path(app.get_temp_file_path(session_id)))
+    assert meta["keyword_hits"] == hits
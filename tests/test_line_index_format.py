@@ -0,0 +1,45 @@
+import os
+import struct
+
+import numpy as np
+
+
+def _write(name, data):
+    path = os.path.join("logs", name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_binary_index_layout_and_offsets(app):
+    data = b"".join(b"line %d\n" % i for i in range(1000)) + b"tail without newline"
+    path = _write("dense.log", data)
+    idx_path = os.path.join("logs", "dense.idx")
+
+    meta = app._write_line_index_for_file(path, idx_path, "utf-8", stride=1)
+    assert meta["line_count"] == 1001 and meta["end_offset"] == len(data)
+
+    raw = open(idx_path, "rb").read()
+    assert raw[-8:] == app._LINE_INDEX_MAGIC
+    meta_len = struct.unpack("<Q", raw[-16:-8])[0]
+    offsets = np.frombuffer(raw[:meta["entries"] * 8], dtype="<u8")
+    expected = [0] + [i + 1 for i, byte in enumerate(data) if byte == 10]
+    assert offsets.tolist() == expected
+    assert len(raw) == meta["entries"] * 8 + meta_len + 16
+
+    line_index = app._open_line_index(idx_path)
+    assert line_index.line_span(1001) == (expected[-1], len(data))
+    assert app._read_line_index_meta(idx_path)["line_count"] == 1001
+
+
+def test_strided_index_seek_points(app):
+    data = b"".join(b"%d\n" % i for i in range(100))
+    path = _write("strided.log", data)
+    idx_path = os.path.join("logs", "strided.idx")
+    app._write_line_index_for_file(path, idx_path, "utf-8", stride=16)
+
+    line_index = app._open_line_index(idx_path)
+    assert line_index.stride == 16 and line_index.line_span(5) is None
+    line_no, offset = line_index.seek_point(40)
+    assert line_no == 33
+    assert data[offset:].split(b"\n", 1)[0] == b"32"
@@ -0,0 +1,39 @@
+import random
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def _random_terms(rng, count):
+    alphabet = "abcXYZ.*+?()[]|^$\\ 中文"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))) for _ in range(count)]
+
+
+def test_trie_regex_matches_naive_search(app):
+    rng = random.Random(11)
+    terms = _random_terms(rng, 500)
+    regex = app._compile_literal_regex(terms)
+    byte_regex = app._compile_literal_regex(terms, encoding="utf-8")
+    lowered = [term.lower() for term in terms]
+    for _ in range(2000):
+        text = "".join(rng.choice("abcxyzABC.*+?()[]|^$\\ 中文") for _ in range(rng.randint(0, 20)))
+        expected = any(term in text.lower() for term in lowered)
+        assert bool(regex.search(text)) == expected, text
+        assert bool(byte_regex.search(text.encode("utf-8"))) == expected, text
+
+
+def test_longest_keyword_wins_and_reports_original_spelling(app):
+    matcher = app._LiteralMatcher(["Error", "ERROR code", "err", "", "error"])
+    assert [m.group(0) for m in matcher.finditer("an error code, an ERR")] == ["error code", "ERR"]
+    assert matcher.keyword_for("error CODE") == "ERROR code"
+    assert matcher.keyword_for("ERR") == "err"
+    assert app._LiteralMatcher([]).search("anything") is None
+
+
+def test_hundreds_of_keywords_filter(app, run_filter, python_engine):
+    lines = write_log("literals.log", logcat_lines(6000))
+    log_path = app.get_log_path("literals.log")
+    keep = [f"message {i}1" for i in range(300)] + ["tag8:"]
+    exclude = [f"message {i}7" for i in range(0, 600, 3)] + ["(", "[x]"]
+    _, task, output = run_filter(log_path, keep, exclude)
+    assert task["backend"] == "python"
+    assert output.decode("utf-8") == "".join(reference_filter(lines, keep, exclude))
@@ -0,0 +1,71 @@
+import functools
+import os
+import random
+from collections import Counter
+
+from conftest import logcat_lines, write_log
+
+
+def expected_facets(count):
+    """logcat_lines 各维度的精确计数"""
+    return {
+        "tag": Counter(f"Tag{i % 9}" for i in range(count)),
+        "pid": Counter(str(100 + i % 7) for i in range(count)),
+        "tid": Counter(str(200 + i % 5) for i in range(count)),
+        "level": Counter("VDIWE"[i % 5] for i in range(count)),
+        "minute": Counter(f"01-02 10:{(i // 60) % 60:02d}" for i in range(count)),
+    }
+
+
+def test_facets_exact_for_small_logs(app):
+    write_log("facets.log", logcat_lines(5000) + ["    continuation line\n"])
+    facets = app._get_log_facets(app.get_log_path("facets.log"))
+    expected = expected_facets(5000)
+    assert facets["lines"] == 5001 and facets["parsed"] == 5000
+    for name in ("tag", "pid", "tid"):
+        assert dict(facets[name]) == dict(expected[name])
+        assert facets[f"{name}_error"] == 0
+    assert dict(facets["levels"]) == dict(expected["level"])
+    assert [level for level, _ in facets["levels"]] == ["V", "D", "I", "W", "E"]
+    assert dict(facets["timeline"]) == dict(expected["minute"])
+    assert facets["timeline_bucket"] == "minute"
+
+
+def test_pool_counts_match_local(app, monkeypatch):
+    write_log("facets_pool.log", logcat_lines(20000))
+    log_path = app.get_log_path("facets_pool.log")
+    monkeypatch.setattr(app, "_split_newline_aligned_ranges",
+                        functools.partial(app._split_newline_aligned_ranges, chunk_bytes=64 * 1024))
+    local = app._get_log_facets(log_path)
+    os.remove(app._get_log_facets_path(app.get_source_index_path(log_path)))
+    monkeypatch.setenv("LOG_FILTER_WORKERS", "2")
+    monkeypatch.setattr(app, "_PARALLEL_FILTER_MIN_BYTES", 0)
+    app._reset_filter_process_pool()
+    try:
+        pooled = app._get_log_facets(log_path)
+    finally:
+        app._reset_filter_process_pool()
+    assert pooled == local
+    assert dict(pooled["tag"]) == dict(expected_facets(20000)["tag"])
+
+
+def test_heavy_hitters_bounds(app):
+    rng = random.Random(19)
+    truth = Counter()
+    sketch = app._HeavyHitters(capacity=20)
+    for _ in range(50):
+        block = Counter({f"hot{i}": rng.randint(200, 300) for i in range(5)})
+        block.update(f"cold{rng.randrange(5000)}" for _ in range(200))
+        truth.update(block)
+        sketch.update(block)
+    assert sketch.error > 0
+    assert len(sketch.counts) <= 20
+    for key, count in sketch.counts.items():
+        assert count <= truth[key] <= count + sketch.error
+    assert {key for key, _ in sketch.top(5)} == {f"hot{i}" for i in range(5)}
+
+
+def test_facet_field_clause(app):
+    assert app._facet_field_clause("level", "W") == "level = W"
+    assert app._facet_field_clause("pid", "1234", exclude=True) == "pid != 1234"
+    app._normalize_field_filter(app._facet_field_clause("tid", "5", exclude=True))
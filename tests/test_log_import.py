@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from conftest import logcat_lines
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    root = tmp_path / "device"
+    (root / "sub").mkdir(parents=True)
+    (root / "logcat.log").write_text("".join(logcat_lines(200)), encoding="utf-8")
+    (root / "sub" / "kernel.txt").write_text("".join(logcat_lines(50)), encoding="utf-8")
+    (root / "notes.md").write_text("not a log", encoding="utf-8")
+    return root
+
+
+def _manifest_entry(app, filename):
+    return app._load_import_manifest().get(filename)
+
+
+def test_auto_mode_hardlinks_and_detects_changes(app, source_dir):
+    imported = app.import_log_source_path(str(source_dir), mode="auto")
+    assert sorted(imported) == ["device/logcat.log", "device/sub/kernel.txt"]
+    src = source_dir / "logcat.log"
+    dest = app.get_log_path("device/logcat.log")
+    assert os.path.samefile(src, dest)
+    entry = _manifest_entry(app, "device/logcat.log")
+    assert entry["mode"] == "hardlink" and entry["source"] == str(src)
+    assert app._get_imported_log_status(entry) == "ok"
+
+    with open(src, "a", encoding="utf-8") as f:
+        f.write("appended\n")
+    assert app._get_imported_log_status(entry) == "changed"
+
+
+def test_reference_mode_symlinks_and_detects_missing_source(app, source_dir):
+    imported = app.import_log_source_path(str(source_dir / "logcat.log"), mode="reference")
+    assert len(imported) == 1
+    dest = app.get_log_path(imported[0])
+    assert os.path.islink(dest) and os.readlink(dest) == str(source_dir / "logcat.log")
+    entry = _manifest_entry(app, imported[0])
+    assert entry["mode"] == "symlink"
+    os.remove(source_dir / "logcat.log")
+    assert app._get_imported_log_status(entry) == "missing"
+
+
+def test_copy_mode_is_independent(app, source_dir):
+    imported = app.import_log_source_path(str(source_dir / "sub" / "kernel.txt"), mode="copy")
+    dest = app.get_log_path(imported[0])
+    assert not os.path.samefile(source_dir / "sub" / "kernel.txt", dest)
+    with open(dest, encoding="utf-8") as f:
+        assert f.read() == "".join(logcat_lines(50))
+    assert _manifest_entry(app, imported[0]) is None
+    assert app._get_imported_log_status(None) is None
+
+
+def test_forget_and_rename_manifest_entries(app, source_dir):
+    app.import_log_source_path(str(source_dir), mode="auto")
+    app._forget_imported_logs("device", new_prefix="renamed")
+    manifest = app._load_import_manifest()
+    assert "renamed/sub/kernel.txt" in manifest and "device/sub/kernel.txt" not in manifest
+    app._forget_imported_logs("renamed")
+    assert not any(key.startswith("renamed/") for key in app._load_import_manifest())
@@ -0,0 +1,68 @@
+import gzip
+import json
+import os
+import random
+
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+@pytest.fixture(scope="module")
+def rotated(app):
+    """logcat.2（gzip）、logcat.1（末行缺换行）、logcat 三个轮转分段，按从旧到新拼接"""
+    lines = logcat_lines(9000)
+    os.makedirs(os.path.join("logs", "dump"), exist_ok=True)
+    with open(os.path.join("logs", "dump", "logcat.2.gz"), "wb") as f:
+        f.write(gzip.compress("".join(lines[:3000]).encode("utf-8")))
+    write_log("dump/logcat.1", lines[3000:5999] + [lines[5999].rstrip("\n")])
+    write_log("dump/logcat", lines[6000:])
+    write_log("dump/other.log", ["unrelated\n"])
+    return lines
+
+
+def test_create_log_sets_orders_segments(app, rotated):
+    assert app._create_log_sets("dump") == ["dump/logcat" + app.LOG_SET_EXTENSION]
+    with open(app.get_log_path("dump/logcat" + app.LOG_SET_EXTENSION), encoding="utf-8") as f:
+        assert json.load(f)["segments"] == ["logcat.2.gz", "logcat.1", "logcat"]
+
+
+def test_virtual_stream_and_line_ranges(app, rotated):
+    app._create_log_sets("dump")
+    log_path = app.get_log_path("dump/logcat" + app.LOG_SET_EXTENSION)
+    data = "".join(rotated).encode("utf-8")
+    layout = app._get_log_set_layout(log_path)
+    assert layout["size"] == len(data)
+    assert [segment[4] for segment in layout["segments"]] == [False, True, False]
+    rng = random.Random(22)
+    with app._open_log_binary(log_path) as f:
+        assert f.read() == data
+        for offset in [layout["starts"][1] - 5, layout["starts"][2] - 1] + [rng.randrange(len(data)) for _ in range(30)]:
+            f.seek(offset)
+            assert f.read(4000) == data[offset:offset + 4000]
+    content, _ = app.get_file_lines_range(log_path, 5999, 6002)
+    assert content.splitlines() == [line.rstrip("\n") for line in rotated[5998:6002]]
+
+
+def test_filter_and_search_across_segments(app, run_filter, rotated):
+    app._create_log_sets("dump")
+    log_path = app.get_log_path("dump/logcat" + app.LOG_SET_EXTENSION)
+    session_id, _, output = run_filter(log_path, ["Tag5"], ["foo"])
+    expected = reference_filter(rotated, ["Tag5"], ["foo"])
+    assert output.decode("utf-8") == "".join(expected)
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    assert [rotated[n - 1] for n in source_map[:, 0]] == expected
+
+    result = app._scan_search_matches_binary(log_path, "message 5999 ", ["utf-8"], False)
+    assert result["matches"] == [6000]
+
+
+def test_changed_segment_refreshes_layout(app, rotated):
+    app._create_log_sets("dump")
+    log_path = app.get_log_path("dump/logcat" + app.LOG_SET_EXTENSION)
+    before = app._get_log_set_layout(log_path)["size"]
+    extra = write_log("dump/logcat", logcat_lines(5, start=9000), mode="a")
+    try:
+        assert app._get_log_set_layout(log_path)["size"] == before + len("".join(extra))
+    finally:
+        write_log("dump/logcat", rotated[6000:])
@@ -0,0 +1,83 @@
+import functools
+import os
+import time
+
+from conftest import write_log
+
+
+def template_lines(count):
+    """三种消息模板按行号循环，数字参数各不相同"""
+    lines = []
+    for i in range(count):
+        head = f"01-02 10:{(i // 60) % 60:02d}:{i % 60:02d}.000  {100 + i % 3}  {200 + i % 3} I "
+        if i % 4 == 0:
+            lines.append(head + f"Wifi: scan finished with {i % 17} results in {i * 7 % 300} ms\n")
+        elif i % 4 == 3:
+            lines.append(head + f"Audio: underrun on track {i % 5}\n")
+        else:
+            lines.append(head + f"Net: heartbeat seq={i} ok\n")
+    return lines
+
+
+def _summary(templates):
+    return sorted((item["template"], item["lines"], item["bytes"]) for item in templates["templates"])
+
+
+def test_templates_group_lines_and_offer_keywords(app):
+    lines = write_log("templates.log", template_lines(4000))
+    templates = app._get_log_templates(app.get_log_path("templates.log"))
+    assert templates["lines"] == 4000
+    assert templates["clusters"] == 3 and templates["other_lines"] == 0
+    assert sorted(item["lines"] for item in templates["templates"]) == [1000, 1000, 2000]
+    assert sum(item["bytes"] for item in templates["templates"]) == sum(len(line) for line in lines)
+    for item in templates["templates"]:
+        assert app._TEMPLATE_PARAM in item["template"]
+        keyword = item["keyword"]
+        assert keyword and all(keyword in sample for sample in item["samples"])
+        assert sum(keyword in line for line in lines) == item["lines"]
+
+
+def test_chunked_mining_matches_single_pass(app, monkeypatch):
+    write_log("templates_chunks.log", template_lines(20000))
+    log_path = app.get_log_path("templates_chunks.log")
+    single = app._get_log_templates(log_path)
+    os.remove(app._get_log_templates_path(app.get_source_index_path(log_path)))
+    monkeypatch.setattr(app, "_split_newline_aligned_ranges",
+                        functools.partial(app._split_newline_aligned_ranges, chunk_bytes=64 * 1024))
+    progress = []
+    chunked = app._get_log_templates(log_path, on_progress=progress.append)
+    assert len(progress) > 5 and progress[-1] == chunked["bytes"]
+    assert _summary(chunked) == _summary(single)
+
+
+def test_background_view_polls_until_ready(app):
+    write_log("templates_bg.log", template_lines(3000))
+    body, done = app._log_templates_view("templates_bg.log", start=True)
+    deadline = time.time() + 30
+    while not done and time.time() < deadline:
+        time.sleep(0.05)
+        body, done = app._log_templates_view("templates_bg.log")
+    assert done
+    assert app._get_log_templates_build(app.get_log_path("templates_bg.log")) == {}
+    assert "Wifi" in str(body) and "正在" not in str(body)
+
+    body, done = app._log_templates_view(None)
+    assert done and "请选择日志文件" in str(body)
+
+
+def test_failed_build_is_reported_and_not_restarted_by_polling(app, monkeypatch):
+    write_log("templates_fail.log", template_lines(10))
+    log_path = app.get_log_path("templates_fail.log")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(app, "_build_log_templates", fail)
+    app._start_log_templates_build(log_path)
+    deadline = time.time() + 10
+    while app._get_log_templates_build(log_path).get("status") == "building" and time.time() < deadline:
+        time.sleep(0.02)
+    state = app._get_log_templates_build(log_path)
+    assert state["status"] == "error" and "boom" in state["error"]
+    body, done = app._log_templates_view("templates_fail.log")
+    assert done and "boom" in str(body)
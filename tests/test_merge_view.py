@@ -0,0 +1,62 @@
+import os
+
+from conftest import write_log
+
+
+def _threadtime(second, pid, tag, text):
+    return f"01-02 10:{second // 60:02d}:{second % 60:02d}.000  {pid}  {pid} I {tag}: {text}\n"
+
+
+def test_interleaves_by_timestamp_with_source_tags(app, run_filter):
+    a_lines, b_lines, expected = [], [], []
+    for i in range(300):
+        a_lines.append(_threadtime(2 * i, 1, "A", f"a{i}"))
+        expected.append((2 * i, 0, "[merge_a_log] " + a_lines[-1]))
+        if i % 50 == 5:
+            a_lines.append(f"    at frame{i}\n")  # 无时间戳的续行沿用上一行的时间
+            expected.append((2 * i, 0, "[merge_a_log] " + a_lines[-1]))
+        b_lines.append(_threadtime(2 * i + 1, 2, "B", f"b{i}"))
+        expected.append((2 * i + 1, 1, "[merge_b_log] " + b_lines[-1]))
+    write_log("merge_a.log", a_lines)
+    write_log("merge_b.log", b_lines)
+    a_path, b_path = app.get_log_path("merge_a.log"), app.get_log_path("merge_b.log")
+
+    _, task, output = run_filter(a_path, [], ["a17", "b2"], merge_paths=[b_path])
+    assert task["backend"] == "python-merge(2)"
+    kept = [line for _, _, line in sorted(expected, key=lambda item: item[:2])
+            if "a17" not in line and "b2" not in line]
+    assert output.decode("utf-8") == "".join(kept)
+    assert task["keyword_hits"]["filter"] == {
+        "a17": sum("a17" in line for line in a_lines), "b2": sum("b2" in line for line in b_lines)
+    }
+
+
+def test_coarsest_format_and_backwards_time(app, run_filter):
+    # 第二个源只有时分秒：统一按一天内的秒数归并；第一个源中途时间倒退，保持源内顺序
+    a_lines = [_threadtime(s, 1, "A", f"a{s}") for s in (10, 20, 30, 5, 40)]
+    b_lines = [f"10:00:{s:02d} B b{s}\n" for s in (15, 35, 45)]
+    write_log("tod_a.log", a_lines)
+    write_log("tod_b.log", b_lines)
+    _, _, output = run_filter(app.get_log_path("tod_a.log"), [], ["zzz"], merge_paths=[app.get_log_path("tod_b.log")])
+    order = [line.split()[-1] for line in output.decode("utf-8").splitlines()]
+    assert order == ["a10", "b15", "a20", "a30", "a5", "b35", "a40", "b45"]
+
+
+def test_mixed_encodings_become_utf8(app, run_filter):
+    write_log("enc_utf8.log", [_threadtime(2 * i, 1, "U", f"统一码 {i}") for i in range(20)])
+    write_log("enc_gbk.log", [_threadtime(2 * i + 1, 2, "G", f"国标码 {i}") for i in range(20)], encoding="gbk")
+    _, task, output = run_filter(app.get_log_path("enc_utf8.log"), ["码"], [],
+                                 merge_paths=[app.get_log_path("enc_gbk.log")])
+    assert task["encoding"] == "utf-8"
+    text = output.decode("utf-8")
+    assert text.count("统一码") == 20 and text.count("国标码") == 20
+    assert text.splitlines()[1].startswith("[enc_gbk_log] ") and text.splitlines()[1].endswith("国标码 0")
+
+
+def test_same_name_sources_get_distinct_tags(app, run_filter):
+    write_log("twin.log", [_threadtime(1, 1, "X", "first")])
+    os.makedirs(os.path.join("logs", "twin_dir"), exist_ok=True)
+    write_log("twin_dir/twin.log", [_threadtime(2, 1, "X", "second")])
+    _, _, output = run_filter(app.get_log_path("twin.log"), [], ["zzz"],
+                              merge_paths=[app.get_log_path("twin_dir/twin.log")])
+    assert [line.split(" ", 1)[0] for line in output.decode("utf-8").splitlines()] == ["[twin_log]", "[twin_log_2]"]
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+@pytest.fixture
+def pool(app, monkeypatch):
+    monkeypatch.setenv("LOG_FILTER_WORKERS", "2")
+    app._reset_filter_process_pool()
+    try:
+        yield app._get_filter_process_pool()
+    finally:
+        app._reset_filter_process_pool()
+
+
+def _run_ranges(app, log_path, keep, exclude, pool):
+    keep_regex, filter_regex, text_encoding = app._compile_engine_patterns(keep, exclude, "utf-8")
+    ranges = app._split_newline_aligned_ranges(log_path, chunk_bytes=64 * 1024)
+    assert len(ranges) > 4
+    output, ordinals = b"", []
+    base = 0
+    for (start, _), (chunk, chunk_ordinals, offsets, range_lines, _) in zip(
+            ranges, app._iter_filtered_ranges(log_path, ranges, keep_regex, filter_regex, text_encoding, pool=pool)):
+        output += chunk
+        ordinals.extend((base + chunk_ordinals).tolist())
+        base += range_lines
+    return output, ordinals
+
+
+def test_pool_workers_match_reference_filter(app, pool):
+    lines = write_log("parallel.log", logcat_lines(20000))
+    log_path = app.get_log_path("parallel.log")
+
+    output, ordinals = _run_ranges(app, log_path, ["tag3", "Tag5"], ["foo"], pool)
+    expected = reference_filter(lines, ["tag3", "Tag5"], ["foo"])
+    assert output.decode("utf-8") == "".join(expected)
+    assert [lines[i] for i in ordinals] == expected
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+
+def test_pool_workers_read_log_sets(app, pool):
+    lines = logcat_lines(12000)
+    # 第一段末尾缺少换行：虚拟拼接时补一个，行不跨分段粘连
+    write_log("set_a.log", lines[:6999] + [lines[6999].rstrip("\n")])
+    write_log("set_b.log", lines[7000:])
+    with open(os.path.join("logs", "parallel" + app.LOG_SET_EXTENSION), "w", encoding="utf-8") as f:
+        json.dump({"segments": ["set_a.log", "set_b.log"]}, f)
+    log_path = app.get_log_path("parallel" + app.LOG_SET_EXTENSION)
+
+    parallel = _run_ranges(app, log_path, ["Tag7"], [], pool)
+    assert parallel == _run_ranges(app, log_path, ["Tag7"], [], None)
+    assert parallel[0].decode("utf-8") == "".join(reference_filter(lines, ["Tag7"]))
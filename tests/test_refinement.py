@@ -0,0 +1,47 @@
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def _source_lines(app, session_id):
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    return source_map[:, 0].tolist()
+
+
+def test_refinement_matches_fresh_run(app, run_filter):
+    lines = write_log("refine.log", logcat_lines(8000))
+    log_path = app.get_log_path("refine.log")
+    run_filter(log_path, ["Tag1", "Tag2"], ["foo"])
+    session_id, task, refined = run_filter(log_path, ["Tag1"], ["foo", "message 1"])
+    assert task["backend"].endswith("-refine")
+    refined_map = _source_lines(app, session_id)
+    refined_hits = task["keyword_hits"]["keep"]
+
+    app._clear_all_filter_tasks(delete_files=True)
+    fresh_id, fresh_task, fresh = run_filter(log_path, ["Tag1"], ["foo", "message 1"])
+    assert fresh_id == session_id
+    assert not fresh_task["backend"].endswith("-refine")
+    assert refined == fresh
+    assert refined.decode("utf-8") == "".join(reference_filter(lines, ["Tag1"], ["foo", "message 1"]))
+    assert refined_map == _source_lines(app, fresh_id)
+    assert [lines[n - 1] for n in refined_map] == refined.decode("utf-8").splitlines(keepends=True)
+    assert refined_hits == fresh_task["keyword_hits"]["keep"]
+
+
+def test_refinement_chains_through_source_map(app, run_filter):
+    lines = write_log("refine_chain.log", logcat_lines(6000))
+    log_path = app.get_log_path("refine_chain.log")
+    run_filter(log_path, [], ["Tag0"])
+    run_filter(log_path, [], ["Tag0", "Tag3"])
+    session_id, task, output = run_filter(log_path, [], ["Tag0", "Tag3", "foo"])
+    assert task["backend"].endswith("-refine")
+    expected = reference_filter(lines, [], ["Tag0", "Tag3", "foo"])
+    assert output.decode("utf-8") == "".join(expected)
+    assert [lines[n - 1] for n in _source_lines(app, session_id)] == expected
+
+
+def test_widening_does_not_refine(app, run_filter):
+    lines = write_log("refine_wide.log", logcat_lines(3000))
+    log_path = app.get_log_path("refine_wide.log")
+    run_filter(log_path, ["Tag1"])
+    _, task, output = run_filter(log_path, ["Tag1", "Tag2"])
+    assert not task["backend"].endswith("-refine")
+    assert output.decode("utf-8") == "".join(reference_filter(lines, ["Tag1", "Tag2"]))
@@ -0,0 +1,37 @@
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def test_log_window_reads_ranges_through_cached_reader(app, run_filter):
+    lines = write_log("window.log", logcat_lines(3000))
+    session_id, _, _ = run_filter(app.get_log_path("window.log"), ["Tag3"])
+    expected = reference_filter(lines, ["Tag3"])
+    client = app.app.server.test_client()
+
+    def window(start, end):
+        body = client.post("/api/get-log-window", json={"session_id": session_id, "start_line": start,
+                                                        "end_line": end}).get_json()
+        assert body["success"], body
+        return body
+
+    body = window(10, 20)
+    assert body["total_lines"] == len(expected)
+    reader = app._session_readers[session_id]
+    window(300, 320)
+    assert app._session_readers[session_id] is reader
+    assert reader.read_range(10, 20) == "".join(expected[9:20]).rstrip("\n")
+
+
+def test_retired_reader_stays_open_until_last_release(app, run_filter):
+    write_log("lease.log", logcat_lines(500))
+    session_id, _, _ = run_filter(app.get_log_path("lease.log"), ["Tag1"])
+
+    reader = app._get_session_reader(session_id)
+    try:
+        app._drop_session_reader(session_id)
+        # 已从缓存移除，但本请求仍持有租用：文件与行索引映射可继续读取
+        assert not reader.file.closed
+        assert reader.read_range(1, 2).count("\n") == 1
+    finally:
+        reader.release()
+    assert reader.file.closed
+    assert not reader.acquire()
@@ -0,0 +1,44 @@
+import os
+
+from conftest import logcat_lines, write_log
+
+
+def _line_starts(lines):
+    starts, position = [], 0
+    for line in lines:
+        starts.append(position)
+        position += len(line.encode("utf-8"))
+    return starts, position
+
+
+def test_source_index_matches_line_starts_and_is_reused(app):
+    lines = write_log("indexed.log", logcat_lines(5000))
+    log_path = app.get_log_path("indexed.log")
+
+    line_index = app._get_source_line_index(log_path)
+    starts, size = _line_starts(lines)
+    assert line_index.line_count == len(lines)
+    assert line_index.end_offset == size
+    assert [line_index.line_span(n) for n in (1, 2500, 5000)] == [
+        (starts[0], starts[1]), (starts[2499], starts[2500]), (starts[4999], size)
+    ]
+
+    # 持久化在 temp/source_index 下，源文件不变时直接复用，不重建
+    idx_path = app.get_source_index_path(log_path)
+    mtime = os.stat(idx_path).st_mtime_ns
+    app._invalidate_line_index(idx_path)
+    assert app._get_source_line_index(log_path, build=False).line_count == len(lines)
+    assert os.stat(idx_path).st_mtime_ns == mtime
+
+
+def test_source_index_rebuilt_after_source_changes(app):
+    lines = write_log("growing.log", logcat_lines(100))
+    log_path = app.get_log_path("growing.log")
+    assert app._get_source_line_index(log_path).line_count == 100
+
+    more = write_log("growing.log", logcat_lines(50, start=100), mode="a")
+    assert app._get_source_line_index(log_path, build=False) is None
+    assert app._get_source_line_index(log_path).line_count == 150
+
+    text, _ = app.get_file_lines_range(log_path, 99, 102)
+    assert text.splitlines() == [line.rstrip("\n") for line in (lines + more)[98:102]]
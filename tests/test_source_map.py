@@ -0,0 +1,46 @@
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def test_map_points_at_source_lines(app, run_filter):
+    lines = write_log("map.log", logcat_lines(4000))
+    log_path = app.get_log_path("map.log")
+    session_id, _, output = run_filter(log_path, ["Tag2"], ["foo"])
+    expected = reference_filter(lines, ["Tag2"], ["foo"])
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    assert source_map.shape == (len(expected), 2)
+    with open(log_path, "rb") as f:
+        data = f.read()
+    for (line_no, offset), line in zip(source_map.tolist(), expected):
+        assert lines[line_no - 1] == line
+        assert data[offset:offset + len(line)].decode("utf-8") == line
+
+    positions = app._lookup_filter_source_positions(session_id, [1, len(expected), len(expected) + 1])
+    assert positions == {1: tuple(source_map[0].tolist()), len(expected): tuple(source_map[-1].tolist())}
+    hit = int(source_map[10, 0])
+    assert app._find_filtered_line_for_source(session_id, hit) == 11
+    assert app._find_filtered_line_for_source(session_id, hit - 1) == 11
+
+
+def test_source_position_api_context(app, run_filter):
+    lines = write_log("map_api.log", logcat_lines(2000))
+    log_path = app.get_log_path("map_api.log")
+    session_id, _, _ = run_filter(log_path, ["Tag7"])
+    client = app.app.server.test_client()
+    data = client.post("/api/source-position", json={"session_id": session_id, "line": 3, "context": 2}).get_json()
+    assert data["success"] and data["source_file"] == "map_api.log"
+    item = data["positions"][0]
+    source_line = item["source_line_number"]
+    assert source_line == [n for n, line in enumerate(lines, 1) if "Tag7" in line][2]
+    assert item["context_start_line"] == source_line - 2
+    assert [line.rstrip("\n") for line in item["context"]] == [line.rstrip("\n") for line in lines[source_line - 3:source_line + 2]]
+
+
+def test_modified_source_invalidates_mapping(app, run_filter):
+    write_log("map_stale.log", logcat_lines(1000))
+    log_path = app.get_log_path("map_stale.log")
+    session_id, _, _ = run_filter(log_path, ["Tag1"])
+    assert app._get_filter_session_source(session_id) == log_path
+    write_log("map_stale.log", logcat_lines(10), mode="a")
+    assert app._get_filter_session_source(session_id) is None
+    app._clear_all_filter_tasks(delete_files=False)
+    assert app._get_filter_session_source(session_id) is None
@@ -0,0 +1,41 @@
+import shutil
+import sys
+
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+def test_command_blocks_are_whole_lines(app):
+    script = "import sys\nfor i in range(5000):\n    sys.stdout.write(f'line {i} ' + 'x' * (i % 37) + '\\n')\n"
+    blocks = []
+    app._read_command_blocks([sys.executable, "-c", script], "python", blocks.append)
+    assert all(block.endswith(b"\n") for block in blocks)
+    assert b"".join(blocks).decode().splitlines() == [f"line {i} " + "x" * (i % 37) for i in range(5000)]
+
+
+@pytest.mark.skipif(shutil.which("grep") is None, reason="grep 不可用")
+def test_grep_publishes_partial_results(app, run_filter, monkeypatch):
+    lines = write_log("streaming.log", logcat_lines(30000))
+    log_path = app.get_log_path("streaming.log")
+    monkeypatch.setattr(app, "_PIPE_READ_BYTES", 4096)
+    updates = []
+    original = app._update_filter_task
+
+    def record(session_id, **kwargs):
+        updates.append(dict(kwargs))
+        original(session_id, **kwargs)
+
+    monkeypatch.setattr(app, "_update_filter_task", record)
+    session_id, task, output = run_filter(log_path, ["Tag4"], ["foo"], backend="grep")
+    expected = reference_filter(lines, ["Tag4"], ["foo"])
+    assert output.decode("utf-8") == "".join(expected)
+    assert task["done_lines"] == len(expected)
+    assert task["done_bytes"] == task["total_bytes"]
+
+    partial = [u for u in updates if "done_lines" in u and not u.get("finished")]
+    assert len(partial) > 1
+    done_lines = [u["done_lines"] for u in partial]
+    assert done_lines == sorted(done_lines) and done_lines[0] < len(expected)
+    ready = next(u for u in partial if u.get("first_ready"))
+    assert app._FILTER_CHUNK_LINES <= ready["done_lines"] < len(expected)
@@ -0,0 +1,39 @@
+import os
+
+
+def _write_restart_log(name, total=6000, restart=3000):
+    """仅时分秒的日志：第 restart+1 行起设备重启，时间从 10:49:59 倒退到 09:00:00（落在两个采样之间）"""
+    lines = []
+    for i in range(total):
+        t = 10 * 3600 + i if i < restart else 9 * 3600 + (i - restart)
+        lines.append(f"{t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d} msg {i + 1}\n")
+    with open(os.path.join("logs", name), "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+    return lines
+
+
+def test_restart_between_samples_starts_new_segment(app):
+    lines = _write_restart_log("restart.log")
+    log_path = app.get_log_path("restart.log")
+
+    line_no, _ = app._locate_time_in_source(log_path, "09:00:00")
+    assert line_no == 3001
+
+    spans = app._resolve_time_range_spans(log_path, ["09:00:00", "09:00:30"])
+    with open(log_path, "rb") as f:
+        data = f.read()
+    selected = b"".join(data[start:end] for start, end, _ in spans)
+    assert selected.decode("utf-8") == "".join(lines[3000:3031])
+    assert spans[0][2] == 3001
+
+
+def test_range_before_restart_stops_at_drop(app):
+    lines = _write_restart_log("restart2.log")
+    log_path = app.get_log_path("restart2.log")
+
+    spans = app._resolve_time_range_spans(log_path, ["10:49:50", "10:55:00"])
+    with open(log_path, "rb") as f:
+        data = f.read()
+    selected = b"".join(data[start:end] for start, end, _ in spans)
+    # 重启后的 09:xx 行不属于该范围，重启前的段在倒退处结束
+    assert selected.decode("utf-8") == "".join(lines[2990:3000])
@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import logcat_lines, reference_filter, write_log
+
+
+@pytest.fixture
+def indexed(app, monkeypatch):
+    """小文件也建立三元组索引：块大小 16KB，稀有关键字只出现在少数几块中"""
+    monkeypatch.setattr(app, "_TRIGRAM_INDEX_MIN_BYTES", 0)
+    monkeypatch.setattr(app, "_TRIGRAM_BLOCK_BYTES", 16 * 1024)
+    lines = logcat_lines(30000)
+    for i in (1234, 1240, 17777, 29999):
+        lines[i] = lines[i].replace("message", "RareMarker message")
+    write_log("trigram.log", lines)
+    log_path = app.get_log_path("trigram.log")
+    index = app._get_trigram_index(log_path, build=True)
+    assert index is not None and index.block_count > 50
+    yield log_path, lines, index
+    with app._trigram_index_cache_lock:
+        app._trigram_index_cache.clear()
+
+
+def test_candidate_blocks_have_no_false_negatives(app, indexed):
+    log_path, lines, index = indexed
+    with open(log_path, "rb") as f:
+        data = f.read()
+    for keyword in (b"raremarker", b"tag3: message 2", b"message 29999 bar", b"zzqq"):
+        blocks = index.candidate_blocks([keyword])
+        for block in range(index.block_count):
+            chunk = data[int(index.offsets[block]):int(index.offsets[block + 1])]
+            if keyword in chunk.lower():
+                assert blocks[block], (keyword, block)
+    assert 0 < index.candidate_blocks([b"raremarker"]).sum() < 10
+    assert not index.candidate_blocks([b"zzqq"]).any()
+    for start, end, line in index.spans(index.candidate_blocks([b"raremarker"])):
+        assert data[:start].count(b"\n") + 1 == line
+        assert data[end - 1:end] == b"\n"
+
+
+def test_filter_reads_only_candidate_blocks(app, run_filter, indexed):
+    log_path, lines, index = indexed
+    session_id, task, output = run_filter(log_path, ["raremarker"], ["Tag0"])
+    expected = reference_filter(lines, ["raremarker"], ["Tag0"])
+    assert "trigram" in task["backend"]
+    assert task["total_bytes"] < index.offsets[-1] / 5
+    assert output.decode("utf-8") == "".join(expected)
+    source_map = app._load_source_map_array(app.get_temp_source_map_path(app.get_temp_file_path(session_id)))
+    assert [lines[n - 1] for n in source_map[:, 0]] == expected
+
+
+def test_search_uses_index(app, indexed, monkeypatch):
+    log_path, lines, _ = indexed
+    used = []
+    original = app._trigram_candidate_spans
+
+    def record(*args, **kwargs):
+        spans = original(*args, **kwargs)
+        used.append(spans)
+        return spans
+
+    monkeypatch.setattr(app, "_trigram_candidate_spans", record)
+    result = app._scan_search_matches_binary(log_path, "RAREmarker", ["utf-8"], False, idx_data={"line_count": len(lines)})
+    assert used and used[0] is not None
+    assert result["matches"] == [n for n, line in enumerate(lines, 1) if "RareMarker" in line]
+
+
+def test_stale_index_is_ignored(app, indexed):
+    log_path, lines, _ = indexed
+    write_log("trigram.log", ["01-02 10:00:00.000  1  2 I Late: raremarker appended\n"], mode="a")
+    assert app._get_trigram_index(log_path) is None
+    rebuilt = app._get_trigram_index(log_path, build=True)
+    assert rebuilt.candidate_blocks([b"late: raremarker"])[-1]